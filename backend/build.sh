@@ -23,6 +23,10 @@ python manage.py makemigrations --noinput
 echo "🗄️ Running migrations..."
 python manage.py migrate --noinput
 
+# Fill unread badge counters (Redis store) from existing unread rows
+echo "🔢 Reconciling unread counters..."
+python manage.py reconcile_unread_counters || echo "⚠️ Unread counter reconcile failed - run reconcile_unread_counters manually"
+
 # Collect static files for production
 echo "📁 Collecting static files..."
 python manage.py collectstatic --noinput
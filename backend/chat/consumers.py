@@ -1,87 +1,135 @@
 # moto_app/backend/chat/consumers.py
 
+import asyncio
 import json
+import logging
+
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async # Veritabanı işlemleri için
 
 # Django User modelini import ediyoruz
 from django.contrib.auth import get_user_model
 from .models import PrivateMessage # PrivateMessage modelini import ediyoruz (chat/models.py'den)
+from .group_messages import MAX_GROUP_MESSAGE_LENGTH, get_group_message_writer, is_group_member
+from . import presence
+from .read_receipts import mark_read_up_to, parse_up_to_id, private_room_group, read_receipt_event
 from notifications.models import Notification # <-- BU SATIRI DÜZELTTİK! Notification modelini doğru yerden import ediyoruz
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# Arka planda çalışan mesaj bildirimleri (tamamlanana kadar referans tutulur)
+_notification_tasks = set()
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Grup sohbeti. Üyelik bağlantıda bir kez kontrol edilir; mesajlar
+    write-behind tamponu ile toplu yazılır (bkz. chat/group_messages.py),
+    gönderene sunucu ID'siyle 'message_ack' döner ve mesaj gruba yayınlanır.
+
+    İstemci {"message": "...", "client_id": "..."} gönderir; client_id
+    isteğe bağlıdır ve ack'te aynen geri döner.
+    """
+
     async def connect(self):
         # URL'den group_id'yi alıyoruz (routing.py'den gelir)
-        self.group_id = self.scope['url_route']['kwargs']['group_id']
+        self.group_id = int(self.scope['url_route']['kwargs']['group_id'])
         self.group_name = f'chat_{self.group_id}'
+        self.joined = False
 
         # Kullanıcının kimliği doğrulanmış mı kontrol et
-        if self.scope["user"].is_authenticated:
-            print(f"DEBUG CONSUMER: Kullanıcı '{self.scope['user'].username}' (ID: {self.scope['user'].id}) sohbet grubuna bağlanıyor: {self.group_name}")
-            
-            # Gruba katıl
-            await self.channel_layer.group_add(
-                self.group_name,
-                self.channel_name
-            )
-            await self.accept() # Bağlantıyı kabul et
-            await self.send(text_data=json.dumps({
-                'type': 'connection_established',
-                'message': f"Sohbet odası {self.group_id} ile bağlantı kuruldu. Kullanıcı: {self.scope['user'].username}"
-            }))
-        else:
+        if not self.scope["user"].is_authenticated:
             print(f"DEBUG CONSUMER: Kimliği doğrulanmamış kullanıcı bağlantı denemesi. Grup ID: {self.group_id}")
             await self.close(code=4003) # 4003: Kimlik doğrulama başarısız (özel kod)
+            return
+
+        # Üyelik bağlantı boyunca geçerli sayılır; mesaj başına sorgu yapılmaz
+        is_member = await database_sync_to_async(is_group_member)(self.scope['user'], self.group_id)
+        if not is_member:
+            logger.warning(f"Grup sohbeti reddedildi: User {self.scope['user'].id} grup {self.group_id} üyesi değil")
+            await self.close(code=4003)
+            return
+
+        print(f"DEBUG CONSUMER: Kullanıcı '{self.scope['user'].username}' (ID: {self.scope['user'].id}) sohbet grubuna bağlanıyor: {self.group_name}")
+
+        # Gruba katıl
+        await self.channel_layer.group_add(
+            self.group_name,
+            self.channel_name
+        )
+        self.joined = True
+        await self.accept() # Bağlantıyı kabul et
+        await self.send(text_data=json.dumps({
+            'type': 'connection_established',
+            'message': f"Sohbet odası {self.group_id} ile bağlantı kuruldu. Kullanıcı: {self.scope['user'].username}"
+        }))
 
     async def disconnect(self, close_code):
         print(f"DEBUG CONSUMER: Bağlantı kesildi. Kullanıcı: {self.scope['user'].username if self.scope['user'].is_authenticated else 'AnonymousUser'}. Kod: {close_code}")
         # Gruptan ayrıl
-        if self.scope["user"].is_authenticated:
+        if getattr(self, 'joined', False):
             await self.channel_layer.group_discard(
                 self.group_name,
                 self.channel_name
             )
 
     async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message = text_data_json['message']
-        
-        # Sadece kimliği doğrulanmış kullanıcıların mesaj göndermesine izin ver
-        if self.scope["user"].is_authenticated:
-            username = self.scope['user'].username
-            user_id = self.scope['user'].id
-            print(f"DEBUG CONSUMER: Kullanıcı '{username}' (ID: {user_id}) mesaj gönderdi: {message}")
+        try:
+            text_data_json = json.loads(text_data)
+            message = text_data_json['message']
+        except (ValueError, TypeError, KeyError):
+            await self._send_error('Geçersiz mesaj verisi.')
+            return
+        client_id = text_data_json.get('client_id')
 
-            # Mesajı grup katmanına gönder
-            await self.channel_layer.group_send(
-                self.group_name,
-                {
-                    'type': 'chat_message', # Alıcı consumer'ın çağıracağı metod adı
-                    'message': message,
-                    'username': username,
-                    'user_id': user_id,
-                }
-            )
-        else:
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': 'Kimlik doğrulanmamış kullanıcı mesaj gönderemez.'
-            }))
+        if not isinstance(message, str) or not message.strip():
+            await self._send_error('Mesaj boş olamaz.', client_id)
+            return
+        if len(message) > MAX_GROUP_MESSAGE_LENGTH:
+            await self._send_error(f'Mesaj en fazla {MAX_GROUP_MESSAGE_LENGTH} karakter olabilir.', client_id)
+            return
+
+        user = self.scope['user']
+        try:
+            saved = await get_group_message_writer().submit(self.group_id, user.id, message)
+        except Exception:
+            await self._send_error('Mesaj kaydedilemedi.', client_id)
+            return
+
+        created_at = saved.created_at.isoformat()
+        await self.send(text_data=json.dumps({
+            'type': 'message_ack',
+            'client_id': client_id,
+            'message_id': saved.id,
+            'created_at': created_at,
+        }))
+
+        # Mesajı grup katmanına gönder
+        await self.channel_layer.group_send(
+            self.group_name,
+            {
+                'type': 'chat_message', # Alıcı consumer'ın çağıracağı metod adı
+                'message': message,
+                'username': user.username,
+                'user_id': user.id,
+                'message_id': saved.id,
+                'created_at': created_at,
+            }
+        )
+
+    async def _send_error(self, message, client_id=None):
+        await self.send(text_data=json.dumps({'type': 'error', 'message': message, 'client_id': client_id}))
 
     # Gruptan mesaj alındığında çağrılan metod
     async def chat_message(self, event):
-        message = event['message']
-        username = event['username']
-        user_id = event['user_id']
-
         # WebSocket üzerinden istemciye mesaj gönder
         await self.send(text_data=json.dumps({
             'type': 'chat_message',
-            'message': message,
-            'username': username,
-            'user_id': user_id,
+            'message': event['message'],
+            'username': event['username'],
+            'user_id': event['user_id'],
+            'message_id': event['message_id'],
+            'created_at': event['created_at'],
         }))
 
 # --- Özel Mesajlaşma Consumer'ı ---
@@ -105,7 +153,8 @@ class PrivateChatConsumer(AsyncWebsocketConsumer):
         # Bu, kullanıcı 1-2 ve 2-1 arasındaki sohbetin aynı gruba düşmesini sağlar
         user_ids = sorted([self.user1_id, self.user2_id])
         self.room_name = f'private_chat_{user_ids[0]}_{user_ids[1]}'
-        self.room_group_name = f'chat_{self.room_name}'
+        self.room_group_name = private_room_group(self.user1_id, self.user2_id)
+        self.partner_id = self.user2_id if current_user_id == self.user1_id else self.user1_id
 
         print(f"DEBUG PRIVATE CONSUMER: Kullanıcı '{self.scope['user'].username}' (ID: {current_user_id}) özel sohbet odasına bağlanıyor: {self.room_group_name}")
 
@@ -120,16 +169,43 @@ class PrivateChatConsumer(AsyncWebsocketConsumer):
             'message': f"Özel sohbet odası {self.room_name} ile bağlantı kuruldu. Kullanıcı: {self.scope['user'].username}"
         }))
 
+        self.presence_session = presence.PresenceSession(current_user_id, self.channel_name)
+        await self.presence_session.start()
+
+        # Karşı tarafın durumu sadece takip edilen veya mesajlaşılan kişiler için gönderilir
+        allowed = await database_sync_to_async(presence.allowed_presence_targets)(
+            self.scope['user'], {self.partner_id}
+        )
+        self.presence_subscribed = self.partner_id in allowed
+        if self.presence_subscribed:
+            await self.channel_layer.group_add(presence.presence_group(self.partner_id), self.channel_name)
+            partner_presence = (await presence.aget_presence([self.partner_id]))[self.partner_id]
+            await self.send(text_data=json.dumps(dict(
+                partner_presence, type='presence_update', user_id=self.partner_id,
+            )))
+
     async def disconnect(self, close_code):
         print(f"DEBUG PRIVATE CONSUMER: Özel sohbet bağlantısı kesildi. Kullanıcı: {self.scope['user'].username if self.scope['user'].is_authenticated else 'AnonymousUser'}. Kod: {close_code}")
-        if self.scope["user"].is_authenticated:
+        if self.scope["user"].is_authenticated and hasattr(self, 'partner_id'):
             await self.channel_layer.group_discard(
                 self.room_group_name,
                 self.channel_name
             )
+            if getattr(self, 'presence_subscribed', False):
+                await self.channel_layer.group_discard(presence.presence_group(self.partner_id), self.channel_name)
+        if getattr(self, 'presence_session', None) is not None:
+            await self.presence_session.stop()
 
     async def receive(self, text_data):
+        if getattr(self, 'presence_session', None) is not None:
+            await self.presence_session.touch()
         text_data_json = json.loads(text_data)
+        if text_data_json.get('type') == 'mark_read':
+            await self._mark_read(text_data_json.get('up_to_id'))
+            return
+        if text_data_json.get('type') == 'heartbeat':
+            await self.send(text_data=json.dumps({'type': 'heartbeat_ack'}))
+            return
         message_content = text_data_json['message']
         receiver_id = text_data_json.get('receiver_id') # Mesajı kime gönderdiği bilgisi
 
@@ -162,37 +238,6 @@ class PrivateChatConsumer(AsyncWebsocketConsumer):
             message=message_content
         )
 
-        # Mesaj bildirimi gönder
-        try:
-            from notifications.utils import send_notification_with_preferences
-            message_text = f"{sender_user.get_full_name() or sender_user.username} size mesaj gönderdi: {message_content[:50]}..."
-            
-            # Bildirimi arka planda gönder (asenkron)
-            import threading
-            def send_message_notification_async():
-                try:
-                    send_notification_with_preferences(
-                        recipient_user=receiver_user,
-                        message=message_text,
-                        notification_type='message',
-                        sender_user=sender_user,
-                        content_object=message_obj,
-                        title=f"Yeni Mesaj - {sender_user.get_full_name() or sender_user.username}"
-                    )
-                except Exception as e:
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.error(f"Mesaj bildirimi gönderilemedi: {e}")
-            
-            # Arka planda bildirim gönder
-            threading.Thread(target=send_message_notification_async, daemon=True).start()
-            
-        except Exception as e:
-            # Bildirim gönderme hatası kritik değil, sadece logla
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Mesaj bildirimi thread başlatılamadı: {e}")
-
         # Mesajı grup katmanına gönder
         await self.channel_layer.group_send(
             self.room_group_name,
@@ -208,6 +253,59 @@ class PrivateChatConsumer(AsyncWebsocketConsumer):
             }
         )
 
+        # Bildirim mesajın odaya iletilmesini bekletmesin diye arka planda gönderilir
+        task = asyncio.ensure_future(self._notify_receiver(sender_user, receiver_user, message_obj))
+        _notification_tasks.add(task)
+        task.add_done_callback(_notification_tasks.discard)
+
+    async def _notify_receiver(self, sender_user, receiver_user, message_obj):
+        try:
+            from notifications.utils import send_notification_with_preferences
+            sender_name = sender_user.get_full_name() or sender_user.username
+            # Push gönderimi fcm_service kuyruğunda yapılır; DB ve channel layer
+            # işleri thread pool'da çalışır, event loop bloklanmaz
+            await database_sync_to_async(send_notification_with_preferences)(
+                recipient_user=receiver_user,
+                message=f"{sender_name} size mesaj gönderdi: {message_obj.message[:50]}...",
+                notification_type='message',
+                sender_user=sender_user,
+                content_object=message_obj,
+                title=f"Yeni Mesaj - {sender_name}"
+            )
+        except Exception as e:
+            # Bildirim gönderme hatası kritik değil, sadece logla
+            logger.error(f"Mesaj bildirimi gönderilemedi: {e}")
+
+    async def _mark_read(self, up_to_id):
+        """Karşı taraftan gelen, up_to_id'ye kadar olan mesajları okundu yap"""
+        up_to_id = parse_up_to_id(up_to_id)
+        if up_to_id is None:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'up_to_id pozitif bir tam sayı olmalıdır.'
+            }))
+            return
+        user_id = self.scope['user'].id
+        updated = await database_sync_to_async(mark_read_up_to)(user_id, self.partner_id, up_to_id)
+        if updated:
+            await self.channel_layer.group_send(
+                self.room_group_name, read_receipt_event(user_id, up_to_id, updated)
+            )
+
+    async def read_receipt(self, event):
+        # Okuyan kullanıcının kendi soketine geri gönderilmez
+        if event['reader_id'] == self.scope['user'].id:
+            return
+        await self.send(text_data=json.dumps(event))
+
+    async def presence_update(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'presence_update',
+            'user_id': event['user_id'],
+            'is_online': event['is_online'],
+            'last_seen': event['last_seen'],
+        }))
+
     # Gruptan mesaj alındığında çağrılan metod
     async def private_chat_message(self, event):
         # Mesajı WebSocket üzerinden istemciye gönder
@@ -0,0 +1,129 @@
+"""
+Konuşma listesi sorguları
+
+Kullanıcının tüm konuşmaları (karşı taraf, son mesaj ve okunmamış sayısı) tek
+bir window function sorgusu ile hesaplanır. ROW_NUMBER() ve SUM() OVER hem
+PostgreSQL'de hem de SQLite'ta (3.25+) desteklendiği için aynı sorgu iki
+veritabanında da çalışır.
+
+İki kullanıcı arasındaki mesaj geçmişi (timestamp, id) keyset cursor ile
+sayfalanır; her sayfa chat_pm_pair_ts_idx üzerinden LIMIT'li tek sorgudur.
+"""
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When, Window
+from django.db.models.functions import RowNumber
+
+from core_api.pagination import encode_cursor, keyset_after, keyset_before
+from users.utils import attach_follow_state
+from .models import PrivateMessage
+from .presence import get_presence
+
+# Cursor verilmediğinde dönen son mesaj sayısı
+DEFAULT_HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+
+
+def conversation_summaries(user):
+    """
+    Kullanıcının konuşmalarını son mesaj zamanına göre (yeniden eskiye) döndürür.
+
+    Her satır partner_id, partner_unread annotate edilmiş son PrivateMessage'dır;
+    sender ve receiver select_related ile gelir.
+    """
+    partner_id = Case(
+        When(sender_id=user.id, then=F('receiver_id')),
+        default=F('sender_id'),
+        output_field=IntegerField(),
+    )
+    unread = Case(
+        When(receiver_id=user.id, is_read=False, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return PrivateMessage.objects.filter(
+        Q(sender=user) | Q(receiver=user)
+    ).annotate(
+        partner_id=partner_id,
+    ).annotate(
+        partner_rank=Window(
+            RowNumber(),
+            partition_by=[F('partner_id')],
+            order_by=[F('timestamp').desc(), F('id').desc()],
+        ),
+        partner_unread=Window(Sum(unread), partition_by=[F('partner_id')]),
+    ).filter(
+        partner_rank=1,
+    ).select_related('sender', 'receiver').order_by('-timestamp', '-id')
+
+
+def build_conversation_list(user):
+    """ConversationViewSet.list yanıtını tek özet sorgusu ile oluşturur"""
+    from .serializers import PrivateMessageSerializer
+
+    last_messages = list(conversation_summaries(user))
+    # İç içe UserSerializer'ın takip sayıları için tek toplu sorgu
+    attach_follow_state(
+        [message.sender for message in last_messages] + [message.receiver for message in last_messages]
+    )
+
+    partners = [
+        message.receiver if message.sender_id == user.id else message.sender for message in last_messages
+    ]
+    # Tüm karşı tarafların durumu tek presence okumasıyla
+    statuses = get_presence([partner.id for partner in partners])
+
+    conversation_list = []
+    for last_message, other_user in zip(last_messages, partners):
+        conversation_list.append({
+            'other_user': {
+                'id': other_user.id,
+                'username': other_user.username,
+                'first_name': other_user.first_name,
+                'last_name': other_user.last_name,
+                'profile_picture': getattr(other_user, 'profile_picture', None),
+            },
+            'last_message': PrivateMessageSerializer(last_message).data,
+            'unread_count': last_message.partner_unread or 0,
+            'is_online': statuses[other_user.id]['is_online'],
+            'last_seen': statuses[other_user.id]['last_seen'],
+        })
+    return conversation_list
+
+
+def message_history_page(user, other_user, before=None, after=None, page_size=DEFAULT_HISTORY_PAGE_SIZE):
+    """
+    İki kullanıcı arasındaki mesajlardan bir sayfa döndürür (eskiden yeniye).
+
+    before verilirse cursor'dan eski, after verilirse cursor'dan yeni mesajlar;
+    ikisi de yoksa en son page_size mesaj döner. has_more, istenen yönde
+    (before/varsayılan için daha eski, after için daha yeni) mesaj kaldığını
+    belirtir.
+    """
+    from .serializers import PrivateMessageSerializer
+
+    queryset = PrivateMessage.objects.filter(
+        Q(sender=user, receiver=other_user) |
+        Q(sender=other_user, receiver=user)
+    ).select_related('sender', 'receiver')
+
+    if after is not None:
+        queryset = queryset.filter(keyset_after(after, 'timestamp')).order_by('timestamp', 'id')
+    else:
+        if before is not None:
+            queryset = queryset.filter(keyset_before(before, 'timestamp'))
+        queryset = queryset.order_by('-timestamp', '-id')
+
+    messages = list(queryset[:page_size + 1])
+    has_more = len(messages) > page_size
+    messages = messages[:page_size]
+    if after is None:
+        messages.reverse()
+
+    attach_follow_state(
+        [message.sender for message in messages] + [message.receiver for message in messages]
+    )
+    return {
+        'results': PrivateMessageSerializer(messages, many=True).data,
+        'has_more': has_more,
+        'before_cursor': encode_cursor(messages[0].timestamp, messages[0].id) if messages else None,
+        'after_cursor': encode_cursor(messages[-1].timestamp, messages[-1].id) if messages else None,
+    }
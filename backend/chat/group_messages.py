@@ -0,0 +1,119 @@
+"""
+Grup mesajlarının WebSocket üzerinden kalıcı yazılması
+
+ChatConsumer mesajları tek tek INSERT etmek yerine process başına bir
+write-behind tamponuna bırakır. Tampon GROUP_MESSAGE_FLUSH_MS dolduğunda veya
+GROUP_MESSAGE_BATCH_SIZE mesaj biriktiğinde hepsini tek bulk_create ile
+yazar; her gönderen, mesajı yazılınca sunucu ID'siyle onay (ack) alır ve
+mesaj ancak bu noktada gruba yayınlanır. Yoğun grup sohbetlerinde mesaj
+başına bir transaction yerine tick başına bir transaction açılır.
+"""
+import asyncio
+import logging
+import weakref
+
+from channels.db import database_sync_to_async
+from django.db.models import Q
+
+from groups.models import Group
+from .models import GroupMessage
+
+logger = logging.getLogger(__name__)
+
+GROUP_MESSAGE_FLUSH_MS = 50
+GROUP_MESSAGE_BATCH_SIZE = 100
+MAX_GROUP_MESSAGE_LENGTH = 4000
+
+
+def is_group_member(user, group_id):
+    """Kullanıcı grubun sahibi veya üyesi mi? (tek EXISTS sorgusu)"""
+    return Group.objects.filter(Q(owner=user) | Q(members=user), pk=group_id).exists()
+
+
+def _bulk_insert(messages):
+    """
+    Mesajları tek INSERT ile yazar. Parti başarısız olursa (ör. bu arada
+    silinen grup) mesajlar tek tek denenir; sadece sorunlu olanlar düşer.
+
+    Returns:
+        list: her mesaj için kayıt veya hata
+    """
+    try:
+        return GroupMessage.objects.bulk_create(messages)
+    except Exception as e:
+        logger.warning(f"Toplu grup mesajı yazımı başarısız, tek tek deneniyor: {e}")
+
+    results = []
+    for message in messages:
+        try:
+            message.save(force_insert=True)
+            results.append(message)
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+class GroupMessageWriter:
+    """Bir event loop'a bağlı write-behind tamponu"""
+
+    def __init__(self, flush_ms=None, batch_size=None):
+        self.flush_seconds = (flush_ms or GROUP_MESSAGE_FLUSH_MS) / 1000
+        self.batch_size = batch_size or GROUP_MESSAGE_BATCH_SIZE
+        self._pending = []
+        self._timer = None
+
+    async def submit(self, group_id, sender_id, content):
+        """
+        Mesajı tampona ekler ve yazılmasını bekler.
+
+        Returns:
+            GroupMessage: id ve created_at'i dolu kayıt
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((
+            GroupMessage(group_id=group_id, sender_id=sender_id, content=content),
+            future,
+        ))
+        if len(self._pending) >= self.batch_size:
+            self._cancel_timer()
+            asyncio.ensure_future(self.flush())
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.flush_seconds, lambda: asyncio.ensure_future(self.flush())
+            )
+        return await future
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def flush(self):
+        self._cancel_timer()
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            saved = await database_sync_to_async(_bulk_insert)([message for message, _ in batch])
+        except Exception as e:
+            logger.error(f"Grup mesajları yazılamadı ({len(batch)} mesaj): {e}")
+            saved = [e] * len(batch)
+        for result, (_, future) in zip(saved, batch):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+_writers = weakref.WeakKeyDictionary()
+
+
+def get_group_message_writer():
+    """Çalışan event loop'un yazıcısı (process başına tek tampon)"""
+    loop = asyncio.get_running_loop()
+    writer = _writers.get(loop)
+    if writer is None:
+        writer = _writers[loop] = GroupMessageWriter()
+    return writer
@@ -0,0 +1,137 @@
+"""
+Mesajlarda tam metin arama (PrivateMessage.message, GroupMessage.content)
+
+PostgreSQL'de her mesaj tablosunda metinden türetilen bir tsvector kolonu
+(search_vector, 'turkish' yapılandırması, GIN index) bulunur; sorgu
+websearch_to_tsquery ile çözülür, sonuçlar ts_rank ile sıralanır ve
+ts_headline ile vurgulanmış kısa bir alıntı döner.
+
+SQLite'ta (development) aynı API tabloyu trigger'larla takip eden FTS5
+tabloları (<tablo>_fts) üzerinden çalışır: her kelime ön ek olarak aranır,
+sıralama bm25 ile, alıntı snippet() ile yapılır. Diğer veritabanlarında
+icontains'e düşülür.
+
+Her iki durumda da önce sadece sayfanın (id, rank, snippet) satırları
+hesaplanır, mesajlar ardından tek sorguda yüklenir. Sıralama rank'e göre
+olduğundan sayfalama sayfa numarasıyla yapılır.
+
+Alıntı ham mesaj metninden üretildiği için veritabanı eşleşmeleri kontrol
+karakterleriyle işaretler; metin HTML-escape edildikten sonra bu işaretler
+<mark> etiketlerine çevrilir.
+"""
+import html
+import re
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVectorField
+from django.db import connection
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'turkish'
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 50
+# Sorguda dikkate alınan en fazla kelime
+MAX_SEARCH_TERMS = 8
+SNIPPET_WORDS = 12
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+SNIPPET_ELLIPSIS = '…'
+# Veritabanının eşleşmeleri işaretlediği, mesaj metninde beklenmeyen karakterler
+_MATCH_START = '\x02'
+_MATCH_END = '\x03'
+
+
+def search_terms(query):
+    """Sorgudaki kelimeler (noktalama ve FTS operatörleri atılır)"""
+    return re.findall(r'\w+', query or '')[:MAX_SEARCH_TERMS]
+
+
+def render_snippet(snippet):
+    """İşaretli alıntıyı HTML-escape edip eşleşmeleri <mark> ile sarar"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(_MATCH_START, HIGHLIGHT_START).replace(_MATCH_END, HIGHLIGHT_END)
+
+
+def _postgres_rows(queryset, field, query, offset, limit):
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    document = RawSQL(
+        f'{connection.ops.quote_name(queryset.model._meta.db_table)}.search_vector', [],
+        output_field=SearchVectorField(),
+    )
+    rows = (
+        queryset.alias(document=document)
+        .filter(document=search_query)
+        .annotate(
+            rank=SearchRank(F('document'), search_query),
+            snippet=SearchHeadline(
+                field, search_query, config=SEARCH_CONFIG,
+                start_sel=_MATCH_START, stop_sel=_MATCH_END,
+                max_words=SNIPPET_WORDS, min_words=min(5, SNIPPET_WORDS), fragment_delimiter=SNIPPET_ELLIPSIS,
+            ),
+        )
+        .order_by('-rank', '-id')
+        .values_list('id', 'rank', 'snippet')
+    )
+    return list(rows[offset:offset + limit])
+
+
+def _sqlite_rows(queryset, query, offset, limit):
+    terms = search_terms(query)
+    if not terms:
+        return []
+    fts = f'{queryset.model._meta.db_table}_fts'
+    # Her kelime tırnak içinde ön ek olarak aranır (örtük AND)
+    match = ' '.join(f'"{term}"*' for term in terms)
+    scope_sql, scope_params = queryset.values('id').query.sql_with_params()
+    sql = (
+        f'SELECT rowid, bm25({fts}), snippet({fts}, 0, %s, %s, %s, %s) FROM {fts} '
+        f'WHERE {fts} MATCH %s AND rowid IN ({scope_sql}) '
+        f'ORDER BY bm25({fts}), rowid DESC LIMIT %s OFFSET %s'
+    )
+    params = [_MATCH_START, _MATCH_END, SNIPPET_ELLIPSIS, SNIPPET_WORDS, match, *scope_params, limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        # bm25 küçükse daha alakalı; API'de büyük rank daha alakalı demek
+        return [(pk, -score, snippet) for pk, score, snippet in cursor.fetchall()]
+
+
+def _fallback_rows(queryset, field, query, offset, limit):
+    rows = queryset.filter(**{f'{field}__icontains': query}).order_by('-id').values_list('id', flat=True)
+    return [(pk, None, None) for pk in rows[offset:offset + limit]]
+
+
+def search_messages(queryset, field, query, page=1, page_size=DEFAULT_SEARCH_PAGE_SIZE, related=('sender',)):
+    """
+    queryset içindeki mesajlarda field üzerinde tam metin arama.
+    Sayfadaki mesajlar related ilişkileriyle birlikte tek sorguda yüklenir.
+
+    Returns:
+        dict: results [(mesaj, rank, snippet)] ve has_more
+    """
+    offset = (page - 1) * page_size
+    limit = page_size + 1
+    if connection.vendor == 'postgresql':
+        rows = _postgres_rows(queryset, field, query, offset, limit)
+    elif connection.vendor == 'sqlite':
+        rows = _sqlite_rows(queryset, query, offset, limit)
+    else:
+        rows = _fallback_rows(queryset, field, query, offset, limit)
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    messages = queryset.model.objects.select_related(*related).in_bulk([pk for pk, _, _ in rows])
+    return {
+        'results': [
+            (messages[pk], rank, render_snippet(snippet)) for pk, rank, snippet in rows if pk in messages
+        ],
+        'has_more': has_more,
+    }
+
+
+def parse_page(request):
+    """?page parametresi (1'den başlar)"""
+    try:
+        return max(1, int(request.query_params.get('page', 1)))
+    except (TypeError, ValueError):
+        return 1
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_add_hiddenconversation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='privatemessage',
+            index=models.Index(fields=['sender', 'receiver', 'timestamp'], name='chat_pm_pair_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Mesajlarda tam metin arama (bkz. chat/message_search.py)
+#
+# PostgreSQL: mesaj metninden türetilen (GENERATED ... STORED) tsvector kolonu
+# ve GIN index; yeni/değişen satırlar veritabanı tarafından indekslenir.
+# SQLite (development): external content FTS5 tablosu ve onu güncel tutan
+# trigger'lar. Kolonlar Django model state'ine eklenmez.
+
+from django.db import migrations
+
+
+POSTGRES_SQL = [
+    """
+    ALTER TABLE chat_privatemessage ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('turkish', coalesce(message, ''))) STORED;
+    """,
+    "CREATE INDEX chat_pm_search_gin_idx ON chat_privatemessage USING gin (search_vector);",
+    """
+    ALTER TABLE chat_groupmessage ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('turkish', coalesce(content, ''))) STORED;
+    """,
+    "CREATE INDEX chat_gm_search_gin_idx ON chat_groupmessage USING gin (search_vector);",
+]
+
+POSTGRES_REVERSE_SQL = [
+    "DROP INDEX IF EXISTS chat_gm_search_gin_idx;",
+    "ALTER TABLE chat_groupmessage DROP COLUMN IF EXISTS search_vector;",
+    "DROP INDEX IF EXISTS chat_pm_search_gin_idx;",
+    "ALTER TABLE chat_privatemessage DROP COLUMN IF EXISTS search_vector;",
+]
+
+
+def _sqlite_fts(table, column):
+    fts = f'{table}_fts'
+    return [
+        f"""
+        CREATE VIRTUAL TABLE {fts} USING fts5(
+            {column}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        );
+        """,
+        f"""
+        CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+        END;
+        """,
+        f"""
+        CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+        END;
+        """,
+        f"""
+        CREATE TRIGGER {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+        END;
+        """,
+        # Mevcut mesajları indeksle
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild');",
+    ]
+
+
+def _sqlite_fts_reverse(table):
+    fts = f'{table}_fts'
+    return [
+        f"DROP TRIGGER IF EXISTS {fts}_ai;",
+        f"DROP TRIGGER IF EXISTS {fts}_ad;",
+        f"DROP TRIGGER IF EXISTS {fts}_au;",
+        f"DROP TABLE IF EXISTS {fts};",
+    ]
+
+
+FULLTEXT_SQL = {
+    'postgresql': (POSTGRES_SQL, POSTGRES_REVERSE_SQL),
+    'sqlite': (
+        _sqlite_fts('chat_privatemessage', 'message') + _sqlite_fts('chat_groupmessage', 'content'),
+        _sqlite_fts_reverse('chat_privatemessage') + _sqlite_fts_reverse('chat_groupmessage'),
+    ),
+}
+
+
+def _run(schema_editor, reverse):
+    # Diğer veritabanlarında arama icontains ile yapılır
+    statements = FULLTEXT_SQL.get(schema_editor.connection.vendor)
+    if statements is None:
+        return
+    forward_sql, reverse_sql = statements
+    for statement in reverse_sql if reverse else forward_sql:
+        schema_editor.execute(statement)
+
+
+def create_fulltext_index(apps, schema_editor):
+    _run(schema_editor, reverse=False)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    _run(schema_editor, reverse=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_privatemessage_pair_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
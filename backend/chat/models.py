@@ -23,14 +23,23 @@ class PrivateMessage(models.Model):
         ordering = ['timestamp']
         verbose_name = "Özel Mesaj"
         verbose_name_plural = "Özel Mesajlar"
+        indexes = [
+            # Konuşma özeti ve iki kullanıcı arasındaki mesaj geçmişi sorguları için
+            models.Index(fields=['sender', 'receiver', 'timestamp'], name='chat_pm_pair_ts_idx'),
+        ]
 
     def __str__(self):
         return f"From {self.sender.username} to {self.receiver.username}: {self.message[:50]}..."
 
     def mark_as_read(self):
-        if not self.is_read:
-            self.is_read = True
-            self.save()
+        if self.is_read:
+            return
+        # Koşullu UPDATE: aynı anda gelen iki okuma sayacı iki kez düşürmesin
+        updated = PrivateMessage.objects.filter(pk=self.pk, is_read=False).update(is_read=True)
+        self.is_read = True
+        if updated:
+            from notifications import counters
+            counters.messages_read(self.receiver_id, self.sender_id, updated)
 
 
 class GroupMessage(models.Model):
@@ -0,0 +1,383 @@
+"""
+Çevrimiçi durumu (presence)
+
+NotificationConsumer ve PrivateChatConsumer her soket için bir PresenceSession
+tutar. Redis yapılandırılmışsa şu yapılar tutulur:
+
+    presence:online          -> kullanıcıların en taze soket kaydının zamanı
+    presence:last_seen       -> her kullanıcının son görülme zamanı
+    presence:sockets:<id>    -> kullanıcının açık soketleri ve son tazelenme zamanları
+
+Soket kaydı bağlanırken oluşturulur, soketten her gelen mesajda (en fazla
+PRESENCE_TOUCH_SECONDS'ta bir) ve sunucu tarafındaki bir zamanlayıcıyla
+PRESENCE_HEARTBEAT_SECONDS'ta bir tazelenir; istemcinin heartbeat göndermesi
+gerekmez. Soket kapanınca sadece kendi kaydı silinir, kullanıcının son soketi
+kapandığında kullanıcı online set'inden çıkar. Process çökerse soketleri hiç
+kapanmaz ve zamanlayıcıları durur; PRESENCE_TIMEOUT_SECONDS boyunca
+tazelenmeyen kayıtlar ölü sayılır. Redis yoksa aynı yapı process içinde
+tutulur (development/test; channel layer da o durumda process içidir).
+
+Durum değişiklikleri sadece o kullanıcıya abone olan kişilere
+(presence_<user_id> channel grubu) gönderilir. Bağlantısı sürekli kopup gelen
+kullanıcılar yayın fırtınası yaratmasın diye kullanıcı başına en fazla
+PRESENCE_BROADCAST_INTERVAL_SECONDS'ta bir yayın yapılır; aradaki
+değişiklikler pencere sonunda son durumla tek yayın olarak gönderilir.
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from core_api.redis_client import get_redis_connection, redis_key, run_store
+from .models import PrivateMessage
+
+User = get_user_model()
+Follow = User.following.through
+logger = logging.getLogger(__name__)
+
+# Açık soketler sunucu tarafında bu aralıkla tazelenir
+PRESENCE_HEARTBEAT_SECONDS = 30
+# Soketten gelen mesajlar kaydı en fazla bu aralıkla tazeler
+PRESENCE_TOUCH_SECONDS = 10
+# Bu süre boyunca tazelenmeyen soket (çökmüş process) ölü sayılır
+PRESENCE_TIMEOUT_SECONDS = 90
+# Kullanıcı başına iki yayın arasındaki en kısa süre
+PRESENCE_BROADCAST_INTERVAL_SECONDS = 10
+MAX_PRESENCE_SUBSCRIPTIONS = 200
+
+
+def presence_group(user_id):
+    return f'presence_{user_id}'
+
+
+class LocMemPresenceStore:
+    """Redis yokken kullanılan process içi presence store'u"""
+
+    blocking = False
+
+    def __init__(self):
+        self._online = {}
+        self._last_seen = {}
+        self._sockets = {}
+        self._broadcasts = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, user_id, socket_id, now):
+        """
+        Soket kaydını oluşturur veya tazeler.
+
+        Returns:
+            kullanıcı bu kayıtla çevrimiçi olduysa True
+        """
+        with self._lock:
+            was_online = self._online.get(user_id, 0) >= now - PRESENCE_TIMEOUT_SECONDS
+            sockets = self._live_sockets(user_id, now)
+            sockets[socket_id] = now
+            self._online[user_id] = self._last_seen[user_id] = now
+            return not was_online
+
+    def disconnect(self, user_id, socket_id, now):
+        """Returns: kullanıcının canlı soketi kalmadıysa True"""
+        with self._lock:
+            sockets = self._live_sockets(user_id, now)
+            sockets.pop(socket_id, None)
+            self._last_seen[user_id] = now
+            if sockets:
+                self._online[user_id] = max(sockets.values())
+                return False
+            self._sockets.pop(user_id, None)
+            self._online.pop(user_id, None)
+            return True
+
+    def _live_sockets(self, user_id, now):
+        cutoff = now - PRESENCE_TIMEOUT_SECONDS
+        sockets = {
+            socket_id: refreshed_at
+            for socket_id, refreshed_at in self._sockets.get(user_id, {}).items()
+            if refreshed_at >= cutoff
+        }
+        self._sockets[user_id] = sockets
+        return sockets
+
+    def lookup(self, user_ids):
+        """{user_id: (en taze soket kaydı, son görülme)}; kayıt yoksa None"""
+        with self._lock:
+            return {
+                user_id: (self._online.get(user_id), self._last_seen.get(user_id))
+                for user_id in user_ids
+            }
+
+    def claim_broadcast(self, user_id, is_online, now, interval):
+        """
+        Returns:
+            (yayın yapılsın mı, beklenecek saniye): durum son yayınla aynıysa
+            (False, 0), pencere dolmadıysa (False, kalan süre)
+        """
+        with self._lock:
+            last = self._broadcasts.get(user_id)
+            if last is not None:
+                last_state, last_at = last
+                if last_state == is_online:
+                    return False, 0
+                if now - last_at < interval:
+                    return False, interval - (now - last_at)
+            self._broadcasts[user_id] = (is_online, now)
+            return True, 0
+
+    def clear(self):
+        with self._lock:
+            self._online.clear()
+            self._last_seen.clear()
+            self._sockets.clear()
+            self._broadcasts.clear()
+
+
+class RedisPresenceStore:
+    """İki sorted set + kullanıcı başına soket sorted set'i; her olay tek script"""
+
+    blocking = True
+
+    # Ölü soketler temizlenir, bu soket tazelenir
+    REFRESH_SCRIPT = """
+    local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+    local was_online = score and tonumber(score) >= tonumber(ARGV[4])
+    redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', '(' .. ARGV[4])
+    redis.call('ZADD', KEYS[3], ARGV[3], ARGV[2])
+    redis.call('EXPIRE', KEYS[3], ARGV[5])
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+    redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+    if was_online then return 0 end
+    return 1
+    """
+    # Online skoru kalan en taze soketin zamanına iner
+    DISCONNECT_SCRIPT = """
+    redis.call('ZREM', KEYS[3], ARGV[2])
+    redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', '(' .. ARGV[4])
+    redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+    local newest = redis.call('ZRANGE', KEYS[3], -1, -1, 'WITHSCORES')
+    if newest[2] then
+        redis.call('ZADD', KEYS[1], newest[2], ARGV[1])
+        return 0
+    end
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    return 1
+    """
+    # Son yayın "durum:zaman" olarak tutulur
+    CLAIM_SCRIPT = """
+    local last = redis.call('HGET', KEYS[1], ARGV[1])
+    if last then
+        local sep = string.find(last, ':')
+        local last_state = string.sub(last, 1, sep - 1)
+        local elapsed = tonumber(ARGV[3]) - tonumber(string.sub(last, sep + 1))
+        if last_state == ARGV[2] then return '0' end
+        if elapsed < tonumber(ARGV[4]) then return tostring(tonumber(ARGV[4]) - elapsed) end
+    end
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2] .. ':' .. ARGV[3])
+    return 'send'
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.online_key = redis_key('presence', 'online')
+        self.last_seen_key = redis_key('presence', 'last_seen')
+        self.broadcasts_key = redis_key('presence', 'broadcasts')
+        self._refresh = client.register_script(self.REFRESH_SCRIPT)
+        self._disconnect = client.register_script(self.DISCONNECT_SCRIPT)
+        self._claim = client.register_script(self.CLAIM_SCRIPT)
+
+    def _keys(self, user_id):
+        return [self.online_key, self.last_seen_key, redis_key('presence', 'sockets', user_id)]
+
+    def refresh(self, user_id, socket_id, now):
+        return bool(self._refresh(
+            keys=self._keys(user_id),
+            args=[user_id, socket_id, now, now - PRESENCE_TIMEOUT_SECONDS, PRESENCE_TIMEOUT_SECONDS * 2],
+        ))
+
+    def disconnect(self, user_id, socket_id, now):
+        return bool(self._disconnect(
+            keys=self._keys(user_id), args=[user_id, socket_id, now, now - PRESENCE_TIMEOUT_SECONDS],
+        ))
+
+    def lookup(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zmscore(self.online_key, user_ids)
+        pipe.zmscore(self.last_seen_key, user_ids)
+        online, last_seen = pipe.execute()
+        return {user_id: pair for user_id, pair in zip(user_ids, zip(online, last_seen))}
+
+    def claim_broadcast(self, user_id, is_online, now, interval):
+        result = self._claim(keys=[self.broadcasts_key], args=[user_id, int(is_online), now, interval])
+        result = result.decode() if isinstance(result, bytes) else result
+        if result == 'send':
+            return True, 0
+        return False, float(result)
+
+
+_locmem_store = LocMemPresenceStore()
+
+
+def get_presence_store():
+    client = get_redis_connection()
+    if client is not None:
+        return RedisPresenceStore(client)
+    return _locmem_store
+
+
+def _presence_entry(scores, now):
+    online_at, last_seen = scores if scores else (None, None)
+    return {
+        'is_online': online_at is not None and online_at >= now - PRESENCE_TIMEOUT_SECONDS,
+        'last_seen': (
+            datetime.fromtimestamp(last_seen, tz=dt_timezone.utc).isoformat()
+            if last_seen is not None else None
+        ),
+    }
+
+
+def get_presence(user_ids):
+    """
+    Çok sayıda kullanıcının durumu tek store çağrısıyla.
+
+    Returns:
+        dict: {user_id: {'is_online': bool, 'last_seen': ISO zaman veya None}}
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    try:
+        scores = get_presence_store().lookup(user_ids)
+    except Exception as e:
+        logger.error(f"Presence okunamadı: {e}")
+        scores = {}
+    now = time.time()
+    return {user_id: _presence_entry(scores.get(user_id), now) for user_id in user_ids}
+
+
+async def aget_presence(user_ids):
+    """get_presence'ın event loop'u bloklamayan karşılığı"""
+    user_ids = list(dict.fromkeys(user_ids))
+    try:
+        scores = await run_store(get_presence_store(), 'lookup', user_ids)
+    except Exception as e:
+        logger.error(f"Presence okunamadı: {e}")
+        scores = {}
+    now = time.time()
+    return {user_id: _presence_entry(scores.get(user_id), now) for user_id in user_ids}
+
+
+def allowed_presence_targets(user, user_ids):
+    """Kullanıcının durumunu görebileceği kişiler: takip ettikleri ve mesajlaştıkları"""
+    user_ids = {user_id for user_id in user_ids if user_id != user.id}
+    if not user_ids:
+        return set()
+    allowed = set(Follow.objects.filter(
+        from_customuser_id=user.id, to_customuser_id__in=user_ids
+    ).values_list('to_customuser_id', flat=True))
+    remaining = user_ids - allowed
+    if remaining:
+        for sender_id, receiver_id in PrivateMessage.objects.filter(
+            Q(sender_id=user.id, receiver_id__in=remaining) | Q(receiver_id=user.id, sender_id__in=remaining)
+        ).values_list('sender_id', 'receiver_id').distinct():
+            allowed.add(receiver_id if sender_id == user.id else sender_id)
+    return allowed
+
+
+_pending_broadcasts = set()
+
+
+async def publish_presence(user_id, store=None):
+    """Durum değiştiyse abonelere yayınlar; pencere dolmadıysa yayını erteler"""
+    store = store or get_presence_store()
+    now = time.time()
+    scores = await run_store(store, 'lookup', [user_id])
+    presence = _presence_entry(scores.get(user_id), now)
+    send, wait = await run_store(
+        store, 'claim_broadcast', user_id, presence['is_online'], now, PRESENCE_BROADCAST_INTERVAL_SECONDS
+    )
+    if send:
+        await get_channel_layer().group_send(presence_group(user_id), dict(
+            presence, type='presence_update', user_id=user_id,
+        ))
+    elif wait > 0 and user_id not in _pending_broadcasts:
+        # Pencere sonunda son durum tek seferde yayınlanır (process başına bir zamanlayıcı)
+        _pending_broadcasts.add(user_id)
+        asyncio.get_running_loop().call_later(
+            wait, lambda: asyncio.ensure_future(_deferred_publish(user_id))
+        )
+
+
+async def _deferred_publish(user_id):
+    _pending_broadcasts.discard(user_id)
+    await _safely(publish_presence(user_id))
+
+
+async def _safely(coroutine):
+    # Presence hatası soket akışını bozmamalı
+    try:
+        await coroutine
+    except Exception as e:
+        logger.error(f"Presence güncellenemedi: {e}")
+
+
+async def user_connected(user_id, socket_id):
+    """Soket kaydını oluşturur/tazeler; kullanıcı çevrimiçi olduysa yayınlar"""
+    async def run():
+        store = get_presence_store()
+        if await run_store(store, 'refresh', user_id, socket_id, time.time()):
+            await publish_presence(user_id, store)
+    await _safely(run())
+
+
+async def user_disconnected(user_id, socket_id):
+    """Soket kaydını siler; kullanıcının son soketiyse yayınlar"""
+    async def run():
+        store = get_presence_store()
+        if await run_store(store, 'disconnect', user_id, socket_id, time.time()):
+            await publish_presence(user_id, store)
+    await _safely(run())
+
+
+class PresenceSession:
+    """
+    Tek bir WebSocket bağlantısının presence kaydı.
+
+    start() kaydı oluşturur ve PRESENCE_HEARTBEAT_SECONDS'ta bir tazeleyen
+    zamanlayıcıyı başlatır; touch() soketten mesaj geldiğinde çağrılır;
+    stop() zamanlayıcıyı durdurup kaydı siler.
+    """
+
+    def __init__(self, user_id, socket_id):
+        self.user_id = user_id
+        self.socket_id = socket_id
+        self._refreshed_at = 0
+        self._task = None
+
+    async def start(self):
+        await self._refresh()
+        self._task = asyncio.ensure_future(self._keep_alive())
+
+    async def touch(self):
+        if time.monotonic() - self._refreshed_at >= PRESENCE_TOUCH_SECONDS:
+            await self._refresh()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await user_disconnected(self.user_id, self.socket_id)
+
+    async def _refresh(self):
+        self._refreshed_at = time.monotonic()
+        await user_connected(self.user_id, self.socket_id)
+
+    async def _keep_alive(self):
+        while True:
+            await asyncio.sleep(PRESENCE_HEARTBEAT_SECONDS)
+            await self._refresh()
@@ -0,0 +1,62 @@
+"""
+Toplu okundu bilgisi ("şu mesaja kadar okudum")
+
+Sohbet açıldığında mesajlar tek tek işaretlenmez; istemci gördüğü en son
+mesajın ID'sini gönderir ve karşı taraftan gelen, o ID'ye kadar olan tüm
+okunmamış mesajlar tek koşullu UPDATE ile okundu yapılır. Karşı tarafa
+(gönderene) özel sohbet odası üzerinden tek bir read_receipt olayı yayınlanır.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from notifications import counters
+from .models import PrivateMessage
+
+
+def private_room_group(user1_id, user2_id):
+    """İki kullanıcının özel sohbet odası (ID sırasından bağımsız)"""
+    low, high = sorted([int(user1_id), int(user2_id)])
+    return f'chat_private_chat_{low}_{high}'
+
+
+def parse_up_to_id(value):
+    """Geçerli bir mesaj ID'si değilse None"""
+    try:
+        up_to_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return up_to_id if up_to_id > 0 else None
+
+
+def mark_read_up_to(reader_id, partner_id, up_to_id):
+    """
+    partner_id'den reader_id'ye gelen, ID'si up_to_id'ye kadar olan okunmamış
+    mesajları tek UPDATE ile okundu yapar.
+
+    Returns:
+        int: okundu yapılan mesaj sayısı
+    """
+    updated = PrivateMessage.objects.filter(
+        receiver_id=reader_id, sender_id=partner_id, id__lte=up_to_id, is_read=False
+    ).update(is_read=True)
+    counters.messages_read(reader_id, partner_id, updated)
+    return updated
+
+
+def read_receipt_event(reader_id, up_to_id, read_count):
+    return {
+        'type': 'read_receipt',
+        'reader_id': reader_id,
+        'up_to_id': up_to_id,
+        'read_count': read_count,
+    }
+
+
+def broadcast_read_receipt(reader_id, partner_id, up_to_id, read_count):
+    """Senkron kod (REST) için: gönderenin sohbet soketine tek olay"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        private_room_group(reader_id, partner_id), read_receipt_event(reader_id, up_to_id, read_count)
+    )
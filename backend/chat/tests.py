@@ -1,3 +1,557 @@
+# moto_app/backend/chat/tests.py
+
+import asyncio
+import json
+import threading
+import time
+from unittest import mock
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.db import connection
 from django.test import TestCase
+from rest_framework.test import APIClient, APITestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from groups.models import Group
+from notifications import counters
+from . import consumers, group_messages, presence
+from .models import GroupMessage, PrivateMessage
+from .routing import websocket_urlpatterns
+from rest_framework import status
+
+User = get_user_model()
+
+
+class ConversationListTest(APITestCase):
+    def setUp(self):
+        """
+        Konuşma listesi testleri için kullanıcılar ve mesajlar oluşturur.
+        """
+        self.user = User.objects.create_user(
+            username='chatuser',
+            email='chat@example.com',
+            password='testpassword'
+        )
+        self.partners = [
+            User.objects.create_user(
+                username=f'partner{i}',
+                email=f'partner{i}@example.com',
+                password='testpassword'
+            )
+            for i in range(3)
+        ]
+        self.url = reverse('conversations-list')
+        self.client.force_authenticate(user=self.user)
+
+    def _send(self, sender, receiver, text, is_read=False):
+        return PrivateMessage.objects.create(sender=sender, receiver=receiver, message=text, is_read=is_read)
+
+    def test_conversation_list_returns_last_message_and_unread_count(self):
+        self._send(self.partners[0], self.user, 'Merhaba')
+        self._send(self.partners[0], self.user, 'Nasılsın?')
+        last_first = self._send(self.user, self.partners[0], 'İyiyim')
+        self._send(self.partners[1], self.user, 'Okundu', is_read=True)
+        last_second = self._send(self.partners[1], self.user, 'Okunmadı')
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+        # En son mesajlaşılan konuşma en üstte
+        second, first = response.data
+        self.assertEqual(second['other_user']['id'], self.partners[1].id)
+        self.assertEqual(second['last_message']['id'], last_second.id)
+        self.assertEqual(second['unread_count'], 1)
+        self.assertEqual(first['other_user']['id'], self.partners[0].id)
+        self.assertEqual(first['last_message']['id'], last_first.id)
+        self.assertEqual(first['unread_count'], 2)
+
+    def test_conversation_list_query_count_is_constant(self):
+        for partner in self.partners:
+            for i in range(5):
+                self._send(partner, self.user, f'Mesaj {i}')
+                self._send(self.user, partner, f'Cevap {i}')
+
+        # conversation summary + bulk follow state
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 3)
+        for conversation in response.data:
+            self.assertEqual(conversation['unread_count'], 5)
+
+    def test_conversation_list_reports_presence(self):
+        presence._locmem_store.clear()
+        self._send(self.partners[0], self.user, 'Merhaba')
+        self._send(self.partners[1], self.user, 'Selam')
+        presence._locmem_store.refresh(self.partners[0].id, 'socket', time.time())
+
+        response = self.client.get(self.url)
+        by_partner = {conversation['other_user']['id']: conversation for conversation in response.data}
+        self.assertTrue(by_partner[self.partners[0].id]['is_online'])
+        self.assertIsNotNone(by_partner[self.partners[0].id]['last_seen'])
+        self.assertFalse(by_partner[self.partners[1].id]['is_online'])
+        self.assertIsNone(by_partner[self.partners[1].id]['last_seen'])
+
+    def test_messages_of_other_users_are_not_listed(self):
+        self._send(self.partners[0], self.partners[1], 'Başkasının mesajı')
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, [])
+
+
+class MessageHistoryPaginationTest(APITestCase):
+    def setUp(self):
+        """
+        Mesaj geçmişi sayfalama testleri için iki kullanıcı ve mesajlar oluşturur.
+        """
+        self.user = User.objects.create_user(
+            username='historyuser',
+            email='history@example.com',
+            password='testpassword'
+        )
+        self.other = User.objects.create_user(
+            username='historyother',
+            email='historyother@example.com',
+            password='testpassword'
+        )
+        self.stranger = User.objects.create_user(
+            username='historystranger',
+            email='historystranger@example.com',
+            password='testpassword'
+        )
+        self.messages = [
+            PrivateMessage.objects.create(
+                sender=self.user if i % 2 else self.other,
+                receiver=self.other if i % 2 else self.user,
+                message=f'Mesaj {i}'
+            )
+            for i in range(7)
+        ]
+        PrivateMessage.objects.create(sender=self.stranger, receiver=self.user, message='Başka konuşma')
+        self.url = reverse('room-messages', kwargs={'user1_id': self.user.id, 'user2_id': self.other.id})
+        self.client.force_authenticate(user=self.user)
+
+    def _ids(self, response):
+        return [message['id'] for message in response.data['results']]
+
+    def test_default_page_returns_latest_messages_in_order(self):
+        response = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._ids(response), [m.id for m in self.messages[-3:]])
+        self.assertTrue(response.data['has_more'])
+
+    def test_before_cursor_walks_back_through_history(self):
+        ids, params = [], {'page_size': 3}
+        while True:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids = self._ids(response) + ids
+            if not response.data['has_more']:
+                break
+            params['before'] = response.data['before_cursor']
+        self.assertEqual(ids, [m.id for m in self.messages])
+
+    def test_after_cursor_returns_newer_messages(self):
+        response = self.client.get(self.url, {'page_size': 2})
+        after_cursor = response.data['after_cursor']
+        newer = PrivateMessage.objects.create(sender=self.other, receiver=self.user, message='Yeni')
+
+        response = self.client.get(self.url, {'after': after_cursor})
+        self.assertEqual(self._ids(response), [newer.id])
+        self.assertFalse(response.data['has_more'])
+
+    def test_with_user_endpoint_is_paginated(self):
+        url = reverse('private-messages-with-user', kwargs={'user_id': self.other.id})
+        response = self.client.get(url, {'page_size': 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._ids(response), [m.id for m in self.messages[-4:]])
+
+    def test_query_count_is_constant(self):
+        # other user + messages + bulk follow state
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 7)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'before': 'bozuk'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class GroupChatConsumerTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='groupowner', email='go@example.com', password='testpassword')
+        self.member = User.objects.create_user(username='groupmember', email='gm@example.com', password='testpassword')
+        self.stranger = User.objects.create_user(username='groupstranger', email='gs@example.com', password='testpassword')
+        self.group = Group.objects.create(name='Pazar Sürüşü', owner=self.owner)
+        self.group.members.add(self.member)
+
+    async def _connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.group.id}/')
+        communicator.scope['user'] = user
+        connected, code = await communicator.connect()
+        if connected:
+            self.assertEqual(json.loads(await communicator.receive_from())['type'], 'connection_established')
+        return communicator, connected, code
+
+    async def _receive_type(self, communicator, message_type):
+        while True:
+            message = json.loads(await communicator.receive_from(timeout=2))
+            if message['type'] == message_type:
+                return message
+
+    async def test_non_member_is_rejected(self):
+        communicator, connected, code = await self._connect(self.stranger)
+        self.assertFalse(connected)
+        self.assertEqual(code, 4003)
+
+    async def test_messages_are_persisted_in_batches_and_acked(self):
+        membership = mock.Mock(wraps=group_messages.is_group_member)
+        bulk_insert = mock.Mock(wraps=group_messages._bulk_insert)
+        with mock.patch.object(consumers, 'is_group_member', membership), \
+                mock.patch.object(group_messages, '_bulk_insert', bulk_insert), \
+                mock.patch.object(group_messages, 'GROUP_MESSAGE_FLUSH_MS', 200):
+            owner, connected, _ = await self._connect(self.owner)
+            self.assertTrue(connected)
+            member, connected, _ = await self._connect(self.member)
+            self.assertTrue(connected)
+
+            await owner.send_to(text_data=json.dumps({'message': 'Saat 9da benzinlikte', 'client_id': 'a1'}))
+            await member.send_to(text_data=json.dumps({'message': 'Tamam', 'client_id': 'b1'}))
+            owner_ack = await self._receive_type(owner, 'message_ack')
+            member_ack = await self._receive_type(member, 'message_ack')
+
+            # Aynı pencerede gelen iki mesaj tek INSERT ile yazılır
+            self.assertEqual(bulk_insert.call_count, 1)
+            self.assertEqual(owner_ack['client_id'], 'a1')
+            saved = await GroupMessage.objects.aget(pk=owner_ack['message_id'])
+            self.assertEqual(saved.content, 'Saat 9da benzinlikte')
+            self.assertEqual(saved.sender_id, self.owner.id)
+            self.assertNotEqual(member_ack['message_id'], owner_ack['message_id'])
+
+            broadcast = await self._receive_type(member, 'chat_message')
+            self.assertIn(broadcast['message_id'], (owner_ack['message_id'], member_ack['message_id']))
+
+            await owner.send_to(text_data=json.dumps({'message': 'Bir mesaj daha'}))
+            await self._receive_type(owner, 'message_ack')
+            # Üyelik sadece bağlantıda kontrol edilir
+            self.assertEqual(membership.call_count, 2)
+
+            await owner.send_to(text_data=json.dumps({'message': '   '}))
+            self.assertEqual((await self._receive_type(owner, 'error'))['message'], 'Mesaj boş olamaz.')
+            await owner.disconnect()
+            await member.disconnect()
+        self.assertEqual(await GroupMessage.objects.acount(), 3)
+
+
+class ReadUpToTest(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='testpassword')
+        self.sender = User.objects.create_user(username='sender', email='sender@example.com', password='testpassword')
+        self.other = User.objects.create_user(username='othersender', email='os@example.com', password='testpassword')
+        self.messages = [
+            PrivateMessage.objects.create(sender=self.sender, receiver=self.reader, message=f'Mesaj {i}')
+            for i in range(5)
+        ]
+        self.foreign = PrivateMessage.objects.create(sender=self.other, receiver=self.reader, message='Başka')
+        self.url = reverse('private-messages-read-up-to', kwargs={'user_id': self.sender.id})
+        presence._locmem_store.clear()
+
+    def _unread_ids(self):
+        return set(PrivateMessage.objects.filter(is_read=False).values_list('id', flat=True))
+
+    def test_rest_marks_conversation_read_with_one_update(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        up_to = self.messages[2]
+        with mock.patch('chat.views.broadcast_read_receipt') as broadcast:
+            with self.assertNumQueries(1):
+                response = client.post(self.url, {'up_to_id': up_to.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated_count'], 3)
+        broadcast.assert_called_once_with(self.reader.id, self.sender.id, up_to.id, 3)
+        self.assertEqual(self._unread_ids(), {self.messages[3].id, self.messages[4].id, self.foreign.id})
+
+        # Tekrar göndermek hiçbir satırı değiştirmez ve yayın yapmaz
+        with mock.patch('chat.views.broadcast_read_receipt') as broadcast:
+            response = client.post(self.url, {'up_to_id': up_to.id}, format='json')
+        self.assertEqual(response.data['updated_count'], 0)
+        broadcast.assert_not_called()
+
+        response = client.post(self.url, {'up_to_id': 'abc'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sender_cannot_mark_own_messages_read(self):
+        client = APIClient()
+        client.force_authenticate(self.sender)
+        url = reverse('private-messages-read-up-to', kwargs={'user_id': self.reader.id})
+        response = client.post(url, {'up_to_id': self.messages[-1].id}, format='json')
+        self.assertEqual(response.data['updated_count'], 0)
+        self.assertEqual(len(self._unread_ids()), 6)
+
+    async def _connect(self, user, partner):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/private_chat/{user.id}/{partner.id}/'
+        )
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(json.loads(await communicator.receive_from())['type'], 'connection_established')
+        self.assertEqual(json.loads(await communicator.receive_from())['type'], 'presence_update')
+        return communicator
+
+    async def _drain(self, communicator):
+        """Kuyruktaki mesajların türleri"""
+        types = []
+        while not await communicator.receive_nothing(timeout=0.2):
+            types.append(json.loads(await communicator.receive_from())['type'])
+        return types
+
+    async def test_websocket_read_sends_single_receipt_to_sender(self):
+        reader = await self._connect(self.reader, self.sender)
+        sender = await self._connect(self.sender, self.reader)
+
+        with mock.patch.object(counters, 'messages_read', wraps=counters.messages_read) as messages_read:
+            await reader.send_to(text_data=json.dumps({'type': 'mark_read', 'up_to_id': self.messages[-1].id}))
+            receipt = json.loads(await sender.receive_from(timeout=2))
+        self.assertEqual(receipt, {
+            'type': 'read_receipt', 'reader_id': self.reader.id,
+            'up_to_id': self.messages[-1].id, 'read_count': 5,
+        })
+        messages_read.assert_called_once_with(self.reader.id, self.sender.id, 5)
+        # Okuyan kendi okundu bilgisini almaz
+        self.assertNotIn('read_receipt', await self._drain(reader))
+        self.assertEqual(
+            await PrivateMessage.objects.filter(receiver=self.reader, is_read=False).acount(), 1
+        )
+
+        await self._drain(reader)
+        await reader.send_to(text_data=json.dumps({'type': 'mark_read', 'up_to_id': -1}))
+        self.assertEqual(json.loads(await reader.receive_from())['type'], 'error')
+        await reader.disconnect()
+        await sender.disconnect()
+
+    async def test_message_is_delivered_before_notification(self):
+        reader = await self._connect(self.reader, self.sender)
+        sender = await self._connect(self.sender, self.reader)
+        await self._drain(reader)
+        release = threading.Event()
+
+        def slow_notification(**kwargs):
+            release.wait(timeout=5)
+
+        with mock.patch('notifications.utils.send_notification_with_preferences', side_effect=slow_notification) as notify:
+            await sender.send_to(text_data=json.dumps({'message': 'Merhaba', 'receiver_id': self.reader.id}))
+            # Bildirim bitmeden mesaj odaya ulaşır
+            message = json.loads(await reader.receive_from(timeout=1))
+            self.assertEqual((message['type'], message['message']), ('private_chat_message', 'Merhaba'))
+            release.set()
+            await asyncio.sleep(0.1)
+            await asyncio.gather(*consumers._notification_tasks)
+        self.assertEqual(notify.call_args.kwargs['recipient_user'], self.reader)
+        await reader.disconnect()
+        await sender.disconnect()
+
+
+class PresenceTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='presalice', email='pa@example.com', password='testpassword')
+        self.bob = User.objects.create_user(username='presbob', email='pb@example.com', password='testpassword')
+        self.stranger = User.objects.create_user(username='presstranger', email='ps@example.com', password='testpassword')
+        presence._locmem_store.clear()
+
+    def test_multiple_sockets_and_timeout(self):
+        store = presence._locmem_store
+        now = time.time()
+        self.assertTrue(store.refresh(self.alice.id, 'a', now))
+        self.assertFalse(store.refresh(self.alice.id, 'b', now))
+        self.assertFalse(store.disconnect(self.alice.id, 'a', now + 1))
+        self.assertTrue(presence.get_presence([self.alice.id])[self.alice.id]['is_online'])
+        self.assertTrue(store.disconnect(self.alice.id, 'b', now + 2))
+        status_ = presence.get_presence([self.alice.id])[self.alice.id]
+        self.assertFalse(status_['is_online'])
+        self.assertIsNotNone(status_['last_seen'])
+
+        # Çöken process'in soketi tazelenmez ve zaman aşımıyla çevrimdışı sayılır
+        store.refresh(self.bob.id, 'crashed', now - presence.PRESENCE_TIMEOUT_SECONDS - 1)
+        self.assertFalse(presence.get_presence([self.bob.id])[self.bob.id]['is_online'])
+
+        # Zaman aşımından sonra açılan iki soketten biri kapanınca kullanıcı çevrimiçi kalır
+        self.assertTrue(store.refresh(self.bob.id, 'a', now))
+        self.assertFalse(store.refresh(self.bob.id, 'b', now))
+        self.assertFalse(store.disconnect(self.bob.id, 'a', now + 1))
+        self.assertTrue(presence.get_presence([self.bob.id])[self.bob.id]['is_online'])
+        self.assertTrue(store.disconnect(self.bob.id, 'b', now + 2))
+
+    async def test_server_keeps_idle_socket_online(self):
+        with mock.patch.object(presence, 'PRESENCE_TIMEOUT_SECONDS', 0.3), \
+                mock.patch.object(presence, 'PRESENCE_HEARTBEAT_SECONDS', 0.1):
+            session = presence.PresenceSession(self.alice.id, 'socket')
+            await session.start()
+            # İstemci hiç mesaj göndermese de sunucu kaydı tazeler
+            await asyncio.sleep(0.5)
+            self.assertTrue((await presence.aget_presence([self.alice.id]))[self.alice.id]['is_online'])
+            await session.stop()
+            self.assertFalse((await presence.aget_presence([self.alice.id]))[self.alice.id]['is_online'])
+
+    def test_batched_lookup_endpoint_only_returns_contacts(self):
+        PrivateMessage.objects.create(sender=self.bob, receiver=self.alice, message='Selam')
+        presence._locmem_store.refresh(self.bob.id, 'socket', time.time())
+        presence._locmem_store.refresh(self.stranger.id, 'socket', time.time())
+        client = APIClient()
+        client.force_authenticate(self.alice)
+
+        response = client.get(reverse('chat-presence'), {'user_ids': f'{self.bob.id},{self.stranger.id}'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data), [str(self.bob.id)])
+        self.assertTrue(response.data[str(self.bob.id)]['is_online'])
+
+        response = client.get(reverse('chat-presence'), {'user_ids': 'a,b'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def _connect(self, user, partner, expect_presence=True):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/private_chat/{user.id}/{partner.id}/'
+        )
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(json.loads(await communicator.receive_from())['type'], 'connection_established')
+        if not expect_presence:
+            return communicator, None
+        return communicator, json.loads(await communicator.receive_from())
+
+    async def test_private_socket_hides_presence_of_strangers(self):
+        stranger, _ = await self._connect(self.stranger, self.alice, expect_presence=False)
+        # Takip edilmeyen ve mesajlaşılmayan kullanıcının durumu gönderilmez
+        self.assertTrue(await stranger.receive_nothing(timeout=0.2))
+        alice, _ = await self._connect(self.alice, self.stranger, expect_presence=False)
+        self.assertTrue(await stranger.receive_nothing(timeout=0.2))
+        await alice.disconnect()
+        await stranger.disconnect()
+
+    async def test_flapping_connection_is_rate_limited(self):
+        await PrivateMessage.objects.acreate(sender=self.bob, receiver=self.alice, message='Selam')
+        with mock.patch.object(presence, 'PRESENCE_BROADCAST_INTERVAL_SECONDS', 0.5):
+            alice, initial = await self._connect(self.alice, self.bob)
+            self.assertEqual(initial, {
+                'type': 'presence_update', 'user_id': self.bob.id, 'is_online': False, 'last_seen': None,
+            })
+
+            bob, _ = await self._connect(self.bob, self.alice)
+            update = json.loads(await alice.receive_from(timeout=1))
+            self.assertEqual((update['user_id'], update['is_online']), (self.bob.id, True))
+
+            # Pencere içinde kopup gelen bağlantı yayın yapmaz
+            await bob.disconnect()
+            bob, _ = await self._connect(self.bob, self.alice)
+            await bob.disconnect()
+            self.assertTrue(await alice.receive_nothing(timeout=0.2))
+
+            # Pencere sonunda son durum tek yayın olarak gelir
+            update = json.loads(await alice.receive_from(timeout=1))
+            self.assertEqual((update['user_id'], update['is_online']), (self.bob.id, False))
+            self.assertIsNotNone(update['last_seen'])
+            self.assertTrue(await alice.receive_nothing(timeout=0.6))
+            await alice.disconnect()
+
+
+def _fulltext_index_exists():
+    """chat 0005 migration'ının tam metin index'i test veritabanında var mı?"""
+    if connection.vendor == 'sqlite':
+        return 'chat_privatemessage_fts' in connection.introspection.table_names()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            columns = connection.introspection.get_table_description(cursor, 'chat_privatemessage')
+        return any(column.name == 'search_vector' for column in columns)
+    return False
+
+
+class MessageSearchTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', email='searcher@example.com', password='testpassword')
+        self.partner = User.objects.create_user(username='searchpartner', email='sp@example.com', password='testpassword')
+        self.stranger = User.objects.create_user(username='searchstranger', email='ss@example.com', password='testpassword')
+        self.oil = PrivateMessage.objects.create(sender=self.partner, receiver=self.user, message='Motor yağı değişimi yarın')
+        self.oil_again = PrivateMessage.objects.create(
+            sender=self.user, receiver=self.partner, message='Yağ filtresini de al, motor yağı için lazım olacak'
+        )
+        PrivateMessage.objects.create(sender=self.user, receiver=self.partner, message='Yarın hava yağmurlu')
+        PrivateMessage.objects.create(sender=self.stranger, receiver=self.partner, message='Motor yağı bende var')
+        self.url = reverse('private-messages-search-messages')
+        self.client.force_authenticate(user=self.user)
+
+    def _ids(self, response):
+        return [message['id'] for message in response.data['results']]
+
+    def _require_index(self):
+        if not _fulltext_index_exists():
+            self.skipTest('Tam metin index\'i yok (migration\'sız test veritabanı)')
+
+    def test_search_matches_own_messages_with_snippets(self):
+        self._require_index()
+        response = self.client.get(self.url, {'q': 'motor yağı'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(self._ids(response)), {self.oil.id, self.oil_again.id})
+        first = response.data['results'][0]
+        self.assertIn('<mark>', first['snippet'])
+        self.assertIsNotNone(first['rank'])
+        self.assertFalse(response.data['has_more'])
+
+        if connection.vendor == 'sqlite':
+            # FTS5'te kelimeler ön ek olarak da eşleşir
+            response = self.client.get(self.url, {'q': 'yağm'})
+            self.assertEqual(len(self._ids(response)), 1)
+
+    def test_snippet_escapes_message_html(self):
+        self._require_index()
+        PrivateMessage.objects.create(
+            sender=self.partner, receiver=self.user, message='<img src=x onerror=alert(1)> zincir bakımı'
+        )
+        snippet = self.client.get(self.url, {'q': 'zincir'}).data['results'][0]['snippet']
+        self.assertNotIn('<img', snippet)
+        self.assertIn('&lt;img', snippet)
+        self.assertIn('<mark>zincir</mark>', snippet)
+
+    def test_search_is_paginated(self):
+        self._require_index()
+        first = self.client.get(self.url, {'q': 'motor', 'page_size': 1})
+        self.assertTrue(first.data['has_more'])
+        second = self.client.get(self.url, {'q': 'motor', 'page_size': 1, 'page': 2})
+        self.assertFalse(second.data['has_more'])
+        self.assertEqual(set(self._ids(first) + self._ids(second)), {self.oil.id, self.oil_again.id})
+
+    def test_index_follows_updates_and_deletes(self):
+        self._require_index()
+        self.oil.message = 'Zincir yağlama'
+        self.oil.save()
+        self.assertEqual(self._ids(self.client.get(self.url, {'q': 'zincir'})), [self.oil.id])
+        self.oil.delete()
+        self.assertEqual(self._ids(self.client.get(self.url, {'q': 'zincir'})), [])
+        self.assertEqual(self._ids(self.client.get(self.url, {'q': 'motor'})), [self.oil_again.id])
+
+    def test_query_without_terms_is_rejected(self):
+        response = self.client.get(self.url, {'q': ' "* '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _group_search_url(self):
+        group = Group.objects.create(name='Arama Grubu', owner=self.partner)
+        group.members.add(self.user)
+        self.group_message = GroupMessage.objects.create(
+            group=group, sender=self.partner, content='Pazar sabahı kahvaltı sürüşü'
+        )
+        GroupMessage.objects.create(group=group, sender=self.user, content='Ben gelemiyorum')
+        return reverse('group-message-search', kwargs={'group_pk': group.id})
+
+    def test_group_search_requires_membership(self):
+        url = self._group_search_url()
+        self.client.force_authenticate(user=self.stranger)
+        response = self.client.get(url, {'q': 'kahvaltı'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
-# Create your tests here.
+    def test_group_search_for_member(self):
+        self._require_index()
+        url = self._group_search_url()
+        response = self.client.get(url, {'q': 'kahvaltı'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._ids(response), [self.group_message.id])
+        self.assertIn('<mark>', response.data['results'][0]['snippet'])
@@ -8,12 +8,49 @@ from django.db.models import Q, Max
 from django.contrib.auth import get_user_model
 from .models import GroupMessage, PrivateMessage
 from .serializers import GroupMessageSerializer, PrivateMessageSerializer
+from .group_messages import is_group_member
+from .message_search import (
+    DEFAULT_SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE, parse_page, search_messages, search_terms,
+)
+from .presence import MAX_PRESENCE_SUBSCRIPTIONS, allowed_presence_targets, get_presence
+from .read_receipts import broadcast_read_receipt, mark_read_up_to, parse_up_to_id
+from .conversations import (
+    DEFAULT_HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE, build_conversation_list, message_history_page,
+)
+from core_api.pagination import decode_cursor, parse_page_size
+from users.utils import attach_follow_state
 # from users.services.supabase_service import SupabaseStorage  # Removed - Supabase disabled
 import logging
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+
+def _history_params(request):
+    """?before / ?after / ?page_size parametrelerini okur"""
+    before = request.query_params.get('before')
+    after = request.query_params.get('after')
+    return {
+        'before': decode_cursor(before, 'before') if before else None,
+        'after': decode_cursor(after, 'after') if after else None,
+        'page_size': parse_page_size(request, DEFAULT_HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE),
+    }
+
+
+def _search_response(found, serializer_class, page, page_size):
+    """Arama sonuçlarını serialize eder; her mesaja rank ve vurgulu snippet eklenir"""
+    messages = [message for message, _, _ in found['results']]
+    # İç içe UserSerializer'ın takip sayıları için tek toplu sorgu
+    attach_follow_state(
+        [message.sender for message in messages]
+        + [message.receiver for message in messages if isinstance(message, PrivateMessage)]
+    )
+    results = []
+    for data, (_, rank, snippet) in zip(serializer_class(messages, many=True).data, found['results']):
+        results.append(dict(data, rank=rank, snippet=snippet))
+    return {'results': results, 'page': page, 'page_size': page_size, 'has_more': found['has_more']}
+
+
 class GroupMessageViewSet(viewsets.ModelViewSet):
     serializer_class = GroupMessageSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -32,8 +69,8 @@ class GroupMessageViewSet(viewsets.ModelViewSet):
         from groups.models import Group
         group = get_object_or_404(Group, pk=group_pk)
         
-        # Kullanıcının grup üyesi olup olmadığını kontrol et
-        if self.request.user not in group.members.all() and self.request.user != group.owner:
+        # Kullanıcının grup üyesi olup olmadığını kontrol et (tüm üye listesi yüklenmez)
+        if not is_group_member(self.request.user, group.pk):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("Bu grubun üyesi değilsiniz.")
         
@@ -68,6 +105,29 @@ class GroupMessageViewSet(viewsets.ModelViewSet):
                 logger.error(f"Grup mesaj medyası Supabase'e yükleme hatası: {str(e)}")
                 # Medya yükleme hatası olsa bile mesaj kaydedilir
 
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request, group_pk=None):
+        """Grup mesajlarında tam metin arama (?q, ?page, ?page_size)"""
+        query = request.query_params.get('q', '').strip()
+        if not search_terms(query):
+            return Response(
+                {'detail': 'Arama terimi gerekli'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not is_group_member(request.user, group_pk):
+            return Response(
+                {'detail': 'Bu grubun üyesi değilsiniz.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        page = parse_page(request)
+        page_size = parse_page_size(request, DEFAULT_SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE)
+        found = search_messages(
+            GroupMessage.objects.filter(group_id=group_pk), 'content', query, page, page_size,
+            related=('sender', 'group', 'reply_to')
+        )
+        return Response(_search_response(found, GroupMessageSerializer, page, page_size))
+
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
         
@@ -180,30 +240,42 @@ class PrivateMessageViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='with-user/(?P<user_id>[^/.]+)')
     def with_user(self, request, user_id=None):
-        """Belirli bir kullanıcı ile olan konuşmayı getir"""
+        """Belirli bir kullanıcı ile olan konuşmayı getir (?before / ?after cursor ile sayfalı)"""
+        params = _history_params(request)
         try:
             other_user = get_object_or_404(User, id=user_id)
-            user = request.user
-            
-            # İki kullanıcı arasındaki mesajları getir
-            messages = PrivateMessage.objects.filter(
-                Q(sender=user, receiver=other_user) | 
-                Q(sender=other_user, receiver=user)
-            ).order_by('timestamp')
-            
-            serializer = self.get_serializer(messages, many=True)
-            return Response(serializer.data)
+            return Response(message_history_page(request.user, other_user, **params))
         except Exception as e:
             return Response(
                 {'detail': f'Konuşma alınırken hata: {str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=False, methods=['post'], url_path='with-user/(?P<user_id>[^/.]+)/read')
+    def read_up_to(self, request, user_id=None):
+        """Kullanıcıdan gelen, up_to_id'ye kadar olan tüm mesajları tek UPDATE ile okundu yap"""
+        up_to_id = parse_up_to_id(request.data.get('up_to_id'))
+        partner_id = parse_up_to_id(user_id)
+        if up_to_id is None or partner_id is None:
+            return Response(
+                {'detail': 'up_to_id pozitif bir tam sayı olmalıdır.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        updated = mark_read_up_to(request.user.id, partner_id, up_to_id)
+        if updated:
+            try:
+                broadcast_read_receipt(request.user.id, partner_id, up_to_id, updated)
+            except Exception as e:
+                # Okundu bilgisi yayınlanamasa da işaretleme geçerli
+                logger.error(f"Okundu bilgisi yayınlanamadı: {e}")
+        return Response({'updated_count': updated, 'up_to_id': up_to_id})
+
     @action(detail=False, methods=['get'], url_path='search')
     def search_messages(self, request):
-        """Mesajlarda arama yap"""
+        """Mesajlarda tam metin arama (?q, ?page, ?page_size); alakaya göre sıralı"""
         query = request.query_params.get('q', '').strip()
-        if not query:
+        if not search_terms(query):
             return Response(
                 {'detail': 'Arama terimi gerekli'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -211,15 +283,15 @@ class PrivateMessageViewSet(viewsets.ModelViewSet):
         
         try:
             user = request.user
+            page = parse_page(request)
+            page_size = parse_page_size(request, DEFAULT_SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE)
             
             # Kullanıcının gönderdiği veya aldığı mesajlarda arama yap
-            messages = PrivateMessage.objects.filter(
-                Q(sender=user) | Q(receiver=user),
-                Q(message__icontains=query)
-            ).order_by('-timestamp')
-            
-            serializer = self.get_serializer(messages, many=True)
-            return Response(serializer.data)
+            found = search_messages(
+                PrivateMessage.objects.filter(Q(sender=user) | Q(receiver=user)),
+                'message', query, page, page_size, related=('sender', 'receiver')
+            )
+            return Response(_search_response(found, PrivateMessageSerializer, page, page_size))
         except Exception as e:
             return Response(
                 {'detail': f'Arama sırasında hata: {str(e)}'},
@@ -237,52 +309,32 @@ class ConversationViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def list(self, request):
-        user = request.user
-        
-        # Kullanıcının katıldığı konuşmaları getir
-        # Önce tüm mesajları al, sonra unique kullanıcı çiftlerini bul
-        all_messages = PrivateMessage.objects.filter(
-            Q(sender=user) | Q(receiver=user)
-        ).select_related('sender', 'receiver')
-        
-        # Unique kullanıcı çiftlerini bul
-        unique_users = set()
-        for message in all_messages:
-            other_user_id = message.receiver.id if message.sender.id == user.id else message.sender.id
-            unique_users.add(other_user_id)
-        
-        conversation_list = []
-        
-        for other_user_id in unique_users:
-            other_user = get_object_or_404(User, id=other_user_id)
-            
-            # Son mesajı getir
-            last_message = PrivateMessage.objects.filter(
-                Q(sender=user, receiver=other_user) | 
-                Q(sender=other_user, receiver=user)
-            ).order_by('-timestamp').first()
-            
-            # Okunmamış mesaj sayısını getir
-            unread_count = PrivateMessage.objects.filter(
-                sender=other_user,
-                receiver=user,
-                is_read=False
-            ).count()
-            
-            conversation_list.append({
-                'other_user': {
-                    'id': other_user.id,
-                    'username': other_user.username,
-                    'first_name': other_user.first_name,
-                    'last_name': other_user.last_name,
-                    'profile_picture': getattr(other_user, 'profile_picture', None),
-                },
-                'last_message': PrivateMessageSerializer(last_message).data if last_message else None,
-                'unread_count': unread_count,
-                'is_online': False,  # TODO: Online durumu için WebSocket implementasyonu
-            })
-        
-        return Response(conversation_list)
+        # Karşı taraf, son mesaj ve okunmamış sayısı tek sorguda hesaplanır
+        return Response(build_conversation_list(request.user))
+
+
+class PresenceView(APIView):
+    """Kişilerin çevrimiçi durumu (?user_ids=1,2,3), tek presence okumasıyla"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            user_ids = [int(value) for value in request.query_params.get('user_ids', '').split(',') if value.strip()]
+        except ValueError:
+            return Response(
+                {'detail': 'user_ids virgülle ayrılmış kullanıcı ID\'leri olmalıdır.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(user_ids) > MAX_PRESENCE_SUBSCRIPTIONS:
+            return Response(
+                {'detail': f'En fazla {MAX_PRESENCE_SUBSCRIPTIONS} kullanıcı sorgulanabilir.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Sadece takip edilen veya mesajlaşılan kişilerin durumu görülebilir
+        allowed = allowed_presence_targets(request.user, user_ids)
+        statuses = get_presence([user_id for user_id in user_ids if user_id in allowed])
+        return Response({str(user_id): presence for user_id, presence in statuses.items()})
 
 
 class RoomMessagesView(APIView):
@@ -290,7 +342,8 @@ class RoomMessagesView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request, user1_id, user2_id):
-        """İki kullanıcı arasındaki mesajları getir"""
+        """İki kullanıcı arasındaki mesajları getir (?before / ?after cursor ile sayfalı)"""
+        params = _history_params(request)
         try:
             user = request.user
             
@@ -305,14 +358,7 @@ class RoomMessagesView(APIView):
             other_user_id = user2_id if user.id == user1_id else user1_id
             other_user = get_object_or_404(User, id=other_user_id)
             
-            # İki kullanıcı arasındaki mesajları getir
-            messages = PrivateMessage.objects.filter(
-                Q(sender=user, receiver=other_user) | 
-                Q(sender=other_user, receiver=user)
-            ).order_by('timestamp')
-            
-            serializer = PrivateMessageSerializer(messages, many=True)
-            return Response(serializer.data)
+            return Response(message_history_page(user, other_user, **params))
             
         except Exception as e:
             logger.error(f"Room messages error: {e}")
@@ -107,6 +107,12 @@ try:
 except Exception as e:
     print(f"DEBUG ASGI: notifications.routing import hatası: {e}")
 
+try:
+    import rides.routing
+    print("DEBUG ASGI: rides.routing import edildi")
+except Exception as e:
+    print(f"DEBUG ASGI: rides.routing import hatası: {e}")
+
 # Render.com için WebSocket konfigürasyonu
 all_websocket_patterns = []
 
@@ -120,6 +126,11 @@ try:
     if hasattr(notifications, 'routing') and hasattr(notifications.routing, 'websocket_urlpatterns'):
         all_websocket_patterns.extend(notifications.routing.websocket_urlpatterns)
         print(f"DEBUG ASGI: Notifications routing eklendi: {len(notifications.routing.websocket_urlpatterns)} pattern")
+
+    # Canlı konum routing'i ekle
+    if hasattr(rides, 'routing') and hasattr(rides.routing, 'websocket_urlpatterns'):
+        all_websocket_patterns.extend(rides.routing.websocket_urlpatterns)
+        print(f"DEBUG ASGI: Rides routing eklendi: {len(rides.routing.websocket_urlpatterns)} pattern")
     
     print(f"DEBUG ASGI: Toplam WebSocket patterns: {len(all_websocket_patterns)}")
     
@@ -0,0 +1,51 @@
+"""
+Keyset (cursor) sayfalama yardımcıları
+
+Cursor formatı `<datetime,id>` şeklindedir, örn.
+`2025-01-01T10:00:00.000000Z,42`. Datetime UTC olarak yazılır; sıralama
+(datetime, id) ikilisine göre yapıldığından aynı zamana sahip kayıtlar da
+atlanmadan sayfalanır.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+
+def encode_cursor(value, pk):
+    value = value.astimezone(dt_timezone.utc)
+    return f"{value.strftime('%Y-%m-%dT%H:%M:%S.%fZ')},{pk}"
+
+
+def decode_cursor(cursor, param='cursor'):
+    """`<datetime,id>` cursor'ını (datetime, id) ikilisine çevirir"""
+    try:
+        raw_value, raw_pk = cursor.rsplit(',', 1)
+        # Query string'de encode edilmemiş '+' boşluğa dönüşür
+        value = datetime.fromisoformat(raw_value.strip().replace(' ', '+'))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=dt_timezone.utc)
+        return value, int(raw_pk)
+    except (AttributeError, TypeError, ValueError):
+        raise ValidationError({param: 'Geçersiz cursor. Beklenen format: <datetime,id>'})
+
+
+def parse_page_size(request, default, maximum):
+    """?page_size parametresini [1, maximum] aralığına sıkıştırır"""
+    try:
+        page_size = int(request.query_params.get('page_size', default))
+    except (TypeError, ValueError):
+        page_size = default
+    return max(1, min(page_size, maximum))
+
+
+def keyset_before(cursor, field):
+    """(field, id) ikilisi cursor'dan küçük olan kayıtlar"""
+    value, pk = cursor
+    return Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+
+
+def keyset_after(cursor, field):
+    """(field, id) ikilisi cursor'dan büyük olan kayıtlar"""
+    value, pk = cursor
+    return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
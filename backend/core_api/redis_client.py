@@ -0,0 +1,45 @@
+"""
+Redis bağlantı yardımcıları
+
+Cache backend'i django_redis ise aynı bağlantı havuzu paylaşılır. Redis
+yapılandırılmamışsa (development/test) None döner ve çağıran servisler
+in-memory fallback kullanır.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def redis_enabled():
+    """Default cache backend Redis mi?"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    return 'redis' in backend.lower()
+
+
+def get_redis_connection():
+    """Ham Redis client'ını döndürür; Redis yoksa None"""
+    if not redis_enabled():
+        return None
+    try:
+        from django_redis import get_redis_connection as _get_connection
+        return _get_connection('default')
+    except Exception as e:
+        logger.warning(f"Redis bağlantısı alınamadı, in-memory fallback kullanılacak: {e}")
+        return None
+
+
+def redis_key(*parts):
+    """Cache KEY_PREFIX ile uyumlu Redis anahtarı üretir"""
+    prefix = settings.CACHES.get('default', {}).get('KEY_PREFIX', 'motoapp')
+    return ':'.join([prefix, *[str(part) for part in parts]])
+
+
+async def run_store(store, method, *args):
+    """Store metodunu çağırır; Redis store'ları (blocking) event loop'u bloklamadan thread pool'da çalışır"""
+    function = getattr(store, method)
+    if store.blocking:
+        return await sync_to_async(function, thread_sensitive=False)(*args)
+    return function(*args)
@@ -379,6 +379,7 @@ CACHE_TIMEOUTS = {
     'groups_list': 600,   # 10 minutes
     'events_list': 300,   # 5 minutes
     'notifications': 60,  # 1 minute
+    'search_suggest': 30,  # 30 seconds, index güncellemelerinde versiyonla düşer
 }
 
 
@@ -590,4 +591,6 @@ SIMPLE_JWT = {
 
 # Firebase Cloud Messaging (FCM) Configuration
 FCM_SERVER_KEY = os.environ.get('FCM_SERVER_KEY')
-FCM_PROJECT_ID = os.environ.get('FCM_PROJECT_ID', 'spiride-4a107')
\ No newline at end of file
+FCM_PROJECT_ID = os.environ.get('FCM_PROJECT_ID', 'spiride-4a107')
+# Test/development için yerel sahte FCM endpoint'i verilebilir
+FCM_API_URL = os.environ.get('FCM_API_URL', 'https://fcm.googleapis.com/fcm/send')
\ No newline at end of file
@@ -16,6 +16,7 @@ from rest_framework_simplejwt.views import (
 from .views import api_root, get_csrf_token
 from .health_check import health_check, detailed_health_check, metrics, readiness_check, liveness_check, debug_database, create_test_data, test_database_connection, database_status, jwt_debug, cache_test
 from .database_health import database_health_check, database_status as db_status
+from notifications.views import UnreadCountersView
 
 # Swagger / Redoc için
 schema_view = get_schema_view(
@@ -108,6 +109,7 @@ urlpatterns = [
     path('api/gamification/', include('gamification.urls')),
     path('api/chat/', include('chat.urls')),
     path('api/search/', include('search.urls')),
+    path('api/me/counters/', UnreadCountersView.as_view(), name='me-counters'),
 
     # Swagger / Redoc
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
@@ -7,8 +7,10 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from chat import presence
 from .models import Notification
 from .serializers import NotificationSerializer
+from .utils import mark_notifications_read
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -41,6 +43,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         self.user = user
         self.user_group_name = f'user_notifications_{self.user.id}'
 
+        self.presence_user_ids = set()
+
         try:
             await self.channel_layer.group_add(self.user_group_name, self.channel_name)
             await self.accept()
@@ -48,6 +52,9 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"WebSocket bağlantı hatası: {e}")
             await self.close(code=4000)
+            return
+        self.presence_session = presence.PresenceSession(self.user.id, self.channel_name)
+        await self.presence_session.start()
 
     @database_sync_to_async
     def get_user_from_token(self, token_value):
@@ -64,6 +71,10 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         try:
             await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+            for user_id in getattr(self, 'presence_user_ids', ()):
+                await self.channel_layer.group_discard(presence.presence_group(user_id), self.channel_name)
+            if getattr(self, 'presence_session', None) is not None:
+                await self.presence_session.stop()
             logger.info(f"WebSocket bağlantısı kesildi: {self.user.username}, Kod: {close_code}")
         except Exception as e:
             logger.error(f"WebSocket bağlantı kesme hatası: {e}")
@@ -81,6 +92,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data):
         try:
+            if getattr(self, 'presence_session', None) is not None:
+                await self.presence_session.touch()
             data = json.loads(text_data)
             action = data.get('action')
             
@@ -93,25 +106,83 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                         'success': success,
                         'notification_id': notification_id
                     }))
+            elif action == 'heartbeat':
+                await self.send(text_data=json.dumps({'action': 'heartbeat_ack'}))
+            elif action == 'subscribe_presence':
+                await self.subscribe_presence(data.get('user_ids'))
+            elif action == 'unsubscribe_presence':
+                for user_id in set(data.get('user_ids') or ()) & self.presence_user_ids:
+                    self.presence_user_ids.discard(user_id)
+                    await self.channel_layer.group_discard(presence.presence_group(user_id), self.channel_name)
+            elif action == 'mark_read_up_to':
+                up_to_id = data.get('up_to_id')
+                updated = await self.mark_notifications_read_up_to(up_to_id)
+                await self.send(text_data=json.dumps({
+                    'action': 'mark_read_up_to_response',
+                    'success': updated is not None,
+                    'up_to_id': up_to_id,
+                    'updated_count': updated or 0
+                }))
         except json.JSONDecodeError:
             logger.error("Geçersiz JSON verisi alındı")
         except Exception as e:
             logger.error(f"WebSocket mesaj işleme hatası: {e}")
 
+    async def subscribe_presence(self, user_ids):
+        """Kişilerin durum değişikliklerine abone olur ve güncel durumlarını gönderir"""
+        if not isinstance(user_ids, list):
+            await self.send(text_data=json.dumps({
+                'action': 'presence_error', 'message': 'user_ids bir liste olmalıdır.'
+            }))
+            return
+        requested = {user_id for user_id in user_ids if isinstance(user_id, int)}
+        room = presence.MAX_PRESENCE_SUBSCRIPTIONS - len(self.presence_user_ids)
+        allowed = await database_sync_to_async(presence.allowed_presence_targets)(
+            self.user, requested - self.presence_user_ids
+        )
+        for user_id in sorted(allowed)[:max(room, 0)]:
+            self.presence_user_ids.add(user_id)
+            await self.channel_layer.group_add(presence.presence_group(user_id), self.channel_name)
+
+        snapshot = await presence.aget_presence(sorted(requested & self.presence_user_ids))
+        await self.send(text_data=json.dumps({
+            'action': 'presence_snapshot',
+            'presence': {str(user_id): status for user_id, status in snapshot.items()},
+        }))
+
+    async def presence_update(self, event):
+        await self.send(text_data=json.dumps({
+            'action': 'presence_update',
+            'user_id': event['user_id'],
+            'is_online': event['is_online'],
+            'last_seen': event['last_seen'],
+        }))
+
     @sync_to_async
     def mark_notification_as_read(self, notification_id):
         try:
-            notification = Notification.objects.get(
-                id=notification_id, 
-                recipient=self.user
-            )
-            notification.is_read = True
-            notification.save()
+            # Tek koşullu UPDATE; zaten okunmuşsa sadece varlığı kontrol edilir
+            updated = mark_notifications_read(self.user, notification_ids=[notification_id])
+            if not updated and not Notification.objects.filter(id=notification_id, recipient=self.user).exists():
+                logger.warning(f"Bildirim bulunamadı: {notification_id}")
+                return False
             logger.info(f"Bildirim okundu olarak işaretlendi: {notification_id}")
             return True
-        except Notification.DoesNotExist:
-            logger.warning(f"Bildirim bulunamadı: {notification_id}")
-            return False
         except Exception as e:
             logger.error(f"Bildirim işaretleme hatası: {e}")
             return False
+
+    @sync_to_async
+    def mark_notifications_read_up_to(self, up_to_id):
+        """up_to_id'ye kadar olan tüm bildirimleri okundu yapar; geçersiz ID'de None"""
+        try:
+            up_to_id = int(up_to_id)
+        except (TypeError, ValueError):
+            return None
+        if up_to_id <= 0:
+            return None
+        try:
+            return mark_notifications_read(self.user, up_to_id=up_to_id)
+        except Exception as e:
+            logger.error(f"Bildirim işaretleme hatası: {e}")
+            return None
@@ -0,0 +1,289 @@
+"""
+Okunmamış sayaçları (bildirim rozeti, mesaj rozeti ve konuşma başına okunmamış)
+
+Sayaçlar COUNT(*) ile yeniden hesaplanmaz; kayıt eklendiğinde artırılır,
+okunduğunda veya silindiğinde okunan satır sayısı kadar azaltılır. Her
+kullanıcının sayaçları tek bir Redis hash'inde tutulur:
+
+    notifications  -> okunmamış bildirim sayısı
+    messages       -> okunmamış özel mesaj sayısı
+    pm:<partner>   -> o kullanıcıdan gelen okunmamış mesaj sayısı
+
+Böylece /api/me/counters/ tek HGETALL ile cevaplanır. Redis yapılandırılmamışsa
+(development/test) aynı sayaçlar UnreadCounter tablosunda tutulur.
+
+Artımlı sayaçlar zamanla kayabilir (ör. .update() ile sinyalsiz toplu
+değişiklikler, yarıda kalan istekler); reconcile_unread_counters komutu
+sayaçları periyodik olarak gerçek değerlerle karşılaştırıp düzeltir. Mevcut
+okunmamışlar UnreadCounter'a 0010_seed_unread_counters migration'ı ile, Redis'e
+ise deploy sırasında çalışan reconcile_unread_counters ile yazılır.
+"""
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+from core_api.redis_client import get_redis_connection, redis_key
+from .models import Notification, UnreadCounter
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+NOTIFICATIONS = 'notifications'
+MESSAGES = 'messages'
+CONVERSATION_PREFIX = 'pm:'
+RECONCILE_CHUNK_SIZE = 500
+
+
+def conversation_key(partner_id):
+    return f'{CONVERSATION_PREFIX}{partner_id}'
+
+
+class RedisCounterStore:
+    """Kullanıcı başına tek hash; sıfıra düşen alanlar silinir"""
+
+    # Azaltmalar sıfırın altına inmez, sıfırlanan alan hash'ten çıkarılır
+    ADJUST_SCRIPT = """
+    for i = 1, #ARGV, 2 do
+        local value = redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+        if value <= 0 then
+            redis.call('HDEL', KEYS[1], ARGV[i])
+        end
+    end
+    return 1
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._adjust = client.register_script(self.ADJUST_SCRIPT)
+
+    def _key(self, user_id):
+        return redis_key('unread', user_id)
+
+    def adjust(self, user_id, deltas):
+        args = []
+        for field, delta in deltas.items():
+            args += [field, int(delta)]
+        if args:
+            self._adjust(keys=[self._key(user_id)], args=args)
+
+    def increment_many(self, user_ids, deltas):
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            for field, delta in deltas.items():
+                pipe.hincrby(self._key(user_id), field, int(delta))
+        pipe.execute()
+
+    def get(self, user_id):
+        return {
+            _decode(field): int(value)
+            for field, value in self.client.hgetall(self._key(user_id)).items()
+        }
+
+    def get_many(self, user_ids):
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.hgetall(self._key(user_id))
+        return {
+            user_id: {_decode(field): int(value) for field, value in row.items()}
+            for user_id, row in zip(user_ids, pipe.execute())
+        }
+
+    def replace(self, counts_by_user):
+        pipe = self.client.pipeline()
+        for user_id, counts in counts_by_user.items():
+            key = self._key(user_id)
+            pipe.delete(key)
+            mapping = {field: count for field, count in counts.items() if count > 0}
+            if mapping:
+                pipe.hset(key, mapping=mapping)
+        pipe.execute()
+
+
+class DatabaseCounterStore:
+    """Redis yokken kullanılan UnreadCounter tablosu"""
+
+    def adjust(self, user_id, deltas):
+        for field, delta in deltas.items():
+            rows = UnreadCounter.objects.filter(user_id=user_id, key=field)
+            if delta < 0:
+                rows.update(count=Greatest(F('count') + delta, Value(0)))
+            elif delta > 0 and not rows.update(count=F('count') + delta):
+                try:
+                    with transaction.atomic():
+                        UnreadCounter.objects.create(user_id=user_id, key=field, count=delta)
+                except IntegrityError:
+                    # Aynı anda başka bir istek satırı oluşturdu
+                    rows.update(count=F('count') + delta)
+
+    def increment_many(self, user_ids, deltas):
+        user_ids = set(user_ids)
+        for field, delta in deltas.items():
+            rows = UnreadCounter.objects.filter(user_id__in=user_ids, key=field)
+            existing = set(rows.values_list('user_id', flat=True))
+            rows.update(count=F('count') + delta)
+            UnreadCounter.objects.bulk_create(
+                [UnreadCounter(user_id=user_id, key=field, count=delta) for user_id in user_ids - existing],
+                ignore_conflicts=True
+            )
+
+    def get(self, user_id):
+        return self.get_many([user_id])[user_id]
+
+    def get_many(self, user_ids):
+        result = {user_id: {} for user_id in user_ids}
+        rows = UnreadCounter.objects.filter(user_id__in=user_ids, count__gt=0)
+        for user_id, field, count in rows.values_list('user_id', 'key', 'count'):
+            result[user_id][field] = count
+        return result
+
+    def replace(self, counts_by_user):
+        with transaction.atomic():
+            UnreadCounter.objects.filter(user_id__in=list(counts_by_user)).delete()
+            UnreadCounter.objects.bulk_create([
+                UnreadCounter(user_id=user_id, key=field, count=count)
+                for user_id, counts in counts_by_user.items()
+                for field, count in counts.items() if count > 0
+            ])
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+_database_store = DatabaseCounterStore()
+
+
+def get_counter_store():
+    client = get_redis_connection()
+    if client is not None:
+        return RedisCounterStore(client)
+    return _database_store
+
+
+def _apply(method, *args):
+    """
+    Sayaç güncellemesini transaction commit edildikten sonra uygular: geri
+    alınan kayıtlar sayılmaz ve sık güncellenen sayaç satırı uzun
+    transaction'lar boyunca kilitli kalmaz. Hatalar yutulur; sayaç kayması
+    asıl işlemi bozmamalı, reconciler düzeltir.
+    """
+    def run():
+        try:
+            getattr(get_counter_store(), method)(*args)
+        except Exception as e:
+            logger.error(f"Okunmamış sayacı güncellenemedi ({method}): {e}")
+
+    transaction.on_commit(run)
+
+
+def notification_created(recipient_id):
+    _apply('adjust', recipient_id, {NOTIFICATIONS: 1})
+
+
+def notifications_created(recipient_ids):
+    """bulk_create ile yazılan bildirimler için (sinyal tetiklenmez)"""
+    recipient_ids = list(recipient_ids)
+    if recipient_ids:
+        _apply('increment_many', recipient_ids, {NOTIFICATIONS: 1})
+
+
+def notifications_read(user_id, count):
+    if count:
+        _apply('adjust', user_id, {NOTIFICATIONS: -count})
+
+
+def message_created(receiver_id, sender_id):
+    _apply('adjust', receiver_id, {MESSAGES: 1, conversation_key(sender_id): 1})
+
+
+def messages_read(receiver_id, sender_id, count):
+    if count:
+        _apply('adjust', receiver_id, {MESSAGES: -count, conversation_key(sender_id): -count})
+
+
+def get_counts(user_id):
+    """
+    Kullanıcının tüm rozet sayıları (tek store okuması).
+
+    Returns:
+        dict: notifications, messages ve partner ID'ye göre conversations
+    """
+    try:
+        counters = get_counter_store().get(user_id)
+    except Exception as e:
+        logger.error(f"Okunmamış sayaçları okunamadı - User {user_id}: {e}")
+        counters = {}
+    return {
+        NOTIFICATIONS: counters.get(NOTIFICATIONS, 0),
+        MESSAGES: counters.get(MESSAGES, 0),
+        'conversations': {
+            field[len(CONVERSATION_PREFIX):]: count
+            for field, count in counters.items()
+            if field.startswith(CONVERSATION_PREFIX) and count > 0
+        },
+    }
+
+
+def compute_counts(user_ids):
+    """Kullanıcıların gerçek sayaçları (iki GROUP BY sorgusu)"""
+    from chat.models import PrivateMessage
+
+    counts = {user_id: {} for user_id in user_ids}
+    notifications = (
+        Notification.objects.filter(recipient_id__in=user_ids, is_read=False)
+        .values('recipient_id').annotate(unread=Count('id'))
+    )
+    for row in notifications:
+        counts[row['recipient_id']][NOTIFICATIONS] = row['unread']
+
+    messages = (
+        PrivateMessage.objects.filter(receiver_id__in=user_ids, is_read=False)
+        .values('receiver_id', 'sender_id').annotate(unread=Count('id'))
+    )
+    for row in messages:
+        user_counts = counts[row['receiver_id']]
+        user_counts[conversation_key(row['sender_id'])] = row['unread']
+        user_counts[MESSAGES] = user_counts.get(MESSAGES, 0) + row['unread']
+    return counts
+
+
+def reconcile_counters(user_ids=None, chunk_size=RECONCILE_CHUNK_SIZE, dry_run=False):
+    """
+    Sayaçları gerçek değerlerle karşılaştırır ve farklı olanları yeniden yazar.
+
+    Kullanıcılar pk sırasıyla chunk_size'lık parçalar halinde işlenir. Parça
+    okunurken gelen yeni mesajlar küçük bir kaymaya yol açabilir; bir sonraki
+    çalıştırmada düzelir.
+
+    Returns:
+        (kontrol edilen kullanıcı sayısı, düzeltilen kullanıcı sayısı)
+    """
+    store = get_counter_store()
+    users = User.objects.order_by('pk')
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+
+    checked = fixed = 0
+    last_pk = 0
+    while True:
+        chunk = list(users.filter(pk__gt=last_pk).values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1]
+        expected = compute_counts(chunk)
+        stored = store.get_many(chunk)
+        drifted = {
+            user_id: counts for user_id, counts in expected.items()
+            if counts != {field: count for field, count in stored[user_id].items() if count > 0}
+        }
+        if drifted and not dry_run:
+            store.replace(drifted)
+        checked += len(chunk)
+        fixed += len(drifted)
+
+    if fixed:
+        logger.info(f"🔢 Okunmamış sayaçları düzeltildi: {fixed}/{checked} kullanıcı")
+    return checked, fixed
@@ -1,155 +1,382 @@
 """
 Firebase Cloud Messaging (FCM) Service
 Push notification gönderme servisi
+
+Push'lar istek yolunda gönderilmez; sınırlı boyutlu bir kuyruğa alınır ve tek
+bir arka plan worker'ı tarafından gönderilir. Worker kısa bir pencere boyunca
+biriken push'ları aynı payload'a göre gruplar ve token'ları multicast
+(registration_ids) isteklerinde toplar. İstekler keep-alive'lı kalıcı bir
+HTTP session üzerinden yapılır, geçici hatalar backoff ile tekrar denenir ve
+FCM'in geçersiz dediği token'lar NotificationPreferences'tan temizlenir.
 """
-import os
+import json
 import logging
+import queue
+import random
+import threading
+import time
+
+import requests
 from django.conf import settings
 from django.contrib.auth import get_user_model
-import requests
+from django.db import close_old_connections
+from requests.adapters import HTTPAdapter
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+# Legacy FCM API'sinin tek istekte kabul ettiği en fazla token sayısı
+MULTICAST_LIMIT = 1000
+# Kuyruk dolarsa yeni push'lar düşürülür (bellek sınırı)
+PUSH_QUEUE_SIZE = 10000
+# Worker'ın ilk push'tan sonra diğerlerini beklediği süre
+COALESCE_WINDOW_SECONDS = 0.05
+# Tek seferde işlenen en fazla kuyruk öğesi
+MAX_BATCH_ITEMS = 500
+MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30
+REQUEST_TIMEOUT = (3.05, 10)
+
+# Token artık geçerli değil, tekrar denemenin anlamı yok
+INVALID_TOKEN_ERRORS = {'NotRegistered', 'InvalidRegistration', 'MismatchSenderId'}
+# Sadece ilgili token'lar için tekrar denenir
+RETRYABLE_TOKEN_ERRORS = {'Unavailable', 'InternalServerError'}
+
+
+def build_payload(title, body, data=None, image_url=None):
+    """Token'lardan bağımsız notification payload'ı"""
+    payload = {
+        "notification": {
+            "title": title,
+            "body": body,
+            "sound": "default",
+            "badge": 1
+        },
+        "data": data or {},
+        "priority": "high"
+    }
+    # Resim URL'i varsa ekle
+    if image_url:
+        payload["notification"]["image"] = image_url
+    return payload
+
+
+class FCMClient:
+    """Kalıcı HTTP session ile multicast gönderim yapan FCM istemcisi"""
+
+    def __init__(self, server_key, api_url=None, session=None):
+        self.server_key = server_key
+        self.api_url = api_url or getattr(settings, 'FCM_API_URL', 'https://fcm.googleapis.com/fcm/send')
+        self.session = session or self._build_session()
+
+    def _build_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            "Authorization": f"key={self.server_key}",
+            "Content-Type": "application/json"
+        })
+        return session
+
+    def send_multicast(self, tokens, payload):
+        """
+        Aynı payload'ı token'lara MULTICAST_LIMIT'lik parçalar halinde gönderir.
+
+        Returns:
+            (sent, failed, invalid_tokens)
+        """
+        sent, failed, invalid_tokens = 0, 0, []
+        tokens = list(tokens)
+        for start in range(0, len(tokens), MULTICAST_LIMIT):
+            chunk_sent, chunk_failed, chunk_invalid = self._send_chunk(tokens[start:start + MULTICAST_LIMIT], payload)
+            sent += chunk_sent
+            failed += chunk_failed
+            invalid_tokens += chunk_invalid
+        return sent, failed, invalid_tokens
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, BACKOFF_MAX_SECONDS)
+        delay = BACKOFF_BASE_SECONDS * (2 ** (attempt - 1))
+        return min(delay + random.uniform(0, delay / 2), BACKOFF_MAX_SECONDS)
+
+    def _send_chunk(self, tokens, payload):
+        sent, invalid_tokens = 0, []
+        pending = tokens
+        retry_after = None
+
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(self._backoff(attempt, retry_after))
+                retry_after = None
+
+            try:
+                response = self.session.post(
+                    self.api_url,
+                    json=dict(payload, registration_ids=pending),
+                    timeout=REQUEST_TIMEOUT
+                )
+            except requests.RequestException as e:
+                logger.warning(f"⚠️ FCM bağlantı hatası (deneme {attempt + 1}): {e}")
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                try:
+                    retry_after = float(response.headers.get('Retry-After'))
+                except (TypeError, ValueError):
+                    retry_after = None
+                logger.warning(f"⚠️ FCM geçici hata (deneme {attempt + 1}): {response.status_code}")
+                continue
+
+            if response.status_code != 200:
+                logger.error(f"❌ FCM HTTP error: {response.status_code} - {response.text}")
+                return sent, len(pending), invalid_tokens
+
+            retry_tokens = []
+            results = response.json().get('results', [])
+            for token, result in zip(pending, results):
+                error = result.get('error')
+                if not error:
+                    sent += 1
+                elif error in INVALID_TOKEN_ERRORS:
+                    invalid_tokens.append(token)
+                elif error in RETRYABLE_TOKEN_ERRORS:
+                    retry_tokens.append(token)
+                else:
+                    logger.error(f"❌ FCM API error: {error}")
+
+            pending = retry_tokens
+            if not pending:
+                break
+
+        failed = len(tokens) - sent - len(invalid_tokens)
+        if pending:
+            logger.error(f"❌ FCM {len(pending)} token için {MAX_RETRIES + 1} denemede gönderilemedi")
+        return sent, failed, invalid_tokens
+
+
+def prune_invalid_tokens(tokens):
+    """FCM'in geçersiz dediği token'ları tercihlerden siler"""
+    from .models import NotificationPreferences
+
+    if not tokens:
+        return 0
+    pruned = NotificationPreferences.objects.filter(fcm_token__in=tokens).update(fcm_token=None)
+    logger.info(f"🧹 {pruned} geçersiz FCM token temizlendi")
+    return pruned
+
+
+def get_fcm_client():
+    """Ayarlardan FCM istemcisi oluşturur; server key yoksa None döner"""
+    fcm_server_key = getattr(settings, 'FCM_SERVER_KEY', None)
+    if not fcm_server_key:
+        logger.error("❌ FCM_SERVER_KEY bulunamadı")
+        return None
+    return FCMClient(fcm_server_key)
+
+
+class PushDispatcher:
+    """
+    Push'ları sınırlı boyutlu kuyrukta biriktirip tek worker thread ile gönderir.
+
+    Kuyruk öğeleri (tokens, payload) ikilileridir. Aynı payload'a sahip öğeler
+    tek multicast isteğinde birleştirilir.
+    """
+
+    def __init__(self, client=None, maxsize=PUSH_QUEUE_SIZE, on_invalid_tokens=prune_invalid_tokens):
+        self._client = client
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._on_invalid_tokens = on_invalid_tokens
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='fcm-push-dispatcher', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, tokens, payload):
+        """Push'u kuyruğa alır; kuyruk doluysa False döner"""
+        tokens = [token for token in tokens if token]
+        if not tokens:
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((tokens, payload))
+            return True
+        except queue.Full:
+            logger.warning(f"⚠️ FCM push kuyruğu dolu, {len(tokens)} token için push düşürüldü")
+            return False
+
+    def flush(self):
+        """Kuyruktaki tüm push'lar gönderilene kadar bekler"""
+        self._queue.join()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + COALESCE_WINDOW_SECONDS
+        while len(batch) < MAX_BATCH_ITEMS:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                self.deliver(batch)
+            except Exception as e:
+                logger.error(f"💥 FCM push batch hatası: {e}")
+            finally:
+                close_old_connections()
+                for _ in batch:
+                    self._queue.task_done()
+
+    def deliver(self, batch):
+        """
+        Öğeleri payload'a göre gruplayıp multicast olarak gönderir.
+
+        Returns:
+            dict: Gönderilen/başarısız/geçersiz token sayıları
+        """
+        if self._client is None:
+            self._client = get_fcm_client()
+        results = {'sent': 0, 'failed': 0, 'invalid': 0}
+        if self._client is None:
+            results['failed'] = sum(len(tokens) for tokens, _ in batch)
+            return results
+
+        grouped = {}
+        for tokens, payload in batch:
+            key = json.dumps(payload, sort_keys=True, default=str)
+            _, group_tokens = grouped.setdefault(key, (payload, {}))
+            # dict sırayı korur ve aynı token'ı tekrar göndermez
+            group_tokens.update(dict.fromkeys(tokens))
+
+        invalid_tokens = []
+        for payload, tokens in grouped.values():
+            sent, failed, invalid = self._client.send_multicast(list(tokens), payload)
+            results['sent'] += sent
+            results['failed'] += failed
+            invalid_tokens += invalid
+
+        results['invalid'] = len(invalid_tokens)
+        if invalid_tokens and self._on_invalid_tokens:
+            self._on_invalid_tokens(invalid_tokens)
+        logger.info(f"📊 FCM batch sonuçları: {results}")
+        return results
+
+
+push_dispatcher = PushDispatcher()
+
+
+def queue_push_notification(tokens, title, body, data=None, image_url=None):
+    """Push'u arka plan kuyruğuna alır; istek yolunu bloklamaz"""
+    return push_dispatcher.enqueue(tokens, build_payload(title, body, data, image_url))
+
+
+def _tokens_for_users(users):
+    from .models import NotificationPreferences
+
+    return dict(
+        NotificationPreferences.objects.filter(
+            user__in=users, push_enabled=True, fcm_token__isnull=False
+        ).exclude(fcm_token='').values_list('user_id', 'fcm_token')
+    )
+
+
 def send_fcm_notification(user, title, body, data=None, image_url=None):
     """
-    FCM ile push notification gönderir
-    
+    FCM ile push notification gönderir (kuyruğa alır)
+
     Args:
         user: Bildirimi alacak kullanıcı
         title: Bildirim başlığı
         body: Bildirim içeriği
         data: Ek veri (dict)
         image_url: Resim URL'i (opsiyonel)
-    
+
     Returns:
-        bool: Başarılı olup olmadığı
+        bool: Kuyruğa alınıp alınmadığı
     """
     try:
-        # Kullanıcının FCM token'ını al
-        if not hasattr(user, 'fcm_token') or not user.fcm_token:
+        fcm_token = _tokens_for_users([user]).get(user.id)
+        if not fcm_token:
             logger.warning(f"❌ FCM token bulunamadı: {user.username}")
             return False
-        
-        fcm_token = user.fcm_token
-        
-        # FCM server key
-        fcm_server_key = getattr(settings, 'FCM_SERVER_KEY', None)
-        if not fcm_server_key:
-            logger.error("❌ FCM_SERVER_KEY bulunamadı")
-            return False
-        
-        # FCM API URL
-        fcm_url = "https://fcm.googleapis.com/fcm/send"
-        
-        # Notification payload
-        notification_payload = {
-            "to": fcm_token,
-            "notification": {
-                "title": title,
-                "body": body,
-                "sound": "default",
-                "badge": 1
-            },
-            "data": data or {},
-            "priority": "high"
-        }
-        
-        # Resim URL'i varsa ekle
-        if image_url:
-            notification_payload["notification"]["image"] = image_url
-        
-        # Headers
-        headers = {
-            "Authorization": f"key={fcm_server_key}",
-            "Content-Type": "application/json"
-        }
-        
-        logger.info(f"📱 FCM notification gönderiliyor: {user.username} - {title}")
-        
-        # FCM API'ye istek gönder
-        response = requests.post(
-            fcm_url,
-            json=notification_payload,
-            headers=headers,
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            response_data = response.json()
-            if response_data.get('success') == 1:
-                logger.info(f"✅ FCM notification gönderildi: {user.username}")
-                return True
-            else:
-                logger.error(f"❌ FCM API error: {response_data}")
-                return False
-        else:
-            logger.error(f"❌ FCM HTTP error: {response.status_code} - {response.text}")
-            return False
-            
+
+        logger.info(f"📱 FCM notification kuyruğa alınıyor: {user.username} - {title}")
+        return queue_push_notification([fcm_token], title, body, data, image_url)
+
     except Exception as e:
         logger.error(f"💥 FCM notification hatası: {e}")
         return False
 
 def send_bulk_fcm_notifications(users, title, body, data=None, image_url=None):
     """
-    Birden fazla kullanıcıya FCM notification gönderir
-    
+    Birden fazla kullanıcıya FCM notification gönderir (tek multicast öğesi)
+
     Args:
         users: Kullanıcı listesi
         title: Bildirim başlığı
         body: Bildirim içeriği
         data: Ek veri (dict)
         image_url: Resim URL'i (opsiyonel)
-    
+
     Returns:
-        dict: Başarılı/başarısız sayıları
+        dict: Kuyruğa alınan/başarısız/token'sız sayıları
     """
+    users = list(users)
+    tokens = _tokens_for_users(users)
     results = {
-        'success': 0,
+        'queued': 0,
         'failed': 0,
-        'no_token': 0
+        'no_token': len(users) - len(tokens)
     }
-    
-    for user in users:
-        if not hasattr(user, 'fcm_token') or not user.fcm_token:
-            results['no_token'] += 1
-            continue
-            
-        success = send_fcm_notification(user, title, body, data, image_url)
-        if success:
-            results['success'] += 1
+
+    if tokens:
+        if queue_push_notification(list(tokens.values()), title, body, data, image_url):
+            results['queued'] = len(tokens)
         else:
-            results['failed'] += 1
-    
+            results['failed'] = len(tokens)
+
     logger.info(f"📊 FCM bulk notification sonuçları: {results}")
     return results
 
 def validate_fcm_token(token):
     """
     FCM token'ının geçerliliğini kontrol eder
-    
+
     Args:
         token: FCM token
-    
+
     Returns:
         bool: Geçerli olup olmadığı
     """
     try:
         if not token:
             return False
-            
+
         # Basit format kontrolü
         if len(token) < 100:  # FCM token'lar genellikle uzun olur
             return False
-            
+
         # FCM server key kontrolü
         fcm_server_key = getattr(settings, 'FCM_SERVER_KEY', None)
         if not fcm_server_key:
             return False
-            
+
         return True
-        
+
     except Exception as e:
         logger.error(f"💥 FCM token validation hatası: {e}")
         return False
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from notifications.counters import RECONCILE_CHUNK_SIZE, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Okunmamış sayaçlarını gerçek değerlerle karşılaştırır ve kaymaları düzeltir (periyodik çalıştırılmalı)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Sadece bu kullanıcı ID\'lerini kontrol et (birden fazla verilebilir)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=RECONCILE_CHUNK_SIZE,
+            help=f'Tek seferde kontrol edilecek kullanıcı sayısı (varsayılan: {RECONCILE_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Sadece kaymış sayaçları say, düzeltme',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            self.stdout.write(self.style.ERROR('--chunk-size pozitif olmalıdır.'))
+            return
+
+        self.stdout.write('🔢 Okunmamış sayaçları kontrol ediliyor...')
+        checked, fixed = reconcile_counters(
+            user_ids=options['user_ids'], chunk_size=options['chunk_size'], dry_run=options['dry_run']
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'DRY RUN: {checked} kullanıcıdan {fixed} tanesinin sayaçları düzeltilecekti.'
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {checked} kullanıcı kontrol edildi, {fixed} kullanıcının sayaçları düzeltildi.'
+        ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0008_ensure_fcm_token_field'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32, verbose_name='Sayaç')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Sayı')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unread_counters', to=settings.AUTH_USER_MODEL, verbose_name='Kullanıcı')),
+            ],
+            options={
+                'verbose_name': 'Okunmamış Sayacı',
+                'verbose_name_plural': 'Okunmamış Sayaçları',
+                'unique_together': {('user', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Mevcut okunmamış bildirim ve mesajlardan UnreadCounter tablosunu doldurur.
+# Artımlı sayaçlar sadece yeni kayıtları sayar; bu adım olmadan deploy
+# öncesinden kalan okunmamışlar rozetlerde 0 görünür. Redis store'u ise deploy
+# sırasında reconcile_unread_counters ile doldurulur (bkz. build.sh).
+
+from django.db import migrations
+from django.db.models import Count
+
+SEED_BATCH_SIZE = 1000
+
+
+def seed_unread_counters(apps, schema_editor):
+    Notification = apps.get_model('notifications', 'Notification')
+    PrivateMessage = apps.get_model('chat', 'PrivateMessage')
+    UnreadCounter = apps.get_model('notifications', 'UnreadCounter')
+
+    counts = {}
+    notifications = (
+        Notification.objects.filter(is_read=False)
+        .values('recipient_id').annotate(unread=Count('id'))
+    )
+    for row in notifications:
+        counts[(row['recipient_id'], 'notifications')] = row['unread']
+
+    messages = (
+        PrivateMessage.objects.filter(is_read=False)
+        .values('receiver_id', 'sender_id').annotate(unread=Count('id'))
+    )
+    for row in messages:
+        counts[(row['receiver_id'], f"pm:{row['sender_id']}")] = row['unread']
+        key = (row['receiver_id'], 'messages')
+        counts[key] = counts.get(key, 0) + row['unread']
+
+    UnreadCounter.objects.all().delete()
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id, key=key, count=count) for (user_id, key), count in counts.items()],
+        batch_size=SEED_BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0009_unread_counter'),
+        ('chat', '0004_privatemessage_pair_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_unread_counters, migrations.RunPython.noop),
+    ]
@@ -136,4 +136,26 @@ class NotificationPreferences(models.Model):
             'sound_enabled': self.sound_enabled,
             'vibration_enabled': self.vibration_enabled,
             'push_enabled': self.push_enabled,
-        }
\ No newline at end of file
+        }
+
+class UnreadCounter(models.Model):
+    """
+    Redis yokken okunmamış sayaçlarının tutulduğu tablo (bkz. notifications/counters.py).
+    key: 'notifications', 'messages' veya konuşma başına 'pm:<partner_id>'
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='unread_counters',
+        verbose_name='Kullanıcı'
+    )
+    key = models.CharField(max_length=32, verbose_name='Sayaç')
+    count = models.PositiveIntegerField(default=0, verbose_name='Sayı')
+
+    class Meta:
+        unique_together = ('user', 'key')
+        verbose_name = 'Okunmamış Sayacı'
+        verbose_name_plural = 'Okunmamış Sayaçları'
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key}: {self.count}"
@@ -0,0 +1,34 @@
+"""
+Bildirim ve özel mesaj ekleme/silme işlemlerini okunmamış sayaçlarına yansıtır.
+Okundu işaretlemeleri çağıran yerde okunan satır sayısıyla yapılır (bkz. counters.py).
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from chat.models import PrivateMessage
+from . import counters
+from .models import Notification
+
+
+@receiver(post_save, sender=Notification, dispatch_uid='unread_counter_notification_saved')
+def notification_saved(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw and not instance.is_read:
+        counters.notification_created(instance.recipient_id)
+
+
+@receiver(post_delete, sender=Notification, dispatch_uid='unread_counter_notification_deleted')
+def notification_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        counters.notifications_read(instance.recipient_id, 1)
+
+
+@receiver(post_save, sender=PrivateMessage, dispatch_uid='unread_counter_message_saved')
+def private_message_saved(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw and not instance.is_read:
+        counters.message_created(instance.receiver_id, instance.sender_id)
+
+
+@receiver(post_delete, sender=PrivateMessage, dispatch_uid='unread_counter_message_deleted')
+def private_message_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        counters.messages_read(instance.receiver_id, instance.sender_id, 1)
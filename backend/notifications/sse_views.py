@@ -1,89 +1,151 @@
-from django.http import StreamingHttpResponse
-from django.contrib.auth import get_user_model
-from django.utils import timezone
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
-import json
 import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
 from .models import Notification
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+# Boşta bekleyen bağlantı için heartbeat aralığı (saniye)
+HEARTBEAT_INTERVAL = 15
+# Last-Event-ID ile yeniden bağlanıldığında en fazla kaç bildirim tekrar gönderilir
+REPLAY_LIMIT = 50
+# İstemcinin yeniden bağlanmadan önce beklemesi gereken süre (milisaniye)
+RETRY_MILLISECONDS = 3000
+
+
+@sync_to_async
+def _authenticate(request):
+    """REST API ile aynı authentication sınıflarını kullanarak kullanıcıyı bulur"""
+    drf_request = Request(
+        request,
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    try:
+        user = drf_request.user
+    except APIException:
+        return None
+    if user is None or not user.is_authenticated:
+        return None
+    return user
+
+
+@sync_to_async
+def _missed_notifications(user_id, last_event_id):
+    """Bağlantı koptuğu sırada gelen bildirimleri tek sorguda getirir"""
+    notifications = Notification.objects.filter(
+        recipient_id=user_id,
+        id__gt=last_event_id,
+    ).select_related('sender', 'recipient', 'content_type').order_by('id')[:REPLAY_LIMIT]
+    return NotificationSerializer(notifications, many=True).data
+
+
+def _parse_last_event_id(request):
+    """Last-Event-ID header'ını (veya last_event_id query parametresini) okur"""
+    raw_value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        return int(raw_value) if raw_value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _format_event(data):
+    """Bildirimi SSE formatına çevirir; id satırı Last-Event-ID için kullanılır"""
+    lines = []
+    if data.get('id') is not None:
+        lines.append(f"id: {data['id']}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return '\n'.join(lines) + '\n\n'
 
-User = get_user_model()
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def notification_stream(request):
+def _heartbeat():
+    return f"data: {json.dumps({'type': 'heartbeat', 'timestamp': timezone.now().isoformat()})}\n\n"
+
+
+async def _event_stream(user_id, last_event_id=None):
     """
-    Server-Sent Events ile gerçek zamanlı bildirim akışı
+    Kullanıcının bildirim grubuna abone olup gelen olayları anında iletir.
+
+    send_realtime_notification'ın yayın yaptığı user_notifications_{id} grubunu
+    dinler; boştaki bağlantı ne veritabanı sorgusu ne de worker thread tutar.
     """
-    print(f"DEBUG: Notification stream endpoint çağrıldı - User: {request.user.username}")
-    print(f"DEBUG: Accept header: {request.META.get('HTTP_ACCEPT', '')}")
-    print(f"DEBUG: Authorization header: {request.META.get('HTTP_AUTHORIZATION', '')[:20]}...")
-    print(f"DEBUG: User authenticated: {request.user.is_authenticated}")
-    print(f"DEBUG: Request method: {request.method}")
-    print(f"DEBUG: Content-Type: {request.META.get('CONTENT_TYPE', '')}")
-    
-    # Accept header kontrolünü tamamen kaldır - tüm istekleri kabul et
-    print("DEBUG: SSE endpoint başlatılıyor, header kontrolleri atlandı")
-    
-    def event_stream():
-        import time
-        last_check = timezone.now()
-        
+    channel_layer = get_channel_layer()
+    group_name = f'user_notifications_{user_id}'
+    channel_name = await channel_layer.new_channel()
+    # Önce abone ol, sonra kaçırılanları gönder - arada gelen olaylar kanalda bekler
+    await channel_layer.group_add(group_name, channel_name)
+    cursor = last_event_id or 0
+
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+
+        if last_event_id is not None:
+            for data in await _missed_notifications(user_id, last_event_id):
+                yield _format_event(data)
+                cursor = max(cursor, data['id'])
+
         while True:
             try:
-                # Son kontrol zamanından sonraki yeni bildirimleri al
-                new_notifications = Notification.objects.filter(
-                    recipient=request.user,
-                    timestamp__gt=last_check,
-                    is_read=False
-                ).order_by('timestamp')
-                
-                for notification in new_notifications:
-                    # SSE formatında bildirim gönder
-                    data = {
-                        'id': notification.id,
-                        'message': notification.message,
-                        'notification_type': notification.notification_type,
-                        'sender': {
-                            'id': notification.sender.id if notification.sender else None,
-                            'username': notification.sender.username if notification.sender else None,
-                        } if notification.sender else None,
-                        'timestamp': notification.timestamp.isoformat(),
-                        'is_read': notification.is_read,
-                    }
-                    
-                    yield f"data: {json.dumps(data)}\n\n"
-                
-                last_check = timezone.now()
-                
-                # Heartbeat gönder - bağlantının canlı olduğunu göster
-                yield f"data: {json.dumps({'type': 'heartbeat', 'timestamp': last_check.isoformat()})}\n\n"
-                
-                # Non-blocking sleep - Gunicorn worker'ını bloklamaz
-                # Kısa sleep ile worker'ı bloklamadan kontrol et
-                time.sleep(5)  # 5 saniye aralıklarla kontrol et
-                
-            except GeneratorExit:
-                # Client bağlantıyı kapattı
-                print("DEBUG: SSE client bağlantıyı kapattı")
-                break
-            except Exception as e:
-                # Hata durumunda error event gönder
-                print(f"DEBUG: SSE stream hatası: {e}")
-                error_data = {'error': str(e), 'type': 'error'}
-                yield f"data: {json.dumps(error_data)}\n\n"
-                time.sleep(30)  # Hata durumunda daha uzun bekle
-    
+                message = await asyncio.wait_for(
+                    channel_layer.receive(channel_name),
+                    timeout=HEARTBEAT_INTERVAL,
+                )
+            except asyncio.TimeoutError:
+                yield _heartbeat()
+                continue
+
+            if message.get('type') != 'send_notification':
+                continue
+            data = message.get('notification')
+            if not data:
+                continue
+            # Replay ile zaten gönderilmiş bildirimleri atla
+            notification_id = data.get('id')
+            if notification_id is not None and notification_id <= cursor:
+                continue
+            if notification_id is not None:
+                cursor = notification_id
+            yield _format_event(data)
+    except asyncio.CancelledError:
+        logger.debug(f"SSE client bağlantıyı kapattı: user {user_id}")
+        raise
+    finally:
+        await channel_layer.group_discard(group_name, channel_name)
+
+
+async def notification_stream(request):
+    """
+    Server-Sent Events ile gerçek zamanlı bildirim akışı
+
+    Channel layer üzerinden push tabanlı çalışır. İstemci yeniden bağlanırken
+    Last-Event-ID gönderirse arada kaçırdığı bildirimler önce iletilir.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': 'Method not allowed.'}, status=405)
+
+    user = await _authenticate(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'},
+            status=401,
+        )
+
     response = StreamingHttpResponse(
-        event_stream(),
+        _event_stream(user.id, _parse_last_event_id(request)),
         content_type='text/event-stream'
     )
     response['Cache-Control'] = 'no-cache'
-    response['Connection'] = 'keep-alive'
     response['Access-Control-Allow-Origin'] = '*'
-    response['Access-Control-Allow-Headers'] = 'Cache-Control, Authorization, Accept'
+    response['Access-Control-Allow-Headers'] = 'Cache-Control, Authorization, Accept, Last-Event-ID'
     response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
     response['X-Accel-Buffering'] = 'no'  # Nginx buffering'i kapat
-    
-    print("DEBUG: SSE response oluşturuldu")
     return response
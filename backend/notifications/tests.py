@@ -1,3 +1,442 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from channels.testing import WebsocketCommunicator
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, RequestFactory
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat import presence
+from chat.models import PrivateMessage
+from . import counters, fcm_service, sse_views
+from .fcm_service import FCMClient, PushDispatcher, build_payload
+from .consumers import NotificationConsumer
+from .models import Notification, NotificationPreferences, UnreadCounter
+from .utils import fan_out_notifications, send_realtime_notification
+
+User = get_user_model()
+
+
+def _parse_event(chunk):
+    """SSE olayındaki id ve data satırlarını ayrıştırır"""
+    event = {}
+    for line in chunk.decode().strip().split('\n'):
+        key, _, value = line.partition(': ')
+        event[key] = value
+    if 'data' in event:
+        event['data'] = json.loads(event['data'])
+    return event
+
+
+class NotificationStreamTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='streamuser',
+            email='stream@example.com',
+            password='testpassword'
+        )
+        self.factory = RequestFactory()
+
+    def _request(self, **headers):
+        token = AccessToken.for_user(self.user)
+        return self.factory.get(
+            '/api/notifications/stream/',
+            HTTP_AUTHORIZATION=f'Bearer {token}',
+            **headers
+        )
+
+    async def test_unauthenticated_request_is_rejected(self):
+        response = await sse_views.notification_stream(
+            self.factory.get('/api/notifications/stream/')
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_group_event_is_pushed_without_polling(self):
+        response = await sse_views.notification_stream(self._request())
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+
+        retry = await anext(stream)
+        self.assertTrue(retry.startswith(b'retry:'))
+
+        next_chunk = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)
+        await get_channel_layer().group_send(f'user_notifications_{self.user.id}', {
+            'type': 'send_notification',
+            'notification': {'id': 42, 'message': 'Merhaba'},
+        })
+        event = _parse_event(await asyncio.wait_for(next_chunk, timeout=2))
+        self.assertEqual(event['id'], '42')
+        self.assertEqual(event['data']['message'], 'Merhaba')
+        await stream.aclose()
+
+    async def test_heartbeat_is_sent_when_idle(self):
+        with mock.patch.object(sse_views, 'HEARTBEAT_INTERVAL', 0.01):
+            response = await sse_views.notification_stream(self._request())
+            stream = response.streaming_content
+            await anext(stream)
+            event = _parse_event(await asyncio.wait_for(anext(stream), timeout=2))
+            await stream.aclose()
+        self.assertEqual(event['data']['type'], 'heartbeat')
+
+    async def test_last_event_id_replays_missed_notifications(self):
+        first = await sync_to_async(Notification.objects.create)(recipient=self.user, message='Eski')
+        second = await sync_to_async(Notification.objects.create)(recipient=self.user, message='Kaçırılan')
+
+        response = await sse_views.notification_stream(
+            self._request(HTTP_LAST_EVENT_ID=str(first.id))
+        )
+        stream = response.streaming_content
+        await anext(stream)
+        event = _parse_event(await asyncio.wait_for(anext(stream), timeout=2))
+        self.assertEqual(event['id'], str(second.id))
+        self.assertEqual(event['data']['message'], 'Kaçırılan')
+
+        # Replay edilen bildirim channel layer'dan tekrar gelirse atlanır
+        next_chunk = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)
+        group_name = f'user_notifications_{self.user.id}'
+        await get_channel_layer().group_send(group_name, {
+            'type': 'send_notification',
+            'notification': {'id': second.id, 'message': 'Kaçırılan'},
+        })
+        await get_channel_layer().group_send(group_name, {
+            'type': 'send_notification',
+            'notification': {'id': second.id + 1, 'message': 'Yeni'},
+        })
+        event = _parse_event(await asyncio.wait_for(next_chunk, timeout=2))
+        self.assertEqual(event['data']['message'], 'Yeni')
+        await stream.aclose()
+
+    async def test_send_realtime_notification_reaches_stream(self):
+        response = await sse_views.notification_stream(self._request())
+        stream = response.streaming_content
+        await anext(stream)
+
+        next_chunk = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)
+        await sync_to_async(send_realtime_notification)(self.user, 'Gerçek zamanlı')
+        event = _parse_event(await asyncio.wait_for(next_chunk, timeout=2))
+        self.assertEqual(event['data']['message'], 'Gerçek zamanlı')
+        await stream.aclose()
+
+
+class FakeFCMServer:
+    """
+    Legacy FCM API'sini taklit eden yerel HTTP sunucusu.
+
+    responses listesindeki (status, body) yanıtları sırayla döner; liste
+    bittiğinde tüm token'lar için başarılı yanıt verir.
+    """
+
+    def __init__(self, responses=None):
+        self.requests = []
+        self.responses = list(responses or [])
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                server.requests.append({'body': body, 'authorization': self.headers['Authorization']})
+                if server.responses:
+                    status_code, payload = server.responses.pop(0)
+                else:
+                    status_code, payload = 200, {'results': [{'message_id': '1'} for _ in body['registration_ids']]}
+                data = json.dumps(payload).encode()
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/fcm/send'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@mock.patch.object(fcm_service, 'BACKOFF_BASE_SECONDS', 0.001)
+class FCMDeliveryTest(TestCase):
+    def setUp(self):
+        self.payload = build_payload('Başlık', 'İçerik', {'notification_type': 'like'})
+
+    def test_tokens_are_sent_in_one_multicast_request(self):
+        with FakeFCMServer() as server:
+            client = FCMClient('test-key', api_url=server.url)
+            sent, failed, invalid = client.send_multicast(['a', 'b', 'c'], self.payload)
+
+        self.assertEqual((sent, failed, invalid), (3, 0, []))
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(server.requests[0]['body']['registration_ids'], ['a', 'b', 'c'])
+        self.assertEqual(server.requests[0]['authorization'], 'key=test-key')
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        responses = [
+            (503, {}),
+            (200, {'results': [{'message_id': '1'}, {'error': 'Unavailable'}]}),
+        ]
+        with FakeFCMServer(responses) as server:
+            client = FCMClient('test-key', api_url=server.url)
+            sent, failed, invalid = client.send_multicast(['a', 'b'], self.payload)
+
+        self.assertEqual((sent, failed, invalid), (2, 0, []))
+        # Sadece geçici hata alan token tekrar denenir
+        self.assertEqual([r['body']['registration_ids'] for r in server.requests], [['a', 'b'], ['a', 'b'], ['b']])
+
+    def test_invalid_tokens_are_pruned_from_preferences(self):
+        user = User.objects.create_user(username='pushuser', email='push@example.com', password='testpassword')
+        other = User.objects.create_user(username='pushother', email='pushother@example.com', password='testpassword')
+        NotificationPreferences.objects.create(user=user, fcm_token='stale-token')
+        NotificationPreferences.objects.create(user=other, fcm_token='good-token')
+
+        responses = [(200, {'results': [{'error': 'NotRegistered'}, {'message_id': '1'}]})]
+        with FakeFCMServer(responses) as server:
+            dispatcher = PushDispatcher(client=FCMClient('test-key', api_url=server.url))
+            results = dispatcher.deliver([(['stale-token'], self.payload), (['good-token'], self.payload)])
+
+        self.assertEqual(results, {'sent': 1, 'failed': 0, 'invalid': 1})
+        self.assertIsNone(NotificationPreferences.objects.get(user=user).fcm_token)
+        self.assertEqual(NotificationPreferences.objects.get(user=other).fcm_token, 'good-token')
+
+    def test_queued_pushes_are_coalesced_by_payload(self):
+        other_payload = build_payload('Başka', 'İçerik')
+        with FakeFCMServer() as server:
+            dispatcher = PushDispatcher(client=FCMClient('test-key', api_url=server.url), on_invalid_tokens=None)
+            with mock.patch.object(fcm_service, 'COALESCE_WINDOW_SECONDS', 0.5):
+                for token in ['a', 'b', 'a']:
+                    self.assertTrue(dispatcher.enqueue([token], self.payload))
+                dispatcher.enqueue(['c'], other_payload)
+                dispatcher.flush()
+
+        sent = sorted(r['body']['registration_ids'] for r in server.requests)
+        self.assertEqual(sent, [['a', 'b'], ['c']])
+
+    def test_full_queue_drops_pushes(self):
+        dispatcher = PushDispatcher(client=mock.Mock(), maxsize=1)
+        with mock.patch.object(dispatcher, '_ensure_worker'):
+            self.assertTrue(dispatcher.enqueue(['a'], self.payload))
+            self.assertFalse(dispatcher.enqueue(['b'], self.payload))
+        self.assertFalse(dispatcher.enqueue([None, ''], self.payload))
+
+
+class NotificationFanOutTest(TestCase):
+    def setUp(self):
+        self.sender = User.objects.create_user(username='fanoutsender', email='fs@example.com', password='testpassword')
+        self.recipients = [
+            User.objects.create_user(username=f'fanout{i}', email=f'fanout{i}@example.com', password='testpassword')
+            for i in range(6)
+        ]
+        # Biri beğenileri kapatmış, biri push token'lı, diğerlerinin tercihi yok
+        NotificationPreferences.objects.create(user=self.recipients[0], likes_comments=False)
+        NotificationPreferences.objects.create(user=self.recipients[1], fcm_token='token-1')
+        patcher = mock.patch('notifications.fcm_service.queue_push_notification', return_value=True)
+        self.queue_push = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fan_out_respects_preferences_and_queues_one_push(self):
+        result = fan_out_notifications(
+            self.recipients, 'Gönderi beğenildi', notification_type='like', sender_user=self.sender
+        )
+
+        self.assertEqual(result['skipped'], 1)
+        self.assertEqual(result['failed_sends'], 0)
+        self.assertEqual(result['push_queued'], 1)
+        self.assertEqual(self.queue_push.call_args.args[0], ['token-1'])
+        self.assertEqual(
+            set(Notification.objects.values_list('recipient_id', flat=True)),
+            {user.id for user in self.recipients[1:]}
+        )
+        for stage in ('preferences', 'filter', 'insert', 'serialize', 'dispatch', 'push', 'total'):
+            self.assertIn(stage, result['timings'])
+
+    def test_query_count_is_independent_of_recipient_count(self):
+        # preferences + bulk insert + bulk follow state
+        with self.assertNumQueries(3):
+            fan_out_notifications(self.recipients[2:4], 'Duyuru', notification_type='group_update', sender_user=self.sender)
+        with self.assertNumQueries(3):
+            fan_out_notifications(self.recipients, 'Duyuru', notification_type='group_update', sender_user=self.sender)
+
+    async def test_each_recipient_receives_own_payload(self):
+        channel_layer = get_channel_layer()
+        channels = {}
+        for user in self.recipients[1:3]:
+            channels[user.id] = await channel_layer.new_channel()
+            await channel_layer.group_add(f'user_notifications_{user.id}', channels[user.id])
+
+        result = await sync_to_async(fan_out_notifications)(
+            self.recipients[1:3], 'Yeni etkinlik', notification_type='event_update', sender_user=self.sender
+        )
+        by_recipient = {n.recipient_id: n.id for n in result['notifications']}
+
+        for user_id, channel in channels.items():
+            event = await asyncio.wait_for(channel_layer.receive(channel), timeout=1)
+            notification = event['notification']
+            self.assertEqual(notification['id'], by_recipient[user_id])
+            self.assertEqual(notification['recipient']['id'], user_id)
+            self.assertEqual(notification['sender']['id'], self.sender.id)
+            self.assertEqual(notification['message'], 'Yeni etkinlik')
+
+
+class UnreadCounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='counteruser', email='cu@example.com', password='testpassword')
+        self.alice = User.objects.create_user(username='counteralice', email='ca@example.com', password='testpassword')
+        self.bob = User.objects.create_user(username='counterbob', email='cb@example.com', password='testpassword')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _message(self, sender, text='Merhaba'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return PrivateMessage.objects.create(sender=sender, receiver=self.user, message=text)
+
+    def _notification(self, text='Bildirim'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(recipient=self.user, message=text)
+
+    def test_counts_follow_inserts_reads_and_deletes(self):
+        first = self._message(self.alice)
+        self._message(self.alice)
+        self._message(self.bob)
+        notification = self._notification()
+        self._notification()
+
+        self.assertEqual(counters.get_counts(self.user.id), {
+            'notifications': 2,
+            'messages': 3,
+            'conversations': {str(self.alice.id): 2, str(self.bob.id): 1},
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.mark_as_read()
+            # İkinci okuma sayacı tekrar düşürmez
+            PrivateMessage.objects.get(pk=first.pk).mark_as_read()
+            notification.delete()
+
+        self.assertEqual(counters.get_counts(self.user.id), {
+            'notifications': 1,
+            'messages': 2,
+            'conversations': {str(self.alice.id): 1, str(self.bob.id): 1},
+        })
+
+    def test_counters_endpoint_reads_store_without_counting(self):
+        self._message(self.alice)
+        self._notification()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse('notification-mark-read'), {}, format='json')
+        self.assertEqual(response.data['updated_count'], 1)
+
+        # Sadece sayaç satırları okunur, mesaj/bildirim tabloları sayılmaz
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('me-counters'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'notifications': 0, 'messages': 1, 'conversations': {str(self.alice.id): 1},
+        })
+
+    def test_mark_read_up_to_id(self):
+        notifications = [self._notification(f'Bildirim {i}') for i in range(3)]
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+            response = self.client.patch(
+                reverse('notification-mark-read'), {'up_to_id': notifications[1].id}, format='json'
+            )
+        self.assertEqual(response.data['updated_count'], 2)
+        self.assertEqual(
+            list(Notification.objects.filter(is_read=False).values_list('id', flat=True)), [notifications[2].id]
+        )
+        self.assertEqual(counters.get_counts(self.user.id)['notifications'], 1)
+
+        response = self.client.patch(reverse('notification-mark-read'), {'up_to_id': 'x'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_fan_out_increments_each_recipient(self):
+        with mock.patch('notifications.fcm_service.queue_push_notification', return_value=True), \
+                self.captureOnCommitCallbacks(execute=True):
+            fan_out_notifications([self.user, self.alice], 'Duyuru', notification_type='group_update')
+        self.assertEqual(counters.get_counts(self.user.id)['notifications'], 1)
+        self.assertEqual(counters.get_counts(self.alice.id)['notifications'], 1)
+
+    def test_rolled_back_insert_is_not_counted(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    Notification.objects.create(recipient=self.user, message='Geri alınacak')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(counters.get_counts(self.user.id)['notifications'], 0)
+
+    def test_reconciler_fixes_drift(self):
+        self._message(self.alice)
+        self._notification()
+        # Sinyalsiz toplu güncelleme sayaçları kaydırır
+        PrivateMessage.objects.filter(receiver=self.user).update(is_read=True)
+        UnreadCounter.objects.create(user=self.bob, key=counters.NOTIFICATIONS, count=5)
+
+        self.assertEqual(counters.reconcile_counters(dry_run=True), (3, 2))
+        self.assertEqual(counters.get_counts(self.user.id)['messages'], 1)
+
+        call_command('reconcile_unread_counters', chunk_size=2, stdout=io.StringIO())
+        self.assertEqual(counters.get_counts(self.user.id), {
+            'notifications': 1, 'messages': 0, 'conversations': {},
+        })
+        self.assertEqual(counters.get_counts(self.bob.id)['notifications'], 0)
+        self.assertEqual(counters.reconcile_counters(), (3, 0))
+
+
+class NotificationConsumerPresenceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='presuser', email='pu@example.com', password='testpassword')
+        self.friend = User.objects.create_user(username='presfriend', email='pf@example.com', password='testpassword')
+        self.stranger = User.objects.create_user(username='presother', email='po@example.com', password='testpassword')
+        self.user.following.add(self.friend)
+        presence._locmem_store.clear()
+
+    async def test_subscribers_receive_contact_presence_changes(self):
+        token = AccessToken.for_user(self.user)
+        communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), f'/ws/notifications/?token={token}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertTrue((await presence.aget_presence([self.user.id]))[self.user.id]['is_online'])
+
+        await communicator.send_to(text_data=json.dumps({
+            'action': 'subscribe_presence', 'user_ids': [self.friend.id, self.stranger.id],
+        }))
+        snapshot = json.loads(await communicator.receive_from())
+        # Takip edilmeyen ve mesajlaşılmayan kullanıcıya abone olunamaz
+        self.assertEqual(snapshot['action'], 'presence_snapshot')
+        self.assertEqual(list(snapshot['presence']), [str(self.friend.id)])
+
+        await presence.user_connected(self.stranger.id, 'socket')
+        await presence.user_connected(self.friend.id, 'socket')
+        update = json.loads(await communicator.receive_from(timeout=1))
+        self.assertEqual(
+            (update['action'], update['user_id'], update['is_online']), ('presence_update', self.friend.id, True)
+        )
+
+        await communicator.send_to(text_data=json.dumps({'action': 'heartbeat'}))
+        self.assertEqual(json.loads(await communicator.receive_from())['action'], 'heartbeat_ack')
+        await communicator.disconnect()
+        self.assertFalse((await presence.aget_presence([self.user.id]))[self.user.id]['is_online'])
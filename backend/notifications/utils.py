@@ -1,6 +1,9 @@
+import asyncio
+import time
 from django.contrib.auth import get_user_model
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from . import counters
 from .models import Notification, NotificationPreferences
 from .serializers import NotificationSerializer
 import logging
@@ -8,6 +11,59 @@ import logging
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+# Bildirim türü -> NotificationPreferences alanı; listede olmayan türler her zaman gönderilir
+NOTIFICATION_TYPE_PREFERENCES = {
+    'message': 'direct_messages',
+    'group_message': 'group_messages',
+    'like': 'likes_comments',
+    'comment': 'likes_comments',
+    'follow': 'follows',
+    'ride_request': 'ride_reminders',
+    'ride_update': 'ride_reminders',
+    'event_update': 'event_updates',
+    'event_join_request': 'event_updates',
+    'event_join_approved': 'event_updates',
+    'event_join_rejected': 'event_updates',
+    'group_update': 'group_activity',
+    'group_invite': 'group_activity',
+    'group_join_request': 'new_members',
+    'challenge': 'challenges_rewards',
+    'reward': 'challenges_rewards',
+    'leaderboard_update': 'leaderboard_updates',
+}
+
+# Fan-out'ta aynı anda bekletilen en fazla group_send sayısı
+FANOUT_SEND_CONCURRENCY = 200
+FANOUT_BATCH_SIZE = 500
+
+
+def notification_type_enabled(preferences, notification_type):
+    """Kullanıcının tercihleri bu bildirim türüne izin veriyor mu"""
+    field = NOTIFICATION_TYPE_PREFERENCES.get(notification_type)
+    if field is None:
+        return True  # Diğer türler için varsayılan olarak gönder
+    return getattr(preferences, field, True)
+
+def mark_notifications_read(user, notification_ids=None, up_to_id=None):
+    """
+    Kullanıcının okunmamış bildirimlerini tek koşullu UPDATE ile okundu yapar.
+
+    Args:
+        notification_ids: sadece bu ID'ler (opsiyonel)
+        up_to_id: ID'si bu değere kadar olanlar (opsiyonel); ikisi de yoksa hepsi
+
+    Returns:
+        int: okundu yapılan bildirim sayısı
+    """
+    notifications = Notification.objects.filter(recipient=user, is_read=False)
+    if notification_ids is not None:
+        notifications = notifications.filter(id__in=notification_ids)
+    if up_to_id is not None:
+        notifications = notifications.filter(id__lte=up_to_id)
+    updated = notifications.update(is_read=True)
+    counters.notifications_read(user.id, updated)
+    return updated
+
 def send_realtime_notification(recipient_user, message, notification_type='other', sender_user=None, content_object=None):
     """
     Gerçek zamanlı bildirim gönderir (WebSocket + Database).
@@ -47,33 +103,185 @@ def send_realtime_notification(recipient_user, message, notification_type='other
             logger.error(f"❌ WebSocket bildirimi hatası: {e}")
         
         logger.info(f"🎉 Bildirim başarıyla gönderildi: {recipient_user.username} - {notification_type}")
+        return notification
         
     except Exception as e:
         logger.error(f"Bildirim gönderme hatası: {e}")
         raise
 
-def send_bulk_notifications(recipients, message, notification_type='other', sender_user=None, content_object=None):
+async def _group_send_all(channel_layer, messages):
+    """group_send'leri tek event loop içinde eşzamanlı gönderir; hata sayısını döner"""
+    semaphore = asyncio.Semaphore(FANOUT_SEND_CONCURRENCY)
+
+    async def send(group_name, event):
+        async with semaphore:
+            await channel_layer.group_send(group_name, event)
+
+    results = await asyncio.gather(
+        *(send(group_name, event) for group_name, event in messages),
+        return_exceptions=True
+    )
+    return sum(1 for result in results if isinstance(result, Exception))
+
+def fan_out_notifications(recipients, message, notification_type='other', sender_user=None,
+                          content_object=None, title=None, respect_preferences=True):
     """
-    Birden fazla kullanıcıya toplu bildirim gönderir.
+    Çok sayıda kullanıcıya tek seferde bildirim gönderir.
+    
+    Tercihler tek sorguda yüklenip bellekte filtrelenir, Notification satırları
+    bulk_create ile yazılır, bildirim bir kez serialize edilip alıcıya özel
+    alanlar (id, recipient, timestamp) üzerine yazılır ve group_send'ler tek
+    event loop içinde eşzamanlı gönderilir. Push token'ları tek multicast
+    öğesi olarak FCM kuyruğuna alınır.
     
     Args:
-        recipients: Bildirimi alacak kullanıcılar listesi
+        recipients: Bildirimi alacak kullanıcılar
         message: Bildirim mesajı
         notification_type: Bildirim türü
         sender_user: Bildirimi gönderen kullanıcı (opsiyonel)
         content_object: İlgili nesne (opsiyonel)
+        title: Push notification için başlık (opsiyonel)
+        respect_preferences: False ise tercihler kontrol edilmez ve push gönderilmez
+    
+    Returns:
+        dict: notifications, skipped, failed_sends, push_queued ve aşama
+        sürelerini (ms) içeren timings
     """
-    for recipient in recipients:
-        try:
-            send_realtime_notification(
-                recipient_user=recipient,
+    from users.serializers import UserSerializer
+    from users.utils import attach_follow_state
+    from .fcm_service import queue_push_notification
+
+    timings = {}
+    started = stage_started = time.perf_counter()
+
+    def finish_stage(name):
+        nonlocal stage_started
+        now = time.perf_counter()
+        timings[name] = round((now - stage_started) * 1000, 1)
+        stage_started = now
+
+    recipients = list({recipient.id: recipient for recipient in recipients}.values())
+    result = {'notifications': [], 'skipped': 0, 'failed_sends': 0, 'push_queued': 0, 'timings': timings}
+
+    # 1) Tercihler tek sorguda
+    preferences = {}
+    if respect_preferences and recipients:
+        preferences = {
+            pref.user_id: pref
+            for pref in NotificationPreferences.objects.filter(user_id__in=[r.id for r in recipients])
+        }
+    finish_stage('preferences')
+
+    # 2) Bildirim türüne göre bellekte filtreleme (tercihi olmayanlar varsayılanlarla gönderilir)
+    if respect_preferences:
+        allowed = [
+            recipient for recipient in recipients
+            if recipient.id not in preferences or notification_type_enabled(preferences[recipient.id], notification_type)
+        ]
+    else:
+        allowed = recipients
+    result['skipped'] = len(recipients) - len(allowed)
+    finish_stage('filter')
+    if not allowed:
+        timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    # 3) Toplu INSERT
+    notifications = Notification.objects.bulk_create(
+        [
+            Notification(
+                recipient=recipient,
+                sender=sender_user,
                 message=message,
                 notification_type=notification_type,
-                sender_user=sender_user,
                 content_object=content_object
             )
-        except Exception as e:
-            logger.error(f"Toplu bildirim hatası - {recipient.username}: {e}")
+            for recipient in allowed
+        ],
+        batch_size=FANOUT_BATCH_SIZE
+    )
+    result['notifications'] = notifications
+    counters.notifications_created(notification.recipient_id for notification in notifications)
+    finish_stage('insert')
+
+    # 4) Bir kez serialize, alıcıya özel alanları üzerine yaz
+    attach_follow_state(allowed + ([sender_user] if sender_user else []))
+    base = dict(NotificationSerializer(notifications[0]).data)
+    recipient_data = {
+        data['id']: data for data in UserSerializer(allowed, many=True).data
+    }
+    timestamp_field = NotificationSerializer().fields['timestamp']
+    messages = [
+        (f'user_notifications_{notification.recipient_id}', {
+            'type': 'send_notification',
+            'notification': dict(
+                base,
+                id=notification.id,
+                recipient=recipient_data[notification.recipient_id],
+                timestamp=timestamp_field.to_representation(notification.timestamp)
+            ),
+        })
+        for notification in notifications
+    ]
+    finish_stage('serialize')
+
+    # 5) Eşzamanlı group_send
+    try:
+        result['failed_sends'] = async_to_sync(_group_send_all)(get_channel_layer(), messages)
+    except Exception as e:
+        logger.error(f"❌ Toplu WebSocket bildirimi hatası: {e}")
+        result['failed_sends'] = len(messages)
+    finish_stage('dispatch')
+
+    # FCM push: tek multicast öğesi
+    if respect_preferences:
+        tokens = [
+            preferences[recipient.id].fcm_token for recipient in allowed
+            if recipient.id in preferences
+            and preferences[recipient.id].push_enabled
+            and preferences[recipient.id].fcm_token
+        ]
+        if tokens:
+            push_title = title or f"MotoApp - {notification_type.replace('_', ' ').title()}"
+            push_data = {
+                'sender_id': str(sender_user.id) if sender_user else None,
+                'sender_username': sender_user.username if sender_user else None,
+                'notification_type': notification_type,
+            }
+            if queue_push_notification(tokens, push_title, message, push_data):
+                result['push_queued'] = len(tokens)
+    finish_stage('push')
+
+    timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(
+        f"📊 Toplu bildirim ({notification_type}): {len(notifications)} gönderildi, "
+        f"{result['skipped']} atlandı, süreler(ms): {timings}"
+    )
+    return result
+
+def send_bulk_notifications(recipients, message, notification_type='other', sender_user=None, content_object=None):
+    """
+    Birden fazla kullanıcıya toplu bildirim gönderir (tercihlere bakmadan).
+    
+    Args:
+        recipients: Bildirimi alacak kullanıcılar listesi
+        message: Bildirim mesajı
+        notification_type: Bildirim türü
+        sender_user: Bildirimi gönderen kullanıcı (opsiyonel)
+        content_object: İlgili nesne (opsiyonel)
+    """
+    try:
+        return fan_out_notifications(
+            recipients,
+            message=message,
+            notification_type=notification_type,
+            sender_user=sender_user,
+            content_object=content_object,
+            respect_preferences=False
+        )
+    except Exception as e:
+        logger.error(f"Toplu bildirim hatası: {e}")
+        return None
 
 def send_notification_with_preferences(recipient_user, message, notification_type='other', sender_user=None, content_object=None, title=None):
     """
@@ -114,30 +322,7 @@ def send_notification_with_preferences(recipient_user, message, notification_typ
             preferences = TempPreferences()
         
         # Notification type'a göre tercih kontrolü
-        should_send = False
-        
-        if notification_type == 'message':
-            should_send = preferences.direct_messages
-        elif notification_type == 'group_message':
-            should_send = preferences.group_messages
-        elif notification_type in ['like', 'comment']:
-            should_send = preferences.likes_comments
-        elif notification_type == 'follow':
-            should_send = preferences.follows
-        elif notification_type in ['ride_request', 'ride_update']:
-            should_send = preferences.ride_reminders
-        elif notification_type in ['event_update', 'event_join_request', 'event_join_approved', 'event_join_rejected']:
-            should_send = preferences.event_updates
-        elif notification_type in ['group_update', 'group_invite']:
-            should_send = preferences.group_activity
-        elif notification_type == 'group_join_request':
-            should_send = preferences.new_members
-        elif notification_type in ['challenge', 'reward']:
-            should_send = preferences.challenges_rewards
-        elif notification_type == 'leaderboard_update':
-            should_send = preferences.leaderboard_updates
-        else:
-            should_send = True  # Diğer türler için varsayılan olarak gönder
+        should_send = notification_type_enabled(preferences, notification_type)
         
         if not should_send:
             logger.info(f"Bildirim tercihi kapalı: {recipient_user.username} - {notification_type}")
@@ -165,21 +350,21 @@ def send_notification_with_preferences(recipient_user, message, notification_typ
                     'notification_type': notification_type,
                 }
                 
-                # FCM push notification gönder
-                logger.info(f"📱 FCM push notification gönderiliyor: {recipient_user.username} - {push_title}")
+                # FCM push notification arka plan kuyruğuna alınır
+                logger.info(f"📱 FCM push notification kuyruğa alınıyor: {recipient_user.username} - {push_title}")
                 
-                from .fcm_service import send_fcm_notification
-                fcm_success = send_fcm_notification(
-                    user=recipient_user,
+                from .fcm_service import queue_push_notification
+                fcm_queued = queue_push_notification(
+                    [getattr(preferences, 'fcm_token', None)],
                     title=push_title,
                     body=message,
                     data=push_data
                 )
                 
-                if fcm_success:
-                    logger.info(f"✅ FCM push notification gönderildi: {recipient_user.username} - {push_title}")
+                if fcm_queued:
+                    logger.info(f"✅ FCM push notification kuyruğa alındı: {recipient_user.username} - {push_title}")
                 else:
-                    logger.warning(f"❌ FCM push notification gönderilemedi: {recipient_user.username}")
+                    logger.warning(f"❌ FCM push notification kuyruğa alınamadı: {recipient_user.username}")
                     
             except Exception as e:
                 logger.error(f"💥 FCM push notification hatası: {e}")
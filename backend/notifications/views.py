@@ -5,9 +5,10 @@ from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 import logging
+from . import counters
 from .models import Notification, NotificationPreferences
 from .serializers import NotificationSerializer, NotificationPreferencesSerializer, FCMTokenSerializer
-from .utils import send_realtime_notification
+from .utils import mark_notifications_read, send_realtime_notification
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +38,23 @@ class NotificationMarkReadView(APIView):
     def patch(self, request, *args, **kwargs):
         try:
             notification_ids = request.data.get('notification_ids')
+            up_to_id = request.data.get('up_to_id')
+            if up_to_id is not None:
+                # Listede görülen en yeni bildirime kadar hepsi tek UPDATE ile
+                try:
+                    up_to_id = int(up_to_id)
+                except (TypeError, ValueError):
+                    up_to_id = 0
+                if up_to_id <= 0:
+                    return Response(
+                        {"detail": "up_to_id pozitif bir tam sayı olmalıdır."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                updated_count = mark_notifications_read(request.user, up_to_id=up_to_id)
+                return Response({
+                    "detail": f"{updated_count} bildirim okundu olarak işaretlendi.",
+                    "updated_count": updated_count
+                })
             if notification_ids:
                 if not isinstance(notification_ids, list):
                     return Response(
@@ -44,21 +62,13 @@ class NotificationMarkReadView(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
-                notifications_to_mark = Notification.objects.filter(
-                    recipient=request.user,
-                    id__in=notification_ids,
-                    is_read=False
-                )
-                updated_count = notifications_to_mark.update(is_read=True)
+                updated_count = mark_notifications_read(request.user, notification_ids=notification_ids)
                 return Response({
                     "detail": f"{updated_count} bildirim okundu olarak işaretlendi.",
                     "updated_count": updated_count
                 })
             else:
-                updated_count = Notification.objects.filter(
-                    recipient=request.user,
-                    is_read=False
-                ).update(is_read=True)
+                updated_count = mark_notifications_read(request.user)
                 return Response({
                     "detail": f"Tüm {updated_count} okunmamış bildirim okundu olarak işaretlendi.",
                     "updated_count": updated_count
@@ -309,4 +319,11 @@ class PushNotificationStatusView(APIView):
             return Response(
                 {"detail": f"Push notification durumu kontrol edilirken hata oluştu: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+class UnreadCountersView(APIView):
+    """Tüm rozet sayıları (bildirim, mesaj, konuşma başına) tek store okumasıyla"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response(counters.get_counts(request.user.id))
@@ -0,0 +1,65 @@
+# posts/feed.py
+"""
+Feed endpoint'leri için N+1'siz Post queryset'i.
+
+Beğeni/yorum sayıları ve viewer'ın beğeni durumu SQL'de annotate edilir, son
+yorumlar tek bir window sorgusu ile, yazarlar ise takip bilgileriyle birlikte
+tek sorguda prefetch edilir. PostSerializer bu alanları gördüğünde post başına
+sorgu yapmaz.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import (
+    Count, Exists, F, IntegerField, OuterRef, Prefetch, Subquery, Value, Window,
+)
+from django.db.models.functions import Coalesce, RowNumber
+
+from users.utils import annotate_follow_state
+from .models import Post, PostComment, PostLike
+
+User = get_user_model()
+
+# Feed'de her post ile birlikte gönderilen yorum sayısı
+FEED_COMMENT_LIMIT = 5
+
+
+def _count_subquery(model):
+    counts = model.objects.filter(
+        post=OuterRef('pk')
+    ).order_by().values('post').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def recent_comments_queryset(limit=FEED_COMMENT_LIMIT):
+    """Her post için en yeni `limit` yorumu tek sorguda seçen window queryset'i"""
+    return PostComment.objects.annotate(
+        feed_row_number=Window(
+            RowNumber(),
+            partition_by=F('post_id'),
+            order_by=[F('created_at').desc(), F('id').desc()],
+        )
+    ).filter(feed_row_number__lte=limit).select_related('author').order_by('-created_at', '-id')
+
+
+def feed_queryset(viewer, queryset=None):
+    """
+    Verilen Post queryset'ini feed serializer modu için hazırlar.
+
+    Eklenen alanlar: likes_total, comments_total, viewer_has_liked,
+    recent_comments (prefetch) ve takip bilgisi annotate edilmiş author.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+
+    if viewer is not None and viewer.is_authenticated:
+        viewer_has_liked = Exists(PostLike.objects.filter(post=OuterRef('pk'), user=viewer))
+    else:
+        viewer_has_liked = Value(False)
+
+    return queryset.annotate(
+        likes_total=_count_subquery(PostLike),
+        comments_total=_count_subquery(PostComment),
+        viewer_has_liked=viewer_has_liked,
+    ).prefetch_related(
+        Prefetch('author', queryset=annotate_follow_state(User.objects.all(), viewer)),
+        Prefetch('comments', queryset=recent_comments_queryset(), to_attr='recent_comments'),
+    )
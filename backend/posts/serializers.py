@@ -18,8 +18,8 @@ class PostSerializer(serializers.ModelSerializer):
     group = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all(), required=False)
     # image field kaldırıldı - artık sadece image_url kullanılıyor
     content = serializers.CharField(required=True, allow_blank=False)  # Content zorunlu ve boş olamaz
-    likes_count = serializers.ReadOnlyField()
-    comments_count = serializers.ReadOnlyField()
+    likes_count = serializers.SerializerMethodField()
+    comments_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     comments = serializers.SerializerMethodField()
     
@@ -40,34 +40,37 @@ class PostSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('id', 'author', 'created_at', 'updated_at')
 
+    # posts.feed.feed_queryset ile gelen annotate alanları varsa post başına
+    # sorgu yapılmaz; yoksa model üzerinden hesaplanır.
+    def get_likes_count(self, obj):
+        if hasattr(obj, 'likes_total'):
+            return obj.likes_total
+        return obj.likes_count
+
+    def get_comments_count(self, obj):
+        if hasattr(obj, 'comments_total'):
+            return obj.comments_total
+        return obj.comments_count
+
     def get_is_liked(self, obj):
+        if hasattr(obj, 'viewer_has_liked'):
+            return obj.viewer_has_liked
+
         request = self.context.get('request')
-        print(f"PostSerializer - Post {obj.id}: get_is_liked called")
-        print(f"  - Request exists: {request is not None}")
-        print(f"  - User authenticated: {request and request.user.is_authenticated}")
-        print(f"  - User: {request.user.username if request and request.user.is_authenticated else 'None'}")
-        
         if request and request.user.is_authenticated:
             try:
-                # Önce PostLike tablosunda bu post için kaç beğeni var kontrol et
-                total_likes = PostLike.objects.filter(post=obj).count()
-                user_like = PostLike.objects.filter(post=obj, user=request.user).exists()
-                
-                print(f"  - Total likes for post {obj.id}: {total_likes}")
-                print(f"  - User {request.user.username} liked: {user_like}")
-                
-                return user_like
+                return PostLike.objects.filter(post=obj, user=request.user).exists()
             except Exception as e:
                 print(f"PostSerializer - Post {obj.id}: Error checking is_liked: {e}")
-                import traceback
-                traceback.print_exc()
                 return False
-        print(f"PostSerializer - Post {obj.id}: User not authenticated, is_liked = False")
         return False
 
     def get_comments(self, obj):
         try:
-            comments = obj.comments.all()[:5]  # Son 5 yorumu al
+            if hasattr(obj, 'recent_comments'):
+                comments = obj.recent_comments
+            else:
+                comments = obj.comments.select_related('author')[:5]  # Son 5 yorumu al
             return [{
                 'id': comment.id,
                 'content': comment.content,
@@ -113,19 +116,6 @@ class PostSerializer(serializers.ModelSerializer):
         if self.context.get('only_content'):
             return representation.get('content')
         
-        # Debug log'ları
-        print(f"PostSerializer - Post {instance.id}:")
-        print(f"  - Author: {instance.author}")
-        print(f"  - Author username: {instance.author.username}")
-        print(f"  - Author ID: {instance.author.id}")
-        print(f"  - Representation author: {representation.get('author')}")
-        if representation.get('author'):
-            author_data = representation.get('author')
-            print(f"  - Author data type: {type(author_data)}")
-            if isinstance(author_data, dict):
-                print(f"  - Author username in data: {author_data.get('username')}")
-                print(f"  - Author ID in data: {author_data.get('id')}")
-        
         # image field artık yok, sadece image_url kullanılıyor
         
         # Author verisini manuel olarak kontrol et
@@ -1,3 +1,235 @@
-from django.test import TestCase
+# moto_app/backend/posts/tests.py
 
-# Create your tests here.
+from unittest import mock
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from groups.models import Group
+from .models import Post, PostLike, PostComment
+from . import timeline
+from .timeline import fan_out_post
+from rest_framework import status
+
+User = get_user_model()
+
+
+def _patch_timeline_store(test_case):
+    """Test boyunca Redis yerine process içi timeline store'u kullanır"""
+    store = timeline.LocMemTimelineStore()
+    patcher = mock.patch.object(timeline, 'get_timeline_store', return_value=store)
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+    return store
+
+
+class FeedQueryCountTest(APITestCase):
+    """
+    Feed endpoint'lerinin sorgu sayısının post sayısından bağımsız olduğunu test eder.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='feeduser',
+            email='feed@example.com',
+            password='testpassword'
+        )
+        self.authors = [
+            User.objects.create_user(
+                username=f'author{i}',
+                email=f'author{i}@example.com',
+                password='testpassword'
+            )
+            for i in range(3)
+        ]
+        self.user.following.add(*self.authors)
+        self.authors[0].following.add(self.user)
+
+        self.group = Group.objects.create(name='Feed Grubu', owner=self.authors[0])
+        self.group.members.add(self.user)
+
+        self.client.force_authenticate(user=self.user)
+        self.store = _patch_timeline_store(self)
+
+    def _create_posts(self, count, group=None):
+        for i in range(count):
+            author = self.authors[i % len(self.authors)]
+            post = Post.objects.create(author=author, content=f'Gönderi {i}', group=group)
+            PostLike.objects.create(post=post, user=self.user)
+            for j in range(7):
+                PostComment.objects.create(post=post, author=self.authors[j % 3], content=f'Yorum {j}')
+
+    def _assert_constant_queries(self, url, num_queries, group=None):
+        self._create_posts(2, group=group)
+        with self.assertNumQueries(num_queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self._create_posts(8, group=group)
+        with self.assertNumQueries(num_queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def _assert_feed_payload(self, posts):
+        self.assertEqual(len(posts), 10)
+        for post in posts:
+            self.assertEqual(post['likes_count'], 1)
+            self.assertEqual(post['comments_count'], 7)
+            self.assertTrue(post['is_liked'])
+            self.assertEqual(len(post['comments']), 5)
+            self.assertTrue(post['author']['is_following'])
+
+    def test_general_post_list_query_count(self):
+        # posts + authors + recent comments
+        posts = self._assert_constant_queries(reverse('general-post-list-create'), 3)
+        self._assert_feed_payload(posts)
+
+    def test_group_post_list_query_count(self):
+        # group + membership + posts + authors + recent comments
+        url = reverse('group-post-list-create', kwargs={'group_pk': self.group.pk})
+        posts = self._assert_constant_queries(url, 5, group=self.group)
+        self._assert_feed_payload(posts)
+
+    def test_following_posts_query_count(self):
+        url = reverse('following-posts')
+        self._create_posts(2)
+        # İlk istekte timeline veritabanından bir kez kurulur
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+        for i in range(8):
+            post = Post.objects.create(author=self.authors[i % 3], content=f'Yeni {i}')
+            PostLike.objects.create(post=post, user=self.user)
+            for j in range(7):
+                PostComment.objects.create(post=post, author=self.authors[j % 3], content=f'Yorum {j}')
+            fan_out_post(post)
+
+        # followees + posts + authors + recent comments
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self._assert_feed_payload(response.data['results'])
+
+    def test_user_posts_query_count(self):
+        url = reverse('user-posts', kwargs={'username': self.authors[0].username})
+        self._create_posts(2)
+        with self.assertNumQueries(4):
+            first = self.client.get(url)
+        self._create_posts(8)
+        # user + posts + authors + recent comments
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first.data), 1)
+        self.assertEqual(len(response.data), 4)
+
+    def test_feed_counts_and_follow_state(self):
+        self._create_posts(1)
+        response = self.client.get(reverse('general-post-list-create'))
+        post = response.data[0]
+        self.assertEqual(post['author']['followers_count'], 1)
+        self.assertEqual(post['author']['following_count'], 1)
+        latest = PostComment.objects.filter(post_id=post['id']).order_by('-created_at', '-id')[:5]
+        self.assertEqual([c['id'] for c in post['comments']], [c.id for c in latest])
+
+
+class FollowingTimelineTest(APITestCase):
+    """
+    Fan-out-on-write timeline ve cursor sayfalamasını test eder.
+    """
+
+    def setUp(self):
+        self.store = _patch_timeline_store(self)
+        self.user = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            password='testpassword'
+        )
+        self.friend = User.objects.create_user(
+            username='friend',
+            email='friend@example.com',
+            password='testpassword'
+        )
+        self.stranger = User.objects.create_user(
+            username='stranger',
+            email='stranger@example.com',
+            password='testpassword'
+        )
+        self.user.following.add(self.friend)
+        self.url = reverse('following-posts')
+        self.client.force_authenticate(user=self.user)
+
+    def _post(self, author, content):
+        post = Post.objects.create(author=author, content=content)
+        fan_out_post(post)
+        return post
+
+    def _fetch_all(self, page_size):
+        ids, cursor = [], None
+        while True:
+            params = {'page_size': page_size}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [post['id'] for post in response.data['results']]
+            cursor = response.data['next_cursor']
+            if not response.data['has_more']:
+                self.assertIsNone(cursor)
+                return ids
+
+    def test_cursor_pages_cover_feed_in_order(self):
+        expected = [self._post(self.friend if i % 2 else self.user, f'Gönderi {i}').id for i in range(7)]
+        self._post(self.stranger, 'Görünmemeli')
+        Post.objects.create(author=self.friend, content='Grup', group=Group.objects.create(
+            name='Grup', owner=self.friend
+        ))
+
+        self.assertEqual(self._fetch_all(page_size=3), list(reversed(expected)))
+
+    def test_new_post_is_pushed_to_follower_timeline(self):
+        self._post(self.friend, 'Eski')
+        self._fetch_all(page_size=10)
+        self.assertTrue(self.store.exists(self.user.id))
+
+        self.client.force_authenticate(user=self.friend)
+        response = self.client.post(
+            reverse('general-post-list-create'), {'content': 'Taze gönderi'}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['results'][0]['content'], 'Taze gönderi')
+
+    def test_large_accounts_are_merged_on_read(self):
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWER_LIMIT', 0):
+            own = self._post(self.user, 'Kendi')
+            celebrity = self._post(self.friend, 'Ünlü')
+            self.assertEqual(self._fetch_all(page_size=1), [celebrity.id, own.id])
+
+    def test_follow_toggle_invalidates_timeline(self):
+        self._post(self.stranger, 'Yeni takip')
+        self.assertEqual(self._fetch_all(page_size=10), [])
+
+        response = self.client.post(reverse('follow-toggle-by-username', kwargs={'username': self.stranger.username}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self._fetch_all(page_size=10)), 1)
+
+    def test_pages_past_capacity_continue_from_database(self):
+        expected = [self._post(self.friend, f'Gönderi {i}').id for i in range(7)]
+        with mock.patch.object(timeline, 'TIMELINE_CAPACITY', 3):
+            self.store.invalidate(self.user.id)
+            self.assertEqual(self._fetch_all(page_size=2), list(reversed(expected)))
+        self.assertEqual(self.store.size(self.user.id), 3)
+
+    def test_feed_is_read_from_database_without_redis(self):
+        expected = [self._post(self.friend if i % 2 else self.user, f'Gönderi {i}').id for i in range(5)]
+        with mock.patch.object(timeline, 'get_timeline_store', return_value=None):
+            self._post(self.friend, 'Yeni')
+            expected.append(Post.objects.latest('id').id)
+            self.assertEqual(self._fetch_all(page_size=2), list(reversed(expected)))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'cursor': 'bozuk'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
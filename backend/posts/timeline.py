@@ -0,0 +1,283 @@
+# posts/timeline.py
+"""
+Takip edilen kullanıcıların gönderileri için timeline servisi.
+
+Yeni bir genel gönderi oluşturulduğunda ID'si takipçilerin Redis'teki sınırlı
+boyutlu sorted set'lerine yazılır (fan-out-on-write). Takipçi sayısı çok yüksek
+hesapların gönderileri yazılmaz; okuma sırasında veritabanından çekilip
+birleştirilir (fan-out-on-read). Sayfalama (created_at, id) keyset cursor ile
+yapılır ve sayfadaki ID'ler tek sorguda feed_queryset ile doldurulur.
+
+Timeline'lar en fazla TIMELINE_CAPACITY gönderi tutar; daha eski sayfalar aynı
+keyset cursor ile veritabanından devam eder. Redis yapılandırılmamışsa
+timeline tutulmaz ve akış doğrudan veritabanından okunur: process içi bir
+store her worker'da ayrı kalır ve diğer worker'lar eski akış gösterirdi.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+
+from core_api.pagination import encode_cursor, keyset_before
+from core_api.redis_client import get_redis_connection, redis_key
+from users.utils import followers_count_expression
+from .feed import feed_queryset
+from .models import Post
+
+User = get_user_model()
+Follow = User.following.through
+logger = logging.getLogger(__name__)
+
+# Kullanıcı başına timeline'da tutulan en fazla gönderi sayısı
+TIMELINE_CAPACITY = 800
+# Bu sayıdan fazla takipçisi olan hesaplar için fan-out-on-read kullanılır
+FANOUT_FOLLOWER_LIMIT = 5000
+# Kullanılmayan timeline'lar bu süre sonra düşer ve ilk okumada yeniden kurulur
+TIMELINE_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+# Aynı mikrosaniyede oluşturulmuş gönderiler için fazladan okunan kayıt
+CURSOR_SLACK = 10
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MARKER_MEMBER = '0'
+_MARKER_SCORE = -1
+
+
+def post_score(created_at):
+    """created_at'i kesin (integer mikrosaniye) sorted set skoruna çevirir"""
+    return (created_at - _EPOCH) // timedelta(microseconds=1)
+
+
+def score_to_datetime(score):
+    return _EPOCH + timedelta(microseconds=int(score))
+
+
+class RedisTimelineStore:
+    """Her kullanıcı için skor = created_at (µs) olan sınırlı boyutlu sorted set"""
+
+    # Sadece mevcut (kurulmuş) timeline'lara yazar; soğuk timeline ilk okumada kurulur
+    PUSH_SCRIPT = """
+    for i, key in ipairs(KEYS) do
+        if redis.call('EXISTS', key) == 1 then
+            redis.call('ZADD', key, ARGV[1], ARGV[2])
+            redis.call('ZREMRANGEBYRANK', key, 1, -(tonumber(ARGV[3]) + 1))
+        end
+    end
+    return 1
+    """
+    PUSH_BATCH_SIZE = 500
+
+    def __init__(self, client):
+        self.client = client
+        self._push = client.register_script(self.PUSH_SCRIPT)
+
+    def _key(self, user_id):
+        return redis_key('timeline', user_id)
+
+    def exists(self, user_id):
+        return bool(self.client.exists(self._key(user_id)))
+
+    def push(self, user_ids, post_id, score):
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), self.PUSH_BATCH_SIZE):
+            keys = [self._key(user_id) for user_id in user_ids[start:start + self.PUSH_BATCH_SIZE]]
+            self._push(keys=keys, args=[score, post_id, TIMELINE_CAPACITY])
+
+    def replace(self, user_id, entries):
+        key = self._key(user_id)
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        # Marker üye boş timeline'ın da "kurulmuş" sayılmasını sağlar
+        mapping = {_MARKER_MEMBER: _MARKER_SCORE}
+        mapping.update({str(post_id): score for post_id, score in entries})
+        pipe.zadd(key, mapping)
+        pipe.zremrangebyrank(key, 1, -(TIMELINE_CAPACITY + 1))
+        pipe.expire(key, TIMELINE_TTL_SECONDS)
+        pipe.execute()
+
+    def range(self, user_id, max_score, count):
+        key = self._key(user_id)
+        rows = self.client.zrevrangebyscore(key, max_score, '(0', start=0, num=count, withscores=True)
+        self.client.expire(key, TIMELINE_TTL_SECONDS)
+        return [(int(member), int(score)) for member, score in rows]
+
+    def size(self, user_id):
+        return self.client.zcount(self._key(user_id), '(0', '+inf')
+
+    def invalidate(self, user_id):
+        self.client.delete(self._key(user_id))
+
+
+class LocMemTimelineStore:
+    """
+    RedisTimelineStore'un process içi karşılığı. Worker'lar arasında
+    paylaşılmadığı için get_timeline_store() tarafından döndürülmez;
+    testlerde Redis yerine kullanılır.
+    """
+
+    def __init__(self):
+        self._timelines = {}
+        self._lock = threading.Lock()
+
+    def exists(self, user_id):
+        return user_id in self._timelines
+
+    def push(self, user_ids, post_id, score):
+        with self._lock:
+            for user_id in user_ids:
+                timeline = self._timelines.get(user_id)
+                if timeline is None:
+                    continue
+                timeline[post_id] = score
+                if len(timeline) > TIMELINE_CAPACITY:
+                    oldest = min(timeline, key=lambda pid: (timeline[pid], pid))
+                    del timeline[oldest]
+
+    def replace(self, user_id, entries):
+        entries = sorted(entries, key=lambda entry: (entry[1], entry[0]), reverse=True)
+        with self._lock:
+            self._timelines[user_id] = dict(entries[:TIMELINE_CAPACITY])
+
+    def range(self, user_id, max_score, count):
+        with self._lock:
+            timeline = dict(self._timelines.get(user_id, {}))
+        rows = sorted(
+            ((post_id, score) for post_id, score in timeline.items() if score <= max_score),
+            key=lambda entry: (entry[1], entry[0]),
+            reverse=True,
+        )
+        return rows[:count]
+
+    def size(self, user_id):
+        with self._lock:
+            return len(self._timelines.get(user_id, {}))
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._timelines.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._timelines.clear()
+
+
+def get_timeline_store():
+    """Redis yoksa None; akış veritabanından okunur"""
+    client = get_redis_connection()
+    if client is not None:
+        return RedisTimelineStore(client)
+    return None
+
+
+def fan_out_post(post):
+    """Yeni genel gönderiyi yazarın ve takipçilerinin timeline'ına ekler"""
+    if post.group_id is not None:
+        return
+    store = get_timeline_store()
+    if store is None:
+        return
+    try:
+        follower_ids = list(
+            Follow.objects.filter(to_customuser_id=post.author_id)
+            .values_list('from_customuser_id', flat=True)[:FANOUT_FOLLOWER_LIMIT + 1]
+        )
+        if len(follower_ids) > FANOUT_FOLLOWER_LIMIT:
+            # Büyük hesaplar okuma sırasında birleştirilir
+            follower_ids = []
+        store.push(follower_ids + [post.author_id], post.id, post_score(post.created_at))
+    except Exception as e:
+        logger.error(f"Timeline fan-out hatası - Post {post.id}: {e}")
+
+
+def invalidate_timeline(user_id):
+    """Takip listesi değiştiğinde timeline'ı düşürür; ilk okumada yeniden kurulur"""
+    store = get_timeline_store()
+    if store is None:
+        return
+    try:
+        store.invalidate(user_id)
+    except Exception as e:
+        logger.error(f"Timeline invalidation hatası - User {user_id}: {e}")
+
+
+def _read_from_db(author_ids, cursor, limit):
+    """Fan-out-on-read: verilen yazarların gönderilerini keyset ile okur"""
+    queryset = Post.objects.filter(author_id__in=author_ids, group__isnull=True)
+    if cursor is not None:
+        queryset = queryset.filter(keyset_before(cursor, 'created_at'))
+    rows = queryset.order_by('-created_at', '-id').values_list('id', 'created_at')[:limit]
+    return [(post_id, post_score(created_at)) for post_id, created_at in rows]
+
+
+def _read_from_store(store, user, fanout_author_ids, cursor, limit):
+    if not store.exists(user.id):
+        store.replace(user.id, _read_from_db(fanout_author_ids, None, TIMELINE_CAPACITY))
+
+    if cursor is None:
+        rows = store.range(user.id, float('inf'), limit)
+    else:
+        cursor_key = (post_score(cursor[0]), cursor[1])
+        rows = store.range(user.id, cursor_key[0], limit + CURSOR_SLACK)
+        rows = [(post_id, score) for post_id, score in rows if (score, post_id) < cursor_key][:limit]
+
+    # Dolu timeline'ın sonuna gelindiyse daha eski gönderiler veritabanından devam eder
+    if len(rows) < limit and store.size(user.id) >= TIMELINE_CAPACITY:
+        if rows:
+            last_id, last_score = rows[-1]
+            cursor = (score_to_datetime(last_score), last_id)
+        rows += _read_from_db(fanout_author_ids, cursor, limit - len(rows))
+    return rows
+
+
+def get_following_page(user, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Takip edilen kullanıcıların (ve kendi) genel gönderilerinden bir sayfa döndürür.
+
+    Returns:
+        (posts, next_cursor, has_more)
+    """
+    limit = page_size + 1
+    followees = user.following.annotate(
+        followers_total=followers_count_expression()
+    ).values_list('id', 'followers_total')
+
+    fanout_author_ids = [user.id]
+    pull_author_ids = []
+    for author_id, followers_total in followees:
+        if followers_total > FANOUT_FOLLOWER_LIMIT:
+            pull_author_ids.append(author_id)
+        else:
+            fanout_author_ids.append(author_id)
+
+    entries = []
+    store = get_timeline_store()
+    if store is None:
+        pull_author_ids += fanout_author_ids
+    else:
+        try:
+            entries = _read_from_store(store, user, fanout_author_ids, cursor, limit)
+        except Exception as e:
+            logger.error(f"Timeline store okunamadı, veritabanına düşülüyor - User {user.id}: {e}")
+            pull_author_ids += fanout_author_ids
+
+    if pull_author_ids:
+        entries += _read_from_db(pull_author_ids, cursor, limit)
+
+    entries = sorted(set(entries), key=lambda entry: (entry[1], entry[0]), reverse=True)[:limit]
+    has_more = len(entries) > page_size
+    entries = entries[:page_size]
+
+    post_ids = [post_id for post_id, _ in entries]
+    posts_by_id = {
+        post.id: post
+        for post in feed_queryset(user, Post.objects.filter(id__in=post_ids))
+    }
+    posts = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+
+    next_cursor = None
+    if has_more and entries:
+        last_id, last_score = entries[-1]
+        next_cursor = encode_cursor(score_to_datetime(last_score), last_id)
+    return posts, next_cursor, has_more
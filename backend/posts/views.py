@@ -5,12 +5,14 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from .models import Post, PostLike, PostComment
 from .serializers import PostSerializer, PostCommentSerializer
+from .feed import feed_queryset
+from .timeline import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, fan_out_post, get_following_page
+from core_api.pagination import decode_cursor, parse_page_size
 from groups.models import Group
 from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.parsers import MultiPartParser, FormParser
 # from users.services.supabase_service import SupabaseStorage  # Removed - Supabase disabled
-from django.db.models import Q
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,6 +29,9 @@ class GeneralPostListCreateView(generics.ListCreateAPIView):
         context['request'] = self.request
         return context
 
+    def get_queryset(self):
+        return feed_queryset(self.request.user, super().get_queryset())
+
     def perform_create(self, serializer):
         # Kullanıcı authentication kontrolü
         logger.info(f"perform_create çağrıldı - User: {self.request.user}")
@@ -67,6 +72,9 @@ class GeneralPostListCreateView(generics.ListCreateAPIView):
             logger.error(f"Genel post oluşturma hatası: {str(e)}")
             raise serializers.ValidationError(f"Post oluşturulamadı: {str(e)}")
         
+        # Takipçilerin timeline'ına ekle
+        fan_out_post(post)
+        
         # Eğer resim varsa sadece Supabase'e yükle
         if image_file:
             try:
@@ -94,12 +102,9 @@ class GroupPostListCreateView(generics.ListCreateAPIView):
         group_pk = self.kwargs.get('group_pk')
         group = get_object_or_404(Group, pk=group_pk)
 
-        if self.request.user in group.members.all() or self.request.user == group.owner:
+        if self.request.user.id == group.owner_id or group.members.filter(pk=self.request.user.pk).exists():
             posts = Post.objects.filter(group=group).order_by('-created_at')
-            logger.info(f"Grup {group_pk} için {posts.count()} post bulundu")
-            for post in posts:
-                logger.info(f"Post {post.id}: Author={post.author.username}, Content={post.content[:50]}...")
-            return posts
+            return feed_queryset(self.request.user, posts)
         raise PermissionDenied("Bu grubun gönderilerini görüntüleme izniniz yok.")
 
     def perform_create(self, serializer):
@@ -288,30 +293,19 @@ class PostLikeToggleView(APIView):
                     from notifications.utils import send_notification_with_preferences
                     message_text = f"{request.user.get_full_name() or request.user.username} gönderinizi beğendi"
                     
-                    # Bildirimi arka planda gönder (asenkron)
-                    import threading
-                    def send_like_notification_async():
-                        try:
-                            send_notification_with_preferences(
-                                recipient_user=post.author,
-                                message=message_text,
-                                notification_type='like',
-                                sender_user=request.user,
-                                content_object=post,
-                                title=f"Gönderiniz Beğenildi - {request.user.get_full_name() or request.user.username}"
-                            )
-                        except Exception as e:
-                            # Logger'ı fonksiyon içinde tanımla
-                            import logging
-                            async_logger = logging.getLogger(__name__)
-                            async_logger.error(f"Beğeni bildirimi gönderilemedi: {e}")
-                    
-                    # Arka planda bildirim gönder
-                    threading.Thread(target=send_like_notification_async, daemon=True).start()
+                    # Push gönderimi fcm_service kuyruğunda yapılır, istek bloklanmaz
+                    send_notification_with_preferences(
+                        recipient_user=post.author,
+                        message=message_text,
+                        notification_type='like',
+                        sender_user=request.user,
+                        content_object=post,
+                        title=f"Gönderiniz Beğenildi - {request.user.get_full_name() or request.user.username}"
+                    )
                     
                 except Exception as e:
                     # Bildirim gönderme hatası kritik değil, sadece logla
-                    logger.error(f"Beğeni bildirimi thread başlatılamadı: {e}")
+                    logger.error(f"Beğeni bildirimi gönderilemedi: {e}")
         
         # Güncel beğeni sayısını al
         likes_count = PostLike.objects.filter(post=post).count()
@@ -382,37 +376,28 @@ class PostCommentDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # Takip edilen kullanıcıların postlarını getir (kendi postları dahil)
+# ?cursor=<created_at,id> ile keyset sayfalama yapılır
 class FollowingPostsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
+        cursor = request.query_params.get('cursor')
+        cursor = decode_cursor(cursor) if cursor else None
+        page_size = parse_page_size(request, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
         try:
-            user = request.user
-            
-            # Takip edilen kullanıcıları al
-            following_users = user.following.all()
-            following_user_ids = list(following_users.values_list('id', flat=True))
-            
-            # Kendi ID'sini de ekle
-            following_user_ids.append(user.id)
-            
-            logger.info(f"Following posts için kullanıcı ID'leri: {following_user_ids}")
-            
-            # Takip edilen kullanıcıların postlarını getir (grup postları hariç)
-            posts = Post.objects.filter(
-                Q(author_id__in=following_user_ids) & Q(group__isnull=True)
-            ).order_by('-created_at')
-            
-            logger.info(f"Following posts: {posts.count()} post bulundu")
-            
-            # Serialize et
+            posts, next_cursor, has_more = get_following_page(request.user, cursor, page_size)
             serializer = PostSerializer(posts, many=True, context={'request': request})
             
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response({
+                'results': serializer.data,
+                'next_cursor': next_cursor,
+                'has_more': has_more,
+            }, status=status.HTTP_200_OK)
             
         except Exception as e:
             logger.error(f"Following posts hatası: {str(e)}")
             return Response(
                 {'error': 'Takip edilen postlar alınamadı'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
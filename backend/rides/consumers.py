@@ -0,0 +1,159 @@
+import json
+import logging
+import time
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from core_api.redis_client import run_store
+from . import live_location, nearby_riders, tracks
+from .geo import is_valid_coordinate
+from .live_location import RiderPosition
+
+logger = logging.getLogger(__name__)
+
+
+def _optional_float(data, key):
+    value = data.get(key)
+    return None if value is None else float(value)
+
+
+class LocationConsumer(AsyncWebsocketConsumer):
+    """
+    ws/location/<ride|group>/<id>/
+
+    Sürücüler {"type": "position", "latitude": .., "longitude": .., "speed": ..,
+    "heading": .., "accuracy": ..} gönderir; izleyiciler bağlantıda tam bir
+    'snapshot', sonra her tick'te sadece değişen sürücüleri içeren 'positions'
+    mesajları alır. {"type": "stop"} paylaşımı durdurur.
+    """
+
+    async def connect(self):
+        self.scope_type = self.scope['url_route']['kwargs']['scope_type']
+        self.scope_id = int(self.scope['url_route']['kwargs']['scope_id'])
+        self.channel_key = live_location.channel_key(self.scope_type, self.scope_id)
+        self.user = self.scope.get('user')
+        self.sharing = False
+        self.last_breadcrumb = None
+        self.subscribed = False
+        # Yolculuk kanallarında tam çözünürlüklü iz parça parça RideTrack'e yazılır
+        self.track_buffer = []
+        self.track_flushed_at = time.monotonic()
+
+        if self.user is None or not self.user.is_authenticated:
+            logger.warning(f"Konum kanalı reddedildi: kimlik doğrulanmamış - {self.channel_key}")
+            await self.close(code=4003)
+            return
+
+        allowed = await database_sync_to_async(live_location.can_access_channel)(
+            self.user, self.scope_type, self.scope_id
+        )
+        if not allowed:
+            logger.warning(f"Konum kanalı reddedildi: User {self.user.id} - {self.channel_key}")
+            await self.close(code=4003)
+            return
+
+        self.store = live_location.get_position_store()
+        self.rider_grid = nearby_riders.get_rider_grid()
+        await self.accept()
+
+        positions = await run_store(self.store, 'snapshot', self.channel_key)
+        await self.send(text_data=json.dumps({
+            'type': 'snapshot',
+            'positions': [position.to_dict() for position in positions],
+        }))
+        live_location.subscribe(self.channel_key, self, self.store)
+        self.subscribed = True
+        logger.info(f"📍 Konum kanalına bağlanıldı: User {self.user.id} - {self.channel_key}")
+
+    async def disconnect(self, close_code):
+        if not getattr(self, 'subscribed', False):
+            return
+        live_location.unsubscribe(self.channel_key, self)
+        if self.sharing:
+            await self._stop_sharing()
+        else:
+            await self._flush_track()
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = json.loads(text_data or '{}')
+            message_type = data.get('type', 'position')
+            if message_type == 'position':
+                await self._update_position(data)
+            elif message_type == 'stop':
+                await self._stop_sharing()
+            else:
+                await self._send_error(f"Bilinmeyen mesaj türü: {message_type}")
+        except (ValueError, TypeError, KeyError):
+            await self._send_error('Geçersiz konum verisi.')
+        except Exception as e:
+            logger.error(f"Konum güncelleme hatası - User {self.user.id}, {self.channel_key}: {e}")
+            await self._send_error('Konum güncellenemedi.')
+
+    async def _update_position(self, data):
+        latitude = float(data['latitude'])
+        longitude = float(data['longitude'])
+        if not is_valid_coordinate(latitude, longitude):
+            raise ValueError('coordinate out of range')
+
+        position = RiderPosition(
+            self.user.id,
+            latitude,
+            longitude,
+            speed=_optional_float(data, 'speed'),
+            heading=_optional_float(data, 'heading'),
+            accuracy=_optional_float(data, 'accuracy'),
+        )
+        await run_store(self.store, 'update', self.channel_key, position)
+        self.sharing = True
+        await self._update_rider_grid(
+            nearby_riders.RiderEntry(self.user.id, latitude, longitude, self.scope_type, self.scope_id)
+        )
+
+        if live_location.should_persist_breadcrumb(self.last_breadcrumb, position):
+            await database_sync_to_async(live_location.persist_breadcrumb)(
+                self.user.id, self.scope_type, self.scope_id, position
+            )
+            self.last_breadcrumb = position
+
+        if self.scope_type == 'ride':
+            self.track_buffer.append((
+                int(position.updated_at * 1000), position.latitude, position.longitude,
+                position.speed, position.heading,
+            ))
+            if (len(self.track_buffer) >= tracks.TRACK_CHUNK_POINTS
+                    or time.monotonic() - self.track_flushed_at >= tracks.TRACK_FLUSH_SECONDS):
+                await self._flush_track()
+
+    async def _flush_track(self):
+        points, self.track_buffer = self.track_buffer, []
+        self.track_flushed_at = time.monotonic()
+        if points:
+            try:
+                await database_sync_to_async(tracks.append_points)(self.scope_id, self.user.id, points)
+            except Exception as e:
+                logger.error(f"İz parçası yazılamadı - User {self.user.id}, {self.channel_key}: {e}")
+
+    async def _stop_sharing(self):
+        self.sharing = False
+        self.last_breadcrumb = None
+        await self._flush_track()
+        await run_store(self.store, 'remove', self.channel_key, self.user.id)
+        await self._update_rider_grid(None)
+        await database_sync_to_async(live_location.deactivate_shares)(
+            self.user.id, self.scope_type, self.scope_id
+        )
+
+    async def _update_rider_grid(self, entry):
+        """Yakındaki sürücüler grid'i; hata konum paylaşımını engellemez"""
+        try:
+            if entry is None:
+                await run_store(self.rider_grid, 'remove', self.user.id)
+            else:
+                await run_store(self.rider_grid, 'update', entry)
+        except Exception as e:
+            logger.error(f"Yakındaki sürücüler grid'i güncellenemedi - User {self.user.id}: {e}")
+
+    async def _send_error(self, message):
+        await self.send(text_data=json.dumps({'type': 'error', 'message': message}))
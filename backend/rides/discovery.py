@@ -0,0 +1,81 @@
+"""
+Konuma göre yolculuk keşfi
+
+?near=lat,lng&radius_km= filtresi önce indexli start_lat/start_lng
+kolonlarında SQL bounding-box ile aday kümeyi daraltır, ardından adaylar
+tam haversine mesafesiyle (NumPy, tek geçiş) elenir ve mesafeye göre
+sıralanır. PostgreSQL ve SQLite'ta aynı şekilde çalışır.
+"""
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .geo import bounding_box, coordinate_pair, haversine_km_array
+
+DEFAULT_NEAR_RADIUS_KM = 20
+MAX_NEAR_RADIUS_KM = 500
+
+
+def parse_near(params, default_radius_km=DEFAULT_NEAR_RADIUS_KM, max_radius_km=MAX_NEAR_RADIUS_KM):
+    """
+    near ve radius_km query parametrelerini ayrıştırır.
+
+    Returns:
+        (lat, lng, radius_km) veya near verilmemişse None
+    """
+    near = params.get('near')
+    if not near:
+        return None
+    latitude, longitude = coordinate_pair(near.split(','))
+    if latitude is None or near.count(',') != 1:
+        raise ValidationError({'near': 'near "lat,lng" formatında geçerli bir koordinat olmalıdır.'})
+    try:
+        radius_km = float(params.get('radius_km', default_radius_km))
+    except ValueError:
+        radius_km = -1
+    if not 0 < radius_km <= max_radius_km:
+        raise ValidationError({'radius_km': f'radius_km 0 ile {max_radius_km} arasında olmalıdır.'})
+    return latitude, longitude, radius_km
+
+
+def parse_datetime_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({name: f'{name} ISO 8601 formatında bir tarih olmalıdır.'})
+    return parsed
+
+
+def bbox_q(latitude, longitude, radius_km, lat_field='start_lat', lng_field='start_lng'):
+    """Bounding-box ön filtresi"""
+    min_lat, max_lat, lng_ranges = bounding_box(latitude, longitude, radius_km)
+    lng_q = Q()
+    for min_lng, max_lng in lng_ranges:
+        lng_q |= Q(**{f'{lng_field}__gte': min_lng, f'{lng_field}__lte': max_lng})
+    return Q(**{f'{lat_field}__gte': min_lat, f'{lat_field}__lte': max_lat}) & lng_q
+
+
+def within_radius(objects, latitude, longitude, radius_km, lat_attr='start_lat', lng_attr='start_lng'):
+    """
+    Adayları tam mesafeyle eler; her nesneye distance_from_km yazılır.
+
+    Returns:
+        Mesafeye göre sıralı liste
+    """
+    objects = list(objects)
+    if not objects:
+        return []
+    distances = haversine_km_array(
+        latitude, longitude,
+        [getattr(obj, lat_attr) for obj in objects],
+        [getattr(obj, lng_attr) for obj in objects],
+    )
+    nearby = []
+    for obj, distance in zip(objects, distances.tolist()):
+        if distance <= radius_km:
+            obj.distance_from_km = round(distance, 3)
+            nearby.append(obj)
+    nearby.sort(key=lambda obj: obj.distance_from_km)
+    return nearby
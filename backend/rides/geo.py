@@ -0,0 +1,119 @@
+"""
+Coğrafi yardımcı fonksiyonlar
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+# Haversine ile aynı yarıçap; kutu daireden küçük kalmasın
+KM_PER_DEGREE_LAT = 2 * math.pi * EARTH_RADIUS_KM / 360
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """İki nokta arasındaki büyük daire mesafesi (km)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_km_array(lat, lng, lats, lngs):
+    """Bir noktadan nokta dizisine mesafeler (km), vektörel"""
+    phi = math.radians(lat)
+    phis = np.radians(np.asarray(lats, dtype=float))
+    d_lambda = np.radians(np.asarray(lngs, dtype=float) - lng)
+    a = np.sin((phis - phi) / 2) ** 2 + math.cos(phi) * np.cos(phis) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def is_valid_coordinate(latitude, longitude):
+    return -90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0
+
+
+def coordinate_pair(value):
+    """[lat, lng] listesini (lat, lng) float çiftine çevirir; geçersizse (None, None)"""
+    try:
+        latitude, longitude = float(value[0]), float(value[1])
+    except (TypeError, ValueError, IndexError, KeyError):
+        return None, None
+    if not is_valid_coordinate(latitude, longitude):
+        return None, None
+    return latitude, longitude
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Noktanın etrafındaki radius_km yarıçaplı dairenin bounding box'ı.
+
+    Returns:
+        (min_lat, max_lat, lng_ranges): 180. meridyeni geçen kutularda
+        lng_ranges iki aralık içerir; kutu bir kutbu içeriyorsa tüm boylamlar.
+    """
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = latitude - d_lat, latitude + d_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), [(-180.0, 180.0)]
+
+    # Boylam açıklığı kutunun kutba en yakın kenarında en geniştir
+    widest_lat = max(abs(min_lat), abs(max_lat))
+    d_lng = radius_km / (KM_PER_DEGREE_LAT * math.cos(math.radians(widest_lat)))
+    if d_lng >= 180:
+        return min_lat, max_lat, [(-180.0, 180.0)]
+    min_lng, max_lng = longitude - d_lng, longitude + d_lng
+    if min_lng < -180:
+        return min_lat, max_lat, [(min_lng + 360, 180.0), (-180.0, max_lng)]
+    if max_lng > 180:
+        return min_lat, max_lat, [(min_lng, 180.0), (-180.0, max_lng - 360)]
+    return min_lat, max_lat, [(min_lng, max_lng)]
+
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(latitude, longitude, precision):
+    """Standart base32 geohash"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        target, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if target >= middle:
+            value |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """Geohash hücresinin (yükseklik, genişlik) derece cinsinden boyutu"""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def geohash_cells_for_radius(latitude, longitude, radius_km, precision):
+    """Dairenin bounding box'ını kaplayan geohash hücreleri"""
+    cell_height, cell_width = geohash_cell_size(precision)
+    min_lat, max_lat, lng_ranges = bounding_box(latitude, longitude, radius_km)
+    cells = set()
+    lat_start = math.floor((min_lat + 90) / cell_height)
+    lat_end = math.floor((min(max_lat, 89.999999) + 90) / cell_height)
+    for min_lng, max_lng in lng_ranges:
+        lng_start = math.floor((min_lng + 180) / cell_width)
+        lng_end = math.floor((min(max_lng, 179.999999) + 180) / cell_width)
+        for lat_index in range(lat_start, lat_end + 1):
+            cell_lat = -90 + (lat_index + 0.5) * cell_height
+            for lng_index in range(lng_start, lng_end + 1):
+                cells.add(geohash_encode(cell_lat, -180 + (lng_index + 0.5) * cell_width, precision))
+    return cells
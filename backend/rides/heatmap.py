@@ -0,0 +1,294 @@
+"""
+Popüler rotalar ısı haritası
+
+Tamamlanmış herkese açık yolculukların ve herkese açık rota şablonlarının
+polyline'ları çevrimdışı bir işle (build_route_heatmap komutu) Web Mercator
+karolarına rasterize edilir. Her karo TILE_CELLS x TILE_CELLS hücrelik bir
+sayaç dizisidir; hücre değeri o hücreden geçen rota sayısıdır (bir rota bir
+hücreyi en fazla bir kez sayar).
+
+Rasterizasyon tamamen NumPy ile yapılır: polyline en yüksek zoom'un hücre
+uzayına projekte edilir, segmentler yarım hücre aralıklarla örneklenir ve
+düşük zoom'ların hücreleri bit kaydırmayla türetilir. Her çalıştırma sadece
+heatmap_indexed_at'i boş olan yolculukları ve şablonları işler ve sayaçları
+mevcut karoların üzerine ekler; geçmiş hiçbir zaman yeniden işlenmez. Sonradan
+düzenlenen veya gizlenen şablonlar (ve yolculuklar) ancak --rebuild ile
+yansır.
+
+Karolar cache'lenerek versiyonlu ETag ile sunulur; iş bir karoyu
+güncellediğinde o karonun cache'i silinir. Versiyonlar --rebuild sonrasında da
+artmaya devam eder.
+"""
+import logging
+import math
+import zlib
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import HeatmapTile, Ride, RouteTemplate
+from .polyline import decode_polyline
+
+logger = logging.getLogger(__name__)
+
+MIN_ZOOM = 5
+MAX_ZOOM = 13
+TILE_CELLS = 64
+HEATMAP_BATCH_RIDES = 200
+TILE_CACHE_SECONDS = 60 * 60
+# Karolar toplu işle güncellendiğinden istemci kısa süre yeniden sormaz
+CLIENT_CACHE_SECONDS = 5 * 60
+# Web Mercator'ın kapsadığı enlem sınırı
+MAX_MERCATOR_LAT = 85.05112878
+
+_CELL_BITS = 32
+_CELL_MASK = (1 << _CELL_BITS) - 1
+
+
+def _tile_cache_key(zoom, x, y):
+    return f'route_heatmap:{zoom}:{x}:{y}'
+
+
+def tile_etag(zoom, x, y, version):
+    return f'"heatmap-{zoom}-{x}-{y}-{version}"'
+
+
+def is_valid_tile(zoom, x, y):
+    return MIN_ZOOM <= zoom <= MAX_ZOOM and 0 <= x < (1 << zoom) and 0 <= y < (1 << zoom)
+
+
+def rasterize(coords):
+    """
+    [lat, lng] dizisinin MAX_ZOOM hücre uzayında geçtiği hücreler.
+
+    Returns:
+        (cx, cy): int64 dizileri (tekrar içerebilir)
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    scale = (1 << MAX_ZOOM) * TILE_CELLS
+    lat = np.radians(np.clip(coords[:, 0], -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    x = (coords[:, 1] + 180) / 360 * scale
+    y = (1 - np.arcsinh(np.tan(lat)) / np.pi) / 2 * scale
+
+    if x.size > 1:
+        dx, dy = np.diff(x), np.diff(y)
+        # Segment başına yarım hücre aralıklı örnek; 180. meridyeni geçen
+        # segmentler dünyanın öbür ucuna çizilmesin diye örneklenmez
+        steps = np.maximum(np.ceil(np.hypot(dx, dy) * 2), 1).astype(np.int64)
+        steps[np.abs(dx) > scale / 2] = 1
+        segment = np.repeat(np.arange(dx.size), steps)
+        offsets = np.arange(segment.size) - np.repeat(np.cumsum(steps) - steps, steps)
+        t = offsets / steps[segment]
+        x = np.append(x[segment] + dx[segment] * t, x[-1])
+        y = np.append(y[segment] + dy[segment] * t, y[-1])
+
+    cx = np.clip(np.floor(x), 0, scale - 1).astype(np.int64)
+    cy = np.clip(np.floor(y), 0, scale - 1).astype(np.int64)
+    return cx, cy
+
+
+def ride_cells(coords):
+    """Yolculuğun her zoom'da geçtiği benzersiz hücre anahtarları {zoom: int64 dizisi}"""
+    cx, cy = rasterize(coords)
+    cells = {}
+    for zoom in range(MIN_ZOOM, MAX_ZOOM + 1):
+        shift = MAX_ZOOM - zoom
+        cells[zoom] = np.unique(((cx >> shift) << _CELL_BITS) | (cy >> shift))
+    return cells
+
+
+def _decode_counts(data):
+    return np.frombuffer(zlib.decompress(bytes(data)), dtype='<u4').copy()
+
+
+def _encode_counts(counts):
+    return zlib.compress(counts.astype('<u4').tobytes())
+
+
+def _tile_increments(keys, increments):
+    """Hücre artışlarını karolara böler: {(x, y): (hücre indexleri, artışlar)}"""
+    cell_x, cell_y = keys >> _CELL_BITS, keys & _CELL_MASK
+    tile_x, tile_y = cell_x // TILE_CELLS, cell_y // TILE_CELLS
+    local = (cell_y % TILE_CELLS) * TILE_CELLS + cell_x % TILE_CELLS
+
+    tile_keys = (tile_x << _CELL_BITS) | tile_y
+    order = np.argsort(tile_keys, kind='stable')
+    unique, starts = np.unique(tile_keys[order], return_index=True)
+    tiles = {}
+    for tile_key, indices in zip(unique.tolist(), np.split(order, starts[1:])):
+        tiles[(tile_key >> _CELL_BITS, tile_key & _CELL_MASK)] = (local[indices], increments[indices])
+    return tiles
+
+
+def _apply_increments(zoom, tiles):
+    """Artışları mevcut karolara ekler; güncellenen karo koordinatlarını döndürür"""
+    xs = {x for x, _ in tiles}
+    ys = {y for _, y in tiles}
+    existing = {
+        (tile.x, tile.y): tile
+        for tile in HeatmapTile.objects.select_for_update().filter(zoom=zoom, x__in=xs, y__in=ys)
+        if (tile.x, tile.y) in tiles
+    }
+
+    created, updated = [], []
+    for (x, y), (local, increments) in tiles.items():
+        tile = existing.get((x, y))
+        if tile is None:
+            counts = np.zeros(TILE_CELLS * TILE_CELLS, dtype=np.uint32)
+        else:
+            counts = _decode_counts(tile.counts)
+        np.add.at(counts, local, increments.astype(np.uint32))
+
+        if tile is None:
+            created.append(HeatmapTile(
+                zoom=zoom, x=x, y=y, counts=_encode_counts(counts), max_count=int(counts.max()),
+            ))
+        else:
+            tile.counts = _encode_counts(counts)
+            tile.max_count = int(counts.max())
+            tile.version += 1
+            tile.updated_at = timezone.now()
+            updated.append(tile)
+
+    HeatmapTile.objects.bulk_create(created)
+    HeatmapTile.objects.bulk_update(updated, ['counts', 'max_count', 'version', 'updated_at'])
+    return list(tiles)
+
+
+def pending_rides():
+    """Isı haritasına henüz eklenmemiş tamamlanmış yolculuklar"""
+    return Ride.objects.filter(completed_at__isnull=False, heatmap_indexed_at__isnull=True)
+
+
+def pending_templates():
+    """Isı haritasına henüz eklenmemiş rota şablonları"""
+    return RouteTemplate.objects.filter(heatmap_indexed_at__isnull=True)
+
+
+def _aggregate(model, routes, is_public):
+    """
+    Rotaları ısı haritasına ekler ve işaretler (tek transaction).
+
+    Sadece is_public(rota) doğru olan ve polyline'ı olan rotalar sayılır;
+    diğerleri de tekrar taranmasın diye işaretlenir.
+
+    Returns:
+        int: güncellenen karo sayısı
+    """
+    per_zoom = {zoom: [] for zoom in range(MIN_ZOOM, MAX_ZOOM + 1)}
+    for route in routes:
+        if not is_public(route) or not route.route_polyline:
+            continue
+        try:
+            coords = decode_polyline(route.route_polyline)
+        except ValueError as e:
+            logger.warning(f"Isı haritası: polyline çözülemedi - {model.__name__} {route.id}: {e}")
+            continue
+        if not len(coords):
+            continue
+        for zoom, keys in ride_cells(coords).items():
+            per_zoom[zoom].append(keys)
+
+    touched = []
+    with transaction.atomic():
+        for zoom, parts in per_zoom.items():
+            if not parts:
+                continue
+            keys, increments = np.unique(np.concatenate(parts), return_counts=True)
+            touched += [(zoom, x, y) for x, y in _apply_increments(zoom, _tile_increments(keys, increments))]
+        model.objects.filter(pk__in=[route.pk for route in routes]).update(heatmap_indexed_at=timezone.now())
+
+    cache.delete_many([_tile_cache_key(*tile) for tile in touched])
+    return len(touched)
+
+
+def aggregate_rides(rides):
+    """Herkese açık yolculukları ısı haritasına ekler; güncellenen karo sayısı"""
+    return _aggregate(Ride, rides, lambda ride: ride.privacy_level == 'public')
+
+
+def aggregate_templates(templates):
+    """Herkese açık rota şablonlarını ısı haritasına ekler; güncellenen karo sayısı"""
+    return _aggregate(RouteTemplate, templates, lambda template: template.is_public)
+
+
+def update_heatmap(batch_size=HEATMAP_BATCH_RIDES):
+    """
+    Bekleyen tüm yolculukları ve şablonları parça parça ısı haritasına ekler.
+
+    Returns:
+        (işlenen rota sayısı, güncellenen karo sayısı)
+    """
+    sources = (
+        (pending_rides, aggregate_rides, ('id', 'route_polyline', 'privacy_level')),
+        (pending_templates, aggregate_templates, ('id', 'route_polyline', 'is_public')),
+    )
+    route_count = tile_count = 0
+    for pending, aggregate, fields in sources:
+        while True:
+            routes = list(pending().order_by('pk').only(*fields)[:batch_size])
+            if not routes:
+                break
+            tile_count += aggregate(routes)
+            route_count += len(routes)
+    if route_count:
+        logger.info(f"🔥 Isı haritası güncellendi: {route_count} rota, {tile_count} karo")
+    return route_count, tile_count
+
+
+def reset_heatmap():
+    """
+    Tüm karoları sıfırlar ve yolculukları/şablonları yeniden işlenecek şekilde işaretler.
+
+    Karolar silinmez; sayaçları boşaltılıp versiyonları artırılır. Yeni karolar
+    version=1'den başladığından silmek, eski ETag'i tutan istemcilere farklı
+    içerik için 304 döndürürdü.
+    """
+    keys = [_tile_cache_key(*tile) for tile in HeatmapTile.objects.values_list('zoom', 'x', 'y')]
+    with transaction.atomic():
+        HeatmapTile.objects.update(
+            counts=_encode_counts(np.zeros(TILE_CELLS * TILE_CELLS, dtype=np.uint32)),
+            max_count=0,
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+        )
+        Ride.objects.filter(heatmap_indexed_at__isnull=False).update(heatmap_indexed_at=None)
+        RouteTemplate.objects.filter(heatmap_indexed_at__isnull=False).update(heatmap_indexed_at=None)
+    cache.delete_many(keys)
+
+
+def get_tile(zoom, x, y):
+    """
+    Karonun (etag, payload) çifti. payload'da sadece dolu hücreler
+    [index, count] olarak yer alır; index = satır * TILE_CELLS + sütun.
+    """
+    key = _tile_cache_key(zoom, x, y)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    tile = HeatmapTile.objects.filter(zoom=zoom, x=x, y=y).first()
+    payload = {'zoom': zoom, 'x': x, 'y': y, 'size': TILE_CELLS, 'max_count': 0, 'cells': []}
+    version = 0
+    if tile is not None:
+        counts = _decode_counts(tile.counts)
+        indices = np.flatnonzero(counts)
+        payload['max_count'] = tile.max_count
+        payload['cells'] = np.column_stack((indices, counts[indices])).tolist()
+        version = tile.version
+
+    result = (tile_etag(zoom, x, y, version), payload)
+    cache.set(key, result, TILE_CACHE_SECONDS)
+    return result
+
+
+def tile_for_point(latitude, longitude, zoom):
+    """Noktanın zoom seviyesindeki karo koordinatları"""
+    n = 1 << zoom
+    lat = math.radians(max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, latitude)))
+    x = int((longitude + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
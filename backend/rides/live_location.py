@@ -0,0 +1,299 @@
+"""
+Canlı konum paylaşımı servisi
+
+Her sürücünün son konumu kanal (ride_<id> / group_<id>) başına küçük bir
+store'da tutulur: Redis yapılandırılmışsa kanal başına bir hash (alan =
+user_id, değer = 36 byte'lık paketlenmiş konum), değilse process içi
+__slots__'lu nesnelerden oluşan bir sözlük. Konum güncellemeleri
+veritabanına her GPS tick'inde yazılmaz; izleyicilere sabit aralıklarla
+(SNAPSHOT_TICK_SECONDS) sadece değişen sürücüleri içeren birleştirilmiş bir
+snapshot gönderilir ve veritabanına sadece örneklenmiş iz noktaları
+(breadcrumb) kaydedilir.
+"""
+import asyncio
+import json
+import logging
+import math
+import struct
+import threading
+import time
+
+from django.db import transaction
+from django.db.models import Q
+
+from core_api.redis_client import get_redis_connection, redis_key, run_store
+from .geo import haversine_km
+
+logger = logging.getLogger(__name__)
+
+# İzleyicilere snapshot gönderme aralığı
+SNAPSHOT_TICK_SECONDS = 1.0
+# Bu süre boyunca güncellenmeyen konumlar snapshot'tan düşer
+POSITION_STALE_SECONDS = 120
+# Breadcrumb örnekleme: en geç bu aralıkla bir nokta kaydedilir...
+BREADCRUMB_INTERVAL_SECONDS = 15
+# ...veya sürücü bu mesafeden fazla ilerlediyse daha erken (ama bu aralıktan sık değil)
+BREADCRUMB_DISTANCE_METERS = 200
+BREADCRUMB_MIN_INTERVAL_SECONDS = 2
+
+CHANNEL_TYPES = ('ride', 'group')
+
+_PACK_FORMAT = '<ddfffd'
+
+
+def channel_key(scope_type, scope_id):
+    return f'{scope_type}_{scope_id}'
+
+
+def _optional(value):
+    return None if value is None or math.isnan(value) else round(value, 2)
+
+
+class RiderPosition:
+    """Bir sürücünün son konumu"""
+
+    __slots__ = ('user_id', 'latitude', 'longitude', 'speed', 'heading', 'accuracy', 'updated_at')
+
+    def __init__(self, user_id, latitude, longitude, speed=None, heading=None, accuracy=None, updated_at=None):
+        self.user_id = user_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.speed = speed
+        self.heading = heading
+        self.accuracy = accuracy
+        self.updated_at = time.time() if updated_at is None else updated_at
+
+    def pack(self):
+        nan = float('nan')
+        return struct.pack(
+            _PACK_FORMAT,
+            self.latitude,
+            self.longitude,
+            nan if self.speed is None else self.speed,
+            nan if self.heading is None else self.heading,
+            nan if self.accuracy is None else self.accuracy,
+            self.updated_at,
+        )
+
+    @classmethod
+    def unpack(cls, user_id, data):
+        latitude, longitude, speed, heading, accuracy, updated_at = struct.unpack(_PACK_FORMAT, data)
+        return cls(
+            user_id, latitude, longitude,
+            _optional(speed), _optional(heading), _optional(accuracy), updated_at,
+        )
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'speed': self.speed,
+            'heading': self.heading,
+            'accuracy': self.accuracy,
+            'updated_at': round(self.updated_at, 3),
+        }
+
+
+class LocMemPositionStore:
+    """Redis yokken kullanılan process içi konum store'u"""
+
+    blocking = False
+
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, position):
+        with self._lock:
+            self._channels.setdefault(key, {})[position.user_id] = position
+
+    def remove(self, key, user_id):
+        with self._lock:
+            positions = self._channels.get(key)
+            if positions is not None:
+                positions.pop(user_id, None)
+                if not positions:
+                    del self._channels[key]
+
+    def snapshot(self, key):
+        threshold = time.time() - POSITION_STALE_SECONDS
+        with self._lock:
+            positions = self._channels.get(key, {})
+            for user_id in [uid for uid, pos in positions.items() if pos.updated_at < threshold]:
+                del positions[user_id]
+            return list(positions.values())
+
+    def clear(self):
+        with self._lock:
+            self._channels.clear()
+
+
+class RedisPositionStore:
+    """Kanal başına bir Redis hash'i: user_id -> paketlenmiş konum"""
+
+    blocking = True
+
+    def __init__(self, client):
+        self.client = client
+
+    def _key(self, key):
+        return redis_key('live_location', key)
+
+    def update(self, key, position):
+        redis_hash = self._key(key)
+        pipe = self.client.pipeline()
+        pipe.hset(redis_hash, position.user_id, position.pack())
+        pipe.expire(redis_hash, POSITION_STALE_SECONDS)
+        pipe.execute()
+
+    def remove(self, key, user_id):
+        self.client.hdel(self._key(key), user_id)
+
+    def snapshot(self, key):
+        threshold = time.time() - POSITION_STALE_SECONDS
+        positions, stale = [], []
+        for user_id, data in self.client.hgetall(self._key(key)).items():
+            position = RiderPosition.unpack(int(user_id), data)
+            if position.updated_at < threshold:
+                stale.append(user_id)
+            else:
+                positions.append(position)
+        if stale:
+            self.client.hdel(self._key(key), *stale)
+        return positions
+
+
+_locmem_store = LocMemPositionStore()
+
+
+def get_position_store():
+    client = get_redis_connection()
+    if client is not None:
+        return RedisPositionStore(client)
+    return _locmem_store
+
+
+def can_access_channel(user, scope_type, scope_id):
+    """Kullanıcı yolculuğun sahibi/katılımcısı veya grubun sahibi/üyesi mi?"""
+    if scope_type == 'ride':
+        from .models import Ride
+        return Ride.objects.filter(Q(owner=user) | Q(participants=user), id=scope_id).exists()
+    if scope_type == 'group':
+        from groups.models import Group
+        return Group.objects.filter(Q(owner=user) | Q(members=user), id=scope_id).exists()
+    return False
+
+
+def should_persist_breadcrumb(last, position):
+    """Son kaydedilen noktaya göre yeni konumun kaydedilip kaydedilmeyeceği"""
+    if last is None:
+        return True
+    elapsed = position.updated_at - last.updated_at
+    if elapsed >= BREADCRUMB_INTERVAL_SECONDS:
+        return True
+    if elapsed < BREADCRUMB_MIN_INTERVAL_SECONDS:
+        return False
+    moved_m = haversine_km(last.latitude, last.longitude, position.latitude, position.longitude) * 1000
+    return moved_m >= BREADCRUMB_DISTANCE_METERS
+
+
+def persist_breadcrumb(user_id, scope_type, scope_id, position):
+    """
+    Örneklenmiş konumu LocationShare olarak kaydeder. Kullanıcının bu
+    kanaldaki önceki aktif kaydı pasifleştirilir; böylece active_shares
+    sürücü başına sadece son noktayı görür.
+    """
+    from .models import LocationShare
+
+    scope = {f'{scope_type}_id': scope_id}
+    with transaction.atomic():
+        LocationShare.objects.filter(user_id=user_id, is_active=True, **scope).update(is_active=False)
+        return LocationShare.objects.create(
+            user_id=user_id,
+            latitude=position.latitude,
+            longitude=position.longitude,
+            speed=position.speed,
+            heading=position.heading,
+            accuracy=position.accuracy,
+            share_type=scope_type,
+            **scope
+        )
+
+
+def deactivate_shares(user_id, scope_type, scope_id):
+    from .models import LocationShare
+
+    LocationShare.objects.filter(
+        user_id=user_id, is_active=True, **{f'{scope_type}_id': scope_id}
+    ).update(is_active=False)
+
+
+class SnapshotBroadcaster:
+    """
+    Bir kanalın bu process'teki izleyicilerine her tick'te tek bir store
+    okumasıyla, sadece değişen ve ayrılan sürücüleri içeren mesaj gönderir.
+    """
+
+    def __init__(self, key, store):
+        self.key = key
+        self.store = store
+        self.consumers = set()
+        self._sent = {}
+        self._task = None
+
+    def add(self, consumer):
+        self.consumers.add(consumer)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def discard(self, consumer):
+        self.consumers.discard(consumer)
+
+    async def _run(self):
+        try:
+            while self.consumers:
+                await asyncio.sleep(SNAPSHOT_TICK_SECONDS)
+                try:
+                    await self.tick()
+                except Exception as e:
+                    logger.error(f"Konum snapshot hatası - {self.key}: {e}")
+        finally:
+            if not self.consumers and _broadcasters.get(self.key) is self:
+                del _broadcasters[self.key]
+
+    async def tick(self):
+        positions = await run_store(self.store, 'snapshot', self.key)
+        current = {position.user_id: position.updated_at for position in positions}
+        changed = [
+            position.to_dict() for position in positions
+            if self._sent.get(position.user_id) != position.updated_at
+        ]
+        left = [user_id for user_id in self._sent if user_id not in current]
+        self._sent = current
+        if not changed and not left:
+            return
+
+        payload = json.dumps({'type': 'positions', 'positions': changed, 'left': left})
+        for consumer in list(self.consumers):
+            try:
+                await consumer.send(text_data=payload)
+            except Exception as e:
+                logger.warning(f"Konum snapshot gönderilemedi - {self.key}: {e}")
+                self.consumers.discard(consumer)
+
+
+_broadcasters = {}
+
+
+def subscribe(key, consumer, store):
+    broadcaster = _broadcasters.get(key)
+    if broadcaster is None:
+        broadcaster = _broadcasters[key] = SnapshotBroadcaster(key, store)
+    broadcaster.add(consumer)
+
+
+def unsubscribe(key, consumer):
+    broadcaster = _broadcasters.get(key)
+    if broadcaster is not None:
+        broadcaster.discard(consumer)
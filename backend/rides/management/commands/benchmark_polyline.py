@@ -0,0 +1,45 @@
+"""
+Polyline codec micro-benchmark'ı
+
+NumPy decoder'ını saf Python decoder ile rastgele yürüyüşle üretilmiş
+uzun bir rota üzerinde karşılaştırır:
+
+    python manage.py benchmark_polyline --points 10000 --repeat 20
+"""
+import timeit
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from rides.polyline import decode_polyline, decode_polyline_py, encode_polyline, route_metrics
+
+
+class Command(BaseCommand):
+    help = 'NumPy polyline codec\'ini saf Python decoder ile karşılaştırır'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=10000, help='Rotadaki nokta sayısı (varsayılan: 10000)')
+        parser.add_argument('--repeat', type=int, default=20, help='Ölçüm tekrar sayısı (varsayılan: 20)')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        steps = rng.normal(0, 0.0005, size=(options['points'], 2))
+        route = np.cumsum(steps, axis=0) + [40.99, 29.02]
+        encoded = encode_polyline(route)
+        repeat = options['repeat']
+
+        def measure(function):
+            return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+        results = {
+            'decode (numpy)': measure(lambda: decode_polyline(encoded)),
+            'decode (python)': measure(lambda: decode_polyline_py(encoded)),
+            'encode (numpy)': measure(lambda: encode_polyline(route)),
+            'metrics (numpy)': measure(lambda: route_metrics(decode_polyline(encoded))),
+        }
+
+        self.stdout.write(f"{options['points']} nokta, {len(encoded)} karakter, en iyi {repeat} ölçüm:")
+        for name, elapsed in results.items():
+            self.stdout.write(f"  {name:<18} {elapsed:8.2f} ms")
+        speedup = results['decode (python)'] / results['decode (numpy)']
+        self.stdout.write(self.style.SUCCESS(f"✅ NumPy decoder {speedup:.1f}x daha hızlı"))
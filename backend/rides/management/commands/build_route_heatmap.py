@@ -0,0 +1,52 @@
+"""
+Popüler rotalar ısı haritasını günceller (bkz. rides/heatmap.py)
+
+Varsayılan olarak sadece henüz eklenmemiş tamamlanmış yolculukları ve rota
+şablonlarını işler; periyodik (ör. cron ile saatlik) çalıştırılmak üzere
+tasarlanmıştır:
+
+    python manage.py build_route_heatmap
+    python manage.py build_route_heatmap --rebuild
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from rides.heatmap import HEATMAP_BATCH_RIDES, pending_rides, pending_templates, reset_heatmap, update_heatmap
+
+
+class Command(BaseCommand):
+    help = 'Tamamlanan yolculukları ve rota şablonlarını popüler rotalar ısı haritasına ekler'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=HEATMAP_BATCH_RIDES,
+            help=f'Tek transaction\'da işlenecek rota sayısı (varsayılan: {HEATMAP_BATCH_RIDES})',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Tüm karoları sıfırlayıp ısı haritasını baştan oluştur',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            self.stdout.write(self.style.ERROR('--batch-size pozitif olmalıdır.'))
+            return
+
+        if options['rebuild']:
+            self.stdout.write(self.style.WARNING('Isı haritası sıfırlanıyor...'))
+            reset_heatmap()
+
+        self.stdout.write(
+            f'🔥 Bekleyen yolculuk sayısı: {pending_rides().count()}, '
+            f'şablon sayısı: {pending_templates().count()}'
+        )
+        started = time.perf_counter()
+        route_count, tile_count = update_heatmap(options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {route_count} rota işlendi, {tile_count} karo güncellendi ({elapsed:.1f} sn).'
+        ))
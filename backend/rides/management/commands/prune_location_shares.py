@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+
+from rides.models import LOCATION_SHARE_TTL_MINUTES
+from rides.share_retention import (
+    DEFAULT_CHUNK_SIZE, DEFAULT_RETENTION_DAYS, deactivate_stale_shares, prune_shares,
+)
+
+
+class Command(BaseCommand):
+    help = 'TTL\'i dolan konum paylaşımlarını pasifleştirir, eski kayıtları parça parça siler/arşivler'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=DEFAULT_RETENTION_DAYS,
+            help=f'Pasif kayıtlar kaç gün saklansın (varsayılan: {DEFAULT_RETENTION_DAYS})',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Tek transaction\'da işlenecek satır sayısı (varsayılan: {DEFAULT_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Parçalar arasında beklenecek saniye',
+        )
+        parser.add_argument(
+            '--archive',
+            help='Silinen satırların ekleneceği .jsonl.gz dosyası',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Sadece etkilenecek satır sayılarını göster',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            self.stdout.write(self.style.ERROR('--chunk-size pozitif olmalıdır.'))
+            return
+
+        common = {
+            'chunk_size': options['chunk_size'],
+            'pause_seconds': options['pause'],
+            'dry_run': options['dry_run'],
+        }
+        self.stdout.write(f'🧹 Konum paylaşımları temizleniyor (TTL: {LOCATION_SHARE_TTL_MINUTES} dk)...')
+        deactivated = deactivate_stale_shares(**common)
+        deleted = prune_shares(
+            retention_days=options['retention_days'], archive_path=options['archive'], **common
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'DRY RUN: {deactivated} paylaşım pasifleştirilecek, {deleted} kayıt silinecekti.'
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {deactivated} paylaşım pasifleştirildi, {deleted} kayıt silindi.'
+        ))
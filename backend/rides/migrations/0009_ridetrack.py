@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0008_ride_additional_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RideTrack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('point_count', models.PositiveIntegerField(default=0, help_text='Toplam nokta sayısı')),
+                ('data', models.BinaryField(blank=True, default=b'', help_text='Tüm noktalar (paketlenmiş)')),
+                ('simplified_data', models.BinaryField(blank=True, default=b'', help_text='Sadeleştirilmiş noktalar (paketlenmiş)')),
+                ('simplified_point_count', models.PositiveIntegerField(default=0)),
+                ('simplify_tolerance_m', models.FloatField(blank=True, help_text='Sadeleştirme toleransı (metre)', null=True)),
+                ('started_at', models.DateTimeField(blank=True, help_text='İlk noktanın zamanı', null=True)),
+                ('ended_at', models.DateTimeField(blank=True, help_text='Son noktanın zamanı', null=True)),
+                ('is_finalized', models.BooleanField(default=False, help_text='Parçalar birleştirildi mi?')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ride', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tracks', to='rides.ride')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ride_tracks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Yolculuk İzi',
+                'verbose_name_plural': 'Yolculuk İzleri',
+                'unique_together': {('ride', 'user')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RideTrackChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('point_count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='rides.ridetrack')),
+            ],
+            options={
+                'ordering': ['sequence'],
+                'unique_together': {('track', 'sequence')},
+            },
+        ),
+    ]
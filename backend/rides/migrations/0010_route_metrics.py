@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:26
+
+from django.db import migrations, models
+
+
+def backfill_route_metrics(apps, schema_editor):
+    from rides.polyline import polyline_metrics
+
+    fields = ['distance_km', 'route_bbox', 'start_coordinates', 'end_coordinates']
+    for model_name in ('Ride', 'RouteTemplate'):
+        model = apps.get_model('rides', model_name)
+        updated = []
+        for instance in model.objects.exclude(route_polyline__isnull=True).exclude(route_polyline='').iterator():
+            try:
+                metrics = polyline_metrics(instance.route_polyline)
+            except ValueError:
+                continue
+            if metrics is None:
+                continue
+            instance.distance_km = metrics['distance_km']
+            instance.route_bbox = metrics['bbox']
+            instance.start_coordinates = metrics['start']
+            instance.end_coordinates = metrics['end']
+            updated.append(instance)
+        model.objects.bulk_update(updated, fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0009_ridetrack'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='route_bbox',
+            field=models.JSONField(blank=True, help_text="Rotanın bounding box'ı [min_lat, min_lng, max_lat, max_lng] (polyline'dan hesaplanır)", null=True),
+        ),
+        migrations.AddField(
+            model_name='routetemplate',
+            name='end_coordinates',
+            field=models.JSONField(blank=True, default=list, help_text='Bitiş koordinatları [lat, lng]'),
+        ),
+        migrations.AddField(
+            model_name='routetemplate',
+            name='route_bbox',
+            field=models.JSONField(blank=True, help_text='Bounding box [min_lat, min_lng, max_lat, max_lng]', null=True),
+        ),
+        migrations.AddField(
+            model_name='routetemplate',
+            name='start_coordinates',
+            field=models.JSONField(blank=True, default=list, help_text='Başlangıç koordinatları [lat, lng]'),
+        ),
+        migrations.RunPython(backfill_route_metrics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_start_point(apps, schema_editor):
+    from rides.geo import coordinate_pair
+
+    Ride = apps.get_model('rides', 'Ride')
+    updated = []
+    for ride in Ride.objects.only('id', 'start_coordinates').iterator():
+        ride.start_lat, ride.start_lng = coordinate_pair(ride.start_coordinates)
+        if ride.start_lat is not None:
+            updated.append(ride)
+    Ride.objects.bulk_update(updated, ['start_lat', 'start_lng'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0005_group_approval_system'),
+        ('rides', '0010_route_metrics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='start_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='start_lng',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(fields=['start_lat', 'start_lng'], name='ride_start_point_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(fields=['start_time'], name='ride_start_time_idx'),
+        ),
+        migrations.RunPython(backfill_start_point, migrations.RunPython.noop),
+    ]
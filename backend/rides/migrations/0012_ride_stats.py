@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0011_ride_start_point'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='avg_speed_kmh',
+            field=models.FloatField(blank=True, help_text='Ortalama hareket hızı (km/h).', null=True),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='max_speed_kmh',
+            field=models.FloatField(blank=True, help_text='Azami hız (km/h).', null=True),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='moving_time_minutes',
+            field=models.FloatField(blank=True, help_text='Hareket süresi (dakika).', null=True),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='night_riding_minutes',
+            field=models.FloatField(blank=True, help_text='Gece sürüş süresi (dakika).', null=True),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='recorded_distance_km',
+            field=models.FloatField(blank=True, help_text='Kaydedilen mesafe (km).', null=True),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='stats_point_count',
+            field=models.PositiveIntegerField(blank=True, help_text='İstatistiklerde kullanılan nokta sayısı.', null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0005_group_approval_system'),
+        ('rides', '0012_ride_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='locationshare',
+            index=models.Index(fields=['is_active', 'updated_at'], name='locshare_active_updated_idx'),
+        ),
+    ]
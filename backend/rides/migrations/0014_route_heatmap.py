@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0013_locationshare_liveness'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='heatmap_indexed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='HeatmapTile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('x', models.PositiveIntegerField()),
+                ('y', models.PositiveIntegerField()),
+                ('counts', models.BinaryField()),
+                ('max_count', models.PositiveIntegerField(default=0)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Isı Haritası Karosu',
+                'verbose_name_plural': 'Isı Haritası Karoları',
+                'unique_together': {('zoom', 'x', 'y')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_route_shapes(apps, schema_editor):
+    from rides.polyline import decode_polyline
+    from rides.route_similarity import route_shape
+
+    RouteTemplate = apps.get_model('rides', 'RouteTemplate')
+    updated = []
+    for template in RouteTemplate.objects.exclude(route_polyline='').iterator():
+        try:
+            template.shape_cell, template.shape_vector = route_shape(decode_polyline(template.route_polyline))
+        except ValueError:
+            continue
+        updated.append(template)
+    RouteTemplate.objects.bulk_update(updated, ['shape_cell', 'shape_vector'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0014_route_heatmap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routetemplate',
+            name='shape_cell',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='routetemplate',
+            name='shape_vector',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='routetemplate',
+            index=models.Index(fields=['shape_cell'], name='routetemplate_shape_cell_idx'),
+        ),
+        migrations.RunPython(backfill_route_shapes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0015_routetemplate_shape'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routetemplate',
+            name='heatmap_indexed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
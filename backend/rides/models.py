@@ -1,16 +1,71 @@
 # moto_app/backend/rides/models.py
 
+import logging
+from datetime import timedelta
+
 from django.db import models
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 # Eğer Django 3.1+ ve PostgreSQL kullanıyorsanız JSONField için import etmelisiniz.
 # Zaten kullanıyorsunuz, bu import'un ekli olması gerekiyor.
 # from django.contrib.postgres.fields import JSONField
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+class RouteMetricsMixin:
+    """
+    route_polyline değiştiğinde mesafe, tahmini süre, bounding box ve
+    başlangıç/bitiş koordinatlarını polyline'dan hesaplar (bkz. rides/polyline.py).
+    İstemcinin gönderdiği mesafe ve süre bu durumda kullanılmaz.
+    """
+    METRIC_FIELDS = ['distance_km', 'route_bbox', 'start_coordinates', 'end_coordinates', 'estimated_duration_minutes']
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_polyline = instance.__dict__.get('route_polyline')
+        return instance
+
+    def apply_route_metrics(self):
+        from .polyline import estimate_duration_minutes, polyline_metrics
+
+        try:
+            metrics = polyline_metrics(self.route_polyline)
+        except ValueError as e:
+            logger.warning(f"Rota polyline'ı çözülemedi - {self.__class__.__name__} {self.pk}: {e}")
+            return False
+        if metrics is None:
+            return False
+        self.distance_km = metrics['distance_km']
+        self.route_bbox = metrics['bbox']
+        self.start_coordinates = metrics['start']
+        self.end_coordinates = metrics['end']
+        self.estimated_duration_minutes = estimate_duration_minutes(metrics['distance_km'])
+        return True
+
+    def sync_derived_fields(self):
+        """Alt sınıflar için: türetilmiş kolonları günceller, değişen alan adlarını döndürür"""
+        return []
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        changed = []
+        polyline_changed = self.route_polyline != getattr(self, '_loaded_polyline', None)
+        if self.route_polyline and polyline_changed and (update_fields is None or 'route_polyline' in update_fields):
+            if self.apply_route_metrics():
+                changed += self.METRIC_FIELDS
+        changed += self.sync_derived_fields()
+        if update_fields is not None and changed:
+            kwargs['update_fields'] = set(update_fields) | set(changed)
+        super().save(*args, **kwargs)
+        self._loaded_polyline = self.route_polyline
+
 
 # Create your models here.
-class Ride(models.Model):
+class Ride(RouteMetricsMixin, models.Model):
     RIDE_TYPES = [
         ('casual', 'Günlük Sürüş'),
         ('touring', 'Tur Sürüşü'),
@@ -57,6 +112,14 @@ class Ride(models.Model):
         help_text="Bitiş koordinatları [lat, lng]",
         default=list
     )
+    route_bbox = models.JSONField(
+        blank=True,
+        null=True,
+        help_text="Rotanın bounding box'ı [min_lat, min_lng, max_lat, max_lng] (polyline'dan hesaplanır)"
+    )
+    # start_coordinates'tan türetilen indexli kolonlar (konuma göre arama için)
+    start_lat = models.FloatField(blank=True, null=True, editable=False)
+    start_lng = models.FloatField(blank=True, null=True, editable=False)
     
     # Zaman bilgileri
     start_time = models.DateTimeField(help_text="Yolculuğun başlangıç tarihi ve saati.")
@@ -72,6 +135,16 @@ class Ride(models.Model):
     privacy_level = models.CharField(max_length=20, choices=PRIVACY_LEVELS, default='public', help_text="Gizlilik seviyesi.")
     distance_km = models.FloatField(blank=True, null=True, help_text="Toplam mesafe (km).")
     estimated_duration_minutes = models.PositiveIntegerField(blank=True, null=True, help_text="Tahmini süre (dakika).")
+
+    # Kaydedilen noktalardan hesaplanan istatistikler (bkz. rides/ride_stats.py)
+    recorded_distance_km = models.FloatField(blank=True, null=True, help_text="Kaydedilen mesafe (km).")
+    moving_time_minutes = models.FloatField(blank=True, null=True, help_text="Hareket süresi (dakika).")
+    max_speed_kmh = models.FloatField(blank=True, null=True, help_text="Azami hız (km/h).")
+    avg_speed_kmh = models.FloatField(blank=True, null=True, help_text="Ortalama hareket hızı (km/h).")
+    night_riding_minutes = models.FloatField(blank=True, null=True, help_text="Gece sürüş süresi (dakika).")
+    stats_point_count = models.PositiveIntegerField(blank=True, null=True, help_text="İstatistiklerde kullanılan nokta sayısı.")
+    # Popüler rotalar ısı haritasına eklendiği an (bkz. rides/heatmap.py)
+    heatmap_indexed_at = models.DateTimeField(blank=True, null=True, editable=False)
     
     # Durum bilgileri
     is_active = models.BooleanField(default=True, help_text="Yolculuğun hala aktif olup olmadığı.")
@@ -86,10 +159,23 @@ class Ride(models.Model):
 
     class Meta:
         ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=['start_lat', 'start_lng'], name='ride_start_point_idx'),
+            models.Index(fields=['start_time'], name='ride_start_time_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def sync_derived_fields(self):
+        from .geo import coordinate_pair
+
+        start_point = coordinate_pair(self.start_coordinates)
+        if start_point == (self.start_lat, self.start_lng):
+            return []
+        self.start_lat, self.start_lng = start_point
+        return ['start_lat', 'start_lng']
+
 
 class RideRequest(models.Model):
     STATUS_CHOICES = [
@@ -129,6 +215,23 @@ class RouteFavorite(models.Model):
         return f"{self.user.username} - {self.ride.title}"
 
 
+# Bu süredir güncellenmeyen paylaşım, stop_sharing çağrılmamış olsa bile
+# (uygulama çöktü, telefon kapandı) aktif sayılmaz
+LOCATION_SHARE_TTL_MINUTES = getattr(settings, 'LOCATION_SHARE_TTL_MINUTES', 10)
+
+
+class LocationShareQuerySet(models.QuerySet):
+    def live(self, now=None):
+        """Aktif ve TTL içinde güncellenmiş paylaşımlar ((is_active, updated_at) index'i)"""
+        cutoff = (now or timezone.now()) - timedelta(minutes=LOCATION_SHARE_TTL_MINUTES)
+        return self.filter(is_active=True, updated_at__gte=cutoff)
+
+    def stale(self, now=None):
+        """is_active=True kalmış ama TTL'i dolmuş paylaşımlar"""
+        cutoff = (now or timezone.now()) - timedelta(minutes=LOCATION_SHARE_TTL_MINUTES)
+        return self.filter(is_active=True, updated_at__lt=cutoff)
+
+
 class LocationShare(models.Model):
     """Real-time konum paylaşımı"""
     SHARE_TYPES = [
@@ -154,8 +257,13 @@ class LocationShare(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = LocationShareQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_active', 'updated_at'], name='locshare_active_updated_idx'),
+        ]
         verbose_name = "Konum Paylaşımı"
         verbose_name_plural = "Konum Paylaşımları"
     
@@ -163,7 +271,7 @@ class LocationShare(models.Model):
         return f"{self.user.username} - {self.latitude}, {self.longitude}"
 
 
-class RouteTemplate(models.Model):
+class RouteTemplate(RouteMetricsMixin, models.Model):
     """Hazır rota şablonları"""
     TEMPLATE_CATEGORIES = [
         ('city', 'Şehir İçi'),
@@ -182,20 +290,115 @@ class RouteTemplate(models.Model):
     waypoints = models.JSONField(default=list, help_text="Ara noktalar")
     start_location = models.CharField(max_length=255, help_text="Başlangıç")
     end_location = models.CharField(max_length=255, help_text="Bitiş")
+    start_coordinates = models.JSONField(default=list, blank=True, help_text="Başlangıç koordinatları [lat, lng]")
+    end_coordinates = models.JSONField(default=list, blank=True, help_text="Bitiş koordinatları [lat, lng]")
+    route_bbox = models.JSONField(blank=True, null=True, help_text="Bounding box [min_lat, min_lng, max_lat, max_lng]")
+    # Benzer rota araması için şekil index'i (bkz. rides/route_similarity.py)
+    shape_cell = models.CharField(max_length=12, blank=True, null=True, editable=False)
+    shape_vector = models.BinaryField(blank=True, null=True, editable=False)
     distance_km = models.FloatField(help_text="Mesafe (km)")
     estimated_duration_minutes = models.PositiveIntegerField(help_text="Tahmini süre (dakika)")
     
     difficulty_level = models.PositiveIntegerField(default=1, help_text="Zorluk seviyesi (1-5)")
     is_public = models.BooleanField(default=True, help_text="Herkese açık mı?")
+    # Popüler rotalar ısı haritasına eklendiği an (bkz. rides/heatmap.py)
+    heatmap_indexed_at = models.DateTimeField(blank=True, null=True, editable=False)
     
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='created_templates')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    METRIC_FIELDS = RouteMetricsMixin.METRIC_FIELDS + ['shape_cell', 'shape_vector']
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['shape_cell'], name='routetemplate_shape_cell_idx'),
+        ]
         verbose_name = "Rota Şablonu"
         verbose_name_plural = "Rota Şablonları"
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+    
+    def apply_route_metrics(self):
+        from .polyline import decode_polyline
+        from .route_similarity import route_shape
+
+        if not super().apply_route_metrics():
+            return False
+        self.shape_cell, self.shape_vector = route_shape(decode_polyline(self.route_polyline))
+        return True
+
+class RideTrack(models.Model):
+    """
+    Bir sürücünün yolculuk boyunca kaydedilen GPS izi.
+
+    Yolculuk sırasında noktalar RideTrackChunk satırlarına parça parça
+    eklenir; yolculuk tamamlandığında parçalar tek bir paketlenmiş blob'da
+    (data) birleştirilir ve Douglas–Peucker ile sadeleştirilmiş bir kopyası
+    (simplified_data) saklanır. Format için bkz. rides/track_codec.py
+    """
+    ride = models.ForeignKey(Ride, on_delete=models.CASCADE, related_name='tracks')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='ride_tracks')
+
+    point_count = models.PositiveIntegerField(default=0, help_text="Toplam nokta sayısı")
+    data = models.BinaryField(blank=True, default=b'', help_text="Tüm noktalar (paketlenmiş)")
+    simplified_data = models.BinaryField(blank=True, default=b'', help_text="Sadeleştirilmiş noktalar (paketlenmiş)")
+    simplified_point_count = models.PositiveIntegerField(default=0)
+    simplify_tolerance_m = models.FloatField(blank=True, null=True, help_text="Sadeleştirme toleransı (metre)")
+
+    started_at = models.DateTimeField(blank=True, null=True, help_text="İlk noktanın zamanı")
+    ended_at = models.DateTimeField(blank=True, null=True, help_text="Son noktanın zamanı")
+    is_finalized = models.BooleanField(default=False, help_text="Parçalar birleştirildi mi?")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['ride', 'user']
+        verbose_name = "Yolculuk İzi"
+        verbose_name_plural = "Yolculuk İzleri"
+
+    def __str__(self):
+        return f"{self.user.username} - {self.ride.title} ({self.point_count} nokta)"
+
+
+class RideTrackChunk(models.Model):
+    """Yolculuk sırasında eklenen, henüz birleştirilmemiş iz parçası"""
+    track = models.ForeignKey(RideTrack, on_delete=models.CASCADE, related_name='chunks')
+    sequence = models.PositiveIntegerField()
+    point_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['track', 'sequence']
+        ordering = ['sequence']
+
+    def __str__(self):
+        return f"Track {self.track_id} #{self.sequence} ({self.point_count} nokta)"
+
+
+class HeatmapTile(models.Model):
+    """
+    Popüler rotalar ısı haritasının bir karosu (Web Mercator z/x/y).
+    counts, TILE_CELLS x TILE_CELLS uint32 hücre sayacının zlib ile
+    sıkıştırılmış halidir; her hücre o hücreden geçen yolculuk sayısıdır.
+    """
+    zoom = models.PositiveSmallIntegerField()
+    x = models.PositiveIntegerField()
+    y = models.PositiveIntegerField()
+    counts = models.BinaryField()
+    max_count = models.PositiveIntegerField(default=0)
+    # Her güncellemede artar; ETag'in parçası
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('zoom', 'x', 'y')
+        verbose_name = "Isı Haritası Karosu"
+        verbose_name_plural = "Isı Haritası Karoları"
+
+    def __str__(self):
+        return f"{self.zoom}/{self.x}/{self.y}"
@@ -0,0 +1,271 @@
+"""
+Yakındaki sürücüler için canlı konum grid'i
+
+Konum paylaşan her kullanıcının sadece son konumu tutulur. Redis
+yapılandırılmışsa tek bir GEO anahtarı (Redis GEO da geohash tabanlıdır)
+GEOSEARCH ile sorgulanır; değilse process içi grid geohash hücresi ->
+{user_id: RiderEntry} sözlüğüdür ve sorgu sadece dairenin kapsadığı
+hücreleri okur. Her iki durumda da sorgu maliyeti toplam paylaşan sürücü
+sayısına değil, yarıçap içindeki sürücü sayısına bağlıdır.
+
+Kayıtlar NEARBY_TTL_SECONDS boyunca güncellenmezse düşer. Görünürlük
+share_type'a göre belirlenir: 'public' herkese, 'friends' karşılıklı takip
+edenlere, 'group' grup üyelerine, 'ride' yolculuk katılımcılarına.
+"""
+import logging
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from core_api.redis_client import get_redis_connection, redis_key
+from .geo import geohash_cells_for_radius, geohash_encode, haversine_km
+
+User = get_user_model()
+Follow = User.following.through
+logger = logging.getLogger(__name__)
+
+NEARBY_TTL_SECONDS = 5 * 60
+NEARBY_DEFAULT_RADIUS_KM = 5
+NEARBY_MAX_RADIUS_KM = 25
+NEARBY_RESULT_LIMIT = 100
+# ~4.9 km x 4.9 km hücreler
+GRID_PRECISION = 5
+
+
+class RiderEntry:
+    """Grid'deki bir sürücünün son konumu ve paylaşım kapsamı"""
+
+    __slots__ = ('user_id', 'latitude', 'longitude', 'share_type', 'scope_id', 'updated_at')
+
+    def __init__(self, user_id, latitude, longitude, share_type, scope_id=None, updated_at=None):
+        self.user_id = user_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.share_type = share_type
+        self.scope_id = scope_id
+        self.updated_at = time.time() if updated_at is None else updated_at
+
+
+class LocMemRiderGrid:
+    """Redis yokken kullanılan process içi geohash grid'i"""
+
+    blocking = False
+
+    def __init__(self):
+        self._cells = {}
+        self._user_cells = {}
+        self._lock = threading.Lock()
+
+    def update(self, entry):
+        cell = geohash_encode(entry.latitude, entry.longitude, GRID_PRECISION)
+        with self._lock:
+            previous = self._user_cells.get(entry.user_id)
+            if previous is not None and previous != cell:
+                self._discard(previous, entry.user_id)
+            self._cells.setdefault(cell, {})[entry.user_id] = entry
+            self._user_cells[entry.user_id] = cell
+
+    def _discard(self, cell, user_id):
+        entries = self._cells.get(cell)
+        if entries is not None:
+            entries.pop(user_id, None)
+            if not entries:
+                del self._cells[cell]
+
+    def remove(self, user_id):
+        with self._lock:
+            cell = self._user_cells.pop(user_id, None)
+            if cell is not None:
+                self._discard(cell, user_id)
+
+    def search(self, latitude, longitude, radius_km):
+        """[(entry, distance_km)] listesi, mesafeye göre sıralı"""
+        threshold = time.time() - NEARBY_TTL_SECONDS
+        results = []
+        with self._lock:
+            for cell in geohash_cells_for_radius(latitude, longitude, radius_km, GRID_PRECISION):
+                entries = self._cells.get(cell)
+                if not entries:
+                    continue
+                for user_id, entry in list(entries.items()):
+                    if entry.updated_at < threshold:
+                        self._discard(cell, user_id)
+                        self._user_cells.pop(user_id, None)
+                        continue
+                    distance = haversine_km(latitude, longitude, entry.latitude, entry.longitude)
+                    if distance <= radius_km:
+                        results.append((entry, distance))
+        results.sort(key=lambda result: result[1])
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._user_cells.clear()
+
+
+class RedisRiderGrid:
+    """
+    GEO anahtarı (konum) + sorted set (son görülme) + hash (paylaşım kapsamı).
+    GEO üyelerinin tek tek TTL'i olmadığından süresi dolanlar sorgu sırasında
+    sorted set üzerinden temizlenir.
+    """
+
+    blocking = True
+
+    def __init__(self, client):
+        self.client = client
+        self.geo_key = redis_key('nearby_riders', 'geo')
+        self.seen_key = redis_key('nearby_riders', 'seen')
+        self.meta_key = redis_key('nearby_riders', 'meta')
+
+    def update(self, entry):
+        pipe = self.client.pipeline()
+        pipe.geoadd(self.geo_key, (entry.longitude, entry.latitude, entry.user_id))
+        pipe.zadd(self.seen_key, {entry.user_id: entry.updated_at})
+        pipe.hset(self.meta_key, entry.user_id, f"{entry.share_type}:{entry.scope_id or ''}")
+        pipe.execute()
+
+    def remove(self, user_id):
+        pipe = self.client.pipeline()
+        pipe.zrem(self.geo_key, user_id)
+        pipe.zrem(self.seen_key, user_id)
+        pipe.hdel(self.meta_key, user_id)
+        pipe.execute()
+
+    def _expire(self):
+        cutoff = time.time() - NEARBY_TTL_SECONDS
+        expired = self.client.zrangebyscore(self.seen_key, '-inf', cutoff)
+        if expired:
+            pipe = self.client.pipeline()
+            pipe.zrem(self.geo_key, *expired)
+            pipe.zrem(self.seen_key, *expired)
+            pipe.hdel(self.meta_key, *expired)
+            pipe.execute()
+
+    def search(self, latitude, longitude, radius_km):
+        self._expire()
+        rows = self.client.geosearch(
+            self.geo_key, longitude=longitude, latitude=latitude, radius=radius_km,
+            unit='km', withdist=True, withcoord=True, sort='ASC',
+        )
+        if not rows:
+            return []
+        members = [member for member, _, _ in rows]
+        pipe = self.client.pipeline()
+        pipe.hmget(self.meta_key, members)
+        pipe.zmscore(self.seen_key, members)
+        metas, seen = pipe.execute()
+
+        results = []
+        for (member, distance, (lng, lat)), meta, updated_at in zip(rows, metas, seen):
+            if meta is None or updated_at is None:
+                continue
+            share_type, _, scope_id = meta.decode().partition(':')
+            entry = RiderEntry(
+                int(member), lat, lng, share_type, int(scope_id) if scope_id else None, updated_at,
+            )
+            results.append((entry, float(distance)))
+        return results
+
+
+_locmem_grid = LocMemRiderGrid()
+
+
+def get_rider_grid():
+    client = get_redis_connection()
+    if client is not None:
+        return RedisRiderGrid(client)
+    return _locmem_grid
+
+
+def update_rider_position(user_id, latitude, longitude, share_type, scope_id=None):
+    """Konum güncellemesini grid'e yazar; hata konum paylaşımını engellemez"""
+    try:
+        get_rider_grid().update(RiderEntry(user_id, latitude, longitude, share_type, scope_id))
+    except Exception as e:
+        logger.error(f"Yakındaki sürücüler grid'i güncellenemedi - User {user_id}: {e}")
+
+
+def remove_rider(user_id):
+    try:
+        get_rider_grid().remove(user_id)
+    except Exception as e:
+        logger.error(f"Yakındaki sürücüler grid'inden silinemedi - User {user_id}: {e}")
+
+
+def _visible_entries(viewer, candidates):
+    """share_type'a göre izleyicinin görebileceği adaylar (en fazla 3 sorgu)"""
+    by_type = {}
+    for entry, distance in candidates:
+        by_type.setdefault(entry.share_type, []).append(entry)
+
+    allowed_users = {entry.user_id for entry in by_type.get('public', [])}
+
+    friends = by_type.get('friends')
+    if friends:
+        ids = [entry.user_id for entry in friends]
+        # Karşılıklı takip: sürücü izleyiciyi, izleyici sürücüyü takip ediyor
+        follows = Follow.objects.filter(
+            Q(from_customuser_id__in=ids, to_customuser_id=viewer.id)
+            | Q(from_customuser_id=viewer.id, to_customuser_id__in=ids)
+        ).values_list('from_customuser_id', 'to_customuser_id')
+        followers, following = set(), set()
+        for source, target in follows:
+            if target == viewer.id:
+                followers.add(source)
+            else:
+                following.add(target)
+        allowed_users |= followers & following
+
+    groups = by_type.get('group')
+    if groups:
+        from groups.models import Group
+        group_ids = Group.objects.filter(
+            Q(owner=viewer) | Q(members=viewer), id__in={entry.scope_id for entry in groups}
+        ).values_list('id', flat=True)
+        group_ids = set(group_ids)
+        allowed_users |= {entry.user_id for entry in groups if entry.scope_id in group_ids}
+
+    rides = by_type.get('ride')
+    if rides:
+        from .models import Ride
+        ride_ids = set(Ride.objects.filter(
+            Q(owner=viewer) | Q(participants=viewer), id__in={entry.scope_id for entry in rides}
+        ).values_list('id', flat=True))
+        allowed_users |= {entry.user_id for entry in rides if entry.scope_id in ride_ids}
+
+    return [
+        (entry, distance) for entry, distance in candidates
+        if entry.user_id in allowed_users and entry.user_id != viewer.id
+    ]
+
+
+def nearby_riders(viewer, latitude, longitude, radius_km=NEARBY_DEFAULT_RADIUS_KM, limit=NEARBY_RESULT_LIMIT):
+    """
+    İzleyicinin görebileceği, yarıçap içinde konum paylaşan sürücüler.
+
+    Returns:
+        list[dict]: mesafeye göre sıralı sürücüler
+    """
+    candidates = get_rider_grid().search(latitude, longitude, radius_km)
+    visible = _visible_entries(viewer, candidates)[:limit]
+    users = User.objects.in_bulk([entry.user_id for entry, _ in visible])
+    results = []
+    for entry, distance in visible:
+        user = users.get(entry.user_id)
+        if user is None:
+            continue
+        results.append({
+            'user_id': entry.user_id,
+            'username': user.username,
+            'profile_picture': user.profile_picture or None,
+            'latitude': entry.latitude,
+            'longitude': entry.longitude,
+            'distance_km': round(distance, 3),
+            'share_type': entry.share_type,
+            'updated_at': round(entry.updated_at, 3),
+        })
+    return results
@@ -0,0 +1,136 @@
+"""
+Encoded polyline codec ve rota metrikleri (NumPy)
+
+Google encoded polyline formatını karakter karakter döngü yerine tüm dizi
+üzerinde vektörel işlemlerle çözer/kodlar. route_metrics tek geçişte
+haversine uzunluğu, bounding box ve başlangıç/bitiş koordinatlarını
+hesaplar; Ride ve RouteTemplate kaydedilirken bu değerler istemciden gelen
+değerlerin yerine kullanılır.
+"""
+import numpy as np
+
+from .geo import EARTH_RADIUS_KM
+
+DEFAULT_PRECISION = 5
+# Tahmini süre verilmemişse kullanılan ortalama hız
+ASSUMED_AVERAGE_SPEED_KMH = 60
+# 64 bit'e sığan en uzun varint (12 * 5 = 60 bit)
+_MAX_CHUNKS = 12
+_CHUNK_SHIFTS = np.arange(_MAX_CHUNKS + 1, dtype=np.int64) * 5
+
+
+def decode_polyline(encoded, precision=DEFAULT_PRECISION):
+    """
+    Encoded polyline'ı (N, 2) boyutlu [lat, lng] float dizisine çevirir.
+
+    Raises:
+        ValueError: Geçersiz polyline
+    """
+    if not encoded:
+        return np.empty((0, 2))
+
+    chars = np.frombuffer(encoded.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    if chars.min() < 0 or chars.max() > 63:
+        raise ValueError('Polyline geçersiz karakter içeriyor')
+
+    # 0x20 biti olmayan karakterler bir değerin son parçasıdır
+    is_last = chars < 0x20
+    if not is_last[-1]:
+        raise ValueError('Polyline yarım kalmış')
+    ends = np.flatnonzero(is_last)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts + 1
+    if lengths.max() > _MAX_CHUNKS:
+        raise ValueError('Polyline değeri çok uzun')
+
+    shifts = (np.arange(chars.size) - np.repeat(starts, lengths)) * 5
+    values = np.add.reduceat((chars & 0x1F) << shifts, starts)
+    values = (values >> 1) ^ -(values & 1)
+    if values.size % 2:
+        raise ValueError('Polyline tek sayıda değer içeriyor')
+
+    coords = np.cumsum(values.reshape(-1, 2), axis=0) / 10 ** precision
+    if np.abs(coords[:, 0]).max() > 90 or np.abs(coords[:, 1]).max() > 180:
+        raise ValueError('Polyline koordinatları geçersiz')
+    return coords
+
+
+def encode_polyline(coords, precision=DEFAULT_PRECISION):
+    """[lat, lng] dizisini encoded polyline string'ine çevirir"""
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    if not len(coords):
+        return ''
+
+    ints = np.round(coords * 10 ** precision).astype(np.int64)
+    deltas = np.diff(ints, axis=0, prepend=0).ravel()
+    values = (deltas << 1) ^ (deltas >> 63)
+
+    remaining = values[:, None] >> _CHUNK_SHIFTS
+    chunk_counts = np.maximum(1, (remaining > 0).sum(axis=1))
+    index = np.arange(_CHUNK_SHIFTS.size)
+    chunks = remaining & 0x1F
+    chunks[index < (chunk_counts - 1)[:, None]] |= 0x20
+    out = (chunks + 63)[index < chunk_counts[:, None]]
+    return out.astype(np.uint8).tobytes().decode('ascii')
+
+
+def decode_polyline_py(encoded, precision=DEFAULT_PRECISION):
+    """Karşılaştırma için saf Python decoder (bkz. benchmark_polyline)"""
+    coords = []
+    index = lat = lng = 0
+    factor = 10 ** precision
+    while index < len(encoded):
+        for axis in range(2):
+            result = shift = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            delta = ~(result >> 1) if result & 1 else result >> 1
+            if axis == 0:
+                lat += delta
+            else:
+                lng += delta
+        coords.append((lat / factor, lng / factor))
+    return coords
+
+
+def route_metrics(coords):
+    """
+    Koordinat dizisi için mesafe (km), bounding box, başlangıç/bitiş.
+
+    Returns:
+        dict veya None (nokta yoksa)
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    if not len(coords):
+        return None
+
+    lat = np.radians(coords[:, 0])
+    lng = np.radians(coords[:, 1])
+    a = (
+        np.sin(np.diff(lat) / 2) ** 2
+        + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lng) / 2) ** 2
+    )
+    distance_km = float(2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1))).sum())
+
+    minimum = coords.min(axis=0)
+    maximum = coords.max(axis=0)
+    return {
+        'distance_km': round(distance_km, 3),
+        'bbox': [float(minimum[0]), float(minimum[1]), float(maximum[0]), float(maximum[1])],
+        'start': [float(coords[0, 0]), float(coords[0, 1])],
+        'end': [float(coords[-1, 0]), float(coords[-1, 1])],
+        'point_count': int(len(coords)),
+    }
+
+
+def polyline_metrics(encoded):
+    return route_metrics(decode_polyline(encoded))
+
+
+def estimate_duration_minutes(distance_km):
+    return max(1, round(distance_km / ASSUMED_AVERAGE_SPEED_KMH * 60))
@@ -0,0 +1,175 @@
+"""
+Yolculuk istatistikleri
+
+complete_ride'da istemcinin gönderdiği mesafe/hız/süre yerine yolculuğun
+kaydedilmiş noktalarından hesaplanan değerler kullanılır. Kaynak, sürücünün
+RideTrack'i (yoksa yolculuğa ait LocationShare satırları) olup tek sorguyla
+okunur; tüm hesaplar NumPy dizileri üzerinde tek geçişte yapılır:
+
+- Tek noktalık GPS sıçramaları (komşularına göre büyük sapma) atılır.
+- Fiziksel olarak imkânsız hızlar (MAX_PLAUSIBLE_SPEED_KMH) ve durağan
+  GPS titreşimi (MOVING_SPEED_KMH altı) mesafe/hareket süresine sayılmaz.
+- Azami hız, tek örneklik zirveleri ve koordinat yuvarlama gürültüsünü
+  bastırmak için en az MAX_SPEED_WINDOW_SECONDS boyunca korunan hızdır.
+- Gece sürüşü, segment ortasındaki güneş yüksekliği ufkun altındayken geçen
+  hareket süresidir.
+"""
+import logging
+
+import numpy as np
+
+from .geo import EARTH_RADIUS_KM
+from .models import LocationShare, RideTrack
+from .tracks import load_columns
+
+logger = logging.getLogger(__name__)
+
+MAX_PLAUSIBLE_SPEED_KMH = 300
+MOVING_SPEED_KMH = 3
+# Bir nokta, komşuları arasındaki yolu bu kadar metreden (ve doğrudan mesafenin
+# SPIKE_RATIO katından) fazla uzatıyorsa sıçrama sayılır
+SPIKE_MIN_DETOUR_M = 100
+SPIKE_RATIO = 2
+NIGHT_SUN_ELEVATION_DEG = 0
+MAX_SPEED_WINDOW_SECONDS = 5
+
+STAT_FIELDS = [
+    'recorded_distance_km', 'moving_time_minutes', 'max_speed_kmh',
+    'avg_speed_kmh', 'night_riding_minutes', 'stats_point_count',
+]
+
+
+def _segment_km(lat, lng):
+    """Ardışık noktalar arası haversine mesafeleri (km)"""
+    phi = np.radians(lat)
+    d_lambda = np.radians(np.diff(lng))
+    a = np.sin(np.diff(phi) / 2) ** 2 + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _pair_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def solar_elevation_deg(timestamps, lat, lng):
+    """Yaklaşık güneş yüksekliği (derece); timestamps Unix saniyesi"""
+    n = np.asarray(timestamps, dtype=float) / 86400.0 + 2440587.5 - 2451545.0
+    mean_longitude = (280.460 + 0.9856474 * n) % 360
+    anomaly = np.radians((357.528 + 0.9856003 * n) % 360)
+    ecliptic = np.radians(mean_longitude + 1.915 * np.sin(anomaly) + 0.020 * np.sin(2 * anomaly))
+    obliquity = np.radians(23.439 - 0.0000004 * n)
+
+    declination = np.arcsin(np.sin(obliquity) * np.sin(ecliptic))
+    right_ascension = np.arctan2(np.cos(obliquity) * np.sin(ecliptic), np.cos(ecliptic))
+    sidereal = np.radians((280.46061837 + 360.98564736629 * n) % 360)
+    hour_angle = sidereal + np.radians(lng) - right_ascension
+
+    phi = np.radians(lat)
+    return np.degrees(np.arcsin(
+        np.sin(phi) * np.sin(declination) + np.cos(phi) * np.cos(declination) * np.cos(hour_angle)
+    ))
+
+
+def _reject_spikes(lat, lng):
+    """Tek noktalık GPS sıçramalarını maskeler"""
+    keep = np.ones(lat.size, dtype=bool)
+    if lat.size < 3:
+        return keep
+    segments = _segment_km(lat, lng)
+    via = (segments[:-1] + segments[1:]) * 1000
+    direct = _pair_km(lat[:-2], lng[:-2], lat[2:], lng[2:]) * 1000
+    detour = via - direct
+    keep[1:-1] = ~((detour > SPIKE_MIN_DETOUR_M) & (detour > SPIKE_RATIO * direct))
+    return keep
+
+
+def _max_sustained_speed(timestamps, distance, valid):
+    """En az MAX_SPEED_WINDOW_SECONDS süren pencerelerdeki en yüksek ortalama hız"""
+    cumulative = np.concatenate(([0.0], np.cumsum(np.where(valid, distance, 0.0))))
+    ends = np.searchsorted(timestamps, timestamps + MAX_SPEED_WINDOW_SECONDS)
+    starts = np.flatnonzero(ends < timestamps.size)
+    if not starts.size:
+        # İz pencereden kısa: geçerli segmentlerin en yükseği
+        return float(np.max(distance[valid] / np.diff(timestamps)[valid] * 3600)) if valid.any() else 0.0
+    ends = ends[starts]
+    speeds = (cumulative[ends] - cumulative[starts]) / (timestamps[ends] - timestamps[starts]) * 3600
+    return float(speeds.max())
+
+
+def compute_ride_stats(timestamps, lat, lng):
+    """
+    Zaman sıralı nokta dizilerinden yolculuk istatistikleri.
+
+    Args:
+        timestamps: Unix saniyesi dizisi
+        lat, lng: derece dizileri
+
+    Returns:
+        dict: STAT_FIELDS ile aynı anahtarlar
+    """
+    timestamps = np.asarray(timestamps, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    lng = np.asarray(lng, dtype=float)
+    stats = dict.fromkeys(STAT_FIELDS, 0)
+    stats['stats_point_count'] = int(timestamps.size)
+    if timestamps.size < 2:
+        return stats
+
+    keep = _reject_spikes(lat, lng)
+    timestamps, lat, lng = timestamps[keep], lat[keep], lng[keep]
+
+    distance = _segment_km(lat, lng)
+    elapsed = np.diff(timestamps)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = np.where(elapsed > 0, distance / elapsed * 3600, np.inf)
+
+    valid = speed <= MAX_PLAUSIBLE_SPEED_KMH
+    moving = valid & (speed >= MOVING_SPEED_KMH)
+    moving_seconds = elapsed[moving].sum()
+    distance_km = distance[moving].sum()
+
+    midpoints = (timestamps[:-1] + timestamps[1:]) / 2
+    night = moving & (solar_elevation_deg(midpoints, (lat[:-1] + lat[1:]) / 2, (lng[:-1] + lng[1:]) / 2)
+                      < NIGHT_SUN_ELEVATION_DEG)
+
+    stats.update({
+        'recorded_distance_km': round(float(distance_km), 3),
+        'moving_time_minutes': round(float(moving_seconds) / 60, 2),
+        'max_speed_kmh': round(_max_sustained_speed(timestamps, distance, valid), 1),
+        'avg_speed_kmh': round(float(distance_km / moving_seconds * 3600), 1) if moving_seconds else 0,
+        'night_riding_minutes': round(float(elapsed[night].sum()) / 60, 2),
+    })
+    return stats
+
+
+def load_ride_positions(ride, user):
+    """
+    Sürücünün yolculuk noktaları (timestamps, lat, lng). Önce RideTrack,
+    yoksa LocationShare satırları tek sorguyla okunur.
+    """
+    track = RideTrack.objects.filter(ride=ride, user=user).first()
+    if track is not None and track.point_count:
+        columns = load_columns(track)
+        return columns['timestamp_ms'] / 1000, columns['latitude'], columns['longitude']
+
+    rows = list(
+        LocationShare.objects.filter(ride=ride, user=user)
+        .order_by('created_at').values_list('created_at', 'latitude', 'longitude')
+    )
+    if not rows:
+        return np.empty(0), np.empty(0), np.empty(0)
+    created, lat, lng = zip(*rows)
+    timestamps = np.fromiter((value.timestamp() for value in created), dtype=float, count=len(rows))
+    return timestamps, np.array(lat, dtype=float), np.array(lng, dtype=float)
+
+
+def record_ride_stats(ride, user=None):
+    """İstatistikleri hesaplar ve yolculuğa kaydeder"""
+    stats = compute_ride_stats(*load_ride_positions(ride, user or ride.owner))
+    for field, value in stats.items():
+        setattr(ride, field, value)
+    ride.save(update_fields=STAT_FIELDS)
+    logger.info(f"📊 Yolculuk istatistikleri hesaplandı - Ride {ride.id}: {stats}")
+    return stats
@@ -0,0 +1,155 @@
+"""
+Rota şekli index'i (RouteTemplate benzerlik ve tekrar tespiti)
+
+Her şablonun polyline'ı yay uzunluğuna göre eşit aralıklı RESAMPLE_POINTS
+noktaya örneklenir ve float32 [lat, lng] vektörü olarak saklanır
+(shape_vector, 256 byte). Şablonlar başlangıç noktasının geohash hücresine
+(shape_cell) göre kovalanır; sorgu sadece başlangıç noktasının etrafındaki
+hücrelerdeki şablonları okur, bounding box'ı kesişmeyen ve uzunluğu çok
+farklı olanları eler, kalan adayları tek NumPy işlemiyle (ortalama nokta
+mesafesi veya ayrık Fréchet mesafesi) sıralar.
+"""
+import math
+
+import numpy as np
+
+from .geo import KM_PER_DEGREE_LAT, geohash_cells_for_radius, geohash_encode
+from .polyline import decode_polyline, route_metrics
+
+RESAMPLE_POINTS = 32
+SHAPE_CELL_PRECISION = 4
+# Başlangıcı bu yarıçaptaki şablonlar aday sayılır
+START_SEARCH_RADIUS_KM = 10
+# Uzunluğu bu kattan fazla farklı şablonlar aday sayılmaz
+MAX_LENGTH_RATIO = 1.5
+# Ortalama nokta mesafesi bunun altındaysa şablonlar aynı rota sayılır
+DUPLICATE_DISTANCE_M = 50
+SIMILAR_DEFAULT_LIMIT = 10
+SIMILAR_MAX_LIMIT = 50
+SIMILARITY_METRICS = ('average', 'frechet')
+
+
+def resample(coords, count=RESAMPLE_POINTS):
+    """[lat, lng] dizisini yay uzunluğuna göre eşit aralıklı count noktaya örnekler"""
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    if len(coords) == 1:
+        return np.repeat(coords, count, axis=0)
+    scale_x = math.cos(math.radians(coords[0, 0]))
+    steps = np.hypot(np.diff(coords[:, 0]), np.diff(coords[:, 1]) * scale_x)
+    distance = np.concatenate(([0.0], np.cumsum(steps)))
+    targets = np.linspace(0, distance[-1], count)
+    return np.column_stack((
+        np.interp(targets, distance, coords[:, 0]),
+        np.interp(targets, distance, coords[:, 1]),
+    ))
+
+
+def route_shape(coords):
+    """
+    Returns:
+        (shape_cell, shape_vector): başlangıç hücresi ve paketlenmiş vektör;
+        nokta yoksa (None, None)
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    if not len(coords):
+        return None, None
+    cell = geohash_encode(coords[0, 0], coords[0, 1], SHAPE_CELL_PRECISION)
+    return cell, resample(coords).astype('<f4').tobytes()
+
+
+def unpack_shape(data):
+    return np.frombuffer(bytes(data), dtype='<f4').reshape(-1, 2).astype(float)
+
+
+def _to_meters(shapes, origin_lat):
+    """(..., 2) derece dizisini origin_lat etrafında equirectangular metreye çevirir"""
+    meters_per_degree = KM_PER_DEGREE_LAT * 1000
+    return np.stack((
+        shapes[..., 0] * meters_per_degree,
+        shapes[..., 1] * meters_per_degree * math.cos(math.radians(origin_lat)),
+    ), axis=-1)
+
+
+def average_distance_m(query, candidates):
+    """Karşılıklı noktalar arası ortalama mesafe; query (N, 2), candidates (K, N, 2)"""
+    origin_lat = query[0, 0]
+    delta = _to_meters(candidates, origin_lat) - _to_meters(query, origin_lat)
+    return np.linalg.norm(delta, axis=-1).mean(axis=-1)
+
+
+def discrete_frechet_m(query, candidates):
+    """Ayrık Fréchet mesafesi; dinamik programlama tüm adaylar için birlikte yürür"""
+    origin_lat = query[0, 0]
+    q = _to_meters(query, origin_lat)
+    c = _to_meters(candidates, origin_lat)
+    # pairwise[k, i, j] = |q_i - c_kj|
+    pairwise = np.linalg.norm(q[None, :, None, :] - c[:, None, :, :], axis=-1)
+    n, m = pairwise.shape[1], pairwise.shape[2]
+    table = np.empty_like(pairwise)
+    table[:, 0, 0] = pairwise[:, 0, 0]
+    table[:, 0, 1:] = np.maximum.accumulate(pairwise[:, 0, 1:], axis=1)
+    table[:, 0, 1:] = np.maximum(table[:, 0, 1:], table[:, 0, :1])
+    for i in range(1, n):
+        table[:, i, 0] = np.maximum(table[:, i - 1, 0], pairwise[:, i, 0])
+        for j in range(1, m):
+            best = np.minimum(np.minimum(table[:, i - 1, j], table[:, i - 1, j - 1]), table[:, i, j - 1])
+            table[:, i, j] = np.maximum(best, pairwise[:, i, j])
+    return table[:, -1, -1]
+
+
+def _bbox_overlaps(a, b):
+    return bool(a and b) and a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def candidate_templates(queryset, start, bbox, distance_km, exclude_id=None):
+    """
+    Başlangıç hücresi kovasındaki, bounding box'ı kesişen ve uzunluğu yakın
+    şablonlar. Sadece bu kova veritabanından okunur.
+    """
+    cells = geohash_cells_for_radius(start[0], start[1], START_SEARCH_RADIUS_KM, SHAPE_CELL_PRECISION)
+    candidates = queryset.filter(shape_cell__in=cells, shape_vector__isnull=False)
+    if exclude_id is not None:
+        candidates = candidates.exclude(pk=exclude_id)
+
+    result = []
+    for template in candidates:
+        if not _bbox_overlaps(bbox, template.route_bbox):
+            continue
+        if distance_km and template.distance_km:
+            ratio = max(distance_km, template.distance_km) / max(min(distance_km, template.distance_km), 1e-6)
+            if ratio > MAX_LENGTH_RATIO:
+                continue
+        result.append(template)
+    return result
+
+
+def rank_similar(queryset, shape_vector, bbox, distance_km, metric='average',
+                 limit=SIMILAR_DEFAULT_LIMIT, exclude_id=None):
+    """
+    Şekle en çok benzeyen şablonlar.
+
+    Returns:
+        list[(RouteTemplate, distance_m)]: mesafeye göre artan
+    """
+    query = unpack_shape(shape_vector)
+    templates = candidate_templates(queryset, query[0], bbox, distance_km, exclude_id)
+    if not templates:
+        return []
+    stacked = np.stack([unpack_shape(template.shape_vector) for template in templates])
+    measure = discrete_frechet_m if metric == 'frechet' else average_distance_m
+    distances = measure(query, stacked)
+    order = np.argsort(distances, kind='stable')[:limit]
+    return [(templates[i], float(distances[i])) for i in order]
+
+
+def find_duplicate(queryset, route_polyline):
+    """Polyline ile neredeyse aynı rotaya sahip şablon (yoksa None)"""
+    coords = decode_polyline(route_polyline)
+    metrics = route_metrics(coords)
+    if metrics is None:
+        return None
+    _, vector = route_shape(coords)
+    ranked = rank_similar(queryset, vector, metrics['bbox'], metrics['distance_km'], limit=1)
+    if ranked and ranked[0][1] <= DUPLICATE_DISTANCE_M:
+        return ranked[0][0]
+    return None
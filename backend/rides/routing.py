@@ -0,0 +1,7 @@
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    # Canlı konum paylaşımı: ws/location/ride/<ride_id>/ veya ws/location/group/<group_id>/
+    re_path(r'^ws/location/(?P<scope_type>ride|group)/(?P<scope_id>\d+)/$', consumers.LocationConsumer.as_asgi()),
+]
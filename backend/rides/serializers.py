@@ -4,6 +4,17 @@ from rest_framework import serializers
 from .models import Ride, RideRequest, RouteFavorite, LocationShare, RouteTemplate
 from django.conf import settings
 from users.serializers import UserSerializer
+from .polyline import decode_polyline
+
+
+def validate_polyline(value):
+    """Encoded polyline çözülebilir mi?"""
+    if value:
+        try:
+            decode_polyline(value)
+        except ValueError:
+            raise serializers.ValidationError("Geçersiz rota polyline'ı.")
+    return value
 
 # RideRequestSerializer sınıfı
 class RideRequestSerializer(serializers.ModelSerializer):
@@ -28,6 +39,9 @@ class RideSerializer(serializers.ModelSerializer):
     # Bu alan, sadece isteği gönderen kullanıcı yolculuğun sahibi ise doldurulur.
     pending_requests = serializers.SerializerMethodField()
 
+    # Sadece ?near= ile listelendiğinde dolu: arama noktasına uzaklık (km)
+    distance_from_km = serializers.SerializerMethodField()
+
     class Meta:
         model = Ride
         fields = [
@@ -38,9 +52,23 @@ class RideSerializer(serializers.ModelSerializer):
             'distance_km', 'estimated_duration_minutes',
             'is_active', 'is_favorite', 'group',
             'created_at', 'updated_at', 'pending_requests',
-            'route_polyline', 'waypoints'
+            'route_polyline', 'waypoints', 'route_bbox', 'distance_from_km',
+            'recorded_distance_km', 'moving_time_minutes', 'max_speed_kmh',
+            'avg_speed_kmh', 'night_riding_minutes',
         ]
-        read_only_fields = ('owner', 'created_at', 'updated_at', 'participants', 'pending_requests', 'completed_at')
+        # Polyline verildiğinde distance_km, estimated_duration_minutes, start/end_coordinates ve
+        # route_bbox sunucuda hesaplanır;
+        # sürüş istatistikleri complete_ride'da kaydedilen noktalardan hesaplanır
+        read_only_fields = (
+            'owner', 'created_at', 'updated_at', 'participants', 'pending_requests', 'completed_at', 'route_bbox',
+            'recorded_distance_km', 'moving_time_minutes', 'max_speed_kmh', 'avg_speed_kmh', 'night_riding_minutes',
+        )
+
+    def validate_route_polyline(self, value):
+        return validate_polyline(value)
+
+    def get_distance_from_km(self, obj):
+        return getattr(obj, 'distance_from_km', None)
 
     def get_pending_requests(self, obj):
         """
@@ -94,9 +122,17 @@ class RouteTemplateSerializer(serializers.ModelSerializer):
             'id', 'name', 'description', 'category', 'route_polyline',
             'waypoints', 'start_location', 'end_location', 'distance_km',
             'estimated_duration_minutes', 'difficulty_level', 'is_public',
+            'start_coordinates', 'end_coordinates', 'route_bbox',
             'created_by', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
+        # Mesafe, süre ve koordinatlar route_polyline'dan hesaplanır
+        read_only_fields = [
+            'id', 'created_by', 'created_at', 'updated_at', 'distance_km',
+            'estimated_duration_minutes', 'start_coordinates', 'end_coordinates', 'route_bbox',
+        ]
+
+    def validate_route_polyline(self, value):
+        return validate_polyline(value)
 
 
 class CreateRideFromTemplateSerializer(serializers.Serializer):
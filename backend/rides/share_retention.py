@@ -0,0 +1,100 @@
+"""
+LocationShare saklama politikası
+
+TTL'i dolan aktif paylaşımlar pasifleştirilir, saklama süresini aşan pasif
+satırlar (istenirse önce arşivlenip) silinir. Her iki işlem de
+(is_active, updated_at) index'i üzerinden pk sırasıyla sınırlı parçalar
+halinde yapılır; her parça kendi kısa transaction'ında çalıştığından tabloyu
+uzun süre kilitlemez ve yarıda kesilirse kaldığı yerden devam edilebilir.
+"""
+import gzip
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import LocationShare
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_CHUNK_SIZE = 1000
+
+ARCHIVE_FIELDS = (
+    'id', 'user_id', 'ride_id', 'group_id', 'latitude', 'longitude', 'accuracy',
+    'speed', 'heading', 'share_type', 'is_active', 'created_at', 'updated_at',
+)
+
+
+def _chunks(queryset, chunk_size):
+    """Sorgudaki pk'ları sırayla chunk_size'lık listeler halinde verir"""
+    last_pk = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+def deactivate_stale_shares(now=None, chunk_size=DEFAULT_CHUNK_SIZE, pause_seconds=0, dry_run=False):
+    """TTL'i dolmuş aktif paylaşımları pasifleştirir; etkilenen satır sayısını döndürür"""
+    stale = LocationShare.objects.stale(now)
+    if dry_run:
+        return stale.count()
+
+    total = 0
+    for ids in _chunks(stale, chunk_size):
+        with transaction.atomic():
+            # Parça seçildikten sonra güncellenen (yeniden canlanan) satırlara dokunma
+            total += LocationShare.objects.stale(now).filter(pk__in=ids).update(is_active=False)
+        if pause_seconds:
+            time.sleep(pause_seconds)
+    logger.info(f"📍 {total} eski konum paylaşımı pasifleştirildi")
+    return total
+
+
+def _archive_rows(archive, ids):
+    for row in LocationShare.objects.filter(pk__in=ids).order_by('pk').values(*ARCHIVE_FIELDS):
+        row['created_at'] = row['created_at'].isoformat()
+        row['updated_at'] = row['updated_at'].isoformat()
+        archive.write(json.dumps(row) + '\n')
+
+
+def prune_shares(retention_days=DEFAULT_RETENTION_DAYS, now=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 archive_path=None, pause_seconds=0, dry_run=False):
+    """
+    Saklama süresini aşan pasif paylaşımları siler.
+
+    archive_path verilirse satırlar silinmeden önce gzip'li JSON Lines
+    dosyasına eklenir.
+
+    Returns:
+        int: silinen (dry_run'da silinecek) satır sayısı
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days)
+    expired = LocationShare.objects.filter(is_active=False, updated_at__lt=cutoff)
+    if dry_run:
+        return expired.count()
+
+    archive = gzip.open(archive_path, 'at', encoding='utf-8') if archive_path else None
+    total = 0
+    try:
+        for ids in _chunks(expired, chunk_size):
+            if archive is not None:
+                _archive_rows(archive, ids)
+                archive.flush()
+            with transaction.atomic():
+                total += LocationShare.objects.filter(pk__in=ids, is_active=False).delete()[0]
+            if pause_seconds:
+                time.sleep(pause_seconds)
+    finally:
+        if archive is not None:
+            archive.close()
+    logger.info(f"🧹 {total} eski konum paylaşımı silindi")
+    return total
@@ -1,9 +1,39 @@
 # moto_app/backend/rides/tests.py
 
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import Ride # Ride modelini import et
+from . import heatmap, live_location, nearby_riders
+from .models import Ride, LocationShare, RideTrack, RouteTemplate # Ride modelini import et
+from .geo import bounding_box, geohash_cells_for_radius, geohash_encode, haversine_km
+from .share_retention import prune_shares
+from .route_similarity import candidate_templates, discrete_frechet_m, resample
+from .ride_stats import compute_ride_stats, solar_elevation_deg
+from .polyline import decode_polyline, decode_polyline_py, encode_polyline, route_metrics
+from .track_codec import decode_points, encode_points, simplify_points
+from .tracks import append_points
+from .routing import websocket_urlpatterns
 from rest_framework import status # HTTP durum kodları için
 
 User = get_user_model() # Django'nun özel User modelini al
@@ -233,4 +263,760 @@ class RideTest(APITestCase):
 
         response = self.client.delete(ride_detail_url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED) # Yetkilendirme hatası beklenir
-        self.assertTrue(Ride.objects.filter(pk=ride.pk).exists())
\ No newline at end of file
+        self.assertTrue(Ride.objects.filter(pk=ride.pk).exists())
+
+
+class LiveLocationChannelTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='rider1', email='rider1@example.com', password='testpassword')
+        self.watcher = User.objects.create_user(username='rider2', email='rider2@example.com', password='testpassword')
+        self.stranger = User.objects.create_user(username='rider3', email='rider3@example.com', password='testpassword')
+        self.ride = Ride.objects.create(
+            owner=self.owner, title='Grup Turu', start_location='Gebze',
+            end_location='Şile', start_time=timezone.now(),
+        )
+        self.ride.participants.add(self.watcher)
+        live_location._locmem_store.clear()
+        patcher = mock.patch.object(live_location, 'SNAPSHOT_TICK_SECONDS', 0.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/location/ride/{self.ride.id}/')
+        communicator.scope['user'] = user
+        connected, code = await communicator.connect()
+        return communicator, connected, code
+
+    async def _receive_type(self, communicator, message_type):
+        while True:
+            message = json.loads(await communicator.receive_from(timeout=2))
+            if message['type'] == message_type:
+                return message
+
+    async def test_non_participant_is_rejected(self):
+        """Yolculukta olmayan kullanıcı kanala bağlanamaz"""
+        communicator, connected, code = await self._connect(self.stranger)
+        self.assertFalse(connected)
+        self.assertEqual(code, 4003)
+
+    async def test_updates_are_coalesced_and_sampled(self):
+        """Aynı tick içindeki güncellemeler tek mesajda birleşir, sadece ilk nokta kaydedilir"""
+        rider, connected, _ = await self._connect(self.owner)
+        self.assertTrue(connected)
+        watcher, connected, _ = await self._connect(self.watcher)
+        self.assertTrue(connected)
+        self.assertEqual((await self._receive_type(watcher, 'snapshot'))['positions'], [])
+
+        for step in range(3):
+            await rider.send_to(text_data=json.dumps({
+                'type': 'position', 'latitude': 40.8 + step * 0.0001, 'longitude': 29.4, 'speed': 60,
+            }))
+        await asyncio.sleep(0.01)
+
+        message = await self._receive_type(watcher, 'positions')
+        self.assertEqual(len(message['positions']), 1)
+        self.assertEqual(message['positions'][0]['user_id'], self.owner.id)
+        self.assertAlmostEqual(message['positions'][0]['latitude'], 40.8002)
+
+        shares = await sync_to_async(list)(LocationShare.objects.filter(ride=self.ride))
+        self.assertEqual(len(shares), 1)
+        self.assertTrue(shares[0].is_active)
+
+        await rider.disconnect()
+        message = await self._receive_type(watcher, 'positions')
+        self.assertEqual(message['left'], [self.owner.id])
+        # Tam çözünürlüklü iz bağlantı kapanınca tek parça olarak yazılır
+        track = await sync_to_async(RideTrack.objects.get)(ride=self.ride, user=self.owner)
+        self.assertEqual(track.point_count, 3)
+        self.assertFalse(await sync_to_async(
+            LocationShare.objects.filter(ride=self.ride, is_active=True).exists
+        )())
+        await watcher.disconnect()
+
+    async def test_invalid_coordinates_are_rejected(self):
+        rider, _, _ = await self._connect(self.owner)
+        await self._receive_type(rider, 'snapshot')
+        await rider.send_to(text_data=json.dumps({'type': 'position', 'latitude': 123, 'longitude': 29}))
+        message = await self._receive_type(rider, 'error')
+        self.assertIn('Geçersiz', message['message'])
+        await rider.disconnect()
+
+    def test_breadcrumb_sampling(self):
+        last = live_location.RiderPosition(1, 40.0, 29.0, updated_at=100.0)
+        nearby = live_location.RiderPosition(1, 40.0001, 29.0, updated_at=105.0)
+        far = live_location.RiderPosition(1, 40.01, 29.0, updated_at=105.0)
+        later = live_location.RiderPosition(1, 40.0, 29.0, updated_at=116.0)
+        self.assertFalse(live_location.should_persist_breadcrumb(last, nearby))
+        self.assertTrue(live_location.should_persist_breadcrumb(last, far))
+        self.assertTrue(live_location.should_persist_breadcrumb(last, later))
+
+    def test_packed_position_round_trip(self):
+        position = live_location.RiderPosition(7, 40.123456, 29.654321, speed=55.5, updated_at=1000.5)
+        restored = live_location.RiderPosition.unpack(7, position.pack())
+        self.assertEqual(len(position.pack()), 36)
+        self.assertEqual(restored.to_dict(), position.to_dict())
+
+
+
+def _sample_track(count, start_ms=1700000000000):
+    """Hafif zikzaklı, kuzeye giden örnek iz"""
+    return [
+        (start_ms + i * 1000, 40.8 + i * 0.0001, 29.4 + (0.00001 if i % 2 else 0), 50 + i % 7, 90)
+        for i in range(count)
+    ]
+
+
+class RideTrackTest(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='trackowner', email='track@example.com', password='testpassword')
+        self.other = User.objects.create_user(username='trackother', email='other@example.com', password='testpassword')
+        self.ride = Ride.objects.create(
+            owner=self.owner, title='Sahil Turu', start_location='Kartal',
+            end_location='Şile', start_time=timezone.now(), privacy_level='private',
+        )
+        self.track_url = reverse('ride-track', kwargs={'pk': self.ride.pk})
+
+    def test_codec_round_trip_is_compact(self):
+        """Paketlenmiş iz geri açıldığında aynı noktaları verir ve nokta başına birkaç byte tutar"""
+        points = _sample_track(1000)
+        points[3] = (points[3][0], points[3][1], points[3][2], None, None)
+        data = encode_points(points)
+        self.assertEqual(decode_points(data), [
+            (t, round(lat, 5), round(lng, 5), speed, heading) for t, lat, lng, speed, heading in points
+        ])
+        self.assertLess(len(data) / len(points), 10)
+
+    def test_simplification_drops_collinear_points(self):
+        points = _sample_track(500)
+        simplified = simplify_points(points, 5)
+        self.assertEqual(simplified[0], points[0])
+        self.assertEqual(simplified[-1], points[-1])
+        self.assertEqual(len(simplified), 2)
+        self.assertEqual(len(simplify_points(points, 0.1)), len(points))
+
+    def test_chunks_are_merged_on_completion(self):
+        points = _sample_track(300)
+        append_points(self.ride.id, self.owner.id, points[150:])
+        append_points(self.ride.id, self.owner.id, points[:150])
+        track = RideTrack.objects.get(ride=self.ride, user=self.owner)
+        self.assertEqual(track.chunks.count(), 2)
+        self.assertEqual(track.point_count, 300)
+
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(reverse('ride-complete-ride', kwargs={'pk': self.ride.pk}), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        track.refresh_from_db()
+        self.assertTrue(track.is_finalized)
+        self.assertEqual(track.chunks.count(), 0)
+        self.assertEqual(track.simplified_point_count, 2)
+
+        response = self.client.get(self.track_url, {'resolution': 'full'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        full = response.data['tracks'][0]
+        self.assertEqual(full['returned_points'], 300)
+        self.assertEqual(full['points'][0][0], points[0][0])
+
+        response = self.client.get(self.track_url)
+        self.assertEqual(response.data['tracks'][0]['returned_points'], 2)
+
+    def test_private_track_requires_participation(self):
+        append_points(self.ride.id, self.owner.id, _sample_track(10))
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get(self.track_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(self.track_url, {'tolerance': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.track_url, {'user_id': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class RouteMetricsTest(APITestCase):
+    # Google polyline dokümantasyonundaki örnek rota
+    POLYLINE = '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='routeuser', email='route@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+    def test_codec_matches_reference(self):
+        coords = decode_polyline(self.POLYLINE)
+        self.assertEqual(coords.tolist(), [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]])
+        self.assertEqual(encode_polyline(coords), self.POLYLINE)
+        self.assertEqual([list(point) for point in decode_polyline_py(self.POLYLINE)], coords.tolist())
+
+        route = [[40.99 + i * 0.00013, 29.02 - (i % 5) * 0.00021] for i in range(2000)]
+        self.assertEqual(decode_polyline(encode_polyline(route)).round(5).tolist(), [
+            [round(lat, 5), round(lng, 5)] for lat, lng in route
+        ])
+        with self.assertRaises(ValueError):
+            decode_polyline('_p~iF~ps|U_')
+
+    def test_route_metrics(self):
+        metrics = route_metrics(decode_polyline(self.POLYLINE))
+        self.assertAlmostEqual(metrics['distance_km'], 788.9, delta=0.5)
+        self.assertEqual(metrics['bbox'], [38.5, -126.453, 43.252, -120.2])
+        self.assertEqual(metrics['start'], [38.5, -120.2])
+        self.assertEqual(metrics['end'], [43.252, -126.453])
+
+    def test_ride_metrics_are_computed_on_save(self):
+        """İstemcinin gönderdiği mesafe polyline'dan hesaplanan değerle değiştirilir"""
+        response = self.client.post(reverse('ride-list'), {
+            'title': 'Uzun Yol', 'start_location': 'A', 'end_location': 'B',
+            'start_time': '2025-07-25T10:00:00Z', 'distance_km': 5, 'route_polyline': self.POLYLINE,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        ride = Ride.objects.get(pk=response.data['id'])
+        self.assertAlmostEqual(ride.distance_km, 788.9, delta=0.5)
+        self.assertEqual(ride.start_coordinates, [38.5, -120.2])
+        self.assertEqual(ride.route_bbox, [38.5, -126.453, 43.252, -120.2])
+        self.assertEqual(ride.estimated_duration_minutes, 789)
+
+        # Polyline değişince istemcinin gönderdiği süre de yeniden hesaplanır
+        response = self.client.patch(reverse('ride-detail', kwargs={'pk': ride.pk}), {
+            'route_polyline': encode_polyline([(41.0, 29.0), (41.0, 29.6)]), 'estimated_duration_minutes': 5,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ride.refresh_from_db()
+        self.assertAlmostEqual(ride.distance_km, 50.4, delta=0.5)
+        self.assertEqual(ride.estimated_duration_minutes, 50)
+
+        response = self.client.post(reverse('ride-list'), {
+            'title': 'Bozuk', 'start_location': 'A', 'end_location': 'B',
+            'start_time': '2025-07-25T10:00:00Z', 'route_polyline': 'ä',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_template_metrics_flow_into_rides(self):
+        response = self.client.post(reverse('route-template-list'), {
+            'name': 'Batı Turu', 'route_polyline': self.POLYLINE, 'start_location': 'A',
+            'end_location': 'B', 'distance_km': 1, 'estimated_duration_minutes': 5,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        template = RouteTemplate.objects.get(pk=response.data['id'])
+        self.assertAlmostEqual(template.distance_km, 788.9, delta=0.5)
+        self.assertEqual(template.estimated_duration_minutes, 789)
+        self.assertEqual(template.end_coordinates, [43.252, -126.453])
+
+        response = self.client.post(
+            reverse('route-template-create-ride', kwargs={'pk': template.pk}),
+            {'template_id': template.pk, 'title': 'Şablondan', 'start_time': '2025-07-25T10:00:00Z'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['start_coordinates'], [38.5, -120.2])
+        self.assertEqual(response.data['distance_km'], template.distance_km)
+
+
+
+class RideDiscoveryTest(APITestCase):
+    CENTER = (41.0082, 28.9784)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='nearuser', email='near@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        now = timezone.now()
+        self.close = self._ride('Yakın', [41.0500, 29.0300], now, 'touring')
+        self.medium = self._ride('Orta', [41.1500, 29.0500], now, 'casual')
+        self.far = self._ride('Uzak', [40.7500, 29.9000], now, 'touring')
+        # Bounding-box'ın köşesinde: kutuya girer ama daireye girmez
+        self.corner = self._ride('Köşe', [41.0082 + 0.165, 28.9784 + 0.22], now, 'touring')
+        self.later = self._ride('Sonra', [41.0100, 28.9800], now + timezone.timedelta(days=10), 'touring')
+        self._ride('Koordinatsız', [], now, 'touring')
+
+    def _ride(self, title, coordinates, start_time, ride_type):
+        return Ride.objects.create(
+            owner=self.user, title=title, start_location='İstanbul', end_location='Şile',
+            start_time=start_time, ride_type=ride_type, start_coordinates=coordinates,
+        )
+
+    def test_start_point_columns_follow_coordinates(self):
+        self.assertEqual((self.close.start_lat, self.close.start_lng), (41.05, 29.03))
+        self.close.start_coordinates = [40.0, 30.0]
+        self.close.save(update_fields=['start_coordinates'])
+        self.close.refresh_from_db()
+        self.assertEqual((self.close.start_lat, self.close.start_lng), (40.0, 30.0))
+
+    def test_near_filter_orders_by_distance(self):
+        response = self.client.get(reverse('ride-list'), {'near': '41.0082,28.9784', 'radius_km': 20})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [ride['title'] for ride in response.data]
+        self.assertEqual(titles, ['Sonra', 'Yakın', 'Orta'])
+        self.assertLessEqual(response.data[-1]['distance_from_km'], 20)
+        self.assertGreater(haversine_km(*self.CENTER, 41.0082 + 0.165, 28.9784 + 0.22), 20)
+
+    def test_near_filter_with_time_window_and_type(self):
+        response = self.client.get(reverse('ride-list'), {
+            'near': '41.0082,28.9784', 'radius_km': 20, 'ride_type': 'touring',
+            'start_before': (timezone.now() + timezone.timedelta(days=1)).isoformat(),
+        })
+        self.assertEqual([ride['title'] for ride in response.data], ['Yakın'])
+
+        response = self.client.get(reverse('ride-list'), {'near': '41.0082,28.9784', 'radius_km': 200})
+        self.assertEqual(len(response.data), 5)
+
+    def test_invalid_near_parameters(self):
+        for params in ({'near': 'abc'}, {'near': '95,10'}, {'near': '41,29', 'radius_km': 0}):
+            response = self.client.get(reverse('ride-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bounding_box_wraps_antimeridian(self):
+        min_lat, max_lat, lng_ranges = bounding_box(0, 179.9, 50)
+        self.assertEqual(len(lng_ranges), 2)
+        self.assertEqual(lng_ranges[1][0], -180.0)
+        self.assertLess(lng_ranges[1][1], -179)
+
+
+
+def _straight_ride(start_ts, seconds, speed_kmh=60, lat=41.0, lng=29.0):
+    """Kuzeye sabit hızla giden 1 Hz örnekli iz (timestamps, lat, lng)"""
+    step_deg = speed_kmh / 3600 / 111.195
+    timestamps = [start_ts + i for i in range(seconds + 1)]
+    return timestamps, [lat + i * step_deg for i in range(seconds + 1)], [lng] * (seconds + 1)
+
+
+class RideStatsTest(APITestCase):
+    # 2025-07-01 09:00 UTC (İstanbul'da gündüz) ve 20:00 UTC (gece)
+    DAY_TS = 1751360400
+    NIGHT_TS = 1751400000
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='statsuser', email='stats@example.com', password='testpassword')
+        self.ride = Ride.objects.create(
+            owner=self.user, title='Akşam Turu', start_location='A', end_location='B', start_time=timezone.now(),
+        )
+
+    def test_jitter_and_spikes_are_rejected(self):
+        timestamps, lats, lngs = _straight_ride(self.DAY_TS, 600)
+        lngs[300] += 0.006  # ~500 m'lik tek noktalık GPS sıçraması
+        # 2 dakika durma: yerinde titreşen noktalar
+        last_ts, last_lat = timestamps[-1], lats[-1]
+        for i in range(1, 121):
+            timestamps.append(last_ts + i)
+            lats.append(last_lat + (0.000005 if i % 2 else 0))
+            lngs.append(29.0)
+
+        stats = compute_ride_stats(timestamps, lats, lngs)
+        self.assertAlmostEqual(stats['recorded_distance_km'], 10, delta=0.05)
+        self.assertAlmostEqual(stats['moving_time_minutes'], 10, delta=0.1)
+        self.assertAlmostEqual(stats['max_speed_kmh'], 60, delta=1)
+        self.assertAlmostEqual(stats['avg_speed_kmh'], 60, delta=1)
+        self.assertEqual(stats['night_riding_minutes'], 0)
+        self.assertEqual(stats['stats_point_count'], 721)
+
+    def test_night_minutes(self):
+        self.assertGreater(solar_elevation_deg([self.DAY_TS], [41.0], [29.0])[0], 30)
+        self.assertLess(solar_elevation_deg([self.NIGHT_TS], [41.0], [29.0])[0], -5)
+        stats = compute_ride_stats(*_straight_ride(self.NIGHT_TS, 300))
+        self.assertAlmostEqual(stats['night_riding_minutes'], 5, delta=0.1)
+
+    def test_complete_ride_uses_recorded_track(self):
+        """İstemcinin gönderdiği değerler yok sayılır, kaydedilen iz kullanılır"""
+        timestamps, lats, lngs = _straight_ride(self.DAY_TS, 1200, speed_kmh=90)
+        append_points(self.ride.id, self.user.id, [
+            (ts * 1000, lat, lng, None, None) for ts, lat, lng in zip(timestamps, lats, lngs)
+        ])
+        self.client.force_authenticate(user=self.user)
+        url = reverse('ride-complete-ride', kwargs={'pk': self.ride.pk})
+        response = self.client.post(url, {'distance': 5000, 'max_speed': 400, 'duration': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertAlmostEqual(response.data['stats']['recorded_distance_km'], 30, delta=0.1)
+
+        self.ride.refresh_from_db()
+        self.assertIsNotNone(self.ride.completed_at)
+        self.assertAlmostEqual(self.ride.max_speed_kmh, 90, delta=1)
+        self.assertAlmostEqual(self.ride.moving_time_minutes, 20, delta=0.1)
+
+        from gamification.models import Score
+        score = Score.objects.get(user=self.user)
+        # 30 km * 0.5 + 1 saatten kısa sürüş bonusu
+        self.assertEqual(score.points, 35)
+
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_location_share_fallback(self):
+        timestamps, lats, lngs = _straight_ride(self.DAY_TS, 120, speed_kmh=36)
+        for ts, lat, lng in list(zip(timestamps, lats, lngs))[::15]:
+            share = LocationShare.objects.create(user=self.user, ride=self.ride, latitude=lat, longitude=lng)
+            LocationShare.objects.filter(pk=share.pk).update(
+                created_at=datetime.fromtimestamp(ts, tz=dt_timezone.utc)
+            )
+        from .ride_stats import record_ride_stats
+        stats = record_ride_stats(self.ride)
+        self.assertEqual(stats['stats_point_count'], 9)
+        self.assertAlmostEqual(stats['recorded_distance_km'], 1.2, delta=0.01)
+        self.assertAlmostEqual(stats['avg_speed_kmh'], 36, delta=0.5)
+
+
+
+class TrackIngestTest(APITestCase):
+    START_MS = 1751360400000
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ingestuser', email='ingest@example.com', password='testpassword')
+        self.other = User.objects.create_user(username='ingestother', email='ingest2@example.com', password='testpassword')
+        self.ride = Ride.objects.create(
+            owner=self.user, title='Dağ Turu', start_location='A', end_location='B', start_time=timezone.now(),
+        )
+        self.url = reverse('ride-track', kwargs={'pk': self.ride.pk})
+        self.client.force_authenticate(user=self.user)
+
+    def _points(self, count, start=0):
+        return [
+            [self.START_MS + (start + i) * 1000, 41.0 + (start + i) * 0.0001, 29.0, 45.5, 180, 8]
+            for i in range(count)
+        ]
+
+    def test_bulk_upload_validates_and_deduplicates(self):
+        points = self._points(500)
+        points[10][1] = 95            # geçersiz enlem
+        points[20][5] = 500           # çok kötü doğruluk
+        points[30][3] = None          # hız yok: kabul edilir
+        points += [list(points[40]), list(points[41])]  # yükleme içi tekrar
+
+        response = self.client.post(self.url, {'points': points}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'accepted': 498, 'rejected': 2, 'duplicates': 2, 'point_count': 498})
+
+        # Yanıtı alamayan istemci aynı noktaları tekrar gönderir
+        response = self.client.post(self.url, {'points': self._points(510)}, format='json')
+        self.assertEqual(response.data['accepted'], 12)
+        self.assertEqual(response.data['duplicates'], 498)
+
+        track = RideTrack.objects.get(ride=self.ride, user=self.user)
+        self.assertEqual(track.chunks.count(), 2)
+        response = self.client.get(self.url, {'resolution': 'full'})
+        full = response.data['tracks'][0]['points']
+        self.assertEqual(len(full), 510)
+        self.assertIsNone(full[30][3])
+
+    def test_bulk_upload_is_constant_in_queries(self):
+        """Toplu yükleme nokta sayısından bağımsız sabit sayıda sorgu çalıştırır"""
+        with CaptureQueriesContext(connection) as bulk:
+            self.client.post(self.url, {'points': self._points(1000)}, format='json')
+        with CaptureQueriesContext(connection) as per_point:
+            for lat, lng in [(41.0 + i * 0.0001, 29.0) for i in range(20)]:
+                self.client.post(reverse('location-share-list'), {
+                    'ride': self.ride.id, 'latitude': lat, 'longitude': lng,
+                }, format='json')
+        self.assertLess(len(bulk.captured_queries), 15)
+        self.assertGreaterEqual(len(per_point.captured_queries), 20 * 2)
+
+    def test_rejections(self):
+        response = self.client.post(self.url, {'points': [[1, 2, 3]]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {'points': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.other)
+        response = self.client.post(self.url, {'points': self._points(5)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.url, {'points': self._points(5)}, format='json')
+        self.client.post(reverse('ride-complete-ride', kwargs={'pk': self.ride.pk}), {}, format='json')
+        response = self.client.post(self.url, {'points': self._points(5, start=5)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+
+class NearbyRidersTest(APITestCase):
+    CENTER = (41.0082, 28.9784)
+
+    def setUp(self):
+        self.viewer = User.objects.create_user(username='viewer', email='viewer@example.com', password='testpassword')
+        self.friend = User.objects.create_user(username='friend', email='friend@example.com', password='testpassword')
+        self.follower = User.objects.create_user(username='follower', email='follower@example.com', password='testpassword')
+        self.public = User.objects.create_user(username='public', email='public@example.com', password='testpassword')
+        self.rider = User.objects.create_user(username='ridemate', email='ridemate@example.com', password='testpassword')
+        self.viewer.following.add(self.friend)
+        self.friend.following.add(self.viewer)
+        # Tek yönlü takip arkadaş sayılmaz
+        self.follower.following.add(self.viewer)
+        self.ride = Ride.objects.create(
+            owner=self.rider, title='Akşam Turu', start_location='A', end_location='B', start_time=timezone.now(),
+        )
+        nearby_riders._locmem_grid.clear()
+        self.addCleanup(nearby_riders._locmem_grid.clear)
+        self.url = reverse('location-share-nearby')
+        self.client.force_authenticate(user=self.viewer)
+
+    def _share(self, user, offset_km, share_type, scope_id=None):
+        latitude = self.CENTER[0] + offset_km / 111.2
+        nearby_riders.update_rider_position(user.id, latitude, self.CENTER[1], share_type, scope_id)
+
+    def _nearby(self, **params):
+        params.setdefault('near', f'{self.CENTER[0]},{self.CENTER[1]}')
+        return self.client.get(self.url, params)
+
+    def test_geohash_cells_cover_radius(self):
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        cells = geohash_cells_for_radius(*self.CENTER, 5, nearby_riders.GRID_PRECISION)
+        self.assertIn(geohash_encode(*self.CENTER, nearby_riders.GRID_PRECISION), cells)
+        # Dairenin kenarındaki nokta da kapsanan bir hücrede
+        self.assertIn(geohash_encode(self.CENTER[0] + 4.9 / 111.2, self.CENTER[1], nearby_riders.GRID_PRECISION), cells)
+
+    def test_visibility_follows_share_type(self):
+        self._share(self.friend, 1, 'friends')
+        self._share(self.follower, 1.5, 'friends')
+        self._share(self.public, 0.5, 'public')
+        self._share(self.rider, 2, 'ride', self.ride.id)
+        self._share(self.viewer, 0, 'public')
+
+        response = self._nearby()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['username'] for row in response.data], ['public', 'friend'])
+        self.assertAlmostEqual(response.data[0]['distance_km'], 0.5, places=2)
+
+        self.ride.participants.add(self.viewer)
+        self.assertEqual([row['username'] for row in self._nearby().data], ['public', 'friend', 'ridemate'])
+
+    def test_radius_and_expiry(self):
+        self._share(self.public, 8, 'public')
+        self.assertEqual(self._nearby().data, [])
+        self.assertEqual(len(self._nearby(radius_km=10).data), 1)
+
+        with mock.patch.object(nearby_riders.time, 'time', return_value=time.time() + nearby_riders.NEARBY_TTL_SECONDS + 1):
+            self.assertEqual(self._nearby(radius_km=10).data, [])
+        self.assertEqual(self._nearby(radius_km=10).data, [])
+
+    def test_rest_share_feeds_grid_and_stop_removes(self):
+        self.client.force_authenticate(user=self.public)
+        response = self.client.post(reverse('location-share-list'), {
+            'latitude': self.CENTER[0], 'longitude': self.CENTER[1], 'share_type': 'public',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(user=self.viewer)
+        self.assertEqual([row['username'] for row in self._nearby().data], ['public'])
+
+        self.client.force_authenticate(user=self.public)
+        self.client.post(reverse('location-share-stop-sharing', kwargs={'pk': response.data['id']}))
+        self.client.force_authenticate(user=self.viewer)
+        self.assertEqual(self._nearby().data, [])
+
+    def test_invalid_query(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self._nearby(radius_km=nearby_riders.NEARBY_MAX_RADIUS_KM + 1)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LocationShareRetentionTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sharer', email='sharer@example.com', password='testpassword')
+        self.ride = Ride.objects.create(
+            owner=self.user, title='Sahil Turu', start_location='A', end_location='B', start_time=timezone.now(),
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _share(self, age, is_active=True):
+        share = LocationShare.objects.create(
+            user=self.user, ride=self.ride, latitude=41.0, longitude=29.0, is_active=is_active,
+        )
+        # auto_now'u atlamak için update
+        LocationShare.objects.filter(pk=share.pk).update(updated_at=timezone.now() - age)
+        return share
+
+    def test_stale_shares_are_not_live(self):
+        fresh = self._share(timedelta(minutes=1))
+        self._share(timedelta(hours=2))
+        self._share(timedelta(minutes=1), is_active=False)
+
+        self.assertEqual(list(LocationShare.objects.live()), [fresh])
+        response = self.client.get(reverse('location-share-active-shares'), {'ride_id': self.ride.id})
+        self.assertEqual([row['id'] for row in response.data], [fresh.id])
+
+    def test_prune_command_deactivates_and_deletes_in_chunks(self):
+        fresh = self._share(timedelta(minutes=1))
+        stale = [self._share(timedelta(hours=2)) for _ in range(5)]
+        old = [self._share(timedelta(days=40), is_active=False) for _ in range(7)]
+
+        call_command('prune_location_shares', '--dry-run', stdout=StringIO())
+        self.assertEqual(LocationShare.objects.filter(is_active=True).count(), 6)
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('prune_location_shares', '--chunk-size', '2', stdout=StringIO())
+        # Her parça kendi UPDATE/DELETE'i ile işlenir
+        self.assertGreaterEqual(
+            sum('UPDATE' in query['sql'] and 'rides_locationshare' in query['sql'] for query in queries.captured_queries), 3,
+        )
+
+        self.assertFalse(LocationShare.objects.filter(pk__in=[share.pk for share in old]).exists())
+        self.assertEqual(
+            set(LocationShare.objects.values_list('pk', 'is_active')),
+            {(fresh.pk, True)} | {(share.pk, False) for share in stale},
+        )
+
+    def test_prune_archives_before_delete(self):
+        old = [self._share(timedelta(days=40), is_active=False) for _ in range(3)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'shares.jsonl.gz')
+            self.assertEqual(prune_shares(archive_path=path, chunk_size=2), 3)
+            with gzip.open(path, 'rt', encoding='utf-8') as archive:
+                rows = [json.loads(line) for line in archive]
+        self.assertEqual([row['id'] for row in rows], [share.pk for share in old])
+        self.assertEqual(rows[0]['ride_id'], self.ride.id)
+        self.assertEqual(LocationShare.objects.count(), 0)
+
+
+class RouteHeatmapTest(APITestCase):
+    ROUTE = [(41.00, 29.00), (41.00, 29.10), (41.05, 29.15)]
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='heatuser', email='heat@example.com', password='testpassword')
+        cache.clear()
+
+    def _ride(self, completed=True, privacy_level='public', route=ROUTE):
+        return Ride.objects.create(
+            owner=self.user, title='Boğaz Turu', start_location='A', end_location='B',
+            start_time=timezone.now(), route_polyline=encode_polyline(route),
+            privacy_level=privacy_level, completed_at=timezone.now() if completed else None,
+        )
+
+    def _tile_url(self, zoom=heatmap.MAX_ZOOM, point=ROUTE[0]):
+        x, y = heatmap.tile_for_point(*point, zoom)
+        return reverse('ride-heatmap', kwargs={'zoom': zoom, 'x': x, 'y': y})
+
+    def test_rasterized_segment_has_no_gaps(self):
+        cx, cy = heatmap.rasterize([(41.0, 29.0), (41.0, 29.5)])
+        columns = np.unique(cx)
+        self.assertTrue(np.all(np.diff(columns) == 1))
+        self.assertEqual(np.unique(cy).size, 1)
+
+    def test_incremental_aggregation(self):
+        self._ride()
+        self._ride()
+        self._ride(privacy_level='private')
+        self._ride(completed=False)
+
+        self.assertEqual(heatmap.update_heatmap()[0], 3)
+        response = self.client.get(self._tile_url())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['max_count'], 2)
+        # Düşük zoom'da da bir yolculuk bir hücreyi bir kez sayar
+        self.assertEqual(self.client.get(self._tile_url(zoom=heatmap.MIN_ZOOM)).data['max_count'], 2)
+
+        # Yeni bir şey yoksa hiçbir karo yeniden işlenmez
+        self.assertEqual(heatmap.update_heatmap(), (0, 0))
+
+        self._ride()
+        with CaptureQueriesContext(connection) as queries:
+            ride_count, _ = heatmap.update_heatmap()
+        self.assertEqual(ride_count, 1)
+        self.assertLess(len(queries.captured_queries), 50)
+        self.assertEqual(self.client.get(self._tile_url()).data['max_count'], 3)
+
+    def test_tile_etag(self):
+        self._ride()
+        call_command('build_route_heatmap', stdout=StringIO())
+        url = self._tile_url()
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('max-age', response['Cache-Control'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self._ride()
+        call_command('build_route_heatmap', stdout=StringIO())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Boş ve geçersiz karolar
+        response = self.client.get(self._tile_url(point=(-33.9, 18.4)))
+        self.assertEqual(response.data['cells'], [])
+        response = self.client.get(reverse('ride-heatmap', kwargs={'zoom': 2, 'x': 0, 'y': 0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_public_templates_are_aggregated_once(self):
+        for is_public in (True, False):
+            RouteTemplate.objects.create(
+                name='Boğaz Şablonu', route_polyline=encode_polyline(self.ROUTE), start_location='A',
+                end_location='B', distance_km=0, estimated_duration_minutes=30,
+                is_public=is_public, created_by=self.user,
+            )
+        self._ride()
+
+        self.assertEqual(heatmap.update_heatmap()[0], 3)
+        self.assertEqual(self.client.get(self._tile_url()).data['max_count'], 2)
+        self.assertFalse(heatmap.pending_templates().exists())
+        self.assertEqual(heatmap.update_heatmap(), (0, 0))
+
+        call_command('build_route_heatmap', '--rebuild', stdout=StringIO())
+        self.assertEqual(self.client.get(self._tile_url()).data['max_count'], 2)
+
+    def test_rebuild(self):
+        self._ride()
+        heatmap.update_heatmap()
+        etag = self.client.get(self._tile_url())['ETag']
+        call_command('build_route_heatmap', '--rebuild', stdout=StringIO())
+        # Yeniden oluşturulan karo eski ETag ile 304 dönmez
+        response = self.client.get(self._tile_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['max_count'], 1)
+
+
+class RouteSimilarityTest(APITestCase):
+    BASE = [(41.00, 29.00), (41.00, 29.20), (41.10, 29.30)]
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='shapeuser', email='shape@example.com', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.base = self._template('Temel', self.BASE)
+        self.copy = self._template('Kopya', [(lat + 0.0002, lng) for lat, lng in self.BASE])
+        self.variant = self._template('Varyant', [(41.00, 29.00), (41.00, 29.20), (40.93, 29.32)])
+        self.far = self._template('Ankara', [(39.92, 32.85), (39.92, 33.05), (40.02, 33.15)])
+
+    def _template(self, name, route):
+        return RouteTemplate.objects.create(
+            name=name, route_polyline=encode_polyline(route), start_location='A', end_location='B',
+            distance_km=0, estimated_duration_minutes=0, created_by=self.user,
+        )
+
+    def test_shape_is_indexed_on_save(self):
+        self.assertEqual(len(self.base.shape_vector), 32 * 2 * 4)
+        self.assertEqual(self.base.shape_cell, self.copy.shape_cell)
+        shape = resample(self.BASE)
+        self.assertEqual(shape.shape, (32, 2))
+        self.assertEqual(tuple(shape[0]), self.BASE[0])
+        self.assertEqual(tuple(shape[-1]), self.BASE[-1])
+
+    def test_similar_ranks_within_bucket(self):
+        candidates = candidate_templates(
+            RouteTemplate.objects.all(), self.BASE[0], self.base.route_bbox, self.base.distance_km,
+        )
+        self.assertNotIn(self.far, candidates)
+
+        url = reverse('route-template-similar', kwargs={'pk': self.base.pk})
+        for metric in ('average', 'frechet'):
+            response = self.client.get(url, {'metric': metric})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual([row['name'] for row in response.data], ['Kopya', 'Varyant'])
+            self.assertLess(response.data[0]['shape_distance_m'], 30)
+
+        self.assertEqual(self.client.get(url, {'metric': 'dtw'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(self.client.get(url, {'limit': 1}).data), 1)
+
+    def test_frechet_matches_reference(self):
+        query = np.array([[0.0, 0.0], [0.0, 0.001], [0.0, 0.002]])
+        shifted = query + [0.001, 0.0]
+        distance = discrete_frechet_m(query, np.stack([query, shifted]))
+        self.assertAlmostEqual(distance[0], 0)
+        self.assertAlmostEqual(distance[1], 111.2, delta=0.5)
+
+    def test_duplicate_template_is_rejected(self):
+        payload = {'name': 'Tekrar', 'start_location': 'A', 'end_location': 'B', 'distance_km': 1}
+        response = self.client.post(reverse('route-template-list'), {
+            **payload, 'route_polyline': encode_polyline([(lat, lng + 0.0001) for lat, lng in self.BASE]),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn(response.data['duplicate_of'], (self.base.id, self.copy.id))
+
+        response = self.client.post(reverse('route-template-list'), {
+            **payload, 'route_polyline': encode_polyline([(41.00, 29.00), (41.05, 29.10), (41.20, 29.10)]),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
@@ -0,0 +1,221 @@
+"""
+Yolculuk izi (RideTrack) servisi
+
+Yolculuk sırasında noktalar parça parça eklenir (append_points), yolculuk
+tamamlanınca parçalar birleştirilip sadeleştirilir (finalize_ride_tracks).
+Okuma tarafı izi istenen çözünürlükte döndürür (track_points).
+"""
+import logging
+import math
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+
+from .models import RideTrack, RideTrackChunk
+from .track_codec import decode_columns, decode_points, encode_points, simplify_points
+
+logger = logging.getLogger(__name__)
+
+# Canlı kanalda bu kadar nokta biriktiğinde (veya süre dolduğunda) parça yazılır
+TRACK_CHUNK_POINTS = 120
+TRACK_FLUSH_SECONDS = 60
+# Tamamlanan izlerin saklanan sadeleştirilmiş kopyası için tolerans
+DEFAULT_SIMPLIFY_TOLERANCE_M = 10.0
+MAX_SIMPLIFY_TOLERANCE_M = 1000.0
+TRACK_RESOLUTIONS = ('full', 'simplified')
+
+# Toplu yükleme (çevrimdışı biriktirilmiş noktalar)
+MAX_INGEST_POINTS = 10000
+# Doğruluğu bundan kötü olan noktalar reddedilir
+MAX_INGEST_ACCURACY_M = 100
+# İstemci saat kayması toleransı
+MAX_FUTURE_SKEW_MS = 5 * 60 * 1000
+INGEST_COLUMNS = ('ts', 'lat', 'lng', 'speed', 'heading', 'accuracy')
+
+
+def _from_ms(timestamp_ms):
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=dt_timezone.utc)
+
+
+def append_points(ride_id, user_id, points):
+    """
+    Noktaları kullanıcının yolculuk izine yeni bir parça olarak ekler.
+
+    Args:
+        points: (timestamp_ms, latitude, longitude, speed, heading) listesi
+
+    Returns:
+        RideTrack veya None (nokta yoksa ya da iz zaten tamamlanmışsa)
+    """
+    if not points:
+        return None
+
+    points = sorted(points, key=lambda point: point[0])
+    with transaction.atomic():
+        track, _ = RideTrack.objects.get_or_create(ride_id=ride_id, user_id=user_id)
+        track = RideTrack.objects.select_for_update().get(pk=track.pk)
+        if track.is_finalized:
+            logger.warning(f"Tamamlanmış ize nokta eklenemez - Ride {ride_id}, User {user_id}")
+            return None
+
+        last_sequence = track.chunks.aggregate(last=Max('sequence'))['last']
+        RideTrackChunk.objects.create(
+            track=track,
+            sequence=0 if last_sequence is None else last_sequence + 1,
+            point_count=len(points),
+            data=encode_points(points),
+        )
+
+        first_at, last_at = _from_ms(points[0][0]), _from_ms(points[-1][0])
+        track.point_count += len(points)
+        track.started_at = min(track.started_at or first_at, first_at)
+        track.ended_at = max(track.ended_at or last_at, last_at)
+        track.save(update_fields=['point_count', 'started_at', 'ended_at', 'updated_at'])
+    return track
+
+
+def _chunk_points(track):
+    points = []
+    for data in track.chunks.order_by('sequence').values_list('data', flat=True):
+        points.extend(decode_points(data))
+    # Parçalar farklı bağlantılardan gelebilir; zamana göre sırala, tekrarları at
+    points.sort(key=lambda point: point[0])
+    return [point for i, point in enumerate(points) if i == 0 or point[0] != points[i - 1][0]]
+
+
+def load_points(track):
+    """İzin tüm noktaları"""
+    if track.is_finalized:
+        return decode_points(track.data)
+    return _chunk_points(track)
+
+
+def load_columns(track):
+    """İzin tüm noktaları kolon dizileri olarak (bkz. track_codec.decode_columns)"""
+    if track.is_finalized:
+        return decode_columns(track.data)
+
+    parts = [decode_columns(data) for data in track.chunks.order_by('sequence').values_list('data', flat=True)]
+    if not parts:
+        return decode_columns(b'')
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    # np.unique zamana göre sıralar ve tekrarlanan timestamp'leri atar
+    _, index = np.unique(columns['timestamp_ms'], return_index=True)
+    return {name: values[index] for name, values in columns.items()}
+
+
+def validate_ingest_points(raw_points, existing_timestamps=(), now_ms=None):
+    """
+    [ts_ms, lat, lng, speed, heading, accuracy] satırlarını tek geçişte doğrular.
+
+    speed, heading ve accuracy null olabilir. Geçersiz satırlar reddedilir,
+    aynı timestamp'li satırlardan (yükleme içinde veya izde zaten varsa)
+    sadece ilki tutulur.
+
+    Raises:
+        ValueError: Payload bir sayı matrisi değilse
+
+    Returns:
+        (points, stats): append_points'e verilecek noktalar ve
+        accepted/rejected/duplicates sayıları
+    """
+    rows = np.array(raw_points, dtype=float)
+    if rows.ndim != 2 or rows.shape[1] != len(INGEST_COLUMNS):
+        raise ValueError(f'Her nokta {len(INGEST_COLUMNS)} elemanlı olmalıdır: {", ".join(INGEST_COLUMNS)}')
+    ts, lat, lng, speed, heading, accuracy = rows.T
+
+    if now_ms is None:
+        now_ms = datetime.now(tz=dt_timezone.utc).timestamp() * 1000
+    valid = (
+        np.isfinite(ts) & (ts > 0) & (ts <= now_ms + MAX_FUTURE_SKEW_MS)
+        & (np.abs(lat) <= 90) & (np.abs(lng) <= 180)
+        & (np.isnan(speed) | (speed >= 0))
+        & (np.isnan(heading) | ((heading >= 0) & (heading <= 360)))
+        & (np.isnan(accuracy) | ((accuracy >= 0) & (accuracy <= MAX_INGEST_ACCURACY_M)))
+    )
+    rejected = int((~valid).sum())
+
+    ts = ts[valid].astype(np.int64)
+    _, first = np.unique(ts, return_index=True)
+    unique = np.zeros(ts.size, dtype=bool)
+    unique[first] = True
+    unique &= ~np.isin(ts, np.asarray(existing_timestamps, dtype=np.int64))
+    duplicates = int(ts.size - unique.sum())
+
+    columns = [ts[unique]] + [column[valid][unique] for column in (lat, lng, speed, heading)]
+    points = [
+        (t, la, ln, None if math.isnan(sp) else sp, None if math.isnan(hd) else hd)
+        for t, la, ln, sp, hd in zip(*(column.tolist() for column in columns))
+    ]
+    return points, {'accepted': len(points), 'rejected': rejected, 'duplicates': duplicates}
+
+
+def ingest_points(ride, user, raw_points):
+    """
+    Çevrimdışı biriktirilmiş noktaları doğrular ve ize tek parça olarak ekler.
+
+    Returns:
+        dict: accepted, rejected, duplicates, point_count; iz tamamlanmışsa None
+    """
+    track = RideTrack.objects.filter(ride=ride, user=user).first()
+    if track is not None and track.is_finalized:
+        return None
+    existing = load_columns(track)['timestamp_ms'] if track is not None else ()
+
+    points, stats = validate_ingest_points(raw_points, existing)
+    if points:
+        track = append_points(ride.id, user.id, points)
+        if track is None:
+            return None
+    stats['point_count'] = track.point_count if track is not None else 0
+    return stats
+
+
+def finalize_track(track, tolerance_m=DEFAULT_SIMPLIFY_TOLERANCE_M):
+    """Parçaları tek blob'da birleştirir, sadeleştirilmiş kopyayı üretir"""
+    with transaction.atomic():
+        track = RideTrack.objects.select_for_update().get(pk=track.pk)
+        if track.is_finalized:
+            return track
+
+        points = _chunk_points(track)
+        simplified = simplify_points(points, tolerance_m)
+        track.data = encode_points(points)
+        track.point_count = len(points)
+        track.simplified_data = encode_points(simplified)
+        track.simplified_point_count = len(simplified)
+        track.simplify_tolerance_m = tolerance_m
+        track.is_finalized = True
+        track.save()
+        track.chunks.all().delete()
+    return track
+
+
+def finalize_ride_tracks(ride, tolerance_m=DEFAULT_SIMPLIFY_TOLERANCE_M):
+    """Yolculuğun tamamlanmamış tüm izlerini birleştirir"""
+    tracks = []
+    for track in RideTrack.objects.filter(ride=ride, is_finalized=False):
+        try:
+            tracks.append(finalize_track(track, tolerance_m))
+        except Exception as e:
+            logger.error(f"İz birleştirilemedi - Track {track.id}: {e}")
+    return tracks
+
+
+def track_points(track, resolution='simplified', tolerance_m=None):
+    """
+    İzi istenen çözünürlükte döndürür.
+
+    resolution='full' tüm noktaları, 'simplified' saklanan sadeleştirilmiş
+    kopyayı döndürür. tolerance_m verilirse tam iz bu toleransla yeniden
+    sadeleştirilir.
+    """
+    if tolerance_m is not None:
+        return simplify_points(load_points(track), tolerance_m)
+    if resolution == 'full':
+        return load_points(track)
+    if track.is_finalized:
+        return decode_points(track.simplified_data)
+    return simplify_points(_chunk_points(track), DEFAULT_SIMPLIFY_TOLERANCE_M)
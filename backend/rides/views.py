@@ -6,12 +6,25 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
-from .models import Ride, RideRequest, RouteFavorite, LocationShare, RouteTemplate
+from .models import Ride, RideRequest, RouteFavorite, LocationShare, RouteTemplate, RideTrack
 from .serializers import (
     RideSerializer, RideRequestSerializer, RouteFavoriteSerializer,
     LocationShareSerializer, RouteTemplateSerializer, CreateRideFromTemplateSerializer
 )
 from .permissions import IsOwnerOrReadOnly
+from .discovery import bbox_q, parse_datetime_param, parse_near, within_radius
+from . import heatmap as route_heatmap
+from .nearby_riders import (
+    NEARBY_DEFAULT_RADIUS_KM, NEARBY_MAX_RADIUS_KM, nearby_riders, remove_rider, update_rider_position,
+)
+from .ride_stats import record_ride_stats
+from .route_similarity import (
+    SIMILAR_DEFAULT_LIMIT, SIMILAR_MAX_LIMIT, SIMILARITY_METRICS, find_duplicate, rank_similar,
+)
+from .tracks import (
+    MAX_INGEST_POINTS, MAX_SIMPLIFY_TOLERANCE_M, TRACK_RESOLUTIONS,
+    finalize_ride_tracks, ingest_points, track_points,
+)
 
 class RideViewSet(viewsets.ModelViewSet):
     queryset = Ride.objects.all()
@@ -20,11 +33,37 @@ class RideViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        start_location = self.request.query_params.get('start_location')
+        params = self.request.query_params
+        start_location = params.get('start_location')
         if start_location:
             queryset = queryset.filter(start_location__iexact=start_location)
+
+        ride_type = params.get('ride_type')
+        if ride_type:
+            queryset = queryset.filter(ride_type=ride_type)
+        start_after = parse_datetime_param(params, 'start_after')
+        if start_after:
+            queryset = queryset.filter(start_time__gte=start_after)
+        start_before = parse_datetime_param(params, 'start_before')
+        if start_before:
+            queryset = queryset.filter(start_time__lte=start_before)
+
+        # ?near=lat,lng&radius_km=: indexli kolonlarda bounding-box ön filtresi
+        near = parse_near(params)
+        if near:
+            queryset = queryset.filter(bbox_q(*near))
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        near = parse_near(request.query_params)
+        if not near:
+            return super().list(request, *args, **kwargs)
+
+        # Bounding-box adayları tam mesafeyle elenir ve mesafeye göre sıralanır
+        rides = within_radius(self.get_queryset(), *near)
+        serializer = self.get_serializer(rides, many=True)
+        return Response(serializer.data)
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
@@ -241,11 +280,9 @@ class RideViewSet(viewsets.ModelViewSet):
         """
         Yolculuğu tamamla ve puan/başarım ver
         URL: /api/rides/<ride_id>/complete_ride/
-        Body: {
-            "distance": 150,  # km
-            "max_speed": 95,  # km/h
-            "duration": 120   # dakika
-        }
+
+        Mesafe, azami hız ve süre istemciden alınmaz; sürücünün kaydedilen
+        noktalarından (RideTrack veya LocationShare) hesaplanır.
         """
         ride = get_object_or_404(Ride, pk=pk)
         user = request.user
@@ -264,27 +301,150 @@ class RideViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Yolculuk verilerini al
-        distance = request.data.get('distance', 0)
-        max_speed = request.data.get('max_speed', 0)
-        duration = request.data.get('duration', 0)
-        
         # Yolculuğu tamamla
-        ride.end_time = timezone.now()
-        ride.save()
+        now = timezone.now()
+        ride.end_time = now
+        ride.completed_at = now
+        ride.save(update_fields=['end_time', 'completed_at', 'updated_at'])
+
+        # Canlı kanalda parça parça yazılan izleri birleştir ve sadeleştir
+        finalize_ride_tracks(ride)
+
+        # İstatistikleri kaydedilen noktalardan hesapla
+        stats = record_ride_stats(ride)
         
         # Puan ve başarım sistemi
-        self._award_points_and_achievements(user, distance, max_speed, duration)
+        self._award_points_and_achievements(
+            user, stats['recorded_distance_km'], stats['max_speed_kmh'], stats['moving_time_minutes']
+        )
         
         serializer = self.get_serializer(ride)
         return Response(
             {
                 "detail": "Yolculuk başarıyla tamamlandı! Puanlarınız ve başarımlarınız güncellendi.",
-                "ride": serializer.data
+                "ride": serializer.data,
+                "stats": stats,
             },
             status=status.HTTP_200_OK
         )
-    
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def track(self, request, pk=None):
+        """
+        Yolculuğun GPS izlerini istenen çözünürlükte döndürür.
+        URL: /api/rides/<ride_id>/track/?resolution=simplified|full&tolerance=<metre>&user_id=<id>
+        Noktalar [timestamp_ms, latitude, longitude, speed, heading] listeleridir.
+        """
+        ride = get_object_or_404(Ride, pk=pk)
+        user = request.user
+        if ride.privacy_level != 'public' and ride.owner_id != user.id \
+                and not ride.participants.filter(id=user.id).exists():
+            return Response(
+                {"detail": "Bu yolculuğun izini görüntüleme yetkiniz yok."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        resolution = request.query_params.get('resolution', 'simplified')
+        if resolution not in TRACK_RESOLUTIONS:
+            return Response(
+                {"detail": f"Geçersiz çözünürlük. Seçenekler: {', '.join(TRACK_RESOLUTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        tolerance = request.query_params.get('tolerance')
+        if tolerance is not None:
+            try:
+                tolerance = float(tolerance)
+            except ValueError:
+                tolerance = -1
+            if not 0 < tolerance <= MAX_SIMPLIFY_TOLERANCE_M:
+                return Response(
+                    {"detail": f"tolerance 0 ile {MAX_SIMPLIFY_TOLERANCE_M:g} metre arasında olmalıdır."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        ride_tracks = RideTrack.objects.filter(ride=ride).select_related('user').order_by('user_id')
+        user_id = request.query_params.get('user_id')
+        if user_id:
+            try:
+                user_id = int(user_id)
+            except ValueError:
+                return Response(
+                    {"detail": "user_id geçerli bir kullanıcı ID'si olmalıdır."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            ride_tracks = ride_tracks.filter(user_id=user_id)
+
+        results = []
+        for ride_track in ride_tracks:
+            points = track_points(ride_track, resolution, tolerance)
+            results.append({
+                'user_id': ride_track.user_id,
+                'username': ride_track.user.username,
+                'point_count': ride_track.point_count,
+                'returned_points': len(points),
+                'started_at': ride_track.started_at,
+                'ended_at': ride_track.ended_at,
+                'is_finalized': ride_track.is_finalized,
+                'points': [list(point) for point in points],
+            })
+        return Response({'resolution': resolution, 'tolerance': tolerance, 'tracks': results})
+
+    @track.mapping.post
+    def upload_track_points(self, request, pk=None):
+        """
+        Çevrimdışı biriktirilmiş konumları tek istekte yükler.
+        URL: POST /api/rides/<ride_id>/track/
+        Body: {"points": [[ts_ms, lat, lng, speed, heading, accuracy], ...]}
+        speed, heading ve accuracy null olabilir.
+        """
+        ride = get_object_or_404(Ride, pk=pk)
+        user = request.user
+        if ride.owner_id != user.id and not ride.participants.filter(id=user.id).exists():
+            return Response(
+                {"detail": "Sadece yolculuğun sahibi ve katılımcıları konum yükleyebilir."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        points = request.data.get('points')
+        if not isinstance(points, list) or not points:
+            return Response({"detail": "points boş olmayan bir liste olmalıdır."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(points) > MAX_INGEST_POINTS:
+            return Response(
+                {"detail": f"Tek istekte en fazla {MAX_INGEST_POINTS} nokta yüklenebilir."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            result = ingest_points(ride, user, points)
+        except (ValueError, TypeError) as e:
+            return Response({"detail": f"Geçersiz nokta verisi: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        if result is None:
+            return Response({"detail": "Bu yolculuğun izi tamamlanmış."}, status=status.HTTP_409_CONFLICT)
+        return Response(result, status=status.HTTP_201_CREATED if result['accepted'] else status.HTTP_200_OK)
+
+    @action(
+        detail=False, methods=['get'], permission_classes=[permissions.AllowAny],
+        url_path=r'heatmap/(?P<zoom>\d+)/(?P<x>\d+)/(?P<y>\d+)',
+    )
+    def heatmap(self, request, zoom=None, x=None, y=None):
+        """
+        Popüler rotalar ısı haritası karosu (Web Mercator z/x/y).
+        URL: /api/rides/heatmap/<zoom>/<x>/<y>/
+        If-None-Match ETag ile eşleşirse 304 döner.
+        """
+        zoom, x, y = int(zoom), int(x), int(y)
+        if not route_heatmap.is_valid_tile(zoom, x, y):
+            return Response(
+                {"detail": f"Geçersiz karo. Zoom {route_heatmap.MIN_ZOOM}-{route_heatmap.MAX_ZOOM} arasında olmalıdır."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        etag, payload = route_heatmap.get_tile(zoom, x, y)
+        headers = {'ETag': etag, 'Cache-Control': f'public, max-age={route_heatmap.CLIENT_CACHE_SECONDS}'}
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(payload, headers=headers)
+
     def _award_points_and_achievements(self, user, distance, max_speed, duration):
         """Kullanıcıya puan ve başarım ver"""
         from gamification.models import Score
@@ -298,7 +458,7 @@ class RideViewSet(viewsets.ModelViewSet):
             base_points += speed_bonus
         
         # Süre bonusu (çok hızlı tamamlama)
-        if duration < 60:  # 1 saatten az
+        if 0 < duration < 60:  # 1 saatten az
             time_bonus = 20
             base_points += time_bonus
         
@@ -306,7 +466,7 @@ class RideViewSet(viewsets.ModelViewSet):
         Score.objects.create(
             user=user,
             points=base_points,
-            activity_name=f"Ride completed: {distance}km, {max_speed}km/h"
+            activity_name=f"Ride completed: {distance:.1f}km, {max_speed:.0f}km/h"
         )
         
         # Başarım ilerlemelerini güncelle
@@ -341,7 +501,7 @@ class RideViewSet(viewsets.ModelViewSet):
                 achievement=achievement,
                 defaults={'progress': 0}
             )
-            user_achievement.progress += distance
+            user_achievement.progress += round(distance)
             user_achievement.save()
         
         # Hız başarımı
@@ -356,7 +516,7 @@ class RideViewSet(viewsets.ModelViewSet):
                 defaults={'progress': 0}
             )
             # Hız için maksimum değeri güncelle
-            user_achievement.progress = max(user_achievement.progress, max_speed)
+            user_achievement.progress = max(user_achievement.progress, round(max_speed))
             user_achievement.save()
 
 
@@ -405,7 +565,23 @@ class LocationShareViewSet(viewsets.ModelViewSet):
         return LocationShare.objects.filter(user=self.request.user)
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        share = serializer.save(user=self.request.user)
+        if share.is_active:
+            update_rider_position(
+                share.user_id, share.latitude, share.longitude, share.share_type,
+                share.ride_id or share.group_id,
+            )
+    
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """
+        Yakında konum paylaşan sürücüler: ?near=lat,lng&radius_km=
+        Sadece izleyicinin paylaşım türüne göre görebildiği sürücüler döner.
+        """
+        near = parse_near(request.query_params, NEARBY_DEFAULT_RADIUS_KM, NEARBY_MAX_RADIUS_KM)
+        if near is None:
+            return Response({'detail': 'near parametresi gereklidir.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(nearby_riders(request.user, *near))
     
     @action(detail=False, methods=['get'])
     def active_shares(self, request):
@@ -413,7 +589,8 @@ class LocationShareViewSet(viewsets.ModelViewSet):
         ride_id = request.query_params.get('ride_id')
         group_id = request.query_params.get('group_id')
         
-        queryset = LocationShare.objects.filter(is_active=True)
+        # Canlı takip için ws/location/ kanalı kullanılır; bu uç nokta son kaydedilen noktaları döndürür
+        queryset = LocationShare.objects.live().select_related('user')
         
         if ride_id:
             queryset = queryset.filter(ride_id=ride_id)
@@ -429,6 +606,7 @@ class LocationShareViewSet(viewsets.ModelViewSet):
         location_share = self.get_object()
         location_share.is_active = False
         location_share.save()
+        remove_rider(location_share.user_id)
         
         return Response({"detail": "Konum paylaşımı durduruldu."})
 
@@ -441,9 +619,58 @@ class RouteTemplateViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return RouteTemplate.objects.filter(is_public=True)
     
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        # Aynı rotanın tekrar şablon olarak eklenmesini engelle
+        duplicate = find_duplicate(self.get_queryset(), serializer.validated_data['route_polyline'])
+        if duplicate is not None:
+            return Response(
+                {"detail": "Bu rota zaten bir şablon olarak mevcut.", "duplicate_of": duplicate.id},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
     
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Bu şablona şekilce benzeyen şablonlar
+        URL: /api/route-templates/<id>/similar/?metric=average|frechet&limit=
+        """
+        template = self.get_object()
+        metric = request.query_params.get('metric', 'average')
+        if metric not in SIMILARITY_METRICS:
+            return Response(
+                {"detail": f"metric şunlardan biri olmalıdır: {', '.join(SIMILARITY_METRICS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', SIMILAR_DEFAULT_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= SIMILAR_MAX_LIMIT:
+            return Response(
+                {"detail": f"limit 1 ile {SIMILAR_MAX_LIMIT} arasında olmalıdır."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if template.shape_vector is None:
+            return Response([])
+        
+        ranked = rank_similar(
+            self.get_queryset(), template.shape_vector, template.route_bbox, template.distance_km,
+            metric=metric, limit=limit, exclude_id=template.id,
+        )
+        data = self.get_serializer([similar for similar, _ in ranked], many=True).data
+        for item, (_, distance_m) in zip(data, ranked):
+            item['shape_distance_m'] = round(distance_m, 1)
+        return Response(data)
+    
     @action(detail=False, methods=['get'])
     def by_category(self, request):
         """Kategoriye göre şablonları getir"""
@@ -472,8 +699,9 @@ class RouteTemplateViewSet(viewsets.ModelViewSet):
                 description=ride_data.get('description', ''),
                 start_location=template.start_location,
                 end_location=template.end_location,
-                start_coordinates=template.waypoints[0] if template.waypoints else [],
-                end_coordinates=template.waypoints[-1] if template.waypoints else [],
+                start_coordinates=template.start_coordinates,
+                end_coordinates=template.end_coordinates,
+                route_bbox=template.route_bbox,
                 start_time=ride_data['start_time'],
                 max_participants=ride_data.get('max_participants'),
                 privacy_level=ride_data.get('privacy_level', 'public'),
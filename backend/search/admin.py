@@ -14,13 +14,14 @@ class SearchIndexAdmin(admin.ModelAdmin):
     list_filter = ['created_at', 'updated_at']
     search_fields = ['username', 'first_name', 'last_name', 'email', 'group_name']
     readonly_fields = ['created_at', 'updated_at']
+    raw_id_fields = ['user', 'group']
     
     fieldsets = (
         ('Kullanıcı Bilgileri', {
-            'fields': ('user_id', 'username', 'first_name', 'last_name', 'email', 'full_name', 'search_vector')
+            'fields': ('user', 'username', 'first_name', 'last_name', 'email', 'full_name', 'search_vector')
         }),
         ('Grup Bilgileri', {
-            'fields': ('group_id', 'group_name', 'group_description', 'group_search_vector')
+            'fields': ('group', 'group_name', 'group_description', 'group_search_vector')
         }),
         ('Sistem Bilgileri', {
             'fields': ('created_at', 'updated_at'),
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SearchConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "search"
+
+    def ready(self):
+        # SearchIndex'i User/Group değişiklikleriyle artımlı güncel tutar
+        from . import signals  # noqa: F401
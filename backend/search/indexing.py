@@ -0,0 +1,140 @@
+"""
+SearchIndex bakımı
+
+User ve Group kayıtları değiştikçe sadece ilgili SearchIndex satırı tek bir
+upsert (INSERT ... ON CONFLICT DO UPDATE) ile güncellenir; silindiklerinde
+satır silinir (bkz. search/signals.py). Tam yeniden kurulum sync_search_index
+management command'ı ile chunk'lar halinde yapılır.
+"""
+import logging
+import time
+
+from django.contrib.auth import get_user_model
+
+from groups.models import Group
+from .models import SearchIndex
+from .suggest import invalidate_suggestions, normalize_prefix
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+REBUILD_CHUNK_SIZE = 1000
+
+# Bu alanlardan biri değişmediyse (örn. sadece last_login) index güncellenmez
+USER_INDEXED_FIELDS = {
+    'username', 'first_name', 'last_name', 'email', 'bio', 'motorcycle_model', 'location',
+}
+GROUP_INDEXED_FIELDS = {'name', 'description'}
+
+USER_UPDATE_FIELDS = [
+    'username', 'first_name', 'last_name', 'email', 'full_name', 'search_vector',
+    'username_prefix', 'name_prefix', 'updated_at',
+]
+GROUP_UPDATE_FIELDS = [
+    'group_name', 'group_description', 'group_search_vector', 'name_prefix', 'updated_at',
+]
+
+
+def user_index_entry(user):
+    """Kullanıcı için (kaydedilmemiş) SearchIndex satırı"""
+    full_name = f"{user.first_name or ''} {user.last_name or ''}".strip()
+    return SearchIndex(
+        user_id=user.id,
+        username=user.username,
+        first_name=user.first_name or '',
+        last_name=user.last_name or '',
+        email=user.email or '',
+        full_name=full_name,
+        username_prefix=normalize_prefix(user.username),
+        name_prefix=normalize_prefix(full_name),
+        search_vector=f"{user.username} {user.first_name or ''} {user.last_name or ''} {user.email or ''} {user.bio or ''} {user.motorcycle_model or ''} {user.location or ''}".strip(),
+    )
+
+
+def group_index_entry(group):
+    """Grup için (kaydedilmemiş) SearchIndex satırı"""
+    return SearchIndex(
+        group_id=group.id,
+        group_name=group.name,
+        name_prefix=normalize_prefix(group.name),
+        group_description=group.description or '',
+        group_search_vector=f"{group.name} {group.description or ''}".strip(),
+    )
+
+
+def _upsert_users(entries):
+    SearchIndex.objects.bulk_create(
+        entries, update_conflicts=True, unique_fields=['user_id'], update_fields=USER_UPDATE_FIELDS
+    )
+
+
+def _upsert_groups(entries):
+    SearchIndex.objects.bulk_create(
+        entries, update_conflicts=True, unique_fields=['group_id'], update_fields=GROUP_UPDATE_FIELDS
+    )
+
+
+def index_user(user):
+    _upsert_users([user_index_entry(user)])
+    invalidate_suggestions()
+
+
+def index_group(group):
+    _upsert_groups([group_index_entry(group)])
+    invalidate_suggestions()
+
+
+def remove_user(user_id):
+    SearchIndex.objects.filter(user_id=user_id).delete()
+    invalidate_suggestions()
+
+
+def remove_group(group_id):
+    SearchIndex.objects.filter(group_id=group_id).delete()
+    invalidate_suggestions()
+
+
+def _chunked(queryset, chunk_size):
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def rebuild_search_index(chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    SearchIndex'i User ve Group tablolarından tamamen yeniden kurar.
+
+    Satırlar chunk_size'lık bulk upsert'lerle yazılır, artık var olmayan
+    kullanıcı/grup satırları silinir.
+
+    Returns:
+        dict: users, groups, removed sayıları ve süre (saniye)
+    """
+    start_time = time.time()
+    stats = {'users': 0, 'groups': 0, 'removed': 0}
+
+    user_fields = ['id', 'username', 'first_name', 'last_name', 'email', 'bio', 'motorcycle_model', 'location']
+    for users in _chunked(User.objects.only(*user_fields).order_by('id'), chunk_size):
+        _upsert_users([user_index_entry(user) for user in users])
+        stats['users'] += len(users)
+
+    for groups in _chunked(Group.objects.only('id', 'name', 'description').order_by('id'), chunk_size):
+        _upsert_groups([group_index_entry(group) for group in groups])
+        stats['groups'] += len(groups)
+
+    # Silinmiş kullanıcı/grupların ve sahipsiz satırların temizliği
+    stale_users = SearchIndex.objects.filter(user_id__isnull=False).exclude(user_id__in=User.objects.values('id'))
+    stale_groups = SearchIndex.objects.filter(group_id__isnull=False).exclude(group_id__in=Group.objects.values('id'))
+    orphans = SearchIndex.objects.filter(user_id__isnull=True, group_id__isnull=True)
+    for queryset in (stale_users, stale_groups, orphans):
+        stats['removed'] += queryset.delete()[0]
+
+    invalidate_suggestions()
+    stats['elapsed'] = round(time.time() - start_time, 3)
+    logger.info(f"✅ Search index yeniden kuruldu: {stats}")
+    return stats
@@ -1,12 +1,16 @@
 """
-Search index'i senkronize etmek için management command
+Search index'i tamamen yeniden kurmak için management command
+
+Günlük bakım signal'lar ile artımlı yapılır (bkz. search/signals.py); bu
+command ilk kurulum veya veri onarımı içindir.
 """
 from django.core.management.base import BaseCommand
-from search.pg_trgm_search import pg_trgm_search_engine
+from search.indexing import REBUILD_CHUNK_SIZE, rebuild_search_index
+from search.models import SearchIndex
 
 
 class Command(BaseCommand):
-    help = 'Search index\'i User ve Group modelleri ile senkronize eder'
+    help = 'Search index\'i User ve Group modellerinden chunk\'lar halinde yeniden kurar'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -14,21 +18,27 @@ class Command(BaseCommand):
             action='store_true',
             help='Mevcut index\'i temizleyip yeniden oluştur',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=REBUILD_CHUNK_SIZE,
+            help=f'Tek upsert sorgusundaki satır sayısı (varsayılan: {REBUILD_CHUNK_SIZE})',
+        )
 
     def handle(self, *args, **options):
         if options['force']:
             self.stdout.write(
-                self.style.WARNING('Search index temizleniyor ve yeniden oluşturuluyor...')
+                self.style.WARNING('Search index temizleniyor...')
             )
-            pg_trgm_search_engine.clear_cache()
-            self.stdout.write(
-                self.style.SUCCESS('Search index başarıyla temizlendi ve yeniden oluşturuldu!')
-            )
-        else:
-            self.stdout.write(
-                self.style.WARNING('Search index senkronize ediliyor...')
-            )
-            pg_trgm_search_engine.force_sync()
-            self.stdout.write(
-                self.style.SUCCESS('Search index başarıyla senkronize edildi!')
+            SearchIndex.objects.all().delete()
+
+        self.stdout.write(
+            self.style.WARNING('Search index yeniden kuruluyor...')
+        )
+        stats = rebuild_search_index(chunk_size=options['chunk_size'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Search index yeniden kuruldu: {stats['users']} kullanıcı, {stats['groups']} grup, "
+                f"{stats['removed']} eski satır silindi ({stats['elapsed']} saniye)"
             )
+        )
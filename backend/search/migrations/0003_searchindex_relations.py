@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    user_id / group_id kolonları aynen kalır (integer, unique); sadece model
+    state'inde FK constraint'siz OneToOneField'a çevrilir, böylece arama
+    sonuçları ranking sorgusunda JOIN ile gelebilir.
+    """
+
+    dependencies = [
+        ('groups', '0005_group_approval_system'),
+        ('search', '0002_create_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[],
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='searchindex',
+                    name='group_id',
+                ),
+                migrations.RemoveField(
+                    model_name='searchindex',
+                    name='user_id',
+                ),
+                migrations.AddField(
+                    model_name='searchindex',
+                    name='group',
+                    field=models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='groups.group'),
+                ),
+                migrations.AddField(
+                    model_name='searchindex',
+                    name='user',
+                    field=models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:19
+
+from django.db import migrations, models
+
+
+def _normalize(value):
+    # search.suggest.normalize_prefix ile aynı
+    return ' '.join((value or '').lower().split())
+
+
+def fill_prefix_columns(apps, schema_editor):
+    """Mevcut index satırlarının prefix kolonlarını doldurur"""
+    SearchIndex = apps.get_model('search', 'SearchIndex')
+    batch = []
+    for entry in SearchIndex.objects.only('id', 'user_id', 'username', 'full_name', 'group_name').iterator(chunk_size=1000):
+        if entry.user_id:
+            entry.username_prefix = _normalize(entry.username)
+            entry.name_prefix = _normalize(entry.full_name)
+        else:
+            entry.name_prefix = _normalize(entry.group_name)
+        batch.append(entry)
+        if len(batch) >= 1000:
+            SearchIndex.objects.bulk_update(batch, ['username_prefix', 'name_prefix'])
+            batch = []
+    if batch:
+        SearchIndex.objects.bulk_update(batch, ['username_prefix', 'name_prefix'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0003_searchindex_relations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchindex',
+            name='name_prefix',
+            field=models.CharField(blank=True, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='searchindex',
+            name='username_prefix',
+            field=models.CharField(blank=True, max_length=150),
+        ),
+        migrations.RunPython(fill_prefix_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='searchindex',
+            index=models.Index(fields=['username_prefix'], name='search_username_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='searchindex',
+            index=models.Index(fields=['name_prefix'], name='search_name_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -1,7 +1,21 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.postgres.search import TrigramSimilarity
 
 
+def member_count_expression(group_ref='pk'):
+    """Grup üye sayısı için COUNT alt sorgusu"""
+    from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+    from django.db.models.functions import Coalesce
+    from groups.models import Group
+
+    Membership = Group.members.through
+    counts = Membership.objects.filter(
+        group_id=OuterRef(group_ref)
+    ).order_by().values('group_id').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
 class SearchIndex(models.Model):
     """
     Arama için optimize edilmiş index modeli
@@ -9,7 +23,16 @@ class SearchIndex(models.Model):
     """
     
     # Kullanıcı arama indexi
-    user_id = models.IntegerField(unique=True, null=True, blank=True)
+    # FK constraint yok: satır signal'lar ile yönetilir, ilişki sadece
+    # sonuçların ranking sorgusunda JOIN ile gelmesi için tanımlı
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
     username = models.CharField(max_length=150, db_index=True)
     first_name = models.CharField(max_length=150, blank=True)
     last_name = models.CharField(max_length=150, blank=True)
@@ -18,17 +41,34 @@ class SearchIndex(models.Model):
     search_vector = models.TextField(blank=True)  # Tüm arama alanlarının birleşimi
     
     # Grup arama indexi
-    group_id = models.IntegerField(unique=True, null=True, blank=True)
+    group = models.OneToOneField(
+        'groups.Group',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
     group_name = models.CharField(max_length=200, blank=True)
     group_description = models.TextField(blank=True)
     group_search_vector = models.TextField(blank=True)  # Grup arama alanlarının birleşimi
     
+    # Typeahead için küçük harfe çevrilmiş prefix kolonları
+    # (kullanıcı: username / ad soyad, grup: grup adı)
+    username_prefix = models.CharField(max_length=150, blank=True)
+    name_prefix = models.CharField(max_length=300, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'search_index'
-        # Indexler migration'da manuel olarak oluşturuluyor (gin_trgm_ops ile)
+        # Trigram indexleri migration'da manuel olarak oluşturuluyor (gin_trgm_ops ile)
+        # Prefix indexleri: PostgreSQL'de LIKE 'abc%' için varchar_pattern_ops kullanılır
+        indexes = [
+            models.Index(fields=['username_prefix'], name='search_username_prefix_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['name_prefix'], name='search_name_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
     
     def __str__(self):
         if self.user_id:
@@ -38,12 +78,16 @@ class SearchIndex(models.Model):
         return f"Search Index: {self.id}"
     
     @classmethod
-    def search_users(cls, query, limit=20, similarity_threshold=0.3):
+    def search_users(cls, query, limit=20, similarity_threshold=0.3, viewer=None):
         """
         pg_trgm kullanarak kullanıcı arama
+
+        Kullanıcı satırı JOIN ile, takipçi/takip sayıları ve viewer'ın takip
+        durumu alt sorgularla aynı SQL'de gelir.
         """
         from django.db.models import Q, F
         from django.contrib.postgres.search import TrigramSimilarity
+        from users.utils import annotate_follow_state
         
         if not query or len(query.strip()) < 2:
             return cls.objects.none()
@@ -51,9 +95,9 @@ class SearchIndex(models.Model):
         query = query.strip()
         
         # Trigram similarity ile arama
-        return cls.objects.filter(
+        queryset = cls.objects.filter(
             user_id__isnull=False
-        ).annotate(
+        ).select_related('user').annotate(
             # Her alan için similarity hesapla
             username_similarity=TrigramSimilarity('username', query),
             first_name_similarity=TrigramSimilarity('first_name', query),
@@ -79,12 +123,15 @@ class SearchIndex(models.Model):
                 'email_similarity',
                 'search_vector_similarity'
             )
-        ).order_by('-max_similarity')[:limit]
+        )
+        return annotate_follow_state(queryset, viewer, user_ref='user_id').order_by('-max_similarity')[:limit]
     
     @classmethod
     def search_groups(cls, query, limit=20, similarity_threshold=0.3):
         """
         pg_trgm kullanarak grup arama
+
+        Grup ve sahibi JOIN ile, üye sayısı alt sorgu ile aynı SQL'de gelir.
         """
         from django.db.models import Q, F
         from django.contrib.postgres.search import TrigramSimilarity
@@ -97,6 +144,8 @@ class SearchIndex(models.Model):
         # Trigram similarity ile arama
         return cls.objects.filter(
             group_id__isnull=False
+        ).select_related('group__owner').annotate(
+            member_total=member_count_expression('group_id'),
         ).annotate(
             # Her alan için similarity hesapla
             group_name_similarity=TrigramSimilarity('group_name', query),
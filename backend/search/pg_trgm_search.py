@@ -1,9 +1,13 @@
 """
 PostgreSQL pg_trgm extension tabanlı arama sistemi
 Bu modül kullanıcı ve grup aramaları için pg_trgm kullanır
+
+SearchIndex istek sırasında senkronize edilmez; signal'lar ile artımlı olarak
+güncellenir (bkz. search/indexing.py).
 """
 from django.contrib.auth import get_user_model
 from groups.models import Group
+from .indexing import rebuild_search_index
 from .models import SearchIndex
 from typing import Dict, List
 import time
@@ -16,93 +20,15 @@ class PgTrgmSearchEngine:
     PostgreSQL pg_trgm extension tabanlı arama motoru
     """
     
-    def __init__(self):
-        self.last_sync = 0
-        self.sync_interval = 300  # 5 dakika
-        
-    def _should_sync(self):
-        """
-        Index'in senkronize edilip edilmeyeceğini kontrol et
-        """
-        return (time.time() - self.last_sync) > self.sync_interval
-    
-    def _sync_search_index(self):
-        """
-        SearchIndex'i User ve Group modelleri ile senkronize et
-        """
-        print("🔄 PgTrgmSearchEngine - Search index senkronize ediliyor...")
-        start_time = time.time()
-        
-        # Kullanıcıları senkronize et
-        users = User.objects.all()
-        for user in users:
-            search_index, created = SearchIndex.objects.get_or_create(
-                user_id=user.id,
-                defaults={
-                    'username': user.username,
-                    'first_name': user.first_name or '',
-                    'last_name': user.last_name or '',
-                    'email': user.email or '',
-                    'full_name': f"{user.first_name or ''} {user.last_name or ''}".strip(),
-                    'search_vector': f"{user.username} {user.first_name or ''} {user.last_name or ''} {user.email or ''} {user.bio or ''} {user.motorcycle_model or ''} {user.location or ''}".strip(),
-                }
-            )
-            
-            if not created:
-                # Mevcut kaydı güncelle
-                search_index.username = user.username
-                search_index.first_name = user.first_name or ''
-                search_index.last_name = user.last_name or ''
-                search_index.email = user.email or ''
-                search_index.full_name = f"{user.first_name or ''} {user.last_name or ''}".strip()
-                search_index.search_vector = f"{user.username} {user.first_name or ''} {user.last_name or ''} {user.email or ''} {user.bio or ''} {user.motorcycle_model or ''} {user.location or ''}".strip()
-                search_index.save()
-        
-        # Grupları senkronize et
-        groups = Group.objects.all()
-        for group in groups:
-            search_index, created = SearchIndex.objects.get_or_create(
-                group_id=group.id,
-                defaults={
-                    'group_name': group.name,
-                    'group_description': group.description or '',
-                    'group_search_vector': f"{group.name} {group.description or ''}".strip(),
-                }
-            )
-            
-            if not created:
-                # Mevcut kaydı güncelle
-                search_index.group_name = group.name
-                search_index.group_description = group.description or ''
-                search_index.group_search_vector = f"{group.name} {group.description or ''}".strip()
-                search_index.save()
-        
-        # Kullanılmayan kayıtları temizle
-        SearchIndex.objects.filter(
-            user_id__isnull=True,
-            group_id__isnull=True
-        ).delete()
-        
-        self.last_sync = time.time()
-        elapsed_time = time.time() - start_time
-        
-        print(f"✅ PgTrgmSearchEngine - Search index senkronize edildi ({elapsed_time:.3f} saniye)")
-    
-    def _ensure_synced(self):
-        """
-        Search index'in güncel olduğundan emin ol
-        """
-        if self._should_sync():
-            self._sync_search_index()
-    
-    def search_users(self, query: str, limit: int = 20, similarity_threshold: float = 0.3) -> List[Dict]:
+    def search_users(self, query: str, limit: int = 20, similarity_threshold: float = 0.3, viewer=None) -> List[Dict]:
         """
         pg_trgm kullanarak kullanıcı arama
+
+        Sonuçlar tek SQL sorgusunda (ranking + kullanıcı JOIN + takip sayıları) gelir.
         """
         if not query or len(query.strip()) < 2:
             return []
         
-        self._ensure_synced()
         query = query.strip()
         
         print(f"🔍 PgTrgmSearchEngine - Kullanıcı arama: '{query}'")
@@ -112,42 +38,40 @@ class PgTrgmSearchEngine:
         search_results = SearchIndex.search_users(
             query=query,
             limit=limit,
-            similarity_threshold=similarity_threshold
+            similarity_threshold=similarity_threshold,
+            viewer=viewer
         )
         
-        # Sonuçları User modelinden al ve formatla
+        # Sonuçları JOIN ile gelen kullanıcı satırından formatla
         results = []
         for search_item in search_results:
-            try:
-                user = User.objects.get(id=search_item.user_id)
-                user_data = {
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'first_name': user.first_name or '',
-                    'last_name': user.last_name or '',
-                    'profile_picture': user.profile_picture,
-                    'cover_picture': user.cover_picture,
-                    'bio': user.bio,
-                    'motorcycle_model': user.motorcycle_model,
-                    'location': user.location,
-                    'website': user.website,
-                    'phone_number': user.phone_number,
-                    'address': user.address,
-                    'date_joined': user.date_joined,
-                    'is_active': user.is_active,
-                    'followers_count': 0,  # Bu alan için ayrı sorgu gerekebilir
-                    'following_count': 0,
-                    'display_name': user.first_name or user.username,
-                    'join_date': user.date_joined.strftime('%B %Y'),
-                    'is_following': False,
-                    'similarity_score': float(search_item.max_similarity),
-                }
-                results.append(user_data)
-            except User.DoesNotExist:
-                # Kullanıcı silinmişse search index'ten de sil
-                search_item.delete()
+            user = search_item.user
+            if user is None:
+                # Kullanıcı silinmiş, index satırı signal ile temizlenir
                 continue
+            results.append({
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'first_name': user.first_name or '',
+                'last_name': user.last_name or '',
+                'profile_picture': user.profile_picture,
+                'cover_picture': user.cover_picture,
+                'bio': user.bio,
+                'motorcycle_model': user.motorcycle_model,
+                'location': user.location,
+                'website': user.website,
+                'phone_number': user.phone_number,
+                'address': user.address,
+                'date_joined': user.date_joined,
+                'is_active': user.is_active,
+                'followers_count': search_item.followers_total,
+                'following_count': search_item.following_total,
+                'display_name': user.first_name or user.username,
+                'join_date': user.date_joined.strftime('%B %Y'),
+                'is_following': bool(search_item.viewer_is_following),
+                'similarity_score': float(search_item.max_similarity),
+            })
         
         elapsed_time = time.time() - start_time
         print(f"✅ PgTrgmSearchEngine - {len(results)} kullanıcı bulundu ({elapsed_time:.3f} saniye)")
@@ -157,11 +81,12 @@ class PgTrgmSearchEngine:
     def search_groups(self, query: str, limit: int = 20, similarity_threshold: float = 0.3) -> List[Dict]:
         """
         pg_trgm kullanarak grup arama
+
+        Sonuçlar tek SQL sorgusunda (ranking + grup/sahip JOIN + üye sayısı) gelir.
         """
         if not query or len(query.strip()) < 2:
             return []
         
-        self._ensure_synced()
         query = query.strip()
         
         print(f"🔍 PgTrgmSearchEngine - Grup arama: '{query}'")
@@ -174,29 +99,26 @@ class PgTrgmSearchEngine:
             similarity_threshold=similarity_threshold
         )
         
-        # Sonuçları Group modelinden al ve formatla
+        # Sonuçları JOIN ile gelen grup satırından formatla
         results = []
         for search_item in search_results:
-            try:
-                group = Group.objects.get(id=search_item.group_id)
-                group_data = {
-                    'id': group.id,
-                    'name': group.name,
-                    'description': group.description or '',
-                    'profile_picture': group.profile_picture_url,  # Grup modelindeki alan adı
-                    'member_count': group.member_count,  # Property olarak tanımlı
-                    'is_public': group.is_public,
-                    'owner_id': group.owner.id,
-                    'owner_username': group.owner.username,
-                    'created_at': group.created_at,
-                    'is_active': True,  # Grup modelinde is_active alanı yok, varsayılan olarak True
-                    'similarity_score': float(search_item.max_similarity),
-                }
-                results.append(group_data)
-            except Group.DoesNotExist:
-                # Grup silinmişse search index'ten de sil
-                search_item.delete()
+            group = search_item.group
+            if group is None:
+                # Grup silinmiş, index satırı signal ile temizlenir
                 continue
+            results.append({
+                'id': group.id,
+                'name': group.name,
+                'description': group.description or '',
+                'profile_picture': group.profile_picture_url,  # Grup modelindeki alan adı
+                'member_count': search_item.member_total,
+                'is_public': group.is_public,
+                'owner_id': group.owner_id,
+                'owner_username': group.owner.username,
+                'created_at': group.created_at,
+                'is_active': True,  # Grup modelinde is_active alanı yok, varsayılan olarak True
+                'similarity_score': float(search_item.max_similarity),
+            })
         
         elapsed_time = time.time() - start_time
         print(f"✅ PgTrgmSearchEngine - {len(results)} grup bulundu ({elapsed_time:.3f} saniye)")
@@ -250,16 +172,14 @@ class PgTrgmSearchEngine:
         Search index'i temizle ve yeniden oluştur
         """
         SearchIndex.objects.all().delete()
-        self.last_sync = 0
-        self._sync_search_index()
+        rebuild_search_index()
         print("🗑️ PgTrgmSearchEngine - Cache temizlendi ve yeniden oluşturuldu")
     
     def force_sync(self):
         """
-        Search index'i zorla senkronize et
+        Search index'i zorla senkronize et (tam yeniden kurulum)
         """
-        self.last_sync = 0
-        self._sync_search_index()
+        return rebuild_search_index()
 
 
 # Global instance
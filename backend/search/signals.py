@@ -0,0 +1,62 @@
+"""
+User ve Group değişikliklerini SearchIndex'e artımlı olarak yansıtır
+"""
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from groups.models import Group
+from . import indexing
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+def _touches(update_fields, indexed_fields):
+    # update_fields verilmemişse tüm alanlar kaydedilmiş sayılır
+    return update_fields is None or bool(set(update_fields) & indexed_fields)
+
+
+@receiver(post_save, sender=User, dispatch_uid='search_index_user_saved')
+def user_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches(update_fields, indexing.USER_INDEXED_FIELDS):
+        return
+    try:
+        # Savepoint: index hatası dış transaction'ı bozmasın
+        with transaction.atomic():
+            indexing.index_user(instance)
+    except Exception as e:
+        # Index hatası kullanıcı kaydını engellememeli
+        logger.error(f"Search index güncellenemedi - User {instance.id}: {e}")
+
+
+@receiver(post_delete, sender=User, dispatch_uid='search_index_user_deleted')
+def user_deleted(sender, instance, **kwargs):
+    try:
+        with transaction.atomic():
+            indexing.remove_user(instance.id)
+    except Exception as e:
+        logger.error(f"Search index satırı silinemedi - User {instance.id}: {e}")
+
+
+@receiver(post_save, sender=Group, dispatch_uid='search_index_group_saved')
+def group_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not _touches(update_fields, indexing.GROUP_INDEXED_FIELDS):
+        return
+    try:
+        with transaction.atomic():
+            indexing.index_group(instance)
+    except Exception as e:
+        logger.error(f"Search index güncellenemedi - Group {instance.id}: {e}")
+
+
+@receiver(post_delete, sender=Group, dispatch_uid='search_index_group_deleted')
+def group_deleted(sender, instance, **kwargs):
+    try:
+        with transaction.atomic():
+            indexing.remove_group(instance.id)
+    except Exception as e:
+        logger.error(f"Search index satırı silinemedi - Group {instance.id}: {e}")
@@ -0,0 +1,141 @@
+"""
+Typeahead (yazarken arama) önerileri
+
+Kısa sorgular sadece küçük harfli prefix kolonları üzerinde LIKE 'abc%' ile
+çalışır (PostgreSQL'de varchar_pattern_ops indexi). Daha uzun sorgularda
+prefix sonuçları yetmezse pg_trgm sıralamasıyla tamamlanır. Sonuçlar
+normalize edilmiş sorgu başına kısa süre cache'lenir; cache anahtarı index
+güncellendikçe artan bir versiyon içerir, böylece index değişince eski
+öneriler bir daha okunmaz.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+# Bu uzunluğa kadar sadece prefix eşleşmesi kullanılır
+PREFIX_ONLY_MAX_LENGTH = 3
+SUGGEST_TRIGRAM_THRESHOLD = 0.3
+SUGGEST_TYPES = ('users', 'groups')
+
+_VERSION_KEY = 'search_suggest_version'
+
+
+def normalize_prefix(value):
+    """Küçük harf, tek boşluk"""
+    return ' '.join((value or '').lower().split())
+
+
+def invalidate_suggestions():
+    """Index güncellendiğinde tüm öneri cache'ini geçersiz kılar"""
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 2, None)
+
+
+def _cache_key(kind, query, limit):
+    version = cache.get_or_set(_VERSION_KEY, 1, None)
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    return f'search_suggest:{version}:{kind}:{limit}:{digest}'
+
+
+def _user_suggestions(query, limit):
+    from .models import SearchIndex
+
+    fields = ('user_id', 'username', 'full_name', 'user__profile_picture')
+    rows = list(
+        SearchIndex.objects.filter(user_id__isnull=False).filter(
+            Q(username_prefix__startswith=query) | Q(name_prefix__startswith=query)
+        ).order_by('username_prefix').values(*fields)[:limit]
+    )
+
+    if len(rows) < limit and len(query) > PREFIX_ONLY_MAX_LENGTH:
+        seen = [row['user_id'] for row in rows]
+        if connection.vendor == 'postgresql':
+            ranked = SearchIndex.search_users(
+                query, limit=limit, similarity_threshold=SUGGEST_TRIGRAM_THRESHOLD
+            ).values(*fields)
+        else:
+            ranked = SearchIndex.objects.filter(user_id__isnull=False).filter(
+                Q(username_prefix__contains=query) | Q(name_prefix__contains=query)
+            ).order_by('username_prefix').values(*fields)[:limit]
+        rows += [row for row in ranked if row['user_id'] not in seen][:limit - len(rows)]
+
+    return [
+        {
+            'type': 'user',
+            'id': row['user_id'],
+            'username': row['username'],
+            'full_name': row['full_name'],
+            'profile_picture': row['user__profile_picture'],
+        }
+        for row in rows
+    ]
+
+
+def _group_suggestions(query, limit):
+    from .models import SearchIndex
+
+    fields = ('group_id', 'group_name', 'group__profile_picture_url')
+    rows = list(
+        SearchIndex.objects.filter(
+            group_id__isnull=False, name_prefix__startswith=query
+        ).order_by('name_prefix').values(*fields)[:limit]
+    )
+
+    if len(rows) < limit and len(query) > PREFIX_ONLY_MAX_LENGTH:
+        seen = [row['group_id'] for row in rows]
+        if connection.vendor == 'postgresql':
+            ranked = SearchIndex.search_groups(
+                query, limit=limit, similarity_threshold=SUGGEST_TRIGRAM_THRESHOLD
+            ).values(*fields)
+        else:
+            ranked = SearchIndex.objects.filter(
+                group_id__isnull=False, name_prefix__contains=query
+            ).order_by('name_prefix').values(*fields)[:limit]
+        rows += [row for row in ranked if row['group_id'] not in seen][:limit - len(rows)]
+
+    return [
+        {
+            'type': 'group',
+            'id': row['group_id'],
+            'name': row['group_name'],
+            'profile_picture': row['group__profile_picture_url'],
+        }
+        for row in rows
+    ]
+
+
+def get_suggestions(query, kind='all', limit=SUGGEST_DEFAULT_LIMIT):
+    """
+    Sorgu prefix'i için kullanıcı ve/veya grup önerileri döndürür.
+
+    Args:
+        query: Kullanıcının yazdığı metin (en az 1 karakter)
+        kind: 'users', 'groups' veya 'all'
+        limit: Tür başına en fazla öneri sayısı
+
+    Returns:
+        dict: {'users': [...], 'groups': [...]} (sadece istenen türler)
+    """
+    query = normalize_prefix(query)
+    if not query:
+        return {}
+    kinds = SUGGEST_TYPES if kind == 'all' else (kind,)
+
+    key = _cache_key(kind, query, limit)
+    suggestions = cache.get(key)
+    if suggestions is None:
+        suggestions = {}
+        if 'users' in kinds:
+            suggestions['users'] = _user_suggestions(query, limit)
+        if 'groups' in kinds:
+            suggestions['groups'] = _group_suggestions(query, limit)
+        timeout = getattr(settings, 'CACHE_TIMEOUTS', {}).get('search_suggest', 30)
+        cache.set(key, suggestions, timeout)
+    return suggestions
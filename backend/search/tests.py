@@ -1,3 +1,184 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from groups.models import Group
+from .indexing import rebuild_search_index
+from .models import SearchIndex
+
+User = get_user_model()
+
+
+class SearchIndexMaintenanceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='searchuser',
+            email='search@example.com',
+            password='testpassword',
+            first_name='Ali',
+            last_name='Veli'
+        )
+
+    def test_user_changes_are_indexed_incrementally(self):
+        entry = SearchIndex.objects.get(user_id=self.user.id)
+        self.assertEqual(entry.full_name, 'Ali Veli')
+
+        self.user.motorcycle_model = 'Yamaha MT-07'
+        self.user.save()
+        entry.refresh_from_db()
+        self.assertIn('Yamaha MT-07', entry.search_vector)
+        self.assertEqual(SearchIndex.objects.filter(user_id=self.user.id).count(), 1)
+
+        self.user.delete()
+        self.assertFalse(SearchIndex.objects.filter(user_id=self.user.id).exists())
+
+    def test_unrelated_field_updates_skip_index(self):
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['last_login'])
+
+    def test_group_changes_are_indexed_incrementally(self):
+        group = Group.objects.create(name='Boğaz Turu', description='Hafta sonu', owner=self.user)
+        self.assertEqual(SearchIndex.objects.get(group_id=group.id).group_search_vector, 'Boğaz Turu Hafta sonu')
+
+        group.name = 'Karadeniz Turu'
+        group.save()
+        self.assertEqual(SearchIndex.objects.get(group_id=group.id).group_name, 'Karadeniz Turu')
+
+        group_id = group.id
+        group.delete()
+        self.assertFalse(SearchIndex.objects.filter(group_id=group_id).exists())
+
+    def test_rebuild_repairs_index_in_chunks(self):
+        users = [
+            User.objects.create_user(username=f'rebuild{i}', email=f'rebuild{i}@example.com', password='testpassword')
+            for i in range(5)
+        ]
+        group = Group.objects.create(name='Yeniden Kur', owner=self.user)
+        # Bozuk durum: eksik, eski ve sahipsiz satırlar
+        SearchIndex.objects.filter(user_id=users[0].id).delete()
+        SearchIndex.objects.filter(user_id=users[1].id).update(username='eski')
+        SearchIndex.objects.create(user_id=999999, username='silinmis')
+        SearchIndex.objects.create(username='sahipsiz')
+
+        stats = rebuild_search_index(chunk_size=2)
+
+        self.assertEqual(stats['users'], 6)
+        self.assertEqual(stats['groups'], 1)
+        self.assertEqual(stats['removed'], 2)
+        self.assertEqual(
+            set(SearchIndex.objects.filter(user_id__isnull=False).values_list('user_id', flat=True)),
+            {self.user.id, *(u.id for u in users)}
+        )
+        self.assertEqual(SearchIndex.objects.get(user_id=users[1].id).username, 'rebuild1')
+        self.assertTrue(SearchIndex.objects.filter(group_id=group.id).exists())
+
+    def test_management_command_force_rebuild(self):
+        SearchIndex.objects.all().delete()
+        call_command('sync_search_index', '--force', '--chunk-size', '10', stdout=StringIO())
+        self.assertTrue(SearchIndex.objects.filter(user_id=self.user.id).exists())
+
+
+class SearchResultHydrationTest(APITestCase):
+    """
+    Arama sonuçlarının sonuç sayısından bağımsız sabit sorguyla geldiğini test eder.
+    """
+
+    def setUp(self):
+        self.viewer = User.objects.create_user(username='viewer', email='viewer@example.com', password='testpassword')
+        self.riders = [
+            User.objects.create_user(
+                username=f'motorcu{i}', email=f'motorcu{i}@example.com', password='testpassword', first_name='Motorcu'
+            )
+            for i in range(4)
+        ]
+        self.viewer.following.add(self.riders[0])
+        self.riders[1].following.add(self.riders[0])
+        for i, rider in enumerate(self.riders):
+            group = Group.objects.create(name=f'Motorcu Grubu {i}', description='Motorcu kulübü', owner=rider)
+            group.members.add(self.viewer, *self.riders[:i])
+        self.client.force_authenticate(user=self.viewer)
+
+    @skipUnless(connection.vendor == 'postgresql', 'pg_trgm sadece PostgreSQL üzerinde')
+    def test_user_search_is_single_query(self):
+        from .pg_trgm_search import pg_trgm_search_engine
+
+        with self.assertNumQueries(1):
+            results = pg_trgm_search_engine.search_users('motorcu', similarity_threshold=0.1, viewer=self.viewer)
+        by_username = {result['username']: result for result in results}
+        self.assertEqual(by_username['motorcu0']['followers_count'], 2)
+        self.assertTrue(by_username['motorcu0']['is_following'])
+        self.assertFalse(by_username['motorcu1']['is_following'])
+        self.assertEqual(by_username['motorcu1']['following_count'], 1)
+
+    @skipUnless(connection.vendor == 'postgresql', 'pg_trgm sadece PostgreSQL üzerinde')
+    def test_group_search_is_single_query(self):
+        from .pg_trgm_search import pg_trgm_search_engine
+
+        with self.assertNumQueries(1):
+            results = pg_trgm_search_engine.search_groups('motorcu grubu', similarity_threshold=0.1)
+        by_name = {result['name']: result for result in results}
+        self.assertEqual(by_name['Motorcu Grubu 3']['member_count'], 4)
+        self.assertEqual(by_name['Motorcu Grubu 3']['owner_username'], 'motorcu3')
+
+    def test_group_search_endpoint_query_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('search-groups'), {'q': 'motorcu'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 4)
+        if connection.vendor != 'postgresql':
+            by_name = {result['name']: result for result in response.data}
+            self.assertEqual(by_name['Motorcu Grubu 2']['member_count'], 3)
+            self.assertEqual(by_name['Motorcu Grubu 2']['owner'], 'motorcu2')
+
+
+class SearchSuggestTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(username='okuyucu', email='okuyucu@example.com', password='testpassword')
+        self.ahmet = User.objects.create_user(
+            username='ahmet_r1', email='ahmet@example.com', password='testpassword', first_name='Ahmet', last_name='Kaya'
+        )
+        self.mehmet = User.objects.create_user(
+            username='mehmet', email='mehmet@example.com', password='testpassword', first_name='Mehmet', last_name='Ahmetoğlu'
+        )
+        self.group = Group.objects.create(name='Ahmetler Kulübü', owner=self.mehmet)
+        self.url = reverse('search-suggest')
+        self.client.force_authenticate(user=self.viewer)
+
+    def test_single_character_prefix_matches_username_and_name(self):
+        response = self.client.get(self.url, {'q': 'A'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([u['username'] for u in response.data['users']], ['ahmet_r1'])
+        self.assertEqual([g['name'] for g in response.data['groups']], ['Ahmetler Kulübü'])
+
+        response = self.client.get(self.url, {'q': 'mehmet ah', 'type': 'users'})
+        self.assertEqual([u['id'] for u in response.data['users']], [self.mehmet.id])
+        self.assertNotIn('groups', response.data)
+
+    def test_longer_queries_fall_back_to_ranking(self):
+        response = self.client.get(self.url, {'q': 'hmet', 'type': 'users'})
+        self.assertEqual({u['username'] for u in response.data['users']}, {'ahmet_r1', 'mehmet'})
+
+    def test_repeated_prefix_is_served_from_cache(self):
+        self.client.get(self.url, {'q': 'ah'})
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'q': ' AH '})
+        self.assertEqual(len(response.data['users']), 1)
+
+    def test_index_update_invalidates_cache(self):
+        self.assertEqual(self.client.get(self.url, {'q': 'zey', 'type': 'users'}).data['users'], [])
+        User.objects.create_user(username='zeynep', email='zeynep@example.com', password='testpassword')
+        response = self.client.get(self.url, {'q': 'zey', 'type': 'users'})
+        self.assertEqual([u['username'] for u in response.data['users']], ['zeynep'])
 
-# Create your tests here.
+    def test_invalid_type_is_rejected(self):
+        response = self.client.get(self.url, {'q': 'ah', 'type': 'posts'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
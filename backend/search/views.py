@@ -11,6 +11,8 @@ from django.contrib.auth import get_user_model
 from groups.models import Group
 from groups.serializers import GroupSerializer
 from users.serializers import UserSerializer
+from .models import member_count_expression
+from .suggest import SUGGEST_DEFAULT_LIMIT, SUGGEST_MAX_LIMIT, get_suggestions
 
 # Database vendor'a göre search engine'i import et
 if connection.vendor == 'postgresql':
@@ -42,7 +44,8 @@ def search_users(request):
             results = pg_trgm_search_engine.search_users(
                 query=query,
                 limit=limit,
-                similarity_threshold=similarity_threshold
+                similarity_threshold=similarity_threshold,
+                viewer=request.user
             )
             print(f"✅ search_users - pg_trgm ile {len(results)} kullanıcı bulundu")
         else:
@@ -78,6 +81,27 @@ def search_users(request):
         return Response([])  # Boş sorgu için hiç sonuç döndürme
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_suggest(request):
+    """
+    Yazarken arama (typeahead) endpoint'i - prefix index + kısa süreli cache
+    
+    Parametreler: q (en az 1 karakter), type (users | groups | all), limit
+    """
+    query = request.query_params.get('q', '')
+    kind = request.query_params.get('type', 'all')
+    if kind not in ('users', 'groups', 'all'):
+        return Response({'detail': "type 'users', 'groups' veya 'all' olmalı"}, status=400)
+    try:
+        limit = int(request.query_params.get('limit', SUGGEST_DEFAULT_LIMIT))
+    except (TypeError, ValueError):
+        limit = SUGGEST_DEFAULT_LIMIT
+    limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+    
+    return Response(get_suggestions(query, kind=kind, limit=limit))
+
+
 @method_decorator(never_cache, name='dispatch')
 class UserSearchView(generics.ListAPIView):
     serializer_class = UserSerializer
@@ -116,6 +140,8 @@ def search_groups(request):
             groups = Group.objects.filter(
                 Q(name__icontains=query) |
                 Q(description__icontains=query)
+            ).select_related('owner').annotate(
+                member_total=member_count_expression()
             )[:limit]
             
             results = []
@@ -125,7 +151,7 @@ def search_groups(request):
                     'name': group.name,
                     'description': group.description,
                     'owner': group.owner.username,
-                    'member_count': group.member_count,
+                    'member_count': group.member_total,
                     'similarity_score': 1.0,  # SQLite için sabit skor
                 })
             print(f"✅ search_groups - SQLite LIKE ile {len(results)} grup bulundu")
@@ -103,6 +103,22 @@ def main():
                 print("⏳ Waiting 10 seconds before retry...")
                 time.sleep(10)
     
+    # Okunmamış sayaçlarını mevcut kayıtlarla doldur/düzelt (Redis store için gerekli)
+    print("🔢 Reconciling unread counters...")
+    try:
+        result = subprocess.run([
+            sys.executable, 'manage.py', 'reconcile_unread_counters'
+        ], capture_output=True, text=True, timeout=120)
+
+        if result.returncode == 0:
+            print("✅ Unread counters reconciled")
+        else:
+            print(f"⚠️ Unread counter reconcile warning: {result.stderr}")
+    except subprocess.TimeoutExpired:
+        print("⚠️ Unread counter reconcile timed out - continuing anyway")
+    except Exception as e:
+        print(f"⚠️ Unread counter reconcile failed: {e} - continuing anyway")
+
     # Superuser oluşturma kaldırıldı - gerekli değil
     print("✅ Skipping superuser creation - not needed")
     
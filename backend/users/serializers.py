@@ -200,9 +200,14 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
     def get_followers_count(self, obj):
+        # annotate_follow_state ile gelen sayı varsa ek sorgu yapma
+        if hasattr(obj, 'followers_total'):
+            return obj.followers_total
         return obj.followers.count()
 
     def get_following_count(self, obj):
+        if hasattr(obj, 'following_total'):
+            return obj.following_total
         return obj.following.count()
 
     def get_profile_photo_url(self, obj):
@@ -233,6 +238,8 @@ class UserSerializer(serializers.ModelSerializer):
         """
         Mevcut kullanıcının bu kullanıcıyı takip edip etmediğini döner
         """
+        if hasattr(obj, 'viewer_is_following'):
+            return obj.viewer_is_following
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return request.user.following.filter(id=obj.id).exists()
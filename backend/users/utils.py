@@ -0,0 +1,64 @@
+# users/utils.py
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+User = get_user_model()
+Follow = User.following.through
+
+
+def _follow_count_subquery(field, user_ref='pk'):
+    """Takip tablosunda verilen alana göre COUNT alt sorgusu"""
+    counts = Follow.objects.filter(
+        **{field: OuterRef(user_ref)}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def followers_count_expression(user_ref='pk'):
+    """Kullanıcı queryset'lerinde takipçi sayısı için annotate ifadesi"""
+    return _follow_count_subquery('to_customuser', user_ref)
+
+
+def annotate_follow_state(queryset, viewer=None, user_ref='pk'):
+    """
+    Kullanıcı queryset'ine takipçi/takip sayılarını ve viewer'ın takip durumunu ekler.
+
+    UserSerializer bu alanlar varsa kullanıcı başına ek sorgu yapmaz:
+    followers_total, following_total, viewer_is_following
+
+    user_ref, queryset kullanıcı modeli değilse kullanıcı ID'sini tutan alandır
+    (örn. SearchIndex için 'user_id').
+    """
+    queryset = queryset.annotate(
+        followers_total=followers_count_expression(user_ref),
+        following_total=_follow_count_subquery('from_customuser', user_ref),
+    )
+    if viewer is not None and viewer.is_authenticated:
+        queryset = queryset.annotate(
+            viewer_is_following=Exists(
+                Follow.objects.filter(from_customuser=viewer, to_customuser=OuterRef(user_ref))
+            )
+        )
+    else:
+        queryset = queryset.annotate(viewer_is_following=Value(False))
+    return queryset
+
+
+def attach_follow_state(users, viewer=None):
+    """
+    Zaten yüklenmiş kullanıcı nesnelerine takip bilgilerini tek sorguda ekler.
+
+    select_related ile gelen (annotate edilemeyen) kullanıcılar için kullanılır.
+    """
+    users = [user for user in users if user is not None]
+    if not users:
+        return users
+    rows = annotate_follow_state(
+        User.objects.filter(pk__in={user.pk for user in users}), viewer
+    ).values_list('pk', 'followers_total', 'following_total', 'viewer_is_following')
+    state = {pk: values for pk, *values in rows}
+    for user in users:
+        if user.pk in state:
+            user.followers_total, user.following_total, user.viewer_is_following = state[user.pk]
+    return users
@@ -838,37 +838,31 @@ class FollowToggleView(APIView):
         if target_user == request.user:
             return Response({'error': 'Kendinizi takip edemezsiniz'}, status=status.HTTP_400_BAD_REQUEST)
         
+        from posts.timeline import invalidate_timeline
+        
         if request.user.following.filter(id=target_user.id).exists():
             request.user.following.remove(target_user)
+            invalidate_timeline(request.user.id)
             return Response({"detail": "Takip bırakıldı"}, status=status.HTTP_200_OK)
         else:
             request.user.following.add(target_user)
+            invalidate_timeline(request.user.id)
             
             # Takip bildirimi gönder (asenkron olarak)
             try:
                 from notifications.utils import send_follow_notification
                 
-                # Bildirimi arka planda gönder (asenkron)
-                import threading
-                def send_notification_async():
-                    try:
-                        send_follow_notification(
-                            follower_user=request.user,
-                            followed_user=target_user
-                        )
-                    except Exception as e:
-                        import logging
-                        logger = logging.getLogger(__name__)
-                        logger.error(f"Takip bildirimi gönderilemedi: {e}")
-                
-                # Arka planda bildirim gönder
-                threading.Thread(target=send_notification_async, daemon=True).start()
+                # Push gönderimi fcm_service kuyruğunda yapılır, istek bloklanmaz
+                send_follow_notification(
+                    recipient_user=target_user,
+                    sender_user=request.user
+                )
                 
             except Exception as e:
                 # Bildirim gönderme hatası kritik değil, sadece logla
                 import logging
                 logger = logging.getLogger(__name__)
-                logger.error(f"Takip bildirimi thread başlatılamadı: {e}")
+                logger.error(f"Takip bildirimi gönderilemedi: {e}")
             
             return Response({"detail": "Takip edildi"}, status=status.HTTP_200_OK)
 
@@ -914,8 +908,10 @@ class UserPostsView(APIView):
     
     def get(self, request, username):
         user = get_object_or_404(User, username=username)
-        posts = user.posts.all().order_by('-created_at')
+        from posts.feed import feed_queryset
+        from posts.models import Post
         from posts.serializers import PostSerializer
+        posts = feed_queryset(request.user, Post.objects.filter(author=user).order_by('-created_at'))
         serializer = PostSerializer(posts, many=True, context={'request': request})
         return Response(serializer.data)
 
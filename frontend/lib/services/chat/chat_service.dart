@@ -12,6 +12,9 @@ class ChatService {
   final Map<String, DateTime> _cacheTimestamps = {};
   static const Duration _cacheDuration = Duration(minutes: 2); // Cache süresini artır
 
+  // Mesaj geçmişi sayfalaması: oda başına daha eski sayfanın cursor'ı (yoksa null)
+  final Map<String, String?> _olderCursors = {};
+
   Future<String?> _getToken() async {
     return await ServiceLocator.token.getToken();
   }
@@ -140,7 +143,9 @@ class ChatService {
 
       if (response.statusCode == 200) {
         final data = jsonDecode(response.body);
-        final messages = (data as List)
+        // Backend sayfalı yanıt döner: {results, has_more, before_cursor, after_cursor}
+        final results = data is Map ? data['results'] : data;
+        final messages = (results as List)
             .map((json) => PrivateMessage.fromJson(json))
             .toList();
             
@@ -185,7 +190,9 @@ class ChatService {
 
       if (response.statusCode == 200) {
         final data = jsonDecode(response.body);
-        final messages = (data as List)
+        // Backend sayfalı yanıt döner: {results, has_more, before_cursor, after_cursor}
+        final results = data is Map ? data['results'] : data;
+        final messages = (results as List)
             .map((json) => PrivateMessage.fromJson(json))
             .toList();
             
@@ -195,6 +202,7 @@ class ChatService {
         // Cache'e kaydet
         _messagesCache[cacheKey] = messages;
         _cacheTimestamps[cacheKey] = DateTime.now();
+        _olderCursors[cacheKey] = _olderCursorFrom(data);
         
         return messages;
       } else {
@@ -205,6 +213,63 @@ class ChatService {
     }
   }
 
+  /// Odada yüklenmemiş daha eski mesaj var mı?
+  bool hasOlderRoomMessages(int user1Id, int user2Id) {
+    return _olderCursors['room_${user1Id}_${user2Id}'] != null;
+  }
+
+  /// Yüklenmiş en eski mesajdan önceki sayfayı getirir (before_cursor ile).
+  /// Mesajlar eskiden yeniye sıralı döner; daha eski mesaj yoksa boş liste.
+  Future<List<PrivateMessage>> getOlderRoomMessages(int user1Id, int user2Id) async {
+    final cacheKey = 'room_${user1Id}_${user2Id}';
+    final cursor = _olderCursors[cacheKey];
+    if (cursor == null) {
+      return [];
+    }
+
+    final token = await _getToken();
+    if (token == null) {
+      throw Exception('Token bulunamadı');
+    }
+
+    try {
+      final response = await http.get(
+        Uri.parse('$_baseUrl/chat/rooms/private_${user1Id}_${user2Id}/messages/')
+            .replace(queryParameters: {'before': cursor}),
+        headers: {
+          'Authorization': 'Bearer $token',
+          'Content-Type': 'application/json',
+        },
+      );
+
+      if (response.statusCode == 200) {
+        final data = jsonDecode(response.body) as Map<String, dynamic>;
+        final messages = (data['results'] as List)
+            .map((json) => PrivateMessage.fromJson(json))
+            .toList();
+        messages.sort((a, b) => a.timestamp.compareTo(b.timestamp));
+
+        _olderCursors[cacheKey] = _olderCursorFrom(data);
+        final cached = _messagesCache[cacheKey];
+        if (cached != null) {
+          _messagesCache[cacheKey] = [...messages, ...cached];
+        }
+        return messages;
+      } else {
+        throw Exception('Eski mesajlar alınamadı: ${response.statusCode} - ${response.body}');
+      }
+    } catch (e) {
+      throw Exception('Eski mesajlar alınırken hata: $e');
+    }
+  }
+
+  String? _olderCursorFrom(dynamic data) {
+    if (data is Map && data['has_more'] == true) {
+      return data['before_cursor'] as String?;
+    }
+    return null;
+  }
+
   /// Room'a mesaj gönder (frontend'in beklediği format)
   Future<PrivateMessage> sendRoomMessage({
     required int user1Id,
@@ -453,15 +518,15 @@ class ChatService {
     }
   }
 
-  /// Mesajlarda arama yap
-  Future<List<PrivateMessage>> searchMessages(String query) async {
+  /// Mesajlarda arama yap (alakaya göre sıralı, sayfa numarasıyla sayfalı)
+  Future<MessageSearchResults> searchMessages(String query, {int page = 1}) async {
     final token = await _getToken();
     if (token == null) {
       throw Exception('Token bulunamadı');
     }
 
     try {
-      final url = '$_baseUrl/chat/private-messages/search/?q=${Uri.encodeComponent(query)}';
+      final url = '$_baseUrl/chat/private-messages/search/?q=${Uri.encodeComponent(query)}&page=$page';
       
       final response = await http.get(
         Uri.parse(url),
@@ -473,11 +538,16 @@ class ChatService {
 
 
       if (response.statusCode == 200) {
-        final data = jsonDecode(response.body);
-        final messages = (data as List)
+        // Backend sayfalı yanıt döner: {results, page, page_size, has_more}
+        final data = jsonDecode(response.body) as Map<String, dynamic>;
+        final messages = (data['results'] as List)
             .map((json) => PrivateMessage.fromJson(json))
             .toList();
-        return messages;
+        return MessageSearchResults(
+          messages: messages,
+          page: data['page'] ?? page,
+          hasMore: data['has_more'] == true,
+        );
       } else {
         throw Exception('Mesajlar aranamadı: ${response.statusCode} - ${response.body}');
       }
@@ -498,6 +568,7 @@ class ChatService {
     _messagesCache.clear();
     _conversationsCache.clear();
     _cacheTimestamps.clear();
+    _olderCursors.clear();
   }
   
   void clearCache() {
@@ -535,6 +606,19 @@ class PrivateMessage {
   }
 }
 
+/// Mesaj aramasının bir sayfası
+class MessageSearchResults {
+  final List<PrivateMessage> messages;
+  final int page;
+  final bool hasMore;
+
+  MessageSearchResults({
+    required this.messages,
+    required this.page,
+    required this.hasMore,
+  });
+}
+
 /// Konuşma modeli
 class Conversation {
   final User otherUser;
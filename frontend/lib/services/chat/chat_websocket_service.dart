@@ -33,6 +33,8 @@ class ChatWebSocketService {
   String? _currentUserId;
   int? _lastMessageId; // Son mesaj ID'sini takip et
   Timer? _pollingTimer; // HTTP polling timer'ını takip et
+  Timer? _heartbeatTimer; // Özel sohbet soketinin heartbeat timer'ı
+  static const Duration _heartbeatInterval = Duration(seconds: 30);
   
   // Constructor
   ChatWebSocketService() {
@@ -128,6 +130,7 @@ class ChatWebSocketService {
 
       _isConnected = true;
       _connectionStatusController.add(true);
+      _startHeartbeat();
 
       print('🔌 ChatWebSocketService: Özel sohbet bağlantısı kuruldu - $userId1 <-> $userId2');
     } catch (e) {
@@ -200,6 +203,7 @@ class ChatWebSocketService {
   /// Bağlantıyı kapat
   Future<void> disconnect() async {
     try {
+      _stopHeartbeat();
       await _subscription?.cancel();
       await _channel?.sink.close(status.goingAway);
       _pollingTimer?.cancel(); // HTTP polling timer'ını da iptal et
@@ -217,6 +221,27 @@ class ChatWebSocketService {
     }
   }
 
+  /// Özel sohbet soketi açıkken periyodik heartbeat gönder
+  void _startHeartbeat() {
+    _stopHeartbeat();
+    _heartbeatTimer = Timer.periodic(_heartbeatInterval, (timer) {
+      if (!_isConnected || _channel == null) {
+        timer.cancel();
+        return;
+      }
+      try {
+        _channel!.sink.add(jsonEncode({'type': 'heartbeat'}));
+      } catch (e) {
+        print('❌ ChatWebSocketService: Heartbeat hatası: $e');
+      }
+    });
+  }
+
+  void _stopHeartbeat() {
+    _heartbeatTimer?.cancel();
+    _heartbeatTimer = null;
+  }
+
   /// Gelen mesajları işle
   void _handleMessage(dynamic message) {
     try {
@@ -244,6 +269,9 @@ class ChatWebSocketService {
           _typingController.add(data['username'] ?? 'Birisi');
           break;
           
+        case 'heartbeat_ack':
+          break;
+          
         case 'error':
           print('❌ ChatWebSocketService: Sunucu hatası: ${data['message']}');
           break;
@@ -259,6 +287,7 @@ class ChatWebSocketService {
   /// Hata işleme - akıllı retry stratejisi ile
   void _handleError(dynamic error) {
     print('❌ ChatWebSocketService: WebSocket hatası: $error');
+    _stopHeartbeat();
     _isConnected = false;
     _connectionStatusController.add(false);
     _connectionManager.updateConnectionStatus(false);
@@ -272,6 +301,7 @@ class ChatWebSocketService {
   /// Bağlantı kesilme işleme
   void _handleDisconnection() {
     print('🔌 ChatWebSocketService: Bağlantı kesildi');
+    _stopHeartbeat();
     _isConnected = false;
     _connectionStatusController.add(false);
     _connectionManager.updateConnectionStatus(false);
@@ -337,7 +367,8 @@ class ChatWebSocketService {
       );
       
       if (response.statusCode == 200) {
-        final data = response.data;
+        final body = response.data;
+        final data = body is Map ? body['results'] : body;
         if (data is List && data.isNotEmpty) {
           // Son mesajı işle - sadece yeni mesajları kontrol et
           final lastMessage = data.last;
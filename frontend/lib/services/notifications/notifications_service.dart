@@ -21,6 +21,10 @@ class NotificationsService {
   // Polling fallback için
   Timer? _pollingTimer;
   bool _isPolling = false;
+
+  // Açık WebSocket'in sunucuda canlı sayılması için heartbeat
+  static const Duration _heartbeatInterval = Duration(seconds: 30);
+  Timer? _heartbeatTimer;
   
   // Debug için constructor'da URL'yi yazdır
   NotificationsService() {
@@ -298,15 +302,18 @@ class NotificationsService {
         (data) {
           try {
             final decodedData = jsonDecode(data);
+            if (decodedData['action'] == 'heartbeat_ack') return;
             _notificationStreamController.add(decodedData);
           } catch (e) {
           }
         },
         onDone: () {
+          _stopHeartbeat();
           _isConnected = false;
           _connectionStatusController.add(false);
         },
         onError: (error) {
+          _stopHeartbeat();
           _isConnected = false;
           _connectionStatusController.add(false);
           _notificationStreamController.addError(error);
@@ -315,6 +322,7 @@ class NotificationsService {
 
       _isConnected = true;
       _connectionStatusController.add(true);
+      _startHeartbeat();
     } catch (e) {
       _isConnected = false;
       _connectionStatusController.add(false);
@@ -325,8 +333,26 @@ class NotificationsService {
     }
   }
 
+  /// Bağlantı açık kaldığı sürece periyodik heartbeat gönderir
+  void _startHeartbeat() {
+    _stopHeartbeat();
+    _heartbeatTimer = Timer.periodic(_heartbeatInterval, (timer) {
+      try {
+        _channel?.sink.add(jsonEncode({'action': 'heartbeat'}));
+      } catch (e) {
+        print('❌ Heartbeat gönderme hatası: $e');
+      }
+    });
+  }
+
+  void _stopHeartbeat() {
+    _heartbeatTimer?.cancel();
+    _heartbeatTimer = null;
+  }
+
   /// WebSocket bağlantısını kapatır
   void disconnectWebSocket() {
+    _stopHeartbeat();
     if (_channel != null) {
       _channel!.sink.close();
       _channel = null;
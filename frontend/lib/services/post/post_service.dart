@@ -14,8 +14,15 @@ class PostService {
   final Map<String, DateTime> _cacheTimestamps = {};
   static const Duration _cacheDuration = Duration(minutes: 3);
 
+  // Following feed cursor sayfalaması: son yüklenen sayfanın devam cursor'ı
+  String? _followingNextCursor;
+  bool _followingHasMore = false;
+
   PostService();
 
+  /// Following feed'de yüklenmemiş daha eski gönderi var mı?
+  bool get hasMoreFollowingPosts => _followingHasMore && _followingNextCursor != null;
+
   Future<String?> _getToken() async {
     return await ServiceLocator.token.getToken();
   }
@@ -136,7 +143,14 @@ class PostService {
       // print('PostService - API response data type: ${response.data.runtimeType}');
 
       if (response.statusCode == 200) {
-        final posts = response.data as List<dynamic>;
+        // Following feed cursor ile sayfalanır: {results, next_cursor, has_more}
+        final data = response.data;
+        final posts = data is Map<String, dynamic>
+            ? List<dynamic>.from(data['results'] as List<dynamic>)
+            : data as List<dynamic>;
+        if (followingOnly) {
+          _setFollowingCursor(data);
+        }
         
         // Debug için gelen postları yazdır
         // print('PostService - Fetched ${posts.length} posts');
@@ -187,8 +201,55 @@ class PostService {
     }
   }
 
+  /// Following feed'in bir sonraki sayfasını getirir ve cache'teki listeye ekler.
+  /// Yeni gelen gönderileri döndürür; devamı yoksa boş liste.
+  Future<List<dynamic>> fetchMoreFollowingPosts() async {
+    final cursor = _followingNextCursor;
+    if (!_followingHasMore || cursor == null) {
+      return [];
+    }
+
+    try {
+      final response = await _apiClient.get(
+        'posts/following/?cursor=${Uri.encodeQueryComponent(cursor)}',
+      );
+
+      if (response.statusCode == 200) {
+        final data = response.data as Map<String, dynamic>;
+        final posts = data['results'] as List<dynamic>;
+        _setFollowingCursor(data);
+
+        final cached = _postsCache['posts_following'];
+        if (cached != null) {
+          cached.addAll(posts);
+        }
+        return posts;
+      } else {
+        throw Exception('Postlar alınamadı: ${response.statusCode}');
+      }
+    } on DioException catch (e) {
+      if (e.type == DioExceptionType.connectionTimeout ||
+          e.type == DioExceptionType.connectionError) {
+        throw Exception(
+            'Sunucuya bağlanılamıyor. Lütfen internet bağlantınızı kontrol edin.');
+      }
+      throw Exception('Postlar alınırken hata oluştu: ${e.message}');
+    }
+  }
+
+  void _setFollowingCursor(dynamic data) {
+    if (data is Map<String, dynamic>) {
+      _followingNextCursor = data['next_cursor'] as String?;
+      _followingHasMore = data['has_more'] == true;
+    } else {
+      _followingNextCursor = null;
+      _followingHasMore = false;
+    }
+  }
+
   /// Fallback: Tüm postları getir ve takip edilen kullanıcıların postlarını filtrele
   Future<List<dynamic>> _fetchFollowingPostsFallback() async {
+    _setFollowingCursor(null);
     try {
       // print('🔄 PostService - Fallback: Tüm postları getirip filtreleme yapılıyor...');
       
@@ -307,6 +368,7 @@ class PostService {
     // print('PostService - Cache temizleniyor...');
     _postsCache.clear();
     _cacheTimestamps.clear();
+    _setFollowingCursor(null);
     // print('PostService - Cache temizlendi');
   }
   
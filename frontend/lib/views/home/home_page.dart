@@ -23,6 +23,8 @@ class _HomePageState extends State<HomePage> {
   bool loading = true;
   String? error;
   List<dynamic> posts = [];
+  bool hasMore = false;
+  bool loadingMore = false;
 
   int unreadNotificationsCount = 0;
 
@@ -49,6 +51,7 @@ class _HomePageState extends State<HomePage> {
       
       setState(() {
         posts = updatedPosts;
+        hasMore = ServiceLocator.post.hasMoreFollowingPosts;
       });
     } catch (e) {
       if (!mounted) return;
@@ -63,6 +66,34 @@ class _HomePageState extends State<HomePage> {
     }
   }
 
+  /// Sayfanın sonuna gelindiğinde bir sonraki cursor sayfasını yükler
+  Future<void> _loadMorePosts() async {
+    if (loading || loadingMore || !hasMore) return;
+
+    setState(() {
+      loadingMore = true;
+    });
+
+    try {
+      final fetchedPosts = await ServiceLocator.post.fetchMoreFollowingPosts();
+      final updatedPosts = await _processPostsWithUserDetails(fetchedPosts);
+
+      if (!mounted) return;
+      setState(() {
+        posts = [...posts, ...updatedPosts];
+        hasMore = ServiceLocator.post.hasMoreFollowingPosts;
+      });
+    } catch (e) {
+      // Devam sayfası yüklenemezse mevcut liste korunur; kaydırınca tekrar denenir
+    } finally {
+      if (mounted) {
+        setState(() {
+          loadingMore = false;
+        });
+      }
+    }
+  }
+
   /// Optimized method to process posts with user details using PerformanceOptimizer
   Future<List<dynamic>> _processPostsWithUserDetails(List<dynamic> fetchedPosts) async {
     return await PerformanceOptimizer.runInBackground(
@@ -271,6 +302,9 @@ class _HomePageState extends State<HomePage> {
         error: error,
         posts: posts,
         onRefresh: _fetchPosts,
+        hasMore: hasMore,
+        loadingMore: loadingMore,
+        onLoadMore: _loadMorePosts,
       ),
       floatingActionButton: ModernFAB(
         onPressed: _onPostButtonPressed,
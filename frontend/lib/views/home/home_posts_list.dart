@@ -10,6 +10,9 @@ class HomePostsList extends StatelessWidget {
   final String? error;
   final List<dynamic> posts;
   final Future<void> Function() onRefresh;
+  final bool hasMore;
+  final bool loadingMore;
+  final VoidCallback? onLoadMore;
 
   const HomePostsList({
     super.key,
@@ -17,6 +20,9 @@ class HomePostsList extends StatelessWidget {
     required this.error,
     required this.posts,
     required this.onRefresh,
+    this.hasMore = false,
+    this.loadingMore = false,
+    this.onLoadMore,
   });
 
   @override
@@ -34,35 +40,55 @@ class HomePostsList extends StatelessWidget {
 
     return RefreshIndicator(
       onRefresh: onRefresh,
-      child: ListView.builder(
-        padding: const EdgeInsets.symmetric(vertical: 8),
-        itemCount: posts.length,
-        itemBuilder: (context, index) {
-          final post = posts[index] as Map<String, dynamic>;
-          final content = post['content']?.toString() ?? '';
-          final contentPreview = content.length > 20 ? '${content.substring(0, 20)}...' : content;
+      child: NotificationListener<ScrollNotification>(
+        onNotification: (notification) {
+          // Listenin sonuna yaklaşınca bir sonraki sayfayı iste
+          if (hasMore &&
+              notification.metrics.pixels >= notification.metrics.maxScrollExtent - 400) {
+            onLoadMore?.call();
+          }
+          return false;
+        },
+        child: ListView.builder(
+          padding: const EdgeInsets.symmetric(vertical: 8),
+          itemCount: posts.length + (hasMore ? 1 : 0),
+          itemBuilder: (context, index) {
+            if (index == posts.length) {
+              return Padding(
+                padding: const EdgeInsets.symmetric(vertical: 16),
+                child: Center(
+                  child: loadingMore
+                      ? const CircularProgressIndicator(strokeWidth: 2)
+                      : const SizedBox.shrink(),
+                ),
+              );
+            }
+            final post = posts[index] as Map<String, dynamic>;
+            final content = post['content']?.toString() ?? '';
+            final contentPreview = content.length > 20 ? '${content.substring(0, 20)}...' : content;
 
-          // Author zaten backend'den nested serializer ile geliyor
-          final authorData = post['author'] is Map<String, dynamic>
-              ? post['author'] as Map<String, dynamic>
-              : {};
+            // Author zaten backend'den nested serializer ile geliyor
+            final authorData = post['author'] is Map<String, dynamic>
+                ? post['author'] as Map<String, dynamic>
+                : {};
 
-          post['author'] = authorData;
+            post['author'] = authorData;
 
-          return FutureBuilder<bool>(
-            future: _isCurrentUserPost(post),
-            builder: (context, snapshot) {
-              final canDelete = snapshot.data ?? false;
-              return PostItem(
-                post: post,
-                onComment: _handleComment,
-                onShare: _handleShare,
-                canDelete: canDelete,
-                onDelete: () => _handleDelete(post['id']),
-              );
-            },
-          );
-        },
+            return FutureBuilder<bool>(
+              future: _isCurrentUserPost(post),
+              builder: (context, snapshot) {
+                final canDelete = snapshot.data ?? false;
+                return PostItem(
+                  post: post,
+                  onComment: _handleComment,
+                  onShare: _handleShare,
+                  canDelete: canDelete,
+                  onDelete: () => _handleDelete(post['id']),
+                );
+              },
+            );
+          },
+        ),
       ),
     );
   }
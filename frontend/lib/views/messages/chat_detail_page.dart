@@ -36,6 +36,8 @@ class _ChatDetailPageState extends State<ChatDetailPage> {
   int? _currentUserId;
   Set<int> _readMessageIds = {}; // Okunan mesaj ID'lerini tut
   bool _hasMarkedAsRead = false; // İlk yüklemede okundu işaretleme kontrolü
+  bool _hasOlderMessages = false;
+  bool _isLoadingOlder = false;
 
   // Real-time chat özellikleri
   bool _isConnected = false;
@@ -45,9 +47,19 @@ class _ChatDetailPageState extends State<ChatDetailPage> {
   @override
   void initState() {
     super.initState();
+    _scrollController.addListener(_onScroll);
     _initializePage();
   }
 
+  /// Kullanıcı yukarı kaydırıp listenin başına yaklaşınca daha eski mesajları yükle
+  void _onScroll() {
+    if (!_scrollController.hasClients) return;
+    final position = _scrollController.position;
+    if (position.userScrollDirection == ScrollDirection.forward && position.pixels <= 200) {
+      _loadOlderMessages();
+    }
+  }
+
   Future<void> _initializePage() async {
     await _getCurrentUserId();
     await _loadMessages();
@@ -280,6 +292,7 @@ class _ChatDetailPageState extends State<ChatDetailPage> {
       if (mounted) {
         setState(() {
           _messages = messages;
+          _hasOlderMessages = _chatService.hasOlderRoomMessages(_currentUserId!, widget.otherUser.id);
           _isLoading = false;
         });
         _scrollToBottom();
@@ -425,6 +438,37 @@ class _ChatDetailPageState extends State<ChatDetailPage> {
     }
   }
 
+  /// before_cursor ile bir önceki sayfayı getirip listenin başına ekler
+  Future<void> _loadOlderMessages() async {
+    if (_isLoadingOlder || !_hasOlderMessages || _currentUserId == null) return;
+    setState(() => _isLoadingOlder = true);
+
+    try {
+      final older = await _chatService.getOlderRoomMessages(_currentUserId!, widget.otherUser.id);
+      if (!mounted) return;
+
+      // Başa eklenen mesajlar görünen konumu kaydırmasın
+      final previousExtent = _scrollController.hasClients ? _scrollController.position.maxScrollExtent : 0.0;
+      final knownIds = _messages.map((m) => m.id).toSet();
+      setState(() {
+        _messages = [...older.where((m) => !knownIds.contains(m.id)), ..._messages];
+        _hasOlderMessages = _chatService.hasOlderRoomMessages(_currentUserId!, widget.otherUser.id);
+      });
+      WidgetsBinding.instance.addPostFrameCallback((_) {
+        if (_scrollController.hasClients) {
+          final delta = _scrollController.position.maxScrollExtent - previousExtent;
+          _scrollController.jumpTo(_scrollController.position.pixels + delta);
+        }
+      });
+    } catch (e) {
+      // Eski mesajlar yüklenemezse mevcut liste korunur; kaydırınca tekrar denenir
+    } finally {
+      if (mounted) {
+        setState(() => _isLoadingOlder = false);
+      }
+    }
+  }
+
   void _scrollToBottom() {
     WidgetsBinding.instance.addPostFrameCallback((_) {
       if (_scrollController.hasClients) {
@@ -627,11 +671,25 @@ class _ChatDetailPageState extends State<ChatDetailPage> {
       );
     }
 
+    // Daha eski mesaj varsa listenin başında yükleniyor göstergesi
+    final offset = _hasOlderMessages ? 1 : 0;
+
     return ListView.builder(
       controller: _scrollController,
       padding: const EdgeInsets.all(16),
-      itemCount: _messages.length,
-      itemBuilder: (context, index) {
+      itemCount: _messages.length + offset,
+      itemBuilder: (context, itemIndex) {
+        if (itemIndex < offset) {
+          return Padding(
+            padding: const EdgeInsets.symmetric(vertical: 8),
+            child: Center(
+              child: _isLoadingOlder
+                  ? const CircularProgressIndicator(strokeWidth: 2)
+                  : const SizedBox.shrink(),
+            ),
+          );
+        }
+        final index = itemIndex - offset;
         final message = _messages[index];
         final isFirstInGroup = index == 0 || 
             _messages[index - 1].sender.id != message.sender.id ||
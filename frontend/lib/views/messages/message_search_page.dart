@@ -17,6 +17,9 @@ class _MessageSearchPageState extends State<MessageSearchPage> {
   bool _isSearching = false;
   String? _errorMessage;
   String _lastQuery = '';
+  int _page = 1;
+  bool _hasMore = false;
+  bool _isLoadingMore = false;
 
   @override
   void dispose() {
@@ -30,6 +33,7 @@ class _MessageSearchPageState extends State<MessageSearchPage> {
         _searchResults = [];
         _errorMessage = null;
         _lastQuery = '';
+        _hasMore = false;
       });
       return;
     }
@@ -43,9 +47,11 @@ class _MessageSearchPageState extends State<MessageSearchPage> {
     try {
       final results = await _chatService.searchMessages(query.trim());
       
-      if (mounted) {
+      if (mounted && query == _lastQuery) {
         setState(() {
-          _searchResults = results;
+          _searchResults = results.messages;
+          _page = results.page;
+          _hasMore = results.hasMore;
           _isSearching = false;
         });
       }
@@ -59,6 +65,30 @@ class _MessageSearchPageState extends State<MessageSearchPage> {
     }
   }
 
+  /// Sonuç listesinin sonuna gelindiğinde bir sonraki sayfayı ekler
+  Future<void> _loadMoreResults() async {
+    if (_isSearching || _isLoadingMore || !_hasMore) return;
+    final query = _lastQuery;
+    setState(() => _isLoadingMore = true);
+
+    try {
+      final results = await _chatService.searchMessages(query.trim(), page: _page + 1);
+      if (mounted && query == _lastQuery) {
+        setState(() {
+          _searchResults = [..._searchResults, ...results.messages];
+          _page = results.page;
+          _hasMore = results.hasMore;
+        });
+      }
+    } catch (e) {
+      // Sonraki sayfa yüklenemezse mevcut sonuçlar korunur
+    } finally {
+      if (mounted) {
+        setState(() => _isLoadingMore = false);
+      }
+    }
+  }
+
   @override
   Widget build(BuildContext context) {
     final theme = Theme.of(context);
@@ -217,13 +247,32 @@ class _MessageSearchPageState extends State<MessageSearchPage> {
       );
     }
 
-    return ListView.builder(
-      padding: const EdgeInsets.all(16),
-      itemCount: _searchResults.length,
-      itemBuilder: (context, index) {
-        final message = _searchResults[index];
-        return _buildMessageTile(message);
+    return NotificationListener<ScrollNotification>(
+      onNotification: (notification) {
+        if (_hasMore &&
+            notification.metrics.pixels >= notification.metrics.maxScrollExtent - 200) {
+          _loadMoreResults();
+        }
+        return false;
       },
+      child: ListView.builder(
+        padding: const EdgeInsets.all(16),
+        itemCount: _searchResults.length + (_hasMore ? 1 : 0),
+        itemBuilder: (context, index) {
+          if (index == _searchResults.length) {
+            return Padding(
+              padding: const EdgeInsets.symmetric(vertical: 16),
+              child: Center(
+                child: _isLoadingMore
+                    ? const CircularProgressIndicator(strokeWidth: 2)
+                    : const SizedBox.shrink(),
+              ),
+            );
+          }
+          final message = _searchResults[index];
+          return _buildMessageTile(message);
+        },
+      ),
     );
   }
 